@@ -16,6 +16,7 @@
 import gtk
 import gobject
 import os
+import time
 import gettext
 from gettext import gettext as _
 gettext.textdomain('quickly-widgets')
@@ -37,6 +38,12 @@ class Prompt(gtk.Dialog):
     quickly.prompts.decimal() uses quickly.prompts.DecimalPrompt
     quickly.prompts.price() uses quickly.prompts.PricePrompt
 
+    Each helper function has an _async variant that shows the dialog
+    and returns right away, rather than running a nested main loop
+    until the user responds, so timers and idle handlers keep running.
+    The Prompts used by the _async variants are hidden rather than
+    destroyed, and reused by the next prompt of the same kind.
+
     Using
     A quickly.prompts.prompt object is not intended to be used without
     configuring or extending it. Otherwise, it will only display a 
@@ -60,6 +67,19 @@ class Prompt(gtk.Dialog):
     #A Prompt is a gtk.Dialog, so you can use gtk.DialogMembers
     action_area = p.get_action_area()
 
+    #Prompt without waiting, on_response is called when the user responds
+    def on_response(response, value):
+        if response == gtk.RESPONSE_OK:
+            my_string = value
+    quickly.prompts.string_async(title, text, on_response=on_response)
+
+    #or wait for the returned Future in a CoroutineTask
+    def ask(params):
+        response, value = yield quickly.prompts.string_async(title, text)
+
+    #destroy the Prompts kept for reuse
+    quickly.prompts.clear_dialog_cache()
+
     Extending 
     #Typically you will add widgets to a prompt
     #String prompt is implemented as follows:
@@ -93,11 +113,113 @@ class Prompt(gtk.Dialog):
         self.set_default_response(gtk.RESPONSE_OK)
 
         self.content_box = gtk.VBox(False, 10)
-        label = gtk.Label(text)
-        self.content_box.pack_start(label,False, False, 5)
+        self._label = gtk.Label(text)
+        self.content_box.pack_start(self._label,False, False, 5)
         content_area.pack_start(self.content_box)
         self.content_box.show()
-        label.show()
+        self._label.show()
+
+    def reset(self, title, text):
+        """reset - sets the title and text again so the Prompt can be
+        shown again. Subclasses also take their default value and put
+        it back in their widgets. Used by the _async helper functions
+        to reuse a Prompt.
+
+        """
+
+        self.set_title(title)
+        self._label.set_text(text)
+        self.set_default_response(gtk.RESPONSE_OK)
+
+#the most hidden dialogs of each class kept for reuse by the _async
+#helper functions
+MAX_CACHED_DIALOGS = 2
+
+_dialog_cache = {}
+
+def _cached_dialog(dialog_class, *args):
+    """_cached_dialog - internal function that returns a hidden dialog of
+    dialog_class from the cache, reset with args, or a new one made with
+    args.
+
+    """
+
+    cached = _dialog_cache.get(dialog_class)
+    if cached:
+        dialog = cached.pop()
+        dialog.reset(*args)
+        return dialog
+    return dialog_class(*args)
+
+def _release_dialog(dialog):
+    """_release_dialog - internal function that hides dialog and keeps it
+    for reuse, or destroys it if enough of its class are kept already.
+
+    """
+
+    dialog.hide()
+    cached = _dialog_cache.setdefault(type(dialog), [])
+    if len(cached) < MAX_CACHED_DIALOGS:
+        cached.append(dialog)
+    else:
+        dialog.destroy()
+
+def clear_dialog_cache():
+    """clear_dialog_cache - destroys the dialogs kept for reuse by the
+    _async helper functions.
+
+    """
+
+    for cached in _dialog_cache.values():
+        for dialog in cached:
+            dialog.destroy()
+    _dialog_cache.clear()
+
+def _show_async(dialog, on_response, get_value=None, reuse=True):
+    """_show_async - internal function that shows dialog without running
+    a nested main loop, and returns a quickly.widgets.coroutine_task.Future
+    for its result.
+
+    arguments:
+    dialog - the dialog to show
+    on_response - a function called with the response, and the value if
+    get_value is given, or None
+    get_value - a function called with dialog to get its value, None for
+    dialogs that only return a response
+    reuse - keep the dialog for reuse after the response, otherwise it
+    is destroyed
+
+    """
+
+    from quickly.widgets.coroutine_task import Future
+    future = Future()
+    handlers = []
+
+    def responded(dialog, response):
+        dialog.disconnect(handlers[0])
+        if get_value is None:
+            result = response
+        else:
+            result = (response, get_value(dialog))
+        if reuse:
+            _release_dialog(dialog)
+        else:
+            dialog.destroy()
+        if on_response is not None:
+            if get_value is None:
+                on_response(response)
+            else:
+                on_response(*result)
+        future.set_result(result)
+
+    handlers.append(dialog.connect("response", responded))
+    if reuse and not dialog.get_data("quickly-keep-on-delete"):
+        #gtk.Dialog destroys itself after the response to a delete event,
+        #the handler stays connected since it runs after the response
+        dialog.connect("delete-event", lambda w, e: True)
+        dialog.set_data("quickly-keep-on-delete", True)
+    dialog.present()
+    return future
 
 def string(title = _("Input String"), text = _("Input a String:"), default_value = ""):
     """string - prompts to enter a string via a dialog box.
@@ -119,6 +241,26 @@ def string(title = _("Input String"), text = _("Input a String:"), default_value
     sp.destroy()
     return (response, val)
 
+def string_async(title = _("Input String"), text = _("Input a String:"),
+                 default_value = "", on_response = None):
+    """string_async - like string(), but shows the dialog and returns
+    right away instead of waiting for the user.
+
+    aguments:
+    title - a string to be the title of the dialog
+    text - a string to provide a prompt for the user within dialog
+    default_value - a string to see the entry in the dialog box
+    on_response - a function called with the gtk.DialogResponse and
+    the string value once the user responds
+
+    returns a quickly.widgets.coroutine_task.Future for the tuple of
+    (gtk.DialogResponse, string value), so a CoroutineTask can yield it
+
+    """
+
+    sp = _cached_dialog(StringPrompt, title, text, default_value)
+    return _show_async(sp, on_response, StringPrompt.get_value)
+
 class StringPrompt(Prompt):
     """A class for receiving a string from a user
 
@@ -157,6 +299,16 @@ class StringPrompt(Prompt):
         self._entry.show()
         self.content_box.pack_end(self._entry, True, True, 5)
 
+    def reset(self, title = _("Input String"), text = _("Input a String:"), default_value = ""):
+        """reset - sets the title, text and entry again so the
+        StringPrompt can be shown again.
+
+        """
+
+        Prompt.reset(self, title, text)
+        self._entry.set_text(default_value)
+        self._entry.grab_focus()
+
     def get_value(self):
         """get_value - returns the value the user has entered into the gtk.Entry
 
@@ -188,6 +340,27 @@ def date(title = _("Choose Date"), text = _("Choose a Date:"), default_value = N
     dp.destroy()
     return (response, val)
 
+def date_async(title = _("Choose Date"), text = _("Choose a Date:"),
+               default_value = None, on_response = None):
+    """date_async - like date(), but shows the dialog and returns right
+    away instead of waiting for the user.
+
+    aguments:
+    title - a string to be the title of the dialog
+    text - a string to provide a prompt for the user within dialog
+    default_value - a tuple in the form of integers for (year,month,day)
+    where month is zero indexed (Jaunary is 0, December is 11)
+    on_response - a function called with the gtk.DialogResponse and
+    the date tuple once the user responds
+
+    returns a quickly.widgets.coroutine_task.Future for the tuple of
+    (gtk.DialogResponse, tuple)
+
+    """
+
+    dp = _cached_dialog(DatePrompt, title, text, default_value)
+    return _show_async(dp, on_response, DatePrompt.get_value)
+
 class DatePrompt(Prompt):
     """A class for receiving a date from a user
 
@@ -229,6 +402,20 @@ class DatePrompt(Prompt):
             self._calendar.select_month(month, year)
             self._calendar.select_day(day)
 
+    def reset(self, title = _("Choose Date"), text = _("Choose a Date:"), default_value = None):
+        """reset - sets the title, text and date again so the DatePrompt
+        can be shown again. The date is today if default_value is None.
+
+        """
+
+        Prompt.reset(self, title, text)
+        if default_value is None or len(default_value) != 3:
+            today = time.localtime()
+            default_value = (today[0], today[1] - 1, today[2])
+        year, month, day = default_value
+        self._calendar.select_month(month, year)
+        self._calendar.select_day(day)
+
     def get_value(self):
         """get_value - return the date currently set in the _calendar member
         A tuple is in the form of integers for (year,month,day)
@@ -271,6 +458,26 @@ def integer(title = _("Enter Number"), text = _("Enter an Integer Value:"),
     ip.destroy()
     return (response, val)
 
+def integer_async(title = _("Enter Number"), text = _("Enter an Integer Value:"),
+                  default_value=0, min_value = -1000000000, max_value=1000000000,
+                  step = 1, on_response = None):
+    """integer_async - like integer(), but shows the dialog and returns
+    right away instead of waiting for the user.
+
+    keyword arguments:
+    the same as integer(), and
+    on_response - a function called with the gtk.DialogResponse and
+    the integer once the user responds
+
+    returns a quickly.widgets.coroutine_task.Future for the tuple of
+    (gtk.DialogResponse, integer)
+
+    """
+
+    ip = _cached_dialog(IntegerPrompt, title, text, default_value,
+                        min_value, max_value, step)
+    return _show_async(ip, on_response, IntegerPrompt.get_value)
+
 
 class IntegerPrompt(Prompt):
     """A Prompt for collecting an integer number value from user. Uses
@@ -312,9 +519,31 @@ class IntegerPrompt(Prompt):
         self._spinner.set_numeric(True)
         self.content_box.pack_end(self._spinner, True, True, 5)
 
+    def reset(self, title=_("Enter Number"), text=_("Enter an Integer Value:"),
+            default_value=0, min_value = -1000000000, max_value=1000000000,
+            step = 1):
+        """reset - sets the title, text and spinner again so the
+        IntegerPrompt can be shown again.
+
+        """
+
+        Prompt.reset(self, title, text)
+        _reset_spinner(self._spinner, default_value, min_value, max_value,
+                       step)
+
     def get_value(self):
             return self._spinner.get_value_as_int()
 
+def _reset_spinner(spinner, value, min_value, max_value, step):
+    """_reset_spinner - internal function that puts the range, step and
+    value of a spinner back for a reused prompt.
+
+    """
+
+    spinner.set_range(min_value, max_value)
+    spinner.set_increments(step, 0)
+    spinner.set_value(value)
+
 def decimal(title=_("Enter Price"), text=_("Choose a Price:"), 
           default_value=0, min_value=-1000000000, max_value=1000000000,
           step=1,digits=20):
@@ -353,6 +582,26 @@ def decimal(title=_("Enter Price"), text=_("Choose a Price:"),
     dp.destroy()
     return (response, val)
 
+def decimal_async(title=_("Enter Price"), text=_("Choose a Price:"),
+                  default_value=0, min_value=-1000000000, max_value=1000000000,
+                  step=1, digits=20, on_response=None):
+    """decimal_async - like decimal(), but shows the dialog and returns
+    right away instead of waiting for the user.
+
+    keyword arguments:
+    the same as decimal(), and
+    on_response - a function called with the gtk.DialogResponse and
+    the number once the user responds
+
+    returns a quickly.widgets.coroutine_task.Future for the tuple of
+    (gtk.DialogResponse, number)
+
+    """
+
+    dp = _cached_dialog(DecimalPrompt, title, text, default_value,
+                        min_value, max_value, step, digits)
+    return _show_async(dp, on_response, DecimalPrompt.get_value)
+
 class DecimalPrompt(Prompt):
     """A Prompt for collecting a decimal number value from user. Uses
         a gtk.Spinner for data entry.
@@ -421,6 +670,19 @@ class DecimalPrompt(Prompt):
         self._spinner.set_numeric(True)
         self.content_box.pack_end(self._spinner, True, True, 5)
 
+    def reset(self, title=_("Enter Number"), text=_("Enter an Integer Value:"),
+                    default_value=0, min_value=-1000000000, max_value=1000000000,
+                    step=1, digits=20):
+        """reset - sets the title, text and spinner again so the
+        DecimalPrompt can be shown again.
+
+        """
+
+        Prompt.reset(self, title, text)
+        self._spinner.set_digits(max(0, min(20, digits)))
+        _reset_spinner(self._spinner, default_value, min_value, max_value,
+                       step)
+
     def get_value(self):
             return self._spinner.get_value()
 
@@ -459,6 +721,26 @@ def price(title=_("Enter Price"), text=_("Choose a Price:"),
     pp.destroy()
     return (response, val)
 
+def price_async(title=_("Enter Price"), text=_("Choose a Price:"),
+                default_value=0, min_value=-1000000000, max_value=1000000000,
+                step=1, on_response=None):
+    """price_async - like price(), but shows the dialog and returns
+    right away instead of waiting for the user.
+
+    keyword arguments:
+    the same as price(), and
+    on_response - a function called with the gtk.DialogResponse and
+    the number once the user responds
+
+    returns a quickly.widgets.coroutine_task.Future for the tuple of
+    (gtk.DialogResponse, number)
+
+    """
+
+    pp = _cached_dialog(PricePrompt, title, text, default_value,
+                        min_value, max_value, step)
+    return _show_async(pp, on_response, PricePrompt.get_value)
+
 class PricePrompt(DecimalPrompt):
     """A Prompt for collecting a decimal number value from the user,
         formatted with two decimal places appropriate for entering
@@ -516,6 +798,17 @@ class PricePrompt(DecimalPrompt):
                               max_value, step)
         self._spinner.set_digits(2)
 
+    def reset(self, title=_("Enter Price"), text=_("Choose a Price:"), 
+          default_value=0, min_value=-1000000000, max_value=1000000000,
+          step=1):
+        """reset - sets the title, text and spinner again so the
+        PricePrompt can be shown again.
+
+        """
+
+        DecimalPrompt.reset(self, title, text, default_value, min_value,
+                            max_value, step, 2)
+
 def yes_no(title = _("Choose Yes or No"), text = "", yes="", no=""):
     """yes_no - prompts the user to choose between two options,
         one "yes" and one "no", though typically the button labels
@@ -539,6 +832,25 @@ def yes_no(title = _("Choose Yes or No"), text = "", yes="", no=""):
     yn.destroy()
     return response
 
+def yes_no_async(title = _("Choose Yes or No"), text = "", yes="", no="",
+                 on_response = None):
+    """yes_no_async - like yes_no(), but shows the dialog and returns
+    right away instead of waiting for the user. The dialog is not reused
+    since its buttons are made for yes and no.
+
+    aguments:
+    the same as yes_no(), and
+    on_response - a function called with the gtk.DialogResponse once
+    the user responds
+
+    returns a quickly.widgets.coroutine_task.Future for the
+    gtk.DialogResponse
+
+    """
+
+    yn = YesNoPrompt(title,text,yes,no)
+    return _show_async(yn, on_response, reuse=False)
+
 class YesNoPrompt(gtk.Dialog):
     """A prompt to collect a user choice between two options,
         one "yes" and one "no", though typically the button labels
@@ -631,6 +943,18 @@ def warning(title = _("Warning"), text = ""):
     w.destroy()
     return response
 
+def warning_async(title = _("Warning"), text = "", on_response = None):
+    """warning_async - like warning(), but shows the dialog and returns right
+    away instead of waiting for the user.
+
+    returns a quickly.widgets.coroutine_task.Future for the
+    gtk.DialogResponse, on_response is called with it too
+
+    """
+
+    w = _cached_dialog(Alert, title, text, gtk.STOCK_DIALOG_WARNING)
+    return _show_async(w, on_response)
+
 def error(title = _("Error"), text = ""):
     """error - displays an error to the user, includes an appropriate icon
     and an OK button
@@ -650,6 +974,18 @@ def error(title = _("Error"), text = ""):
     e.destroy()
     return response
 
+def error_async(title = _("Error"), text = "", on_response = None):
+    """error_async - like error(), but shows the dialog and returns right
+    away instead of waiting for the user.
+
+    returns a quickly.widgets.coroutine_task.Future for the
+    gtk.DialogResponse, on_response is called with it too
+
+    """
+
+    e = _cached_dialog(Alert, title, text, gtk.STOCK_DIALOG_ERROR)
+    return _show_async(e, on_response)
+
 
 def info(title = _("Information"), text = ""):
     """info - displays information to the user, includes an appropriate
@@ -670,6 +1006,18 @@ def info(title = _("Information"), text = ""):
     i.destroy()
     return response
 
+def info_async(title = _("Information"), text = "", on_response = None):
+    """info_async - like info(), but shows the dialog and returns right
+    away instead of waiting for the user.
+
+    returns a quickly.widgets.coroutine_task.Future for the
+    gtk.DialogResponse, on_response is called with it too
+
+    """
+
+    i = _cached_dialog(Alert, title, text, gtk.STOCK_DIALOG_INFO)
+    return _show_async(i, on_response)
+
 class Alert(gtk.Dialog):
     """Displays an icon, a message, and an OK button to users.
     Used by quickly.prompts.info(), quickly.prompts.warning(),
@@ -700,16 +1048,26 @@ class Alert(gtk.Dialog):
         self.set_default_response(gtk.RESPONSE_OK)
 
         self.content_box = gtk.HBox(False, 10)
-        label = gtk.Label(text)
+        self._label = gtk.Label(text)
         self._image = gtk.Image()
         self._image.set_from_stock(image,gtk.ICON_SIZE_DIALOG)
         self.content_box.pack_start(self._image, False, False, 5)
-        self.content_box.pack_end(label,False, False, 5)
+        self.content_box.pack_end(self._label,False, False, 5)
         content_area.pack_start(self.content_box)
         self.content_box.show()
-        label.show()
+        self._label.show()
         self._image.show()
 
+    def reset(self, title="", text="", image=None):
+        """reset - sets the title, text and image again so the Alert can
+        be shown again. Used by the _async helper functions.
+
+        """
+
+        self.set_title(title)
+        self._label.set_text(text)
+        self.set_image(image)
+
     def set_image(self, image):
         self._image.set_from_stock(image,gtk.ICON_SIZE_DIALOG)        
     
@@ -734,6 +1092,18 @@ def save_image_file(title=_("Choose an Image"),path=None):
     sid.destroy()
     return (response, value)
 
+def save_image_file_async(title=_("Choose an Image"), path=None, on_response=None):
+    """save_image_file_async - like save_image_file(), but shows the dialog and returns
+    right away instead of waiting for the user.
+
+    returns a quickly.widgets.coroutine_task.Future for the tuple of
+    (gtk.DialogResponse, file name), on_response is called with both
+
+    """
+
+    sid = SaveImageDialog(title, path)
+    return _show_async(sid, on_response, SaveImageDialog.get_filename, reuse=False)
+
 
 class ImageDialog(gtk.FileChooserDialog):
     """A base class for OpenImageDialog and SaveImageDialog
@@ -842,22 +1212,80 @@ class OpenImageDialog(ImageDialog):
     sid._filter.add_mime_type("image/svg")
     sid._filter.add_pattern("*.svg")
 
+    #Share a thumbnail cache between dialogs, or turn the preview off
+    from quickly.widgets.thumbnail_cache import ThumbnailCache
+    cache = ThumbnailCache(max_entries=5000)
+    oid = OpenImageDialog(title, thumbnail_cache=cache)
+    oid = OpenImageDialog(title, preview=False)
+
     Extending
     A SaveImageDialog is an ImageDialog which is a gtk.FileChooserDialog
 
     """
 
-    def __init__(self, title="Choose File Location", path=None):
+    def __init__(self, title="Choose File Location", path=None, preview=True,
+                 thumbnail_cache=None):
         """Create an OpenImageDialog.
 
         keyword arguments:
         title - a title for the dialog, defaults to an empty string
         path - a directory path to initially open to, defaults to 
         ~/Pictures
+        preview - show a thumbnail of the selected file, defaults to True
+        thumbnail_cache - a quickly.widgets.thumbnail_cache.ThumbnailCache
+        for the preview, defaults to one using ~/.cache/thumbnails.
+        Thumbnails are made on worker threads, and a thumbnail that is
+        not made yet when the selection moves on is not made at all.
 
         """
         ImageDialog.__init__(self,gtk.FILE_CHOOSER_ACTION_OPEN, gtk.STOCK_OPEN, title,path)
 
+        self.thumbnail_cache = None
+        self.__preview_request = None
+        if preview:
+            if thumbnail_cache is None:
+                from quickly.widgets.thumbnail_cache import ThumbnailCache
+                thumbnail_cache = ThumbnailCache()
+            self.thumbnail_cache = thumbnail_cache
+            self.preview_image = gtk.Image()
+            self.set_preview_widget(self.preview_image)
+            self.set_use_preview_label(False)
+            self.connect("update-preview", self.__update_preview)
+            self.connect("destroy", self.__cancel_preview)
+
+    def __cancel_preview(self, widget=None):
+        if self.__preview_request is not None:
+            self.__preview_request.cancel()
+            self.__preview_request = None
+
+    def __update_preview(self, dialog):
+        """__update_preview - internal function that asks for a thumbnail
+        of the file being previewed, in place of the last one asked for.
+
+        """
+
+        self.__cancel_preview()
+        filename = self.get_preview_filename()
+        if filename is None or not os.path.isfile(filename):
+            self.set_preview_widget_active(False)
+            return
+        self.__preview_request = self.thumbnail_cache.request(filename,
+                                    self.__thumbnail_ready, priority=1)
+
+    def __thumbnail_ready(self, filename, thumbnail):
+        #may be called on a worker thread
+        gobject.idle_add(self.__show_thumbnail, filename, thumbnail)
+
+    def __show_thumbnail(self, filename, thumbnail):
+        if filename != self.get_preview_filename():
+            return False
+        if thumbnail is None:
+            self.set_preview_widget_active(False)
+        else:
+            self.preview_image.set_from_file(thumbnail)
+            self.set_preview_widget_active(True)
+        return False
+
 def open_image_file(title=_("Choose an Image"),path=None):
     """open_image_file - prompts the user to choose an image file
 
@@ -879,6 +1307,18 @@ def open_image_file(title=_("Choose an Image"),path=None):
     oid.destroy()
     return (response, value)
 
+def open_image_file_async(title=_("Choose an Image"), path=None, on_response=None):
+    """open_image_file_async - like open_image_file(), but shows the dialog and returns
+    right away instead of waiting for the user.
+
+    returns a quickly.widgets.coroutine_task.Future for the tuple of
+    (gtk.DialogResponse, file name), on_response is called with both
+
+    """
+
+    oid = OpenImageDialog(title, path)
+    return _show_async(oid, on_response, OpenImageDialog.get_filename, reuse=False)
+
 def choose_directory(title=_("Choose a Directory"),path=None):
     """choose_directory - prompts the user to choose an directory
 
@@ -900,6 +1340,18 @@ def choose_directory(title=_("Choose a Directory"),path=None):
     dcd.destroy()
     return (response, value)
 
+def choose_directory_async(title=_("Choose a Directory"), path=None, on_response=None):
+    """choose_directory_async - like choose_directory(), but shows the dialog and returns
+    right away instead of waiting for the user.
+
+    returns a quickly.widgets.coroutine_task.Future for the tuple of
+    (gtk.DialogResponse, file name), on_response is called with both
+
+    """
+
+    dcd = DirectoryChooserDialog(title, path)
+    return _show_async(dcd, on_response, DirectoryChooserDialog.get_filename, reuse=False)
+
 class DirectoryChooserDialog(gtk.FileChooserDialog):
     """A Dialog to prompt the user to choose a directory path.
 
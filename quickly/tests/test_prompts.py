@@ -17,8 +17,16 @@
 """Tests for the DictionaryGrid"""
 
 from testtools import TestCase
+import gtk
 import quickly.prompts
 
+def _showing(dialog_class):
+    """returns the visible dialog of dialog_class"""
+    for window in gtk.window_list_toplevels():
+        if type(window) is dialog_class and window.get_property("visible"):
+            return window
+    return None
+
 class TestDictionaryGrid(TestCase):
     """Test the CouchGrid functionality"""
 
@@ -26,7 +34,7 @@ class TestDictionaryGrid(TestCase):
         pass
 
     def tearDown(self):
-        pass
+        quickly.prompts.clear_dialog_cache()
 
     def test_string_prompt(self):
         """Test a simple creating An AsynchTaskProgressBox 
@@ -35,3 +43,58 @@ class TestDictionaryGrid(TestCase):
         """
         pass
         #response, val = quickly.prompts.string()
+
+    def test_string_async(self):
+        """Test that string_async returns before the user responds, and
+        passes the response and value to on_response and the Future
+
+        """
+
+        responses = []
+        future = quickly.prompts.string_async("title", "text", "default",
+                                    lambda r, v: responses.append((r, v)))
+        self.assertFalse(future.done())
+        sp = _showing(quickly.prompts.StringPrompt)
+        sp._entry.set_text("typed")
+        sp.response(gtk.RESPONSE_OK)
+        self.assertEqual(responses, [(gtk.RESPONSE_OK, "typed")])
+        self.assertEqual(future.result(), (gtk.RESPONSE_OK, "typed"))
+        self.assertFalse(sp.get_property("visible"))
+
+    def test_async_prompt_reused(self):
+        """Test that a second prompt reuses the hidden dialog of the first
+        with its default value put back
+
+        """
+
+        quickly.prompts.string_async("title", "text", "first")
+        first = _showing(quickly.prompts.StringPrompt)
+        first._entry.set_text("typed")
+        first.response(gtk.RESPONSE_CANCEL)
+        future = quickly.prompts.string_async("title 2", "text", "second")
+        second = _showing(quickly.prompts.StringPrompt)
+        self.assertTrue(first is second)
+        self.assertEqual(second.get_title(), "title 2")
+        second.response(gtk.RESPONSE_OK)
+        self.assertEqual(future.result(), (gtk.RESPONSE_OK, "second"))
+
+    def test_integer_async_reset(self):
+        """Test that a reused IntegerPrompt takes its new range"""
+
+        quickly.prompts.integer_async(default_value=5)
+        _showing(quickly.prompts.IntegerPrompt).response(gtk.RESPONSE_OK)
+        future = quickly.prompts.integer_async(default_value=50,
+                                               min_value=0, max_value=10)
+        _showing(quickly.prompts.IntegerPrompt).response(gtk.RESPONSE_OK)
+        self.assertEqual(future.result(), (gtk.RESPONSE_OK, 10))
+
+    def test_yes_no_async(self):
+        """Test that yes_no_async passes only the response"""
+
+        responses = []
+        future = quickly.prompts.yes_no_async("title", "text",
+                                              on_response=responses.append)
+        yn = _showing(quickly.prompts.YesNoPrompt)
+        yn.response(gtk.RESPONSE_YES)
+        self.assertEqual(responses, [gtk.RESPONSE_YES])
+        self.assertEqual(future.result(), gtk.RESPONSE_YES)
@@ -0,0 +1,589 @@
+### BEGIN LICENSE
+# Copyright (C) 2010 Rick Spencer rick.spencer@canonical.com
+#This program is free software: you can redistribute it and/or modify it
+#under the terms of the GNU General Public License version 3, as published
+#by the Free Software Foundation.
+#
+#This program is distributed in the hope that it will be useful, but
+#WITHOUT ANY WARRANTY; without even the implied warranties of
+#MERCHANTABILITY, SATISFACTORY QUALITY, or FITNESS FOR A PARTICULAR
+#PURPOSE.  See the GNU General Public License for more details.
+#
+#You should have received a copy of the GNU General Public License along
+#with this program.  If not, see <http://www.gnu.org/licenses/>.
+### END LICENSE
+
+"""Running totals for the numeric columns of a grid
+ColumnAggregate keeps the count, sum, average, minimum and maximum of
+a set of numbers as they are added and removed. StoreAggregates keeps
+a ColumnAggregate for each aggregatable column of a store, such as
+currency and integer columns, counting only the rows that are visible.
+It is told about each inserted, changed and deleted row, so totals are
+never worked out again from every row. Given group keys it also keeps
+the totals of each group of rows with the same values for those keys.
+DictionaryGrid.aggregates, GridFooter and GroupedGrid use a
+StoreAggregates. StoreValueCounts keeps the number of rows with each
+distinct value of a column in the same way, for
+DictionaryGrid.value_counts and the DistinctValuesFilterBox. This module
+does not use gtk.
+
+Using
+aggregate = ColumnAggregate()
+aggregate.add(10)
+aggregate.add(5)
+aggregate.remove(10)
+print aggregate.values()["sum"]
+
+columns = grid_model.build_columns(["name", "price"])
+store_aggregates = StoreAggregates(columns)
+store_aggregates.row_inserted(0, ["pen", "1.5", {}])
+store_aggregates.row_changed(0, ["pen", "2.5", {}])
+print store_aggregates.get("price")["max"]
+
+#be called back after a change
+store_aggregates.add_listener(on_totals_changed)
+
+#group by status, then by customer
+by_status = StoreAggregates(columns, group_keys=["status", "customer"])
+by_status.reset(rows)
+for prefix in by_status.children():
+    print prefix, by_status.group(prefix).count
+print by_status.group(("open", "acme")).get("price")["sum"]
+
+#count the rows with each status
+statuses = StoreValueCounts("status")
+statuses.set_columns(columns)
+statuses.reset(rows)
+print statuses.counts
+
+Extending
+A column model is aggregated if its aggregatable class variable is True.
+Its display values are turned into numbers with real_val, and empty
+cells are not counted.
+
+"""
+
+#the names of the values returned by ColumnAggregate.values
+FUNCTIONS = ["count", "sum", "avg", "min", "max"]
+
+class ColumnAggregate(object):
+    """ColumnAggregate - the count, sum, average, minimum and maximum of
+    a changing set of numbers.
+
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.sum = 0
+        self.__counts = {}
+        self.__min = None
+        self.__max = None
+        self.__stale = False
+
+    def add(self, val):
+        """add - counts a number.
+
+        arguments:
+        val - the number
+
+        """
+
+        self.count += 1
+        self.sum += val
+        self.__counts[val] = self.__counts.get(val, 0) + 1
+        if self.__stale:
+            return
+        if self.__min is None or val < self.__min:
+            self.__min = val
+        if self.__max is None or val > self.__max:
+            self.__max = val
+
+    def remove(self, val):
+        """remove - stops counting a number added before.
+
+        arguments:
+        val - the number
+
+        """
+
+        self.count -= 1
+        self.sum -= val
+        left = self.__counts[val] - 1
+        if left == 0:
+            del self.__counts[val]
+            #the ends are found again from the distinct values when asked
+            if val == self.__min or val == self.__max:
+                self.__stale = True
+        else:
+            self.__counts[val] = left
+        if self.count == 0:
+            self.sum = 0
+
+    @property
+    def avg(self):
+        """avg - the average of the numbers, or None if there are none.
+        This property is read only.
+
+        """
+
+        if self.count == 0:
+            return None
+        return self.sum / float(self.count)
+
+    @property
+    def min(self):
+        """min - the smallest number, or None if there are none.
+        This property is read only.
+
+        """
+
+        self.__refresh()
+        return self.__min
+
+    @property
+    def max(self):
+        """max - the largest number, or None if there are none.
+        This property is read only.
+
+        """
+
+        self.__refresh()
+        return self.__max
+
+    def values(self):
+        """values - returns a dictionary of the aggregates by the names
+        in FUNCTIONS.
+
+        """
+
+        return {"count": self.count, "sum": self.sum, "avg": self.avg,
+                "min": self.min, "max": self.max}
+
+    def __refresh(self):
+        if not self.__stale:
+            return
+        self.__stale = False
+        if len(self.__counts) == 0:
+            self.__min = None
+            self.__max = None
+        else:
+            self.__min = min(self.__counts)
+            self.__max = max(self.__counts)
+
+def cell_number(column, stored):
+    """cell_number - returns the real value of a value stored in a row
+    for an aggregatable column, or None if the cell is empty.
+
+    arguments:
+    column - the column model
+
+    stored - the value stored in the row for the column
+
+    """
+
+    display = column.cell_display_val(stored)
+    if display is None or display == "":
+        return None
+    try:
+        return column.real_val(display)
+    except Exception:
+        return None
+
+class RowGroup(object):
+    """RowGroup - the rows of a StoreAggregates that share the values of
+    its group keys, or of the first few of them. Not typically created
+    directly, but returned from StoreAggregates.group.
+
+    """
+
+    def __init__(self, prefix, keys):
+        self.prefix = prefix
+        self.count = 0
+        self.aggregates = dict([(key, ColumnAggregate()) for key in keys])
+        self.children = set()
+
+    def get(self, key):
+        """get - returns a dictionary of the aggregates of the group for
+        a column, by the names in FUNCTIONS.
+
+        """
+
+        return self.aggregates[key].values()
+
+class StoreAggregates(object):
+    """StoreAggregates - keeps a ColumnAggregate for each aggregatable
+    column over the visible rows of a store, by being told about each
+    change to the store, and optionally for each group of rows with
+    the same values for some keys. Not typically created directly, but
+    by DictionaryGrid.aggregates and DictionaryGrid.group_aggregates.
+
+    """
+
+    def __init__(self, columns, visible_index=None, group_keys=None):
+        """Creates a StoreAggregates
+
+        arguments:
+        columns - the column models of the store. Columns that are not
+        aggregatable are left out.
+
+        keyword arguments:
+        visible_index - the position in the row of a boolean that is
+        False for rows to leave out, or None to count every row.
+
+        group_keys - a list of keys of columns to group the rows by. The
+        rows are grouped by the first key, each group by the second key,
+        and so on.
+
+        """
+
+        if group_keys is None:
+            group_keys = []
+        self.group_keys = group_keys
+        self.__listeners = []
+        self.set_columns(columns, visible_index)
+
+    def set_columns(self, columns, visible_index=None):
+        """set_columns - starts again with new column models, for a store
+        that was replaced. Listeners are kept.
+
+        arguments:
+        columns - the column models of the new store
+
+        keyword arguments:
+        visible_index - as for the StoreAggregates constructor
+
+        """
+
+        columns_map = dict([(c.key, c) for c in columns])
+        self.columns = [c for c in columns if c.aggregatable]
+        self.group_columns = [columns_map[k] for k in self.group_keys
+                              if k in columns_map]
+        self.visible_index = visible_index
+        self.reset([])
+
+    def add_listener(self, function):
+        """add_listener - calls function with no arguments after each
+        change to the aggregates.
+
+        arguments:
+        function - the function to call
+
+        """
+
+        self.__listeners.append(function)
+
+    def remove_listener(self, function):
+        """remove_listener - stops calling a function passed to
+        add_listener.
+
+        """
+
+        self.__listeners.remove(function)
+
+    def get(self, key):
+        """get - returns a dictionary of the aggregates of the visible
+        rows for a column, by the names in FUNCTIONS.
+
+        arguments:
+        key - the key of an aggregatable column
+
+        """
+
+        return self.__groups[()].get(key)
+
+    def group(self, prefix):
+        """group - returns the RowGroup for the rows whose first group
+        key values are prefix, or None if there are no such rows. The
+        empty tuple is the group of all the visible rows.
+
+        arguments:
+        prefix - a tuple of values stored in the rows for the first
+        group keys, as many as the depth of the group
+
+        """
+
+        return self.__groups.get(prefix)
+
+    def children(self, prefix=()):
+        """children - returns a list of the prefixes of the groups one
+        level below a group.
+
+        keyword arguments:
+        prefix - the prefix of the group, the top level by default
+
+        """
+
+        group = self.__groups.get(prefix)
+        if group is None:
+            return []
+        return list(group.children)
+
+    def rows_in(self, prefix):
+        """rows_in - returns a list of the positions in the store of the
+        visible rows in a group. Looks at every row, so it is meant for
+        showing the rows of a group when they are asked for.
+
+        arguments:
+        prefix - the prefix of the group
+
+        """
+
+        depth = len(prefix)
+        return [i for i, entry in enumerate(self.__rows)
+                if entry is not None and entry[0][:depth] == prefix]
+
+    def take_changed_groups(self):
+        """take_changed_groups - returns a set of the prefixes of the
+        groups that changed since it was last called, including groups
+        that went away and groups with a row that was edited. The set
+        has the empty prefix after a reset, when any group may have
+        changed.
+
+        """
+
+        changed = self.__changed_groups
+        self.__changed_groups = set()
+        return changed
+
+    def reset(self, rows):
+        """reset - forgets every row and counts rows instead.
+
+        arguments:
+        rows - the rows of the store, in order
+
+        """
+
+        self.__groups = {(): RowGroup((), self.__keys())}
+        self.__changed_groups = set([()])
+        self.__rows = [self.__entry(row) for row in rows]
+        for entry in self.__rows:
+            self.__count(entry, True)
+        self.__changed()
+
+    def rows_reordered(self, rows):
+        """rows_reordered - follows the new order of the rows of the store.
+        The store does not say how the rows moved, so they are counted
+        again.
+
+        arguments:
+        rows - the rows of the store, in their new order
+
+        """
+
+        self.reset(rows)
+
+    def row_inserted(self, index, row):
+        """row_inserted - counts a row added to the store.
+
+        arguments:
+        index - the position of the new row
+
+        row - the new row
+
+        """
+
+        entry = self.__entry(row)
+        self.__rows.insert(index, entry)
+        self.__count(entry, True)
+        self.__changed()
+
+    def row_changed(self, index, row):
+        """row_changed - counts the new values of a row that changed,
+        including whether it is visible, in place of the old ones.
+
+        arguments:
+        index - the position of the row
+
+        row - the row with its new values
+
+        """
+
+        entry = self.__entry(row)
+        old = self.__rows[index]
+        if entry == old:
+            if entry is not None and len(self.group_columns) > 0:
+                #the totals are the same, but the rows of the group are not
+                self.__changed_groups.add(entry[0])
+                self.__changed()
+            return
+        self.__count(old, False)
+        self.__rows[index] = entry
+        self.__count(entry, True)
+        self.__changed()
+
+    def row_deleted(self, index):
+        """row_deleted - stops counting a row removed from the store.
+
+        arguments:
+        index - the position the row had
+
+        """
+
+        self.__count(self.__rows.pop(index), False)
+        self.__changed()
+
+    def __keys(self):
+        return [c.key for c in self.columns]
+
+    def __entry(self, row):
+        if self.visible_index is not None and not row[self.visible_index]:
+            return None
+        numbers = tuple([cell_number(c, row[c.index]) for c in self.columns])
+        return (tuple([row[c.index] for c in self.group_columns]), numbers)
+
+    def __count(self, entry, add):
+        if entry is None:
+            return
+        key, numbers = entry
+        groups = self.__groups
+        parent = None
+        for depth in range(len(key) + 1):
+            prefix = key[:depth]
+            group = groups.get(prefix)
+            if group is None:
+                group = RowGroup(prefix, self.__keys())
+                groups[prefix] = group
+                parent.children.add(prefix)
+            #the group of all rows is only marked by reset, so the
+            #empty prefix means every group may have changed
+            if depth > 0:
+                self.__changed_groups.add(prefix)
+            if add:
+                group.count += 1
+            else:
+                group.count -= 1
+            for column, val in zip(self.columns, numbers):
+                if val is not None:
+                    if add:
+                        group.aggregates[column.key].add(val)
+                    else:
+                        group.aggregates[column.key].remove(val)
+            if group.count == 0 and depth > 0:
+                del groups[prefix]
+                parent.children.discard(prefix)
+            parent = group
+
+    def __changed(self):
+        for function in self.__listeners:
+            function()
+
+class StoreValueCounts(object):
+    """StoreValueCounts - keeps the number of rows of a store with each
+    display value of a column, by being told about each change to the
+    store. Rows hidden by a filter are counted too. Not typically
+    created directly, but by DictionaryGrid.value_counts.
+
+    """
+
+    def __init__(self, key):
+        """Creates a StoreValueCounts
+
+        arguments:
+        key - the key of the column to count the values of
+
+        """
+
+        self.key = key
+        self.set_columns([])
+
+    def set_columns(self, columns, visible_index=None):
+        """set_columns - starts again with new column models, for a store
+        that was replaced.
+
+        arguments:
+        columns - the column models of the new store
+
+        keyword arguments:
+        visible_index - not used, every row is counted
+
+        """
+
+        self.column = None
+        for column in columns:
+            if column.key == self.key:
+                self.column = column
+        self.reset([])
+
+    def reset(self, rows):
+        """reset - forgets every row and counts rows instead.
+
+        arguments:
+        rows - the rows of the store, in order
+
+        """
+
+        #counts - a dictionary of display values to the number of rows
+        #with that value
+        self.counts = {}
+        self.__values = [self.__value(row) for row in rows]
+        for val in self.__values:
+            self.__count(val, 1)
+
+    def rows_reordered(self, rows):
+        """rows_reordered - follows the new order of the rows of the store.
+        The counts do not change, only the value kept for each position.
+
+        arguments:
+        rows - the rows of the store, in their new order
+
+        """
+
+        self.__values = [self.__value(row) for row in rows]
+
+    def row_inserted(self, index, row):
+        """row_inserted - counts the value of a row added to the store.
+
+        arguments:
+        index - the position of the new row
+
+        row - the new row
+
+        """
+
+        val = self.__value(row)
+        self.__values.insert(index, val)
+        self.__count(val, 1)
+
+    def row_changed(self, index, row):
+        """row_changed - counts the new value of a row in place of the
+        old one.
+
+        arguments:
+        index - the position of the row
+
+        row - the row with its new values
+
+        """
+
+        val = self.__value(row)
+        old = self.__values[index]
+        if val == old:
+            return
+        self.__values[index] = val
+        self.__count(old, -1)
+        self.__count(val, 1)
+
+    def row_deleted(self, index):
+        """row_deleted - stops counting the value of a row removed from
+        the store.
+
+        arguments:
+        index - the position the row had
+
+        """
+
+        self.__count(self.__values.pop(index), -1)
+
+    def __value(self, row):
+        if self.column is None:
+            return None
+        return self.column.cell_display_val(row[self.column.index])
+
+    def __count(self, val, change):
+        if self.column is None:
+            return
+        left = self.counts.get(val, 0) + change
+        if left == 0:
+            del self.counts[val]
+        else:
+            self.counts[val] = left
@@ -17,9 +17,12 @@ try:
  import pygtk
  pygtk.require("2.0")
  import gtk
+ import inspect
  import threading
  import time
  import gobject
+ import coroutine_task
+ import task_executor
  import gettext
  from gettext import gettext as _
  gettext.textdomain('quickly-widgets')
@@ -27,21 +30,51 @@ try:
 except:
  print "couldn't load depencies"
 
+#milliseconds between pulses of the progressbar when no fraction is known
+PULSE_INTERVAL = 100
+
+#milliseconds to collect calls to update before repainting the progressbar
+FRAME_INTERVAL = 16
+
 class AsynchTaskProgressBox( gtk.HBox ):
  """AsynchTaskProgressBox: encapsulates a pulstating progressbar, a cancel
  button, and a long running task. Use an AsynchTaskProgressBox when you want
  a window to perform a long running task in the background without freezing 
  the UI for the user.
 
+ The progressbar is only ever touched from the main loop. Calls to update
+ from the task are collected and applied at most once per FRAME_INTERVAL,
+ and the progressbar only pulses while no fraction is known.
+
+ Pass a task_executor.TaskExecutor as executor to run the task on a shared,
+ bounded pool of workers rather than on a thread of its own. Boxes that
+ share an executor wait in its queue until a worker is free. Use a
+ task_executor.ProcessTaskExecutor for cpu bound tasks, so they run in
+ worker processes and leave the UI responsive.
+
+ A task can hand over results before it returns by passing lists of them
+ to params["partial_results_function"]. They are emitted on the main loop
+ in the partial-results signal. partial_results_function blocks while
+ the main loop is behind, and returns False once the box is killed.
+
+ When run_function is a generator function it is run on the main loop as
+ a coroutine_task.CoroutineTask rather than on a thread. Killing the box
+ raises coroutine_task.TaskCancelled where the coroutine is waiting.
+
  """
 
- def __init__(self, run_function, params = None, cancelable = True):
+ def __init__(self, run_function, params = None, cancelable = True,
+              executor = None, priority = 0):
   """Create an AsycnTaskProgressBox
 
   Keyword arguments:
   run_function -- the function to run asynchronously
   params -- optional dictionary of parameters to be pass into run_function
   cancelable -- optional value to determine whether to show cancel button. Defaults to True.
+  executor -- optional TaskExecutor to run run_function on. Defaults to
+  None, which runs run_function on a new thread.
+  priority -- optional priority of the task in the executor's queue.
+  Defaults to 0.
   Do not use a value with the key of 'kill' in the params dictionary
 
   """
@@ -63,15 +96,27 @@ class AsynchTaskProgressBox( gtk.HBox ):
   self.pack_end(self.cancel_button, False)
   
   self.run_function = run_function
-  self.pulse_thread = None
+  self.executor = executor
+  self.priority = priority
   self.work_thread = None
   self.params = params
+  self.__running = False
+  self.__fraction = 0
+  self.__displaytext = ""
+  self.__update_pending = False
+  self.__pulse_source = None
+  self.__channel = None
+  self.__drain_pending = False
 
   self.connect("destroy", self.__destroy)
   
  __gsignals__ = {'complete' : (gobject.SIGNAL_RUN_LAST, gobject.TYPE_NONE,
 		(gobject.TYPE_PYOBJECT,)),
 		'cancelrequested' : (gobject.SIGNAL_RUN_LAST, gobject.TYPE_NONE,
+		(gobject.TYPE_PYOBJECT,)),
+		'progress' : (gobject.SIGNAL_RUN_LAST, gobject.TYPE_NONE,
+		(gobject.TYPE_PYOBJECT,)),
+		'partial-results' : (gobject.SIGNAL_RUN_LAST, gobject.TYPE_NONE,
 		(gobject.TYPE_PYOBJECT,))
 		}
  
@@ -81,17 +126,39 @@ class AsynchTaskProgressBox( gtk.HBox ):
   caption -- optional text to display in the progressbar
   """
   #Throw an exception if the user tries to start an operating thread
-  if self.pulse_thread != None:
+  if self.__running:
    raise RuntimeError("AsynchTaskProgressBox already started.")
-
-  #Create and start a thread to run the users task
-  #pass in a callback and the user's params
-  self.work_thread = KillableThread(self.run_function, self.__on_complete, self.params)
-  self.work_thread.start()
+  self.__running = True
+  self.__fraction = 0
+  self.__displaytext = caption
+  self.progressbar.set_text(caption)
+
+  #give the task a new channel for partial results, a coroutine runs
+  #on the main loop so it can not wait for the main loop to drain it
+  coroutine = inspect.isgeneratorfunction(self.run_function)
+  if coroutine:
+   max_batches = 0
+  else:
+   max_batches = task_executor.DEFAULT_MAX_BATCHES
+  self.__channel = task_executor.ResultChannel(max_batches,
+                                   on_put=self.__schedule_partial_results)
+  self.params["partial_results_function"] = self.__channel.put
+
+  #Create and start a thread to run the users task, or queue it
+  #on the executor, pass in a callback and the user's params
+  if coroutine:
+   self.work_thread = coroutine_task.CoroutineTask(self.run_function,
+                                   self.params, self.__on_complete)
+   self.work_thread.start()
+  elif self.executor is not None:
+   self.work_thread = self.executor.submit(self.run_function, self.params,
+                                           self.__on_complete, self.priority)
+  else:
+   self.work_thread = KillableThread(self.run_function, self.__on_complete, self.params)
+   self.work_thread.start()
   
-  #create a thread to display the user feedback
-  self.pulse_thread = PulseThread(self.progressbar, caption)
-  self.pulse_thread.start()
+  #pulse the progressbar from the main loop until a fraction is known
+  self.__start_pulsing()
 
   #enable the button so the user can try to kill the task
   self.cancel_button.set_sensitive( True )
@@ -101,14 +168,104 @@ class AsynchTaskProgressBox( gtk.HBox ):
   caption.
   Keyword arguments:
   fraction -- the current percentage complete
-  displaytext -- the new caption to display"""
-  if self.pulse_thread != None:
-   self.pulse_thread.update(fraction, displaytext)
+  displaytext -- the new caption to display
+
+  update is safe to call from any thread. The progressbar is repainted
+  from the main loop, at most once per FRAME_INTERVAL no matter how often
+  update is called.
+
+  """
+  if not self.__running:
+   return
+  self.__fraction = fraction
+  self.__displaytext = displaytext
+  if not self.__update_pending:
+   self.__update_pending = True
+   gobject.timeout_add(FRAME_INTERVAL, self.__apply_update)
+
+ def __apply_update(self):
+  """__apply_update: internal main loop callback that repaints the
+  progressbar with the latest values passed to update.
+
+  """
+  self.__update_pending = False
+  if not self.__running:
+   return False
+  if self.__fraction:
+   self.progressbar.set_fraction(self.__fraction)
+  else:
+   self.__start_pulsing()
+  self.progressbar.set_text(self.__displaytext)
+  self.emit("progress", self.__fraction)
+  return False
+
+ def __schedule_partial_results(self):
+  """__schedule_partial_results: internal function called on the task's
+  thread after it puts partial results.
+
+  """
+  if not self.__drain_pending:
+   self.__drain_pending = True
+   gobject.timeout_add(FRAME_INTERVAL, self.__emit_partial_results)
+
+ def __emit_partial_results(self):
+  """__emit_partial_results: internal main loop callback that emits the
+  partial results put since it last ran in one partial-results signal.
+
+  """
+  self.__drain_pending = False
+  if not self.__running or self.__channel is None:
+   return False
+  results = []
+  for batch in self.__channel.get_batches():
+   results.extend(batch)
+  if len(results) > 0:
+   self.emit("partial-results", results)
+  return False
+
+ def connect_grid(self, grid):
+  """connect_grid: appends partial results to a DictionaryGrid as they
+  are emitted. Returns the handler id of the partial-results signal.
+
+  Keyword arguments:
+  grid -- the DictionaryGrid, run_function should pass lists of
+  dictionaries to params["partial_results_function"]
+
+  """
+  return self.connect("partial-results",
+                      lambda box, dictionaries: grid.append_rows(dictionaries))
+
+ def __start_pulsing(self):
+  if self.__pulse_source is None:
+   self.__pulse_source = gobject.timeout_add(PULSE_INTERVAL, self.__pulse)
+
+ def __stop_pulsing(self):
+  if self.__pulse_source is not None:
+   gobject.source_remove(self.__pulse_source)
+   self.__pulse_source = None
+
+ def __pulse(self):
+  """__pulse: internal main loop callback that pulses the progressbar
+  while no fraction is known. Stops itself once there is a fraction.
+
+  """
+  if not self.__running or self.__fraction:
+   self.__pulse_source = None
+   return False
+  self.progressbar.pulse()
+  return True
   
  #call back function for after run_function returns
+ #called on the work thread, so hand the result to the main loop
  def __on_complete( self, data ):
+  gobject.idle_add(self.__complete, data)
+
+ def __complete(self, data):
+  #partial results always arrive before complete
+  self.__emit_partial_results()
   self.emit("complete", data)
   self.kill()
+  return False
 
  #call back function for cancel button
  def __stop_clicked( self, widget, data = None ):
@@ -128,70 +285,127 @@ class AsynchTaskProgressBox( gtk.HBox ):
  
   """
 
-  #stop the pulse_thread and remove a reference to it if there is one
-  if self.pulse_thread != None:
-   self.pulse_thread.kill()
-   self.pulse_thread = None
+  #stop updating the progressbar and drop any partial results
+  self.__running = False
+  self.__stop_pulsing()
+  if self.__channel is not None:
+   self.__channel.close()
 
   #disable the cancel button since the task is about to be told to stop
-  gobject.idle_add(self.__disable_cancel_button)
+  #and reset the progressbar to show that no task is running
+  gobject.idle_add(self.__reset)
 
   #tell the users function tostop if it's thread exists
   if self.work_thread != None:
    self.work_thread.kill()
 
  #called when the widget is destroyed, attempts to clean up
- #the work thread and the pulse thread
+ #the work thread and stop updating the progressbar
  def __destroy(self, widget, data = None):
   if self.work_thread != None:
    self.work_thread.kill()
-  if self.pulse_thread != None:
-   self.pulse_thread.kill() 
+  self.__running = False
+  self.__stop_pulsing()
+  if self.__channel is not None:
+   self.__channel.close()
 
- def __disable_cancel_button(self):
-  gtk.gdk.threads_enter()
+ def __reset(self):
+  """__reset: internal main loop callback that disables the cancel
+  button and clears the progressbar after the task stops.
+
+  """
+  #the box may have been started again before this ran
+  if self.__running:
+   return False
   self.cancel_button.set_sensitive( False )
-  gtk.gdk.threads_leave()
+  self.progressbar.set_fraction(0)
+  self.progressbar.set_text("")
+  return False
 
-class PulseThread ( threading.Thread ):
- """Class for use by AsynchTaskProgressBox. Not for general use.
+class AggregateProgressBox( gtk.HBox ):
+ """AggregateProgressBox: a progressbar that shows the overall progress
+ of a group of AsynchTaskProgressBoxes, for example a batch of tasks
+ submitted to the same TaskExecutor. The boxes in the group do not need
+ to be shown.
 
  """
- def __init__(self,progressbar,displaytext = _("Working")):
-  threading.Thread.__init__(self)
-  self.displaytext = displaytext
-  self.setDaemon(False)
-  self.progressbar = progressbar
-  self.__kill = False
-  self.fraction = float(0)
 
- def kill(self):
-  self.__kill = True
+ def __init__(self, boxes = None):
+  """Create an AggregateProgressBox
 
- def update(self, fraction, displaytext):
-  self.displaytext = displaytext
-  self.fraction = fraction
+  Keyword arguments:
+  boxes -- optional list of AsynchTaskProgressBoxes to track
 
- #As a subclass of Thread, this function runs when start() is called
- #It will cause the progressbar to pulse, showing that a task is running
- def run ( self ):
-  self.progressbar.set_text(self.displaytext)
-  #keep running until the __kill flag is set to True
-  while not self.__kill:
-   time.sleep(.1)
-   #get ahold of the UI thread and command the progress bar to pulse
-   gtk.gdk.threads_enter()
-   if self.fraction == 0:
-    self.progressbar.pulse()
-   else:
-    self.progressbar.set_fraction(self.fraction)
-   self.progressbar.set_text(self.displaytext)
-   gtk.gdk.threads_leave()
-  #before exiting, reset the progressbar to show that no task is running
-  gtk.gdk.threads_enter()
-  self.progressbar.set_fraction(0)
-  self.progressbar.set_text("")
-  gtk.gdk.threads_leave()
+  """
+
+  gtk.HBox.__init__( self, False, 2 )
+
+  self.progressbar = gtk.ProgressBar()
+  self.progressbar.show()
+  self.pack_start(self.progressbar, True)
+
+  self.__fractions = {}
+  self.__finished = []
+  if boxes is not None:
+   for box in boxes:
+    self.add_box(box)
+
+ __gsignals__ = {'all-complete' : (gobject.SIGNAL_RUN_LAST, gobject.TYPE_NONE,
+		())
+		}
+
+ def add_box(self, box):
+  """add_box: adds an AsynchTaskProgressBox to the group.
+
+  Keyword arguments:
+  box -- the AsynchTaskProgressBox to track
+
+  """
+
+  self.__fractions[box] = 0
+  box.connect("progress", self.__box_progress)
+  box.connect("complete", self.__box_finished)
+  box.connect("cancelrequested", self.__box_finished)
+  self.__refresh()
+
+ @property
+ def fraction(self):
+  """fraction - the overall completion of the group, counting each
+  finished or cancelled box as done. This property is read only.
+
+  """
+
+  if len(self.__fractions) == 0:
+   return 0.0
+  return sum(self.__fractions.values()) / float(len(self.__fractions))
+
+ @property
+ def finished_count(self):
+  """finished_count - the number of boxes that completed or were
+  cancelled. This property is read only.
+
+  """
+
+  return len(self.__finished)
+
+ def __box_progress(self, box, fraction):
+  if box not in self.__finished:
+   self.__fractions[box] = fraction or 0
+   self.__refresh()
+
+ def __box_finished(self, box, data = None):
+  if box not in self.__finished:
+   self.__finished.append(box)
+   self.__fractions[box] = 1.0
+   self.__refresh()
+   if len(self.__finished) == len(self.__fractions):
+    self.emit("all-complete")
+
+ def __refresh(self):
+  self.progressbar.set_fraction(self.fraction)
+  self.progressbar.set_text(_("%(done)d of %(total)d complete") %
+                            {"done": len(self.__finished),
+                             "total": len(self.__fractions)})
 
 class KillableThread( threading.Thread ):
  """Class for use by AsynchTaskProgressBox. Not for general use.
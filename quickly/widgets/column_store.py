@@ -0,0 +1,414 @@
+# -*- coding: utf-8 -*-
+### BEGIN LICENSE
+# Copyright (C) 2010 Rick Spencer rick.spencer@canonical.com
+#This program is free software: you can redistribute it and/or modify it
+#under the terms of the GNU General Public License version 3, as published
+#by the Free Software Foundation.
+#
+#This program is distributed in the hope that it will be useful, but
+#WITHOUT ANY WARRANTY; without even the implied warranties of
+#MERCHANTABILITY, SATISFACTORY QUALITY, or FITNESS FOR A PARTICULAR
+#PURPOSE.  See the GNU General Public License for more details.
+#
+#You should have received a copy of the GNU General Public License along
+#with this program.  If not, see <http://www.gnu.org/licenses/>.
+### END LICENSE
+
+"""A columnar store for the dictionaries of a DictionaryGrid
+ColumnStore keeps the real values of each column in one sequence per
+column rather than in a dictionary per row. Columns whose column model
+has an array_typecode, such as integer, currency and check columns, are
+kept in an array.array, other columns in a list. The dictionary for a
+row is only made when it is asked for, and is shared while anything
+holds on to it. A DictionaryGrid created with columnar=True keeps its
+dictionaries in a ColumnStore. ColumnStore does not use gtk.
+
+Using
+columns = grid_model.build_columns(["name", "price", "done?"])
+store = ColumnStore(columns)
+row_id = store.append({"name": "a", "price": 1.5, "done?": True})
+
+#read a value or a whole column, indexed by row id
+store.get_value(row_id, "price")
+prices = store.column("price")
+
+#get the dictionary for a row, setting a key in it changes the store
+dictionary = store.dictionary(row_id)
+dictionary["price"] = 2.0
+
+#removed rows keep their row id, so the ids of other rows do not change
+store.remove(row_id)
+
+#work on a copy of a column with NumPy, if it is installed
+values, present = store.numpy_column("price")
+total = values[present & store.numpy_live()].sum()
+
+Extending
+A column model chooses how its column is kept by its array_typecode, a
+typecode for array.array or None to keep the values in a list.
+
+"""
+
+import array
+import sys
+import weakref
+
+class RowDict(dict):
+    """RowDict - the dictionary for a row in a ColumnStore. Every way of
+    setting or deleting keys, including update, setdefault, pop,
+    popitem and clear, changes the store as well. Not typically created
+    directly, but returned from ColumnStore.dictionary.
+
+    """
+
+    def __init__(self, store, row_id, values):
+        dict.__init__(self, values)
+        self.store = store
+        self.row_id = row_id
+
+    def __setitem__(self, key, val):
+        self.store.set_value(self.row_id, key, val)
+
+    def __delitem__(self, key):
+        if key not in self:
+            raise KeyError(key)
+        self.store.delete_value(self.row_id, key)
+
+    def update(self, *args, **kwargs):
+        for key, val in dict(*args, **kwargs).items():
+            self[key] = val
+
+    def setdefault(self, key, default=None):
+        if key not in self:
+            self[key] = default
+        return dict.__getitem__(self, key)
+
+    def pop(self, key, *default):
+        if key not in self:
+            if len(default) > 0:
+                return default[0]
+            raise KeyError(key)
+        val = dict.__getitem__(self, key)
+        del self[key]
+        return val
+
+    def popitem(self):
+        if len(self) == 0:
+            raise KeyError("popitem(): dictionary is empty")
+        key = iter(self).next()
+        return (key, self.pop(key))
+
+    def clear(self):
+        for key in self.keys():
+            del self[key]
+
+class ColumnStore(object):
+    """ColumnStore - stores the dictionaries for rows as one typed array
+    or list per column.
+
+    """
+
+    def __init__(self, columns):
+        """Creates a ColumnStore
+
+        arguments:
+        columns - the column models for the keys to store by column.
+        Keys of the dictionaries that are not in columns are kept in a
+        dictionary for the row.
+
+        """
+
+        self.columns = columns
+        self.__columns_map = dict([(c.key, c) for c in columns])
+        self.__values = {}
+        self.__present = {}
+        for column in columns:
+            if column.array_typecode is None:
+                self.__values[column.key] = []
+            else:
+                self.__values[column.key] = array.array(column.array_typecode)
+            self.__present[column.key] = bytearray()
+        self.__extras = []
+        self.__removed = bytearray()
+        self.__removed_count = 0
+        self.__dictionaries = weakref.WeakValueDictionary()
+
+    def __len__(self):
+        return len(self.__removed) - self.__removed_count
+
+    @property
+    def row_count(self):
+        """row_count - the number of row ids handed out, including those
+        of removed rows. This property is read only.
+
+        """
+
+        return len(self.__removed)
+
+    def append(self, dictionary):
+        """append - adds the values in a dictionary as a row and returns
+        the row id. The dictionary is not kept.
+
+        arguments:
+        dictionary - the dictionary for the row, with real values
+
+        """
+
+        columns_map = self.__columns_map
+        for key, values in self.__values.items():
+            if key in dictionary:
+                values.append(self.__stored_val(columns_map[key],
+                                                dictionary[key]))
+                self.__present[key].append(1)
+            else:
+                values.append(self.__empty_val(columns_map[key]))
+                self.__present[key].append(0)
+        extras = None
+        for key in dictionary:
+            if key not in columns_map:
+                if extras is None:
+                    extras = {}
+                extras[key] = dictionary[key]
+        self.__extras.append(extras)
+        self.__removed.append(0)
+        return len(self.__removed) - 1
+
+    def remove(self, row_id):
+        """remove - removes a row. Its values are released, but the row
+        id is not used again.
+
+        arguments:
+        row_id - the id of the row
+
+        """
+
+        if self.__removed[row_id]:
+            return
+        self.__removed[row_id] = 1
+        self.__removed_count += 1
+        for key, values in self.__values.items():
+            values[row_id] = self.__empty_val(self.__columns_map[key])
+            self.__present[key][row_id] = 0
+        self.__extras[row_id] = None
+
+    def is_removed(self, row_id):
+        """is_removed - returns True if the row was removed.
+
+        arguments:
+        row_id - the id of the row
+
+        """
+
+        return self.__removed[row_id] == 1
+
+    def live_ids(self):
+        """live_ids - returns a list of the ids of the rows that have not
+        been removed, in the order they were added.
+
+        """
+
+        removed = self.__removed
+        return [i for i in xrange(len(removed)) if not removed[i]]
+
+    def get_value(self, row_id, key, default=None):
+        """get_value - returns the real value for key in a row, or default
+        if the dictionary for the row did not have key.
+
+        arguments:
+        row_id - the id of the row
+
+        key - the key of the value
+
+        keyword arguments:
+        default - the value to return if the row has no value for key
+
+        """
+
+        if key in self.__values:
+            if not self.__present[key][row_id]:
+                return default
+            val = self.__values[key][row_id]
+            if self.__columns_map[key].array_typecode == "b":
+                val = bool(val)
+            return val
+        extras = self.__extras[row_id]
+        if extras is None:
+            return default
+        return extras.get(key, default)
+
+    def set_value(self, row_id, key, val):
+        """set_value - sets the value for key in a row. Values for columns
+        kept in an array are converted with the real_val of the column.
+
+        arguments:
+        row_id - the id of the row
+
+        key - the key of the value
+
+        val - the new value
+
+        """
+
+        if key in self.__values:
+            column = self.__columns_map[key]
+            self.__values[key][row_id] = self.__stored_val(column, val)
+            self.__present[key][row_id] = 1
+            if column.array_typecode is not None:
+                val = self.get_value(row_id, key)
+        else:
+            if self.__extras[row_id] is None:
+                self.__extras[row_id] = {}
+            self.__extras[row_id][key] = val
+        dictionary = self.__dictionaries.get(row_id)
+        if dictionary is not None:
+            dict.__setitem__(dictionary, key, val)
+
+    def delete_value(self, row_id, key):
+        """delete_value - removes key from a row, as if its dictionary
+        never had it.
+
+        arguments:
+        row_id - the id of the row
+
+        key - the key to remove
+
+        """
+
+        if key in self.__values:
+            self.__values[key][row_id] = self.__empty_val(self.__columns_map[key])
+            self.__present[key][row_id] = 0
+        elif self.__extras[row_id] is not None:
+            self.__extras[row_id].pop(key, None)
+        dictionary = self.__dictionaries.get(row_id)
+        if dictionary is not None and key in dictionary:
+            dict.__delitem__(dictionary, key)
+
+    def dictionary(self, row_id):
+        """dictionary - returns the dictionary for a row. The same
+        dictionary is returned for as long as something holds on to it.
+
+        arguments:
+        row_id - the id of the row
+
+        """
+
+        dictionary = self.__dictionaries.get(row_id)
+        if dictionary is None:
+            values = {}
+            for key in self.__values:
+                if self.__present[key][row_id]:
+                    values[key] = self.get_value(row_id, key)
+            if self.__extras[row_id] is not None:
+                values.update(self.__extras[row_id])
+            dictionary = RowDict(self, row_id, values)
+            self.__dictionaries[row_id] = dictionary
+        return dictionary
+
+    def dictionaries(self):
+        """dictionaries - returns the dictionaries for the rows that have
+        not been removed, in the order they were added.
+
+        """
+
+        return [self.dictionary(i) for i in self.live_ids()]
+
+    def column(self, key):
+        """column - returns the array or list of the values for key,
+        indexed by row id. Values for removed rows and rows without
+        the key are 0, or None for a list.
+
+        arguments:
+        key - the key of a column
+
+        """
+
+        return self.__values[key]
+
+    def present(self, key):
+        """present - returns a bytearray indexed by row id that is 1 where
+        the dictionary for the row had key.
+
+        arguments:
+        key - the key of a column
+
+        """
+
+        return self.__present[key]
+
+    def numpy_column(self, key):
+        """numpy_column - returns a tuple of NumPy arrays for the values
+        of key and a boolean mask of the rows that have them, or None
+        if NumPy is not installed. The arrays are copies, so they stay
+        valid as rows are added, but do not follow changes to the store.
+
+        arguments:
+        key - the key of a column
+
+        """
+
+        try:
+            import numpy
+        except ImportError:
+            return None
+        values = self.__values[key]
+        if isinstance(values, array.array):
+            if len(values) == 0:
+                values = numpy.zeros(0, values.typecode)
+            else:
+                #the buffer of the array moves when it grows, so copy it
+                values = numpy.frombuffer(values, values.typecode).copy()
+        else:
+            values = numpy.array(values, object)
+        present = numpy.frombuffer(self.__present[key], numpy.bool_).copy() \
+                  if len(values) > 0 else numpy.zeros(0, numpy.bool_)
+        return (values, present)
+
+    def numpy_live(self):
+        """numpy_live - returns a NumPy boolean mask of the rows that
+        have not been removed, or None if NumPy is not installed. The
+        mask is a copy, like the arrays from numpy_column.
+
+        """
+
+        try:
+            import numpy
+        except ImportError:
+            return None
+        removed = numpy.frombuffer(self.__removed, numpy.bool_) \
+                  if len(self.__removed) > 0 else numpy.zeros(0, numpy.bool_)
+        return ~removed
+
+    def table_bytes(self):
+        """table_bytes - returns an estimate of the bytes used by the
+        columns and the other values of the rows.
+
+        """
+
+        total = sys.getsizeof(self.__removed) + sys.getsizeof(self.__extras)
+        counted = set()
+        for key, values in self.__values.items():
+            total += sys.getsizeof(values) + sys.getsizeof(self.__present[key])
+            if not isinstance(values, array.array):
+                for val in values:
+                    if id(val) not in counted:
+                        counted.add(id(val))
+                        total += sys.getsizeof(val)
+        for extras in self.__extras:
+            if extras is not None:
+                total += sys.getsizeof(extras)
+                for val in extras.values():
+                    total += sys.getsizeof(val)
+        return total
+
+    def __stored_val(self, column, val):
+        if column.array_typecode is None:
+            return val
+        val = column.real_val(val)
+        if column.array_typecode == "b":
+            return int(bool(val))
+        return val
+
+    def __empty_val(self, column):
+        if column.array_typecode is None:
+            return None
+        return 0
@@ -13,28 +13,40 @@
 #with this program.  If not, see <http://www.gnu.org/licenses/>.
 ### END LICENSE
 
-import gtk
-import gobject
-from grid_column import StringColumn, CurrencyColumn, CheckColumn
-from grid_column import IntegerColumn, TagsColumn, DateColumn
+"""Conventions for choosing the type of column to use for a key.
+The same conventions pick GridColumns for a DictionaryGrid and
+column models for a GridModel.
+
+"""
+
+def column_type_name(key):
+    """column_type_name - returns the name of the GridColumn class
+    to use for key by convention.
+
+    """
 
-def get_column(key, index, dictionary_index, editable):
     if key.lower() == "id":
-        return IntegerColumn(key, index, dictionary_index, editable)
+        return "IntegerColumn"
     elif key.endswith("?"):
-        return CheckColumn(key, index, dictionary_index, editable)
+        return "CheckColumn"
     elif key.lower().endswith(" price") or key.lower() == "price":
-        return CurrencyColumn(key, index, dictionary_index, editable)
+        return "CurrencyColumn"
     elif key.lower() == "tags":
-        return TagsColumn(key, index, dictionary_index, editable)
+        return "TagsColumn"
     elif key.lower().endswith(" count") or key.lower() == "count":
-        return IntegerColumn(key, index, dictionary_index, editable)
+        return "IntegerColumn"
     elif key.lower().endswith(" date") or key.lower() == "date":
-        return DateColumn(key, index, dictionary_index, editable)
+        return "DateColumn"
 
     else:
-        return StringColumn(key, index, dictionary_index, editable)
-
-
+        return "StringColumn"
 
+def get_column(key, index, dictionary_index, editable):
+    import grid_column
+    column_type = getattr(grid_column, column_type_name(key))
+    return column_type(key, index, dictionary_index, editable)
 
+def get_column_model(key, index, dictionary_index):
+    import grid_model
+    column_type = getattr(grid_model, column_type_name(key) + "Model")
+    return column_type(key, index, dictionary_index)
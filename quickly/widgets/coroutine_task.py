@@ -0,0 +1,383 @@
+### BEGIN LICENSE
+# Copyright (C) 2010 Rick Spencer rick.spencer@canonical.com
+#This program is free software: you can redistribute it and/or modify it
+#under the terms of the GNU General Public License version 3, as published
+#by the Free Software Foundation.
+#
+#This program is distributed in the hope that it will be useful, but
+#WITHOUT ANY WARRANTY; without even the implied warranties of
+#MERCHANTABILITY, SATISFACTORY QUALITY, or FITNESS FOR A PARTICULAR
+#PURPOSE.  See the GNU General Public License for more details.
+#
+#You should have received a copy of the GNU General Public License along
+#with this program.  If not, see <http://www.gnu.org/licenses/>.
+### END LICENSE
+
+"""Generator based coroutines run by the main loop
+A CoroutineTask runs a generator function on the main loop, resuming it
+whenever what it yielded is ready. Many CoroutineTasks can wait on I/O at
+the same time without using a thread each. AsynchTaskProgressBox runs
+its run_function as a CoroutineTask when it is a generator function.
+
+Using
+#a coroutine is a generator function that takes params, what it yields
+#says when to resume it:
+#  None - resume on the next main loop iteration
+#  a number - resume after that many seconds
+#  a Future - resume with its result, or raise its exception
+#  a generator - run it as a coroutine and resume with its result
+def fetch_all(params):
+    pages = []
+    for url in params["urls"]:
+        future = Future()
+        gio.File(url).load_contents_async(
+            lambda f, result: future.set_result(f.load_contents_finish(result)[0]))
+        pages.append((yield future))
+        params["update_progress_function"](len(pages) / float(len(params["urls"])))
+    raise Return(pages)
+
+task = CoroutineTask(fetch_all, {"urls": urls}, on_complete)
+task.start()
+
+#stop the task, TaskCancelled is raised where the coroutine is waiting
+task.kill()
+
+def fetch_all(params):
+    try:
+        ...
+    except TaskCancelled:
+        raise Return("stopped")
+
+Configuring
+#run the coroutine with something other than the glib main loop, the
+#scheduler needs call_soon(function, *args), call_later(seconds,
+#function, *args) and cancel(handle)
+task = CoroutineTask(fetch_all, params, on_complete, scheduler=scheduler)
+
+"""
+
+import threading
+import traceback
+import types
+
+class TaskCancelled(Exception):
+    """TaskCancelled: raised inside a coroutine when its task is killed."""
+
+    pass
+
+class Return(Exception):
+    """Return: raise Return(value) to return value from a coroutine, since
+    generators can not return a value.
+
+    """
+
+    def __init__(self, value=None):
+        Exception.__init__(self, value)
+        self.value = value
+
+class Future(object):
+    """Future: the result of something that has not finished yet. A
+    coroutine yields a Future to wait for its result. set_result and
+    set_exception may be called from any thread.
+
+    """
+
+    def __init__(self):
+        self.__done = False
+        self.__result = None
+        self.__exception = None
+        self.__callbacks = []
+        self.__lock = threading.Lock()
+
+    def done(self):
+        """done: returns True once there is a result or an exception."""
+
+        return self.__done
+
+    def result(self):
+        """result: returns the result, or raises the exception.
+        Raises a RuntimeError if the future is not done.
+
+        """
+
+        if not self.__done:
+            raise RuntimeError("Future is not done.")
+        if self.__exception is not None:
+            raise self.__exception
+        return self.__result
+
+    def exception(self):
+        """exception: returns the exception, or None."""
+
+        return self.__exception
+
+    def set_result(self, result):
+        """set_result: sets the result and calls the done callbacks.
+
+        Keyword arguments:
+        result -- the result
+
+        """
+
+        self.__finish(result, None)
+
+    def set_exception(self, exception):
+        """set_exception: sets an exception to raise in place of a result
+        and calls the done callbacks.
+
+        Keyword arguments:
+        exception -- the exception
+
+        """
+
+        self.__finish(None, exception)
+
+    def add_done_callback(self, function):
+        """add_done_callback: calls function with the future once it is
+        done, right away if it is done already.
+
+        Keyword arguments:
+        function -- the function to call
+
+        """
+
+        self.__lock.acquire()
+        try:
+            if not self.__done:
+                self.__callbacks.append(function)
+                return
+        finally:
+            self.__lock.release()
+        function(self)
+
+    def remove_done_callback(self, function):
+        """remove_done_callback: stops function from being called when the
+        future is done.
+
+        Keyword arguments:
+        function -- a function passed to add_done_callback
+
+        """
+
+        self.__lock.acquire()
+        try:
+            if function in self.__callbacks:
+                self.__callbacks.remove(function)
+        finally:
+            self.__lock.release()
+
+    def __finish(self, result, exception):
+        self.__lock.acquire()
+        try:
+            if self.__done:
+                raise RuntimeError("Future is already done.")
+            self.__result = result
+            self.__exception = exception
+            self.__done = True
+            callbacks = self.__callbacks
+            self.__callbacks = []
+        finally:
+            self.__lock.release()
+        for function in callbacks:
+            function(self)
+
+class GLibScheduler(object):
+    """GLibScheduler: runs coroutine steps from the glib main loop.
+    Used by CoroutineTask unless another scheduler is passed in.
+
+    """
+
+    def __init__(self):
+        import gobject
+        self.__gobject = gobject
+
+    def call_soon(self, function, *args):
+        return self.__gobject.idle_add(self.__call_once, function, args)
+
+    def call_later(self, seconds, function, *args):
+        return self.__gobject.timeout_add(int(seconds * 1000),
+                                          self.__call_once, function, args)
+
+    def cancel(self, handle):
+        self.__gobject.source_remove(handle)
+
+    def __call_once(self, function, args):
+        function(*args)
+        return False
+
+_default_scheduler = None
+
+def default_scheduler():
+    """default_scheduler: returns the GLibScheduler shared by CoroutineTasks,
+    created on first use.
+
+    """
+
+    global _default_scheduler
+    if _default_scheduler is None:
+        _default_scheduler = GLibScheduler()
+    return _default_scheduler
+
+class CoroutineTask(object):
+    """CoroutineTask: runs a generator function as a coroutine on a
+    scheduler, the glib main loop by default. The function gets the same
+    params as with an AsynchTaskProgressBox.
+
+    """
+
+    PENDING = "pending"
+    RUNNING = "running"
+    DONE = "done"
+    KILLED = "killed"
+
+    def __init__(self, run_function, params=None, on_complete=None,
+                 scheduler=None):
+        """Create a CoroutineTask
+
+        Keyword arguments:
+        run_function -- a generator function, it is passed params
+        params -- optional dictionary of parameters to pass to run_function
+        on_complete -- optional function called with the value the
+        coroutine returns with Return. Not called if the coroutine raises
+        an exception, including TaskCancelled.
+        scheduler -- optional scheduler, defaults to default_scheduler()
+
+        """
+
+        if params is None:
+            params = {}
+        params["kill"] = False
+        self.run_function = run_function
+        self.params = params
+        self.on_complete = on_complete
+        if scheduler is None:
+            scheduler = default_scheduler()
+        self.scheduler = scheduler
+        self.future = Future()
+        self.state = CoroutineTask.PENDING
+        self.__generator = None
+        self.__handle = None
+        self.__waiting_on = None
+        self.__child = None
+
+    def start(self):
+        """start: calls run_function and schedules the first step of the
+        coroutine.
+
+        """
+
+        if self.state != CoroutineTask.PENDING:
+            raise RuntimeError("CoroutineTask already started.")
+        self.state = CoroutineTask.RUNNING
+        self.__generator = self.run_function(self.params)
+        self.__handle = self.scheduler.call_soon(self.__step, None, None)
+
+    def kill(self):
+        """kill: sets params["kill"] to True and raises TaskCancelled in
+        the coroutine where it is waiting.
+
+        """
+
+        self.params["kill"] = True
+        if self.state == CoroutineTask.PENDING:
+            self.state = CoroutineTask.KILLED
+            self.future.set_exception(TaskCancelled())
+        elif self.state == CoroutineTask.RUNNING:
+            self.__stop_waiting()
+            self.__handle = self.scheduler.call_soon(self.__step, None,
+                                                     TaskCancelled())
+
+    def __stop_waiting(self):
+        """__stop_waiting: internal function that stops waiting on a
+        scheduled step or a future.
+
+        """
+
+        if self.__handle is not None:
+            self.scheduler.cancel(self.__handle)
+            self.__handle = None
+        if self.__waiting_on is not None:
+            self.__waiting_on.remove_done_callback(self.__future_done)
+            self.__waiting_on = None
+        if self.__child is not None:
+            self.__child.kill()
+            self.__child = None
+
+    def __step(self, value, exception):
+        """__step: internal function that resumes the coroutine with a
+        value or an exception and waits on what it yields next.
+
+        """
+
+        self.__handle = None
+        try:
+            if exception is not None:
+                yielded = self.__generator.throw(exception)
+            else:
+                yielded = self.__generator.send(value)
+        except Return, r:
+            self.__finish(r.value, None)
+            return
+        except StopIteration:
+            self.__finish(None, None)
+            return
+        except TaskCancelled, e:
+            self.__finish(None, e)
+            return
+        except Exception, e:
+            traceback.print_exc()
+            self.__finish(None, e)
+            return
+
+        if yielded is None:
+            self.__handle = self.scheduler.call_soon(self.__step, None, None)
+        elif isinstance(yielded, (int, long, float)):
+            self.__handle = self.scheduler.call_later(yielded, self.__step,
+                                                      None, None)
+        else:
+            if isinstance(yielded, types.GeneratorType):
+                yielded = self.__start_child(yielded)
+            if not isinstance(yielded, Future):
+                self.__handle = self.scheduler.call_soon(self.__step, None,
+                    TypeError("Can not wait on %r." % (yielded,)))
+                return
+            self.__waiting_on = yielded
+            yielded.add_done_callback(self.__future_done)
+
+    def __start_child(self, generator):
+        """__start_child: internal function that runs a generator yielded
+        by the coroutine as a coroutine of its own, returns its future.
+
+        """
+
+        self.__child = CoroutineTask(lambda params: generator, None, None,
+                                     self.scheduler)
+        self.__child.start()
+        return self.__child.future
+
+    def __future_done(self, future):
+        """__future_done: internal function called when the future the
+        coroutine waits on is done, possibly on another thread.
+
+        """
+
+        self.__waiting_on = None
+        self.__child = None
+        if future.exception() is not None:
+            self.__handle = self.scheduler.call_soon(self.__step, None,
+                                                     future.exception())
+        else:
+            self.__handle = self.scheduler.call_soon(self.__step,
+                                                     future.result(), None)
+
+    def __finish(self, result, exception):
+        if self.params["kill"]:
+            self.state = CoroutineTask.KILLED
+        else:
+            self.state = CoroutineTask.DONE
+        if exception is not None:
+            self.future.set_exception(exception)
+            return
+        self.future.set_result(result)
+        if self.on_complete is not None:
+            self.on_complete(result)
@@ -61,13 +61,33 @@ persistence. Otherwise, derive from DictionaryGrid.
 
 import gtk
 import gobject
-from desktopcouch.records.server import CouchDatabase
-from desktopcouch.records.record import Record
 from quickly.widgets.dictionary_grid import DictionaryGrid
 from quickly.widgets.grid_column import CheckColumn
 
 #TODO: a delete_selected_rows function would be nice and not too hard
 
+def _couch_database(database_name, uri=None):
+    """_couch_database - internal function that opens (and creates if
+    needed) a desktopcouch database. desktopcouch is imported on first
+    use so that importing couch_grid does not start up desktopcouch.
+
+    """
+
+    from desktopcouch.records.server import CouchDatabase
+    if uri:
+        return CouchDatabase(database_name, create=True, uri=uri)
+    else:
+        return CouchDatabase(database_name, create=True)
+
+def _record(dictionary):
+    """_record - internal function that creates a desktopcouch Record
+    for a dictionary, importing desktopcouch on first use.
+
+    """
+
+    from desktopcouch.records.record import Record
+    return Record(dictionary)
+
 class CouchGrid(DictionaryGrid):
     def __init__(
             self, database_name, record_type=None, dictionaries=None, editable=False, keys=None, type_hints=None, uri=None):
@@ -132,10 +152,7 @@ class CouchGrid(DictionaryGrid):
         else:
             DictionaryGrid.__init__(self, None, editable, keys, type_hints)
 
-        if self.uri:
-            self._db = CouchDatabase(database_name, create=True, uri=self.uri)
-        else:
-            self._db = CouchDatabase(database_name, create=True)
+        self._db = _couch_database(database_name, self.uri)
 
         if dictionaries is not None:
             for d in dictionaries:
@@ -153,10 +170,7 @@ class CouchGrid(DictionaryGrid):
 
     @database.setter
     def database(self, db_name):
-        if self.uri:
-            self._db = CouchDatabase(db_name, create=True, uri=self.uri)
-        else:
-            self._db = CouchDatabase(db_name, create=True)
+        self._db = _couch_database(db_name, self.uri)
         if self.record_type != None:
             self._refresh_treeview()#first time treeview is reset
 
@@ -306,7 +320,7 @@ class CouchGrid(DictionaryGrid):
         """
 
         dictionary["record_type"] = self.record_type
-        rec = Record(dictionary)
+        rec = _record(dictionary)
         #meh, best not to save an empty row
         if len(dictionary) > 1:
             doc_id = self._db.put_record(rec)
@@ -339,7 +353,7 @@ class CouchGrid(DictionaryGrid):
         if "__desktopcouch_id" not in dictionary: #the row has not been stored
             #create a document
             dictionary["record_type"] = self.record_type
-            rec = Record(dictionary)
+            rec = _record(dictionary)
             doc_id = self._db.put_record(rec)
             dictionary["__desktopcouch_id"] = doc_id
             self.list_store.set_value(iter, len(self.keys), dictionary)
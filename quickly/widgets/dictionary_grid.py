@@ -42,6 +42,42 @@ dg = CouchGrid(dictionaries=dicts,keys=keys, type_hints = hints)
 #A CouchGrid is gtk.TreeView, so you can use gtk.TreeView members
 dg.get_column(0).set_title("Price")
 
+#Store columns with few distinct values as small integer codes rather
+#than a string in every row, and share their repeated values between
+#the dictionaries, then see how much memory each row takes
+dg = DictionaryGrid(dictionaries=dicts, compact_keys=["status","test?"])
+print dg.bytes_per_row()
+
+#Keep the dictionaries in a column_store.ColumnStore, with a typed array
+#for each integer, currency and check column. Dictionaries are made when
+#rows, selected_rows or cell-edited hand them out
+dg = DictionaryGrid(dictionaries=dicts, columnar=True)
+prices = dg.row_store.column("price")
+
+#Add a boolean column after the dictionaries that is True for the rows
+#to show, and is used as the visible column of a gtk.TreeModelFilter.
+#A GridFilter adds one and writes the rows that change into it
+dg.add_visible_column()
+filtered = dg.unfiltered_store.filter_new()
+filtered.set_visible_column(dg.visible_column)
+
+#Get the count, sum, avg, min and max of a currency or integer column
+#over the rows that are not hidden by a GridFilter. The totals are kept
+#up to date as rows are added, edited, removed and filtered, see
+#grid_footer.GridFooter to display them
+totals = dg.aggregates("price")
+print totals["sum"], totals["avg"]
+
+#Find the rows with some text in any column, ignoring case. The values
+#are kept in a trigram index that follows changes to the rows, see
+#search_index.StoreSearch. GridFilter(dg, search=True) adds a search box
+found = dg.search("acme")
+
+#Count the rows with each value of a column. The counts are kept up to
+#date once asked for, see grid_filter.DistinctValuesFilterBox
+for status, count in dg.value_counts("status").items():
+    print status, count
+
 #Use the selection-changed signal and read from the DictionaryGrid
 dg.connect("selection-changed", __handle_selection_changed)
 def __handle_selection_changed(widget, dictionaries, data = None):
@@ -69,13 +105,18 @@ how the data is being displayed, etc...
 import gtk
 import gobject
 import conventions
+import grid_model
+import column_store
+import aggregates
+import search_index
 from quickly.widgets.grid_column import StringColumn
 from grid_column import CheckColumn
 
 class DictionaryGrid(gtk.TreeView):
     __gtype_name__ = "DictionaryGrid"
     
-    def __init__(self, dictionaries=None, editable = False, keys=None, type_hints=None):
+    def __init__(self, dictionaries=None, editable = False, keys=None, type_hints=None,
+                 compact_keys=None, columnar=False):
         """
         Creates a new DictionaryGrid
         arguments:
@@ -99,11 +140,31 @@ class DictionaryGrid(gtk.TreeView):
         by convention, or for changing the type of a column from
         the default of a string to something else.
 
+        compact_keys - a list of keys for columns with few distinct
+        values, such as a status or a category. These columns are
+        stored in the ListStore as integer codes from a
+        grid_model.ValueEncoder, and equal values for them in the
+        dictionaries are shared. Columns that store integers already,
+        such as CheckColumns, are left as they are.
+
+        columnar - True to keep the values of the rows in a
+        column_store.ColumnStore, the row_store member, rather than
+        keeping a dictionary for each row. The dictionaries passed in
+        are not kept, and the dictionaries handed out are made when
+        they are asked for. Setting a key in one changes the store.
+
         """
 
         gtk.TreeView.__init__(self)
         self.list_store = None
         self.unfiltered_store = None
+        self.row_store = None
+        self._columnar = columnar
+        self._visible_column = False
+        self.__store_aggregates = None
+        self.__search_index = None
+        self.__value_counts = {}
+        self.__watched = {}
         self._keys = keys
         self._editable = editable
         if dictionaries is None:
@@ -114,6 +175,10 @@ class DictionaryGrid(gtk.TreeView):
             self._type_hints = {}
         else:
             self._type_hints = type_hints
+        if compact_keys is None:
+            self._compact_keys = []
+        else:
+            self._compact_keys = compact_keys
         self.get_selection().set_mode(gtk.SELECTION_MULTIPLE)
         self._refresh_treeview()
 
@@ -151,9 +216,8 @@ class DictionaryGrid(gtk.TreeView):
 
         """
         iter = self.get_model().get_iter(path)
-        row_dict = self.get_model().get_value(iter,len(self.keys))
+        row_dict = self._row_dictionary(self.get_model(), iter)
         key = col.key
-        dictionary = self.get_model().get_value(iter,len(self.keys))
         self.emit("cell-edited",cell, path, key, new_val, row_dict)
 
     @property
@@ -217,11 +281,202 @@ class DictionaryGrid(gtk.TreeView):
             if t in self.columns:
                 self.columns[t].set_title(titles[t])
 
+    def bytes_per_row(self):
+        """bytes_per_row - returns an estimate of the bytes each row
+        uses, counting the cells of the ListStore, the dictionaries and
+        the values in them, and the tables of any compact_keys columns.
+
+        """
+
+        if self.unfiltered_store is None:
+            return 0
+        rows = (tuple(r) for r in self.unfiltered_store)
+        per_row = grid_model.encoded_bytes_per_row(self.__columns, rows)
+        if self.row_store is not None and len(self.row_store) > 0:
+            per_row += self.row_store.table_bytes() / float(len(self.row_store))
+        return per_row
+
+    @property
+    def visible_column(self):
+        """visible_column - the position in the ListStore of the column
+        added by add_visible_column, or None if it has not been added.
+
+        This property is read only.
+
+        """
+
+        if not self._visible_column or self.keys is None:
+            return None
+        return len(self.keys) + 1
+
+    def add_visible_column(self):
+        """add_visible_column - adds a boolean column after the one for
+        the dictionaries, True for every row, to hide rows with by
+        setting it to False. Existing rows are copied into a new
+        ListStore that the columns are pointed at, so the columns and
+        any titles, formatting or handlers set on them are kept. Models
+        rebuilt by _refresh_treeview keep the column. Does nothing if
+        the column was already added.
+
+        """
+
+        if self._visible_column:
+            return
+        self._visible_column = True
+        if self.list_store is None:
+            return
+        old_store = self.list_store
+        col_types = [old_store.get_column_type(i)
+                     for i in range(old_store.get_n_columns())]
+        self.list_store = gtk.ListStore(*(col_types + [gobject.TYPE_BOOLEAN]))
+        #rows of a columnar grid keep their ids in the same row_store
+        for row in old_store:
+            self.list_store.append(list(row) + [True])
+        for c in self.get_columns():
+            c.list_store = self.list_store
+        self.unfiltered_store = self.list_store
+        self.set_model(self.list_store)
+        for watcher in self.__watched.keys():
+            self.__watch(watcher)
+
+    @property
+    def store_aggregates(self):
+        """store_aggregates - the aggregates.StoreAggregates keeping the
+        totals of the aggregatable columns for the visible rows. It is
+        made the first time it is asked for, and from then on follows
+        every change to the rows.
+
+        This property is read only.
+
+        """
+
+        if self.__store_aggregates is None:
+            self.__store_aggregates = aggregates.StoreAggregates([])
+            self.__watch(self.__store_aggregates)
+        return self.__store_aggregates
+
+    def aggregates(self, key):
+        """aggregates - returns a dictionary of the "count", "sum", "avg",
+        "min" and "max" of the rows not hidden by a GridFilter for a
+        column. Empty cells are not counted.
+
+        arguments:
+        key - the key of a currency or integer column
+
+        """
+
+        return self.store_aggregates.get(key)
+
+    def group_aggregates(self, group_keys):
+        """group_aggregates - returns a new aggregates.StoreAggregates
+        that groups the visible rows by the values of group_keys and
+        follows every change to the rows, as used by GroupedGrid. Pass
+        it to release_aggregates when it is no longer needed.
+
+        arguments:
+        group_keys - a list of keys to group by
+
+        """
+
+        totals = aggregates.StoreAggregates([], group_keys=group_keys)
+        self.__watch(totals)
+        return totals
+
+    def release_aggregates(self, totals):
+        """release_aggregates - stops updating a StoreAggregates returned
+        by group_aggregates.
+
+        arguments:
+        totals - the StoreAggregates
+
+        """
+
+        self.__unwatch(totals)
+
+    @property
+    def search_index(self):
+        """search_index - the search_index.StoreSearch with a trigram index
+        of the values of every searchable column. It is made the first
+        time it is asked for, and from then on follows every change to
+        the rows.
+
+        This property is read only.
+
+        """
+
+        if self.__search_index is None:
+            self.__search_index = search_index.StoreSearch([])
+            self.__watch(self.__search_index)
+        return self.__search_index
+
+    def search(self, text):
+        """search - returns a list of the dictionaries for the rows with
+        text in any column, ignoring case, whether a GridFilter hides
+        them or not. Columns of check boxes are not searched.
+
+        arguments:
+        text - the text to find
+
+        """
+
+        store = self.unfiltered_store
+        if store is None:
+            return []
+        positions = self.search_index.search(text)
+        return [self._row_dictionary(store, store.get_iter((i,)))
+                for i in positions]
+
+    def value_counts(self, key):
+        """value_counts - returns a dictionary of the display values of a
+        column to the number of rows with that value, whether a
+        GridFilter hides them or not. The counts are kept from the first
+        time a column is asked for, and from then on follow every change
+        to the rows, so asking again does not look at the rows.
+
+        arguments:
+        key - the key of the column
+
+        """
+
+        if key not in self.__value_counts:
+            counts = aggregates.StoreValueCounts(key)
+            self.__watch(counts)
+            self.__value_counts[key] = counts
+        return dict(self.__value_counts[key].counts)
+
+    def __watch(self, watcher):
+        """__watch - internal function that points a StoreAggregates,
+        StoreValueCounts or StoreSearch at the current ListStore and its
+        columns, and tells it about every change to the rows.
+
+        """
+
+        self.__unwatch(watcher)
+        if self.list_store is None:
+            watcher.set_columns([])
+            self.__watched[watcher] = []
+            return
+        watcher.set_columns(self.__columns, self.visible_column)
+        watcher.reset(self.list_store)
+        store = self.list_store
+        handlers = [("row-inserted", lambda m, p, i: watcher.row_inserted(p[0], m[i])),
+                    ("row-changed", lambda m, p, i: watcher.row_changed(p[0], m[i])),
+                    ("row-deleted", lambda m, p: watcher.row_deleted(p[0])),
+                    ("rows-reordered", lambda m, *args: watcher.rows_reordered(m))]
+        self.__watched[watcher] = [(store, store.connect(signal, handler))
+                                   for signal, handler in handlers]
+
+    def __unwatch(self, watcher):
+        for store, handler in self.__watched.pop(watcher, []):
+            store.disconnect(handler)
+
     def get_dictionaries_copy(self):
         """get_dictionaries_copy -returns a copy of the dictionaries in
         the dictionary grid.
  
         """
+        if self.row_store is not None:
+            return self.row_store.dictionaries()
         return self._dictionaries[:]
 
     def _infer_keys_from_dictionaries(self):
@@ -232,13 +487,7 @@ class DictionaryGrid(gtk.TreeView):
         but may be useful to override in subclasses.
         
         """
-        key_collector = []
-        for r in self._dictionaries:                
-            for k in r.keys():
-                if k not in key_collector and not k.startswith("__"):
-                    key_collector.append(k)
-        
-        self._keys = key_collector
+        self._keys = grid_model.infer_keys(self._dictionaries)
 
     def _refresh_treeview(self):
         """
@@ -250,6 +499,10 @@ class DictionaryGrid(gtk.TreeView):
 
         """
 
+        #a columnar grid keeps its dictionaries in the row_store
+        if self.row_store is not None:
+            self._dictionaries = self.row_store.dictionaries()
+
         #if keys are already set, set up titles and columns
         if self.keys is not None:
             self.__reset_model()
@@ -264,6 +517,8 @@ class DictionaryGrid(gtk.TreeView):
             #so we have to make rows as long as the headerings
             #note that the last value is reserved for extra data
             self.append_row(dictionary)
+        if self.row_store is not None:
+            self._dictionaries = []
 
         #apply the model to the Treeview if possible
         if self.list_store != None:
@@ -281,20 +536,32 @@ class DictionaryGrid(gtk.TreeView):
 
         """        
 
-        new_row = []
+        row = grid_model.make_row(self.__columns, dictionary)
+        if self.row_store is not None:
+            row[-1] = self.row_store.append(dictionary)
+        if self._visible_column:
+            row.append(True)
+        self.list_store.append(row)
 
-        for i, k in enumerate(self.keys):
-                if k in dictionary:
-                    display_val = self.__columns_map[k].display_val(dictionary[k])
-                    real_val = self.__columns_map[k].real_val(dictionary[k])
-                    #TODO: store a "real_val" instead of display val
-                    #that was "converted_val"
-                    dictionary[k] = real_val
-                else:
-                    display_val = self.__columns_map[k].default_display_val()
-                new_row.append(display_val)
-        new_row.append(dictionary)
-        self.list_store.append(new_row)
+    def append_rows(self, dictionaries):
+        """append_rows: add a list of rows to the TreeView, for example
+        partial results from an AsynchTaskProgressBox. If no keys are set
+        up, keys will be inferred from the dictionaries.
+
+        arguments:
+        dictionaries - a list of dictionaries to add to the TreeView.
+
+        """
+
+        if self.keys is None:
+            if len(dictionaries) == 0:
+                return
+            self._keys = grid_model.infer_keys(dictionaries)
+            self.__reset_model()
+            self.unfiltered_store = self.list_store
+            self.set_model(self.list_store)
+        for dictionary in dictionaries:
+            self.append_row(dictionary)
 
     @property
     def rows(self):
@@ -312,8 +579,18 @@ class DictionaryGrid(gtk.TreeView):
     def __append_dict(self, model, path, iter, rows):
         """ __append_dict: internal function, do not call directly"""
 
-        row = model.get_value(iter,len(self.keys))
-        rows.append(row)
+        rows.append(self._row_dictionary(model, iter))
+
+    def _row_dictionary(self, model, iter):
+        """_row_dictionary: returns the dictionary for the row at iter in
+        model, making it if the grid is columnar.
+
+        """
+
+        stored = model.get_value(iter, len(self.keys))
+        if self.row_store is None:
+            return stored
+        return self.row_store.dictionary(stored)
 
     @property
     def selected_rows(self):
@@ -334,7 +611,7 @@ class DictionaryGrid(gtk.TreeView):
             row = {} #a row to be added to the list of rows
             iter = model.get_iter(mr)
 
-            row = model.get_value(iter,len(self.keys))
+            row = self._row_dictionary(model, iter)
             rows.append(row)
         return rows
 
@@ -365,12 +642,14 @@ class DictionaryGrid(gtk.TreeView):
                 store_iters.append(model.get_model().convert_iter_to_child_iter(i))
 
             for store_iter in store_iters:
+                self.__forget_row(self.unfiltered_store, store_iter)
                 self.unfiltered_store.remove(store_iter)
 
         else:
             iters = [model.get_iter(path) for path in rows]
 
             for i in iters:
+                self.__forget_row(model, i)
                 model.remove(i)
 
         #select a row for the user, nicer that way
@@ -388,6 +667,15 @@ class DictionaryGrid(gtk.TreeView):
             self.get_selection().select_path(rows_remaining - 1)
 
 
+    def __forget_row(self, model, iter):
+        """ __forget_row - internal function that removes a row from the
+        row_store of a columnar grid before it is removed from model.
+
+        """
+
+        if self.row_store is not None:
+            self.row_store.remove(model.get_value(iter, len(self.keys)))
+
     def __reset_model(self):
         """ __reset_model - internal funciton, do not call directly.
         This function is typically called when the TreeView needs
@@ -404,6 +692,7 @@ class DictionaryGrid(gtk.TreeView):
         col_count = len(self.keys) + 1
         col_types = []
         self.__columns_map = {}
+        self.__columns = []
 
         #create a column for each key
         for i, k in enumerate(self.keys):
@@ -414,21 +703,33 @@ class DictionaryGrid(gtk.TreeView):
                 #no column supplied, use conventions to get a column
                 column = conventions.get_column(k,i,len(self.keys), self.editable)
                 
+            if k in self._compact_keys and column.compactable:
+                column.set_encoder(grid_model.ValueEncoder())
+
             #add the created column, and remember it's key
             self.append_column(column)
             self.__columns_map[k] = column
+            self.__columns.append(column)
 
             #store the into for creating the list store
             col_types.append(column.column_type)
             
         #create the liststore with the designated types
-        #the last column is always for storing the backing dict
-        col_types.append(gobject.TYPE_PYOBJECT)
+        #the last column is always for storing the backing dict,
+        #or its row id in the row_store for a columnar grid
+        if self._columnar:
+            self.row_store = column_store.ColumnStore(self.__columns)
+            col_types.append(gobject.TYPE_INT)
+        else:
+            col_types.append(gobject.TYPE_PYOBJECT)
+        if self._visible_column:
+            col_types.append(gobject.TYPE_BOOLEAN)
         self.list_store = gtk.ListStore(*col_types)
 
         for c in self.get_columns():
             self.__last_sorted_col = None
             c.list_store = self.list_store
+            c.row_store = self.row_store
 
             #TODO: store and delete these, this is a leak
             c.connect("clicked",self.__remove_sort_icon)
@@ -439,6 +740,9 @@ class DictionaryGrid(gtk.TreeView):
             else:
                 c.renderer.connect("edited",self.__edited, c)
 
+        for watcher in self.__watched.keys():
+            self.__watch(watcher)
+
 
     def __remove_sort_icon(self, column):
         """__remove_sort_icon: internal function used in handling
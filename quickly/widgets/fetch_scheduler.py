@@ -0,0 +1,172 @@
+### BEGIN LICENSE
+# Copyright (C) 2010 Rick Spencer rick.spencer@canonical.com
+#This program is free software: you can redistribute it and/or modify it
+#under the terms of the GNU General Public License version 3, as published
+#by the Free Software Foundation.
+#
+#This program is distributed in the hope that it will be useful, but
+#WITHOUT ANY WARRANTY; without even the implied warranties of
+#MERCHANTABILITY, SATISFACTORY QUALITY, or FITNESS FOR A PARTICULAR
+#PURPOSE.  See the GNU General Public License for more details.
+#
+#You should have received a copy of the GNU General Public License along
+#with this program.  If not, see <http://www.gnu.org/licenses/>.
+### END LICENSE
+
+"""Decides which queued fetches may start
+FetchScheduler holds fetches waiting to start and says which of them may
+start without going over a limit on all active fetches and a limit on
+active fetches per host. UrlFetchQueue uses it to start its
+UrlFetchProgressBoxes. FetchScheduler does not use gtk or gio, so it can
+be tested and reused on its own.
+
+Using
+scheduler = FetchScheduler(max_active=4, max_per_host=2)
+scheduler.add(fetch, host_of(url), priority=0)
+
+#start what may start now
+for fetch in scheduler.next_ready():
+    fetch.start()
+
+#then when a fetch is done
+scheduler.finished(fetch)
+for fetch in scheduler.next_ready():
+    fetch.start()
+
+"""
+
+import urlparse
+
+#the most fetches to run at once
+DEFAULT_MAX_ACTIVE = 4
+
+#the most fetches to run at once against the same host
+DEFAULT_MAX_PER_HOST = 2
+
+def host_of(url):
+    """host_of: returns the host part of url, or an empty string for urls
+    without one, such as file urls.
+
+    """
+
+    return urlparse.urlparse(url)[1]
+
+def split_ranges(size, count):
+    """split_ranges: returns a list of (start, end) tuples that split size
+    bytes into count ranges of about the same size. end is not included
+    in the range. Returns fewer ranges when size is smaller than count.
+
+    Keyword arguments:
+    size -- the number of bytes to split
+    count -- the number of ranges to split them into
+
+    """
+
+    count = max(1, min(count, size))
+    ranges = []
+    start = 0
+    for i in range(count):
+        end = size * (i + 1) // count
+        ranges.append((start, end))
+        start = end
+    return ranges
+
+class FetchScheduler(object):
+    """FetchScheduler: orders waiting fetches by priority and hands them
+    out while the active fetches are within the limits.
+
+    """
+
+    def __init__(self, max_active=DEFAULT_MAX_ACTIVE,
+                 max_per_host=DEFAULT_MAX_PER_HOST):
+        """Create a FetchScheduler
+
+        Keyword arguments:
+        max_active -- the most fetches to run at once
+        max_per_host -- the most fetches to run at once for one host,
+        None for no limit
+
+        """
+
+        self.max_active = max_active
+        self.max_per_host = max_per_host
+        self.__pending = []
+        self.__active = {}
+        self.__host_counts = {}
+        self.__sequence = 0
+
+    @property
+    def pending(self):
+        """pending - the number of fetches waiting to start.
+        This property is read only.
+
+        """
+
+        return len(self.__pending)
+
+    @property
+    def active(self):
+        """active - the number of fetches handed out by next_ready that
+        have not finished. This property is read only.
+
+        """
+
+        return len(self.__active)
+
+    def add(self, item, host, priority=0):
+        """add: queues a fetch.
+
+        Keyword arguments:
+        item -- the fetch, anything hashable
+        host -- the host it fetches from, see host_of
+        priority -- fetches with a higher priority start first, fetches
+        with the same priority start in the order they were added
+
+        """
+
+        self.__pending.append((-priority, self.__sequence, item, host))
+        self.__sequence += 1
+        self.__pending.sort()
+
+    def next_ready(self):
+        """next_ready: returns a list of the fetches that may start now and
+        counts them as active. A fetch whose host is at its limit does not
+        hold up fetches for other hosts.
+
+        """
+
+        ready = []
+        waiting = []
+        for entry in self.__pending:
+            host = entry[3]
+            if (len(self.__active) < self.max_active and
+                not self.__host_full(host)):
+                self.__active[entry[2]] = host
+                self.__host_counts[host] = self.__host_counts.get(host, 0) + 1
+                ready.append(entry[2])
+            else:
+                waiting.append(entry)
+        self.__pending = waiting
+        return ready
+
+    def finished(self, item):
+        """finished: stops counting a fetch as active, or removes it from
+        the queue if it has not started.
+
+        Keyword arguments:
+        item -- a fetch passed to add
+
+        """
+
+        if item in self.__active:
+            host = self.__active.pop(item)
+            self.__host_counts[host] -= 1
+            if self.__host_counts[host] == 0:
+                del self.__host_counts[host]
+        else:
+            self.__pending = [e for e in self.__pending if e[2] is not item]
+
+    def __host_full(self, host):
+        if self.max_per_host is None:
+            return False
+        return self.__host_counts.get(host, 0) >= self.max_per_host
@@ -56,6 +56,14 @@ default_display_val(self) - reutrn the value to display in the case where
 a row does not contain a key, value pair for the specified column. For example
 StringColumn returns an empty string ("")
 
+sort_key(self, val) - takes a display value and returns a value used to
+sort the column from least value to greatest value
+
+The built in columns get these functions from the GTK-free column models
+in grid_model, for example CurrencyColumn inherits them from
+grid_model.CurrencyColumnModel. A new column can do the same by deriving
+from a column model as well as from a GridColumn.
+
 A new column type will often require a specially configured gtk.CellRenderer.
 If you are deriving from StringColumn, but are using a custom renderer,
 you need to override the _initialize_renderer method, and set the 
@@ -79,12 +87,14 @@ You also need to define two class variable:
 1. column_type, the gobject type for the column's display value.
 This is needed so that the DictionaryGrid can create a ListStore
 
-2. default_filter, the grid_filter type to use in cases where a 
-GridFilter is associate with the column.
+2. default_filter, a callable that returns the grid_filter widget to use
+in cases where a GridFilter is associate with the column. A grid_filter
+type works, but the built in columns use _lazy_filter so that grid_filter
+and its widgets are only imported once a GridFilter is actually created.
 
 For example, CurrencyColumn defines the following class variables:
 column_type = gobject.TYPE_STRING
-default_filter = grid_filter.NumericFilterBox
+default_filter = _lazy_filter("NumericFilterBox")
 
 """
 
@@ -101,25 +111,52 @@ try:
     pygtk.require("2.0")
     import gtk
     import gobject
-    import grid_filter
-
+    import grid_model
 
 except Exception, inst:
     print "some dependencies for GridFilter are not available"
     raise inst
 
-class StringColumn( gtk.TreeViewColumn ):
+def _lazy_filter(filter_name):
+    """_lazy_filter - internal function that returns a default_filter
+    function for a column. grid_filter is imported the first time the
+    filter is needed rather than when grid_column is imported.
+
+    arguments:
+    filter_name - the name of the filter box class in grid_filter
+
+    """
+
+    def default_filter(self):
+        import grid_filter
+        return getattr(grid_filter, filter_name)()
+    return default_filter
+
+def _reorder(store, new_order):
+    """_reorder - internal function that reorders the rows of a
+    gtk.ListStore, or the top level rows of a gtk.TreeStore as used by
+    a TreeGrid.
+
+    """
+
+    if isinstance(store, gtk.TreeStore):
+        store.reorder(None, new_order)
+    else:
+        store.reorder(new_order)
+
+class StringColumn( gtk.TreeViewColumn, grid_model.StringColumnModel ):
     """StringColumn - Displays strings and tracks data as string.
     Uses a CellRendererText for display and editing. Not typically created
     directly in code, but rather created by a DictionaryGrid or descendant.
 
     Suitable as a base class for any column that needs to display a string.
+    Converts values using grid_model.StringColumnModel.
 
     """
 
     column_type = gobject.TYPE_STRING
     __sort_order = None
-    default_filter = grid_filter.StringFilterBox
+    default_filter = _lazy_filter("StringFilterBox")
     def __init__(self, key, index, dictionary_index, editable=True, format_function = None ):
         """Creates a StringColumn
 
@@ -140,10 +177,9 @@ class StringColumn( gtk.TreeViewColumn ):
 
         """
 
-        self.index = index
-        self.key = key
+        grid_model.StringColumnModel.__init__(self, key, index, dictionary_index)
         self.list_store = None
-        self.dictionary_index = dictionary_index
+        self._format_function = format_function
         self._initialize_renderer(editable, index)
         
         gtk.TreeViewColumn.__init__( self, key, self.renderer, text=index)
@@ -153,6 +189,37 @@ class StringColumn( gtk.TreeViewColumn ):
         self.set_clickable(True)
         self.connect('clicked', self.sort_rows)
         self.set_resizable(True)
+
+    def set_encoder(self, encoder):
+        """set_encoder - stores the column as codes from a
+        grid_model.ValueEncoder rather than as strings. The column_type
+        becomes gobject.TYPE_INT, so call before the ListStore is created.
+        Used by a DictionaryGrid for its compact_keys.
+
+        arguments:
+        encoder - the grid_model.ValueEncoder for the column
+
+        """
+
+        self.encoder = encoder
+        self.column_type = gobject.TYPE_INT
+        self.clear_attributes(self.renderer)
+        self.set_cell_data_func(self.renderer, self._on_decode,
+                                self._format_function)
+
+    def _on_decode(self, column, cell_renderer, tree_model, iter, format_function):
+        """_on_decode - internal signal handler that sets the text of a
+        cell from the code stored for it, then formats it with
+        format_function if there is one.
+
+        """
+
+        val = self.encoder.decode(tree_model.get_value(iter, self.index))
+        if format_function is not None:
+            string = format_function(val, cell_renderer)
+            if string != None:
+                val = string
+        cell_renderer.set_property('text', val)
     
     def sort_rows(self, widget):
         """sort_rows - when called, the DictionaryGrid will resort
@@ -163,7 +230,7 @@ class StringColumn( gtk.TreeViewColumn ):
 
         sort_order = widget.get_sort_order()                
         
-        rows = [tuple(r) + (i,) for i, r in enumerate(self.list_store)]
+        values = [r[self.index] for r in self.list_store]
         if sort_order == gtk.SORT_ASCENDING:
             sort_order = gtk.SORT_DESCENDING
 
@@ -173,55 +240,8 @@ class StringColumn( gtk.TreeViewColumn ):
         self.set_sort_indicator(True)
         self.set_sort_order(sort_order)
         
-        if sort_order == gtk.SORT_ASCENDING:
-            rows.sort(self._sort_ascending)
-        else:
-            rows.sort(self._sort_descending)
-
-        self.list_store.reorder([r[-1] for r in rows])
-
-
-    def _sort_ascending(self, x, y):
-        """_sort_ascending - internal sort function that sorts two values
-        in the column from least value to greatest value. 
-
-        returns 1 if x > y, 0 if x = y, -1 if x < y
-
-        arguments:
-        x - the value being compared to
-        y - the value being compared
-
-        """
-
-        x = x[self.index]
-        y = y[self.index]
-        if x > y:
-            return 1
-        elif x == y:
-            return 0
-        elif x < y:
-            return -1
-       
-    def _sort_descending(self, x, y):
-        """_sort_descending - internal sort function that sorts two values 
-        in the column from greatest value to least value. May need to be 
-        implimented or overriden in specialized columns.
-
-        returns 1 if x < y, 0 if x = y, -1 if x > y
-
-        arguments:
-        x - the value being compared to
-        y - the value being compared
-
-        """
-        x = x[self.index]
-        y = y[self.index]
-        if x > y:
-            return -1
-        elif x == y:
-            return 0
-        elif x < y:
-            return 1
+        descending = sort_order == gtk.SORT_DESCENDING
+        _reorder(self.list_store, grid_model.sort_order(values, self, descending))
 
     def _on_format(self,column, cell_renderer, tree_model, iter, format_function):
         """on format - internal signal handler called when the column needs 
@@ -284,58 +304,21 @@ class StringColumn( gtk.TreeViewColumn ):
         if self.list_store is not None:
             iter = self.list_store.get_iter(path)
             #update the ListStore with the new text
-            self.list_store.set_value(iter, self.index, self.display_val(new_text))
+            self.list_store.set_value(iter, self.index, self.cell_val(self.display_val(new_text)))
         
-            dictionary = self.list_store.get_value(iter,self.dictionary_index)
+            dictionary = self.row_dictionary(self.list_store.get_value(iter,self.dictionary_index))
             dictionary[self.key] = self.real_val(new_text)
 
-    def display_val(self, val):
-        """display_val - takes a real value and returns the cooresponding
-        display value
-
-        arguments:
-
-        val - the real value to convert
-
-        """
-
-        if val == None:
-            return self.default_display_val()
-        else:
-            return str(val)
-
-    def real_val(self, val):
-        """real_val - takes a display value and returns the cooresponding
-        real value.
-
-        arguments:
-
-        val - the display value to convert
-
-        """
-
-        #in a StringColumn, the backing data and the display data are the same
-        return self.display_val(val)
-
-    def default_display_val(self):
-        """default_dislay_val - return the value to display in the case
-        where there is no real value for the column for the row.
-
-        """
-
-        #display an empty string if there is no string for the cell
-        return ""
-
-class CurrencyColumn( StringColumn ):
+class CurrencyColumn( StringColumn, grid_model.CurrencyColumnModel ):
     """CurrencyColumn - display data in currency format. Uses a gtk.Spinner
     to display data and support editing if enabled. Store real values as float.
 
-    Inherits from StringColumn.
+    Inherits from StringColumn and grid_model.CurrencyColumnModel.
 
     """
 
     column_type = gobject.TYPE_STRING
-    default_filter = grid_filter.NumericFilterBox
+    default_filter = _lazy_filter("NumericFilterBox")
     def __init__(self, key, index,dictionary_index, editable=True ):
         """Creates a CurrencyColumn
 
@@ -386,109 +369,17 @@ class CurrencyColumn( StringColumn ):
             
             iter = self.list_store.get_iter(path)
             #update the ListStore with the new text
-            self.list_store.set_value(iter, self.index, self.display_val(new_text))            
-            dictionary = self.list_store.get_value(iter,self.dictionary_index)
+            self.list_store.set_value(iter, self.index, self.cell_val(self.display_val(new_text)))            
+            dictionary = self.row_dictionary(self.list_store.get_value(iter,self.dictionary_index))
             dictionary[self.key] = self.real_val(new_text)
 
-  
-    def display_val(self, val):
-        """display_val - takes a real value and returns the cooresponding
-        display value
-
-        arguments:
-
-        val - the real value to convert
-
-        """
-
-        try:
-            return str(float(val))
-        except:
-            return ""        """Creates a CurrencyColumn
-
-        Arguments:
-        key - the key from the dict for the row. Also used as the title for the
-        column by default.
-
-        index - the position of the column in the grid.
-
-        dictionary_index - the index in the ListStore where the dictionary
-        for the row is stored. Typically len(dict).
-
-        editable - False if the column does not allow the user to edit the
-        values in the column. Defaults to True.
-
-        """
-
-
-    def real_val(self, val):
-        """real_val - takes a display value and returns the cooresponding
-        real value.
-
-        arguments:
-
-        val - the display value to convert
-
-        """
-
-        try:
-            return float(val)
-        except:
-            return 0.0
-
-    def default_display_val(self):
-        """default_dislay_val - return the value to display in the case
-        where there is no real value for the column for the row.
-
-        """
-
-        return ""
-
-    def _sort_ascending(self, x, y):
-        x = x[self.index]
-        y = y[self.index]
-        if x == "" and y == "":
-            return 0
-        if x == "" and y != "":
-            return -1
-        if x != "" and y == "":
-            return 1
-
-        x = float(x)
-        y = float(y)
-        if x > y:
-            return 1
-        elif x == y:
-            return 0
-        elif x < y:
-            return -1
-
-    def _sort_descending(self, x, y):
-        x = x[self.index]
-        y = y[self.index]
-        if x == "" and y == "":
-            return 0
-        if x == "" and y != "":
-            return 1
-        if x != "" and y == "":
-            return -1
-
-        x = float(x)
-        y = float(y)
-        if x > y:
-            return -1
-        elif x == y:
-            return 0
-        elif x < y:
-            return 1
-
     def _currency_format(self, val, cell_renderer):
         try:
             return "%.2f" % float(val)
         except:
             return ""
 
-class TagsColumn( StringColumn ):
+class TagsColumn( StringColumn, grid_model.TagsColumnModel ):
     """TagsColumn - A specialization of a StringColumn that differs
     only in that it uses a TagsFilterBox for filtering in any
     attached GridFilter.
@@ -496,19 +387,19 @@ class TagsColumn( StringColumn ):
     """
 
     column_type = gobject.TYPE_STRING
-    default_filter = grid_filter.TagsFilterBox
+    default_filter = _lazy_filter("TagsFilterBox")
 
 
-class IntegerColumn( StringColumn ):
+class IntegerColumn( StringColumn, grid_model.IntegerColumnModel ):
     """IntegerColumn - display data in Integer format. Uses a gtk.Spinner
     to display data and support editing if enabled. Store real values as int.
 
-    Inherits from StringColumn.
+    Inherits from StringColumn and grid_model.IntegerColumnModel.
 
     """
 
     column_type = gobject.TYPE_STRING
-    default_filter = grid_filter.IntegerFilterBox
+    default_filter = _lazy_filter("IntegerFilterBox")
 
     def __init__(self, key, index, dictionary_index, editable=True ):
         """Creates an IntegerColumn
@@ -555,98 +446,20 @@ class IntegerColumn( StringColumn ):
             
             iter = self.list_store.get_iter(path)
             #update the ListStore with the new text
-            self.list_store.set_value(iter, self.index, self.display_val(new_text))            
-            dictionary = self.list_store.get_value(iter,self.dictionary_index)
+            self.list_store.set_value(iter, self.index, self.cell_val(self.display_val(new_text)))            
+            dictionary = self.row_dictionary(self.list_store.get_value(iter,self.dictionary_index))
             dictionary[self.key] = self.real_val(new_text)
 
 
-    def display_val(self, val):
-        """display_val - takes a real value and returns the cooresponding
-        display value
-
-        arguments:
-
-        val - the real value to convert
-
-        """
-
-        try:
-            return str(int(val))
-        except:
-            return ""
-
-    def real_val(self, val):
-        """real_val - takes a display value and returns the cooresponding
-        real value.
-
-        arguments:
-
-        val - the display value to convert
-
-        """
-
-        try:
-            return int(val)
-        except:
-            return 0
-
-    
-    def default_display_val(self):
-        """default_dislay_val - return the value to display in the case
-        where there is no real value for the column for the row.
-
-        """
-
-        return ""
-
-    def _sort_ascending(self, x, y):
-        x = x[self.index]
-        y = y[self.index]
-        if x == "" and y == "":
-            return 0
-        if x == "" and y != "":
-            return -1
-        if x != "" and y == "":
-            return 1
-
-        x = int(x)
-        y = int(y)
-        if x > y:
-            return 1
-        elif x == y:
-            return 0
-        elif x < y:
-            return -1
-
-    def _sort_descending(self, x, y):
-        x = x[self.index]
-        y = y[self.index]
-        if x == "" and y == "":
-            return 0
-        if x == "" and y != "":
-            return 1
-        if x != "" and y == "":
-            return -1
-
-        x = int(x)
-        y = int(y)
-        if x > y:
-            return -1
-        elif x == y:
-            return 0
-        elif x < y:
-            return 1
-
-
-class CheckColumn( gtk.TreeViewColumn ):
+class CheckColumn( gtk.TreeViewColumn, grid_model.CheckColumnModel ):
     """CheckColumn - display data as checkboxes. Store real values as bool.
 
-    Inherits from gtk.TreeViewColumn.
+    Inherits from gtk.TreeViewColumn and grid_model.CheckColumnModel.
 
     """
 
     column_type = gobject.TYPE_INT
-    default_filter = grid_filter.CheckFilterBox
+    default_filter = _lazy_filter("CheckFilterBox")
 
     def __init__(self, key, index, dictionary_index, editable=True, format_function = None ):
         """Creates a StringColumn
@@ -668,11 +481,9 @@ class CheckColumn( gtk.TreeViewColumn ):
 
         """
 
-        self.index = index
-        self.key = key
+        grid_model.CheckColumnModel.__init__(self, key, index, dictionary_index)
         self._initialize_renderer(editable, index)
         self.list_store = None
-        self.dictionary_index = dictionary_index
 
         gtk.TreeViewColumn.__init__( self, key, self.renderer)
 
@@ -686,7 +497,7 @@ class CheckColumn( gtk.TreeViewColumn ):
     def sort_rows(self, widget):
         sort_order = widget.get_sort_order()                
         
-        rows = [tuple(r) + (i,) for i, r in enumerate(self.list_store)]
+        values = [r[self.index] for r in self.list_store]
         if sort_order == gtk.SORT_ASCENDING:
             sort_order = gtk.SORT_DESCENDING
 
@@ -696,22 +507,8 @@ class CheckColumn( gtk.TreeViewColumn ):
         self.set_sort_order(sort_order)
         self.set_sort_indicator(True)
         
-        if sort_order == gtk.SORT_ASCENDING:
-            rows.sort(self._sort_ascending)
-        else:
-            rows.sort(self._sort_descending)
-
-        self.list_store.reorder([r[-1] for r in rows])
-
-    def _sort_ascending(self, x, y):
-        x = x[self.index]
-        y = y[self.index]
-        return y - x
-
-    def _sort_descending(self, x, y):
-        x = x[self.index]
-        y = y[self.index]
-        return x - y
+        descending = sort_order == gtk.SORT_DESCENDING
+        _reorder(self.list_store, grid_model.sort_order(values, self, descending))
 
     def _on_format(self,column, cell_renderer, tree_model, iter):
         cell_val = tree_model.get_value(iter, self.index)
@@ -740,73 +537,19 @@ class CheckColumn( gtk.TreeViewColumn ):
             #update the ListStore with the new text
             self.list_store.set_value(iter, self.index, new_val)
         
-            dictionary = self.list_store.get_value(iter,self.dictionary_index)
+            dictionary = self.row_dictionary(self.list_store.get_value(iter,self.dictionary_index))
             dictionary[self.key] = new_val
 
-    def display_val(self, val):
-        """display_val - takes a real value and returns the cooresponding
-        display value
-
-        arguments:
-
-        val - the real value to convert
-
-        """
-
-        if type(val) is bool:
-            if val:
-                return 1
-            else:
-                return 0
-        elif type(val) is str:
-            if val.lower() == _("yes"):
-                return 1
-            else:
-                return 0
-        elif type(val) is None:
-            return self.default_display_val()
-        else:
-            return bool(val)
-
-    def default_display_val(self):
-        """default_dislay_val - return the value to display in the case
-        where there is no real value for the column for the row.
-
-        """
-
-        return -1
-
-
-    def real_val(self, val):
-        """real_val - takes a display value and returns the cooresponding
-        real value.
-
-        arguments:
-
-        val - the display value to convert
-
-        """
-
-        if type(val) is type(True):
-            return val
-        elif type(val) is type("a"):
-            if val.lower() == "yes":
-                return True
-            else:
-                return False
-        else:
-            return bool(val)
-
-class DateColumn( StringColumn ):
+class DateColumn( StringColumn, grid_model.DateColumnModel ):
     """DateColumn - display data in date format. Uses a gtk.Calendar
     to display data and support editing if enabled. Store real values as tuple.
 
-    Inherits from StringColumn.
+    Inherits from StringColumn and grid_model.DateColumnModel.
 
     """
 
     column_type = gobject.TYPE_STRING
-    default_filter = grid_filter.DateFilterBox
+    default_filter = _lazy_filter("DateFilterBox")
 
     def __init__(self, key, index,dictionary_index, editable=True ):
         """Creates a Date
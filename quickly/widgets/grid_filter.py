@@ -48,6 +48,20 @@ filter_hints = {"status":blank_filter}
 filt = GridFilter(grid, filter_hints)
 filt.show()
 
+#add a box to search every column, the rows shown have the text in any
+#column as well as matching the filters
+filt = GridFilter(grid, search=True)
+
+#work out which rows to show on a worker thread, so filtering a large
+#grid does not block the window. As with AsynchTaskProgressBox, call
+#gobject.threads_init() before gtk.main()
+filt = GridFilter(grid, executor=task_executor.default_executor())
+
+#let the user check the values to show from a list of the values in a
+#column, with the number of rows having each
+filter_hints = {"status":DistinctValuesFilterBox(grid, "status")}
+filt = GridFilter(grid, filter_hints)
+
 Extending
 A custom filter combo is easiest to create by deriving from BlankFilterBox
 and using the BlankFilterBox.append function to display new filters.
@@ -64,6 +78,20 @@ Filter UI could be created to use widgets other than gtk.Combo so long as
 the widget has a get_model function that returns a gtk.ListStore with
 filtering functions stored as the last value (column) in the liststore.
 
+The filtering itself is done by the GTK-free grid_model module. Each
+filter box hands out a grid_model.Predicate from get_predicate, and
+the GridFilter combines the predicates from its FilterRows into a
+grid_model.RowFilter. The filter functions used by the built in filter
+boxes live in grid_model, so the same filtering can run without a display.
+
+A GridFilter adds a visible column to its DictionaryGrid and hides rows
+by writing False into it. When NumPy is installed the rows to show are
+worked out a column at a time with RowFilter.mask, and only the rows
+that change are written to the grid. Given an executor, the columns
+are read from the grid and the rows to show are worked out on the
+executor, then written to the grid in one go from the main loop. A
+filter that changes again before that is done replaces it.
+
 """
 
 import sys
@@ -77,18 +105,22 @@ try:
  pygtk.require("2.0")
  import gtk
  import gobject
+ import grid_model
 
 except Exception, inst:
  print "some dependencies for GridFilter are not available"
  raise inst
 
+#the number of rows the filters are timed on to decide their order
+FILTER_SAMPLE_ROWS = 50
+
 class GridFilter( gtk.VBox ):
  """GridFilter: A widget that provides a user interface for filtering a
  treeview. A GridFilter hosts one ore more GridRows, which in turn host
  an active filter.
 
  """
- def __init__(self, grid, filter_hints={} ):
+ def __init__(self, grid, filter_hints={}, search=False, executor=None ):
   """Create a GridFilter for filtering an associated treeview.
   This class is used by BugsPane.
 
@@ -98,13 +130,58 @@ class GridFilter( gtk.VBox ):
   options arguments:
   filter_hints - a dictionary of column keys to FilterCombo types to
   provide custom filtering. 
+
+  search - True to add a box for searching every column of the grid,
+  using the grid's search_index.
+
+  executor - a task_executor.TaskExecutor to work out the rows to show
+  on, rather than on the main loop. Only used if the grid has a visible
+  column.
  
   """
 
   gtk.VBox.__init__( self, False, 10 )
   self.grid = grid  
+  if hasattr(grid, "add_visible_column"):
+   grid.add_visible_column()
   self.store = grid.get_model()
   self.filter_hints = filter_hints
+  self.row_filter = None
+  self.__filtered_model = None
+  self.__columns_cache = {}
+  self.__filter_stats = grid_model.FilterStats()
+  self.executor = executor
+  self.__task = None
+  #bumped when the filter changes and when rows change, so a mask
+  #worked out for an old filter or old rows is not used
+  self.__generation = 0
+  self.__rows_generation = 0
+  self.connect("destroy",self.__destroyed)
+  self.__writing = False
+  #the visible column as last written, so a refilter compares the new
+  #mask with it rather than reading the column back from the store
+  self.__shown = None
+  if self.__visible_column() is not None:
+   self.store.connect("row-changed", self.__row_changed)
+   self.store.connect("row-inserted", self.__row_inserted)
+   self.store.connect("row-deleted", self.__row_deleted)
+   self.store.connect("rows-reordered", self.__rows_reordered)
+
+  #create the search box
+  self.search_entry = None
+  if search and self.__visible_column() is not None:
+   search_box = gtk.HBox(False,2)
+   search_box.show()
+   self.pack_start(search_box, False, False)
+   label = gtk.Label(_("_Search all columns:"))
+   label.set_use_underline(True)
+   label.show()
+   search_box.pack_start(label, False, False)
+   self.search_entry = gtk.Entry()
+   self.search_entry.show()
+   self.search_entry.connect("changed",self.__filter_changed)
+   label.set_mnemonic_widget(self.search_entry)
+   search_box.pack_start(self.search_entry, True, True)
 
   #create the and/or radio buttons
   radio_box = gtk.HBox(False,2)
@@ -153,11 +230,225 @@ class GridFilter( gtk.VBox ):
 
   """
 
-  filt = self.store.filter_new()
-  sort_mod = gtk.TreeModelSort(filt)
-  filt.set_visible_func(self.__filter_func, data )
-  filt.refilter()
-  self.grid.set_model(sort_mod)
+  self.row_filter = self.__ordered(self.get_row_filter())
+  visible = self.__visible_column()
+  if visible is None:
+   filt = self.store.filter_new()
+   sort_mod = gtk.TreeModelSort(filt)
+   filt.set_visible_func(self.__filter_func, data )
+   filt.refilter()
+   self.grid.set_model(sort_mod)
+   return
+
+  if self.executor is None:
+   self.__update_visible(visible)
+  else:
+   self.__start_mask()
+  #the filter follows the visible column, so it is only made once
+  if self.__filtered_model is None:
+   filt = self.store.filter_new()
+   filt.set_visible_column(visible)
+   self.__filtered_model = gtk.TreeModelSort(filt)
+  self.grid.set_model(self.__filtered_model)
+
+ def __ordered(self, row_filter):
+  """__ordered: internal function that times the terms of a row filter
+  on a sample of the rows, and returns a row filter that tests them in
+  the order that decides rows soonest.
+
+  """
+
+  store = self.store
+  if store is None or len(row_filter.terms) < 2 or len(store) == 0:
+   return row_filter
+  step = max(1, len(store) // FILTER_SAMPLE_ROWS)
+  rows = [tuple(store[i]) for i in range(0, len(store), step)]
+  row_filter.measure(rows[:FILTER_SAMPLE_ROWS], self.__filter_stats)
+  return row_filter.ordered(self.__filter_stats)
+
+ def __visible_column(self):
+  """__visible_column: internal function that returns the position of
+  the visible column of the grid's store, or None if it has none.
+
+  """
+
+  if self.store is None:
+   return None
+  return getattr(self.grid, "visible_column", None)
+
+ def __update_visible(self, visible):
+  """__update_visible: internal function that works out which rows match
+  the row filter and writes the rows that changed to the visible column.
+  Columns are read from the store once and kept until a row changes.
+
+  """
+
+  store = self.store
+  values_of = lambda index: [r[index] for r in store]
+  mask = self.row_filter.mask(values_of, len(store), self.__columns_cache)
+  if mask is None:
+   #NumPy is not installed, so test the rows one at a time
+   mask = [_row_matches(self.row_filter, r) for r in store]
+  self.__apply_mask(visible, mask)
+
+ def __apply_mask(self, visible, mask):
+  """__apply_mask: internal function that writes the rows that changed
+  to the visible column, for a mask of the rows matching the row filter.
+  The visible column is only read from the store the first time and
+  after rows were reordered.
+
+  """
+
+  store = self.store
+  text = self.__search_text()
+  if text != "":
+   mask = grid_model.and_masks(mask, self.grid.search_index.mask(text))
+  if self.__shown is None:
+   self.__shown = [r[visible] for r in store]
+  shown = self.__shown
+  self.__writing = True
+  try:
+   for i in grid_model.changed_rows(shown, mask):
+    shown[i] = bool(mask[i])
+    store.set_value(store.get_iter((i,)), visible, shown[i])
+  finally:
+   self.__writing = False
+
+ def __start_mask(self):
+  """__start_mask: internal function that reads the columns the row
+  filter tests from the store, and works out the mask on the executor.
+  A mask still being worked out is no longer needed, so it is killed.
+
+  """
+
+  if self.__task is not None:
+   self.__task.kill()
+  self.__generation += 1
+  store = self.store
+  cache = self.__columns_cache
+  for index in set([i for i, p in self.row_filter.terms if p is not None]):
+   if ("values", index) not in cache:
+    cache[("values", index)] = [r[index] for r in store]
+  #the worker gets its own copy of the cache, as the main loop clears
+  #the cache when rows change
+  params = {"row_filter": self.row_filter, "cache": dict(cache),
+            "row_count": len(store),
+            "generation": (self.__generation, self.__rows_generation)}
+  self.__task = self.executor.submit(_compute_mask, params,
+                                     self.__mask_computed)
+
+ #called on the worker, so hand the mask to the main loop
+ def __mask_computed(self, result):
+  if result is not None:
+   gobject.idle_add(self.__finish_mask, result)
+
+ def __finish_mask(self, result):
+  """__finish_mask: internal function called on the main loop with a
+  mask worked out by the executor. Writes it to the visible column if
+  the filter and the rows are the same as when it was started.
+
+  """
+
+  (generation, rows_generation), mask, cache = result
+  if generation != self.__generation:
+   #the filter changed again, or the GridFilter was destroyed
+   return False
+  self.__task = None
+  if rows_generation != self.__rows_generation or len(mask) != len(self.store):
+   #rows changed while the mask was worked out
+   self.__start_mask()
+   return False
+  self.__columns_cache.update(cache)
+  self.__apply_mask(self.__visible_column(), mask)
+  return False
+
+ def __destroyed(self, widget, data=None):
+  if self.__task is not None:
+   self.__task.kill()
+   self.__task = None
+  self.__generation += 1
+
+ def __row_changed(self, model, path, iter):
+  """__row_changed: internal signal handler called when a row of the
+  store is added or edited. Tests just that row against the row filter.
+
+  Do not call directly
+  """
+
+  if self.__writing:
+   return
+  self.__columns_cache.clear()
+  self.__rows_generation += 1
+  visible = self.__visible_column()
+  shown = model.get_value(iter, visible)
+  if self.row_filter is not None:
+   match = _row_matches(self.row_filter, model[iter])
+   text = self.__search_text()
+   if match and text != "":
+    match = self.grid.search_index.row_matches(model[iter], text)
+   if shown != match:
+    self.__writing = True
+    try:
+     model.set_value(iter, visible, match)
+    finally:
+     self.__writing = False
+    shown = match
+  if self.__shown is not None:
+   self.__shown[path[0]] = shown
+
+ def __row_inserted(self, model, path, iter):
+  """__row_inserted: internal signal handler called when a row is added
+  to the store. Makes room for it in the visible column as last written,
+  then tests it like an edited row.
+
+  Do not call directly
+  """
+
+  if self.__shown is not None:
+   self.__shown.insert(path[0], model.get_value(iter,
+                                                self.__visible_column()))
+  self.__row_changed(model, path, iter)
+
+ def __search_text(self):
+  if self.search_entry is None:
+   return ""
+  return self.search_entry.get_text()
+
+ def __rows_moved(self, model, *args):
+  """__rows_moved: internal signal handler called when rows of the store
+  are removed or reordered, so the columns read from it are out of date.
+
+  Do not call directly
+  """
+
+  self.__columns_cache.clear()
+  self.__rows_generation += 1
+
+ def __row_deleted(self, model, path):
+  if self.__shown is not None:
+   del self.__shown[path[0]]
+  self.__rows_moved(model, path)
+
+ def __rows_reordered(self, model, path, iter, new_order):
+  #pygtk does not pass the new order as a list, so the visible column
+  #is read again on the next refilter
+  self.__shown = None
+  self.__rows_moved(model, path, iter, new_order)
+
+ def get_row_filter(self):
+  """get_row_filter: returns a grid_model.RowFilter for the current
+  state of the FilterRows and the and/or buttons. The RowFilter is a
+  snapshot, so the filter widgets are read once per refilter rather than
+  once for every row.
+
+  """
+
+  row_filter = grid_model.RowFilter(self.and_button.get_active())
+  for r in self.rows:
+   index, predicate = r.get_term()
+   row_filter.append(index, predicate)
+  #columns stored as codes are filtered by code
+  return row_filter.for_columns(self.grid.get_columns())
   
  def __filter_func(self, model, iter, data):
   """filter_func: called for each row in the treeview model in response to
@@ -167,19 +458,47 @@ class GridFilter( gtk.VBox ):
 
   Do not call directly
   """
-  #determine whether this is an "and" or an "or" filter
-  match_all = self.and_button.get_active()
 
-  for r in self.rows:
-   rez = r.is_match(iter.copy(),model)  #check the result of each filter
-   if match_all:                        #if it's an "and" filter
-    if not rez:                         #and if the filter does not match
-     return False                       #then the row should not be visible
-   else:                                #but if it's an "or" filter
-    if rez:                             #and it is a match
-     return True                        #return that the row should be visible
-  return match_all  #all filters match an "and" or none matched an "or" 
+  return self.row_filter.matches(model[iter])
   
+def _compute_mask(params):
+ """_compute_mask: works out the mask of a row filter from columns read
+ from the store beforehand. Run on a worker of a TaskExecutor by a
+ GridFilter. Returns None if the task was killed.
+
+ """
+
+ row_filter = params["row_filter"]
+ cache = params["cache"]
+ row_count = params["row_count"]
+ values_of = lambda index: cache[("values", index)]
+ mask = row_filter.mask(values_of, row_count, cache)
+ if mask is None:
+  #NumPy is not installed, so test the rows one at a time, from rows
+  #holding just the columns that are tested
+  indices = [i for i, p in row_filter.terms if p is not None]
+  columns = [values_of(i) for i in indices]
+  mask = []
+  for position in xrange(row_count):
+   if position % 1000 == 0 and params["kill"]:
+    return None
+   row = dict([(i, c[position]) for i, c in zip(indices, columns)])
+   mask.append(_row_matches(row_filter, row))
+ if params["kill"]:
+  return None
+ return (params["generation"], mask, cache)
+
+def _row_matches(row_filter, row):
+ """_row_matches: returns True if row_filter matches row, or False if a
+ filter function can not handle a value in the row.
+
+ """
+
+ try:
+  return bool(row_filter.matches(row))
+ except Exception:
+  return False
+
 class FilterRow( gtk.HBox):
  """FilterRow: A widget that displays a single filter in a GridFilter.
  Typically, this class will not be used directly, but only via a GridFilter.   
@@ -324,12 +643,26 @@ class FilterRow( gtk.HBox):
   model: the treeview model containing the rows being tested
 
   """
+  treeview_col, predicate = self.get_term()
+  if predicate is None:
+   return True
+  orig_val = model.get_value(store_iter.copy(), treeview_col)
+  for column in self.grid.get_columns():
+   if column.index == treeview_col:
+    orig_val = column.cell_display_val(orig_val)
+  return predicate(orig_val)
+
+ def get_term(self):
+  """get_term: returns a tuple of the column index the FilterRow filters
+  and a grid_model.Predicate for the filter, or None if the filter
+  matches every row.
+
+  """
+
   col_iter = self.column_combo.get_model().get_iter(self.column_combo.get_active())
   filter_widget = self.column_combo.get_model().get_value(col_iter,1)
   treeview_col = self.column_combo.get_model().get_value(col_iter,2)
-
-  orig_val = model.get_value(store_iter.copy(), treeview_col)
-  return filter_widget.filter(orig_val)
+  return (treeview_col, filter_widget.get_predicate())
 
 class BlankFilterBox( gtk.HBox):
  """BlankFilterBox provides a base class for FilterCombos, as
@@ -361,16 +694,26 @@ class BlankFilterBox( gtk.HBox):
   self.pack_start(self.combo, False, False)
   self.pack_start(self.entry)
 
- def filter(self, orig_val):
+ def get_predicate(self):
+  """get_predicate: returns a grid_model.Predicate for the filter
+  function chosen in the combo and the text in the entry, or None
+  if no filter function is chosen.
+
+  """
+
   if self.combo.get_active() == -1:
-   return True
+   return None
   filt_iter = self.combo.get_model().get_iter(self.combo.get_active())
   filt_func = self.combo.get_model().get_value(filt_iter,1)
   target_val = self.entry.get_text()
   if target_val is None or target_val == "":
-   return False
+   return grid_model.match_nothing
   else:     
-   return filt_func(orig_val, self.entry.get_text())
+   return grid_model.Predicate(filt_func, target_val)
+
+ def filter(self, orig_val):
+  predicate = self.get_predicate()
+  return predicate is None or predicate(orig_val)
 
  def __changed(self, widget, data=None):
     self.emit("changed",data)
@@ -393,7 +736,8 @@ class StringFilterBox( BlankFilterBox ):
 
     Lets the user specify if the row should be displayed based on
     containing, not containing, starting with, or ending with a user specified
-    string.
+    string, containing or not containing it ignoring case, containing it as
+    a whole word, or matching it as a regular expression.
 
 
  """
@@ -403,30 +747,28 @@ class StringFilterBox( BlankFilterBox ):
   """
 
   BlankFilterBox.__init__(self)
-  self.append(_("contains"),self.contains)
-  self.append(_("does not contain"),self.not_contains)
-  self.append(_("starts with"),self.starts_with)
-  self.append(_("ends with"),self.ends_with)
+  self.append(_("contains"),grid_model.string_contains)
+  self.append(_("does not contain"),grid_model.string_not_contains)
+  self.append(_("starts with"),grid_model.string_starts_with)
+  self.append(_("ends with"),grid_model.string_ends_with)
+  self.append(_("contains (any case)"),
+              grid_model.string_contains_ignore_case)
+  self.append(_("does not contain (any case)"),
+              grid_model.string_not_contains_ignore_case)
+  self.append(_("contains the word"),grid_model.string_contains_word)
+  self.append(_("matches the pattern"),grid_model.string_matches_pattern)
 
  def contains(self, orig_val, target_val):
-  if len(self.entry.get_text()) == 0:
-   return True
-  return orig_val.find(target_val) > -1
+  return grid_model.string_contains(orig_val, target_val)
 
  def not_contains(self, orig_val, target_val):
-  if len(target_val) == 0:
-   return True
-  return orig_val.find(target_val) == -1
+  return grid_model.string_not_contains(orig_val, target_val)
 
  def starts_with(self, orig_val, target_val):
-  if len(target_val) == 0:
-   return True
-  return orig_val.startswith(target_val)
+  return grid_model.string_starts_with(orig_val, target_val)
 
  def ends_with(self, orig_val, target_val):
-  if len(target_val) == 0:
-   return True
-  return orig_val.endswith(target_val)
+  return grid_model.string_ends_with(orig_val, target_val)
 
 
 class TagsFilterBox( BlankFilterBox ):
@@ -440,10 +782,10 @@ class TagsFilterBox( BlankFilterBox ):
 
  def __init__(self):
   BlankFilterBox.__init__(self)
-  self.append(_("has any of these tags"), self._filter_any)
-  self.append(_("has all of these tags"), self._filter_all)
-  self.append(_("does not have one of these tags"), self._filter_not)
-  self.append(_("does not have any of these tags"), self._filter_not_all)
+  self.append(_("has any of these tags"), grid_model.tags_any)
+  self.append(_("has all of these tags"), grid_model.tags_all)
+  self.append(_("does not have one of these tags"), grid_model.tags_not)
+  self.append(_("does not have any of these tags"), grid_model.tags_not_all)
 
  def _filter_any(self, orig_val, target_val):
   """
@@ -455,16 +797,7 @@ class TagsFilterBox( BlankFilterBox ):
 
   """
 
-  if len(target_val) == 0:
-   return True
-
-  tags_on_bug = orig_val.split()
-  tags_in_filter = target_val.split()
-
-  for tag in tags_in_filter:
-   if tag in tags_on_bug:
-    return True
-  return False
+  return grid_model.tags_any(orig_val, target_val)
 
  def _filter_all(self, orig_val, target_val):
   """
@@ -475,16 +808,8 @@ class TagsFilterBox( BlankFilterBox ):
   Do not call directly
 
   """
-  if len(target_val) == 0:
-   return True
-
-  tags_on_bug = orig_val.split()
-  tags_in_filter = self.entry.get_text().split()
 
-  for tag in tags_in_filter:
-   if tag not in tags_on_bug:
-    return False
-  return True
+  return grid_model.tags_all(orig_val, target_val)
 
  def _filter_not(self, orig_val, target_val):
   """
@@ -495,16 +820,8 @@ class TagsFilterBox( BlankFilterBox ):
   Do not call directly
 
   """
-  if len(target_val) == 0:
-   return True
 
-  tags_on_bug = orig_val.split()
-  tags_in_filter = target_val.split()
-              
-  for tag in tags_in_filter:
-   if tag not in tags_on_bug:
-    return True
-  return False
+  return grid_model.tags_not(orig_val, target_val)
 
  def _filter_not_all(self, orig_val, target_val):
   """
@@ -515,16 +832,8 @@ class TagsFilterBox( BlankFilterBox ):
   Do not call directly
 
   """
-  if len(self.entry.get_text()) == 0:
-   return True
-
-  tags_on_bug = orig_val.split()
-  tags_in_filter = target_val.split()
 
-  for tag in tags_in_filter:
-   if tag in tags_on_bug:
-    return False
-   return True
+  return grid_model.tags_not_all(orig_val, target_val)
   
 class IntegerFilterBox( gtk.HBox ):
  """
@@ -554,18 +863,24 @@ class IntegerFilterBox( gtk.HBox ):
   self.pack_start(self.combo, False, False)
   self.pack_start(self.spinner)
 
-  self.__combo_store.append(["=",self._equals])
-  self.__combo_store.append(["<",self._less_than])
-  self.__combo_store.append([">",self._greater_than])
-  self.__combo_store.append(["<=",self._less_than_equals])
-  self.__combo_store.append([">=",self._greater_than_equals])
+  self.__combo_store.append(["=",grid_model.integer_equals])
+  self.__combo_store.append(["<",grid_model.integer_less_than])
+  self.__combo_store.append([">",grid_model.integer_greater_than])
+  self.__combo_store.append(["<=",grid_model.integer_less_than_equals])
+  self.__combo_store.append([">=",grid_model.integer_greater_than_equals])
 
  def __changed(self, widget, data=None):
     self.emit("changed",data)
 
- def filter(self, orig_val):
+ def get_predicate(self):
+  """get_predicate: returns a grid_model.Predicate for the filter
+  function chosen in the combo and the value in the spinner, or None
+  if no filter function is chosen.
+
+  """
+
   if self.combo.get_active() == -1:
-       return True
+       return None
 
   filt_iter = self.combo.get_model().get_iter(self.combo.get_active())
   filt_func = self.combo.get_model().get_value(filt_iter,1)
@@ -576,24 +891,28 @@ class IntegerFilterBox( gtk.HBox ):
 
   except Exception, inst:
    print inst
-   return False
+   return grid_model.match_nothing
+
+  return grid_model.Predicate(filt_func, target_val)
 
-  return filt_func(orig_val, target_val)
+ def filter(self, orig_val):
+  predicate = self.get_predicate()
+  return predicate is None or predicate(orig_val)
 
  def _equals(self, orig_val, target_val):
-  return int(orig_val) == target_val
+  return grid_model.integer_equals(orig_val, target_val)
 
  def _less_than(self, orig_val, target_val):
-  return int(orig_val) < target_val
+  return grid_model.integer_less_than(orig_val, target_val)
 
  def _greater_than(self, orig_val, target_val):
-  return int(orig_val) > target_val
+  return grid_model.integer_greater_than(orig_val, target_val)
 
  def _less_than_equals(self, orig_val, target_val):
-  return int(orig_val) <= target_val
+  return grid_model.integer_less_than_equals(orig_val, target_val)
 
  def _greater_than_equals(self, orig_val, target_val):
-  return int(orig_val) >= target_val
+  return grid_model.integer_greater_than_equals(orig_val, target_val)
 
 class DateFilterBox( gtk.HBox ):
  """DateFilterCombo: A default date filter class for use in a FilterRow.
@@ -620,11 +939,11 @@ class DateFilterBox( gtk.HBox ):
   self.combo.show()
   self.combo.connect("changed",self.__changed)
 
-  self.__combo_store.append([ _("before"),self.before ])
-  self.__combo_store.append([ _("on or before"),self.on_before ])
-  self.__combo_store.append([ _("on"), self.on_date ])
-  self.__combo_store.append([ _("on or after"),self.on_after ])
-  self.__combo_store.append([ _("after"),self.after ])
+  self.__combo_store.append([ _("before"),grid_model.date_before ])
+  self.__combo_store.append([ _("on or before"),grid_model.date_on_before ])
+  self.__combo_store.append([ _("on"), grid_model.date_on ])
+  self.__combo_store.append([ _("on or after"),grid_model.date_on_after ])
+  self.__combo_store.append([ _("after"),grid_model.date_after ])
 
   self.calendar = gtk.Calendar()
   self.calendar.show()
@@ -636,39 +955,41 @@ class DateFilterBox( gtk.HBox ):
   self.pack_start(self.calendar, False, False)
 
  def before(self, orig_val):
-   stored_date, target_date = self.__get_dates(orig_val, self.calendar.get_date())
-   return stored_date < target_date
+   return grid_model.date_before(orig_val, self.__get_target_date())
 
  def on_before(self, orig_val):
-   stored_date, target_date = self.__get_dates(orig_val, self.calendar.get_date())
-   return stored_date <= target_date
+   return grid_model.date_on_before(orig_val, self.__get_target_date())
 
  def on_date(self, orig_val):
-   stored_date, target_date = self.__get_dates(orig_val, self.calendar.get_date())
-   return stored_date == target_date
+   return grid_model.date_on(orig_val, self.__get_target_date())
 
  def on_after(self, orig_val):
-   stored_date, target_date = self.__get_dates(orig_val, self.calendar.get_date())
-   return stored_date >= target_date
+   return grid_model.date_on_after(orig_val, self.__get_target_date())
 
  def after(self, orig_val):
-   stored_date, target_date = self.__get_dates(orig_val, self.calendar.get_date())
-   return stored_date > target_date
+   return grid_model.date_after(orig_val, self.__get_target_date())
 
- def __get_dates(self, orig_val, target_date):
+ def __get_target_date(self):
    target_date = self.calendar.get_date()
-   target_date = datetime.date(int(target_date[0]),int(target_date[1] + 1),int(target_date[2]))
-   p = orig_val.split("-")
-   stored_date = datetime.date(int(p[0]),int(p[1]),int(p[2]))   
-   return (stored_date, target_date)
+   return datetime.date(int(target_date[0]),int(target_date[1] + 1),int(target_date[2]))
+
+ def get_predicate(self):
+  """get_predicate: returns a grid_model.Predicate for the filter
+  function chosen in the combo and the date in the calendar, or None
+  if no filter function is chosen.
+
+  """
 
- def filter(self, orig_val):
   if self.combo.get_active() == -1:
-   return True
+   return None
 
   filt_iter = self.combo.get_model().get_iter(self.combo.get_active())
   filt_func = self.combo.get_model().get_value(filt_iter,1)
-  return filt_func(orig_val)
+  return grid_model.Predicate(filt_func, self.__get_target_date())
+
+ def filter(self, orig_val):
+  predicate = self.get_predicate()
+  return predicate is None or predicate(orig_val)
 
  def __changed(self, widget, data=None):
   self.emit("changed",data)
@@ -699,33 +1020,228 @@ class CheckFilterBox( gtk.HBox ):
   self.combo.show()
   self.combo.connect("changed",self.__changed)
 
-  self.__combo_store.append([ _("checked"),self.filter_checked ])
-  self.__combo_store.append([ _("not Checked"),self.filter_not_checked ])
-  self.__combo_store.append([ _("unset"), self.filter_unset ])
+  self.__combo_store.append([ _("checked"),grid_model.check_checked ])
+  self.__combo_store.append([ _("not Checked"),grid_model.check_not_checked ])
+  self.__combo_store.append([ _("unset"), grid_model.check_unset ])
 
   self.pack_start(self.combo, False, False)
 
- def filter(self, orig_val):
+ def get_predicate(self):
+  """get_predicate: returns a grid_model.Predicate for the filter
+  function chosen in the combo, or None if no filter function is chosen.
+
+  """
+
   if self.combo.get_active() == -1:
-   return True
+   return None
 
   filt_iter = self.combo.get_model().get_iter(self.combo.get_active())
   filt_func = self.combo.get_model().get_value(filt_iter,1)
-  return filt_func(orig_val)
+  return grid_model.Predicate(filt_func)
+
+ def filter(self, orig_val):
+  predicate = self.get_predicate()
+  return predicate is None or predicate(orig_val)
 
  def filter_checked(self, orig_val):
-  return orig_val == 1
+  return grid_model.check_checked(orig_val)
 
  def filter_not_checked(self, orig_val):
-  return orig_val == 0
+  return grid_model.check_not_checked(orig_val)
 
  def filter_unset(self, orig_val):
-  return orig_val == -1
+  return grid_model.check_unset(orig_val)
 
  def __changed(self, widget, data=None):
   self.emit("changed",data)
 
 
+class DistinctValuesFilterBox( gtk.HBox ):
+ """DistinctValuesFilterBox: A filter class for use in a FilterRow that
+    lists the values found in a column, each with the number of rows
+    that have it, and shows the rows with the values the user checks.
+
+    The counts come from DictionaryGrid.value_counts, which keeps them
+    as the rows change, so opening the list does not look at the rows.
+
+ """
+ __gsignals__ = {'changed' : (gobject.SIGNAL_RUN_LAST, gobject.TYPE_NONE,
+		(gobject.TYPE_PYOBJECT,)),
+		}
+
+ def __init__(self, grid, key):
+  """create a DistinctValuesFilterBox
+
+  arguments:
+  grid - the DictionaryGrid being filtered
+
+  key - the key of the column to list the values of
+
+  """
+
+  gtk.HBox.__init__(self, False, 10)
+  self.grid = grid
+  self.key = key
+  self.__chosen = None
+  self.button = gtk.Button(_("(All)"))
+  self.button.show()
+  self.button.connect("clicked",self.__show_values)
+  self.pack_start(self.button, False, False)
+
+  #the list of values, with a check box for each
+  self.__values_store = gtk.ListStore(gobject.TYPE_BOOLEAN,gobject.TYPE_STRING,
+                                      gobject.TYPE_PYOBJECT)
+  view = gtk.TreeView(self.__values_store)
+  view.set_headers_visible(False)
+  toggle = gtk.CellRendererToggle()
+  toggle.connect("toggled",self.__toggled)
+  view.append_column(gtk.TreeViewColumn("", toggle, active=0))
+  view.append_column(gtk.TreeViewColumn("", gtk.CellRendererText(), text=1))
+  view.show()
+  scroll = gtk.ScrolledWindow()
+  scroll.set_policy(gtk.POLICY_NEVER, gtk.POLICY_AUTOMATIC)
+  scroll.set_size_request(-1, 200)
+  scroll.add(view)
+  scroll.show()
+
+  button_box = gtk.HBox(False,2)
+  button_box.show()
+  all_button = gtk.Button(_("Select _All"))
+  all_button.connect("clicked",self.__set_all,True)
+  all_button.show()
+  button_box.pack_start(all_button, False, False)
+  none_button = gtk.Button(_("_Clear"))
+  none_button.connect("clicked",self.__set_all,False)
+  none_button.show()
+  button_box.pack_start(none_button, False, False)
+
+  vbox = gtk.VBox(False, 5)
+  vbox.pack_start(scroll)
+  vbox.pack_start(button_box, False, False)
+  vbox.show()
+  self.popup = gtk.Window(gtk.WINDOW_TOPLEVEL)
+  self.popup.set_decorated(False)
+  self.popup.set_type_hint(gtk.gdk.WINDOW_TYPE_HINT_DROPDOWN_MENU)
+  self.popup.add(vbox)
+  self.popup.connect("focus-out-event",lambda w, e: w.hide())
+  self.popup.connect("delete-event",lambda w, e: w.hide_on_delete())
+  self.connect("destroy",lambda w: self.popup.destroy())
+
+ @property
+ def chosen(self):
+  """chosen - a set of the display values of the rows to show, or None
+  to show every row. Setting this property refilters the grid.
+
+  """
+
+  return self.__chosen
+
+ @chosen.setter
+ def chosen(self, chosen):
+  if chosen is not None:
+   chosen = set(chosen)
+  self.__chosen = chosen
+  self.button.set_label(self.__summary())
+  self.emit("changed",None)
+
+ def distinct_values(self):
+  """distinct_values: returns a list of tuples of each display value in
+  the column and the number of rows with it, in the order of the column.
+
+  """
+
+  counts = self.grid.value_counts(self.key)
+  values = counts.keys()
+  column = self.grid.columns.get(self.key)
+  try:
+   values.sort(key=column.sort_key)
+  except Exception:
+   values.sort()
+  return [(v, counts[v]) for v in values]
+
+ def value_label(self, val, count):
+  """value_label: returns the text to show in the list for a value.
+  Override to change how values are shown.
+
+  arguments:
+  val - the display value
+
+  count - the number of rows with the value
+
+  """
+
+  if val is None or val == "":
+   text = _("(empty)")
+  elif isinstance(val, basestring):
+   text = val
+  else:
+   #check columns display numbers
+   text = str(self.grid.columns[self.key].real_val(val))
+  return "%s (%d)" % (text, count)
+
+ def get_predicate(self):
+  """get_predicate: returns a grid_model.Predicate that matches the
+  checked values, or None if every value is checked.
+
+  """
+
+  if self.__chosen is None:
+   return None
+  if len(self.__chosen) == 0:
+   return grid_model.match_nothing
+  return grid_model.Predicate(grid_model.value_in, frozenset(self.__chosen))
+
+ def filter(self, orig_val):
+  predicate = self.get_predicate()
+  return predicate is None or predicate(orig_val)
+
+ def __summary(self):
+  if self.__chosen is None:
+   return _("(All)")
+  if len(self.__chosen) == 0:
+   return _("(None)")
+  if len(self.__chosen) == 1:
+   val = list(self.__chosen)[0]
+   return self.value_label(val, self.grid.value_counts(self.key).get(val, 0))
+  return _("%d values") % len(self.__chosen)
+
+ def __show_values(self, button, data=None):
+  """__show_values: internal signal handler that fills the list from the
+  counts kept by the grid and shows it under the button.
+
+  Do not call directly
+  """
+
+  self.__values_store.clear()
+  for val, count in self.distinct_values():
+   checked = self.__chosen is None or val in self.__chosen
+   self.__values_store.append([checked, self.value_label(val, count), val])
+  toplevel = self.get_toplevel()
+  if isinstance(toplevel, gtk.Window):
+   self.popup.set_transient_for(toplevel)
+  x, y = button.window.get_origin()
+  allocation = button.get_allocation()
+  self.popup.move(x + allocation.x, y + allocation.y + allocation.height)
+  self.popup.show()
+  self.popup.present()
+
+ def __toggled(self, cell, path, data=None):
+  row = self.__values_store[path]
+  row[0] = not row[0]
+  self.__read_checks()
+
+ def __set_all(self, button, checked):
+  for row in self.__values_store:
+   row[0] = checked
+  self.__read_checks()
+
+ def __read_checks(self):
+  checked = set([r[2] for r in self.__values_store if r[0]])
+  if len(checked) == len(self.__values_store):
+   self.chosen = None
+  else:
+   self.chosen = checked
+
 class NumericFilterBox( BlankFilterBox ):
  """NumericFilterCombo: A default number filter class for use in a FilterRow.
 
@@ -740,41 +1256,26 @@ class NumericFilterBox( BlankFilterBox ):
 
   """
   BlankFilterBox.__init__( self )
-  self.append("=",self._equals )
-  self.append("<",self._less_than )
-  self.append(">",self._greater_than )
-  self.append("<=",self._less_than_equals)
-  self.append(">=",self._greater_than_equals )
+  self.append("=",grid_model.numeric_equals )
+  self.append("<",grid_model.numeric_less_than )
+  self.append(">",grid_model.numeric_greater_than )
+  self.append("<=",grid_model.numeric_less_than_equals)
+  self.append(">=",grid_model.numeric_greater_than_equals )
 
  def _equals(self, orig_val):
-  try:
-   return float(orig_val) == float(self.entry.get_text())
-  except:
-   return True
+  return grid_model.numeric_equals(orig_val, self.entry.get_text())
 
  def _less_than(self, orig_val):
-  try:
-   return float(orig_val) < float(self.entry.get_text())
-  except:
-   return True
+  return grid_model.numeric_less_than(orig_val, self.entry.get_text())
 
  def _greater_than(self, orig_val):
-  try:
-   return float(orig_val) > float(self.entry.get_text())
-  except:
-   return True
+  return grid_model.numeric_greater_than(orig_val, self.entry.get_text())
 
  def _less_than_equals(self, orig_val):
-  try:
-   return float(orig_val) <= float(self.entry.get_text())
-  except:
-   return True
+  return grid_model.numeric_less_than_equals(orig_val, self.entry.get_text())
 
  def _greater_than_equals(self, orig_val):
-  try:
-   return float(orig_val) >= float(self.entry.get_text())
-  except:
-   return True
+  return grid_model.numeric_greater_than_equals(orig_val, self.entry.get_text())
 
 def __delete_test(button, grid):
     grid.remove_selected_rows(delete=True)
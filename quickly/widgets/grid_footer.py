@@ -0,0 +1,141 @@
+### BEGIN LICENSE
+# Copyright (C) 2010 Rick Spencer rick.spencer@canonical.com
+#This program is free software: you can redistribute it and/or modify it
+#under the terms of the GNU General Public License version 3, as published
+#by the Free Software Foundation.
+#
+#This program is distributed in the hope that it will be useful, but
+#WITHOUT ANY WARRANTY; without even the implied warranties of
+#MERCHANTABILITY, SATISFACTORY QUALITY, or FITNESS FOR A PARTICULAR
+#PURPOSE.  See the GNU General Public License for more details.
+#
+#You should have received a copy of the GNU General Public License along
+#with this program.  If not, see <http://www.gnu.org/licenses/>.
+### END LICENSE
+
+"""A summary footer for a DictionaryGrid
+GridFooter is a gtk.HBox that shows totals for the currency and integer
+columns of a DictionaryGrid, such as the sum of a price column, for the
+rows not hidden by a GridFilter. The totals come from the grid's
+store_aggregates, which keeps them up to date as rows change, and the
+labels are updated once the main loop is idle, so a burst of changes
+only updates them once.
+
+Using
+grid = DictionaryGrid(dictionaries=dicts)
+filt = GridFilter(grid)
+footer = GridFooter(grid)
+footer.show()
+
+Configuring
+#choose the totals to show for each column, from "count", "sum",
+#"avg", "min" and "max"
+footer = GridFooter(grid, {"price": ["sum", "avg"], "id": ["count"]})
+
+#read a total without displaying it
+print grid.aggregates("price")["max"]
+
+Extending
+Override GridFooter.format_value to change how totals are displayed.
+
+"""
+
+import gettext
+from gettext import gettext as _
+gettext.textdomain('quickly-widgets')
+
+import gtk
+import gobject
+
+#the labels for the totals
+FUNCTION_TITLES = {"count": _("Count"), "sum": _("Sum"), "avg": _("Average"),
+                   "min": _("Min"), "max": _("Max")}
+
+class GridFooter(gtk.HBox):
+    """GridFooter: displays totals for the columns of a DictionaryGrid.
+
+    """
+
+    def __init__(self, grid, functions=None):
+        """Create a GridFooter
+
+        arguments:
+        grid - the DictionaryGrid to total
+
+        keyword arguments:
+        functions - a dictionary of column keys to a list of the totals
+        to show for the column. Defaults to the sum of every currency
+        and integer column.
+
+        """
+
+        gtk.HBox.__init__(self, False, 12)
+        self.grid = grid
+        self.__labels = {}
+        self.__update_source = None
+        self.__totals = grid.store_aggregates
+        if functions is None:
+            functions = dict([(c.key, ["sum"]) for c in self.__totals.columns])
+        self.functions = functions
+        for key in grid.keys or []:
+            if key not in functions:
+                continue
+            for function in functions[key]:
+                label = gtk.Label()
+                label.show()
+                self.pack_start(label, False, False)
+                self.__labels[(key, function)] = label
+        self.__totals.add_listener(self.__totals_changed)
+        self.connect("destroy", self.__destroyed)
+        self.update()
+
+    def format_value(self, key, function, val):
+        """format_value: returns the text to display for a total.
+
+        arguments:
+        key - the key of the column
+
+        function - the name of the total, such as "sum"
+
+        val - the total, None if there are no numbers in the column
+
+        """
+
+        if val is None:
+            return ""
+        if function == "count":
+            return str(val)
+        if function == "avg":
+            return "%.2f" % val
+        return self.grid.columns[key].display_val(val)
+
+    def update(self):
+        """update: sets the labels to the current totals. Called when the
+        main loop is idle after the totals change.
+
+        """
+
+        self.__update_source = None
+        for (key, function), label in self.__labels.items():
+            val = self.grid.aggregates(key)[function]
+            title = self.grid.columns[key].get_title()
+            label.set_text("%s %s: %s" % (title, FUNCTION_TITLES[function],
+                                          self.format_value(key, function, val)))
+        return False
+
+    def __totals_changed(self):
+        """__totals_changed: internal function called by the grid's
+        store_aggregates after every change, that waits for the main loop
+        to be idle before updating.
+
+        Do not call directly
+        """
+
+        if self.__update_source is None:
+            self.__update_source = gobject.idle_add(self.update)
+
+    def __destroyed(self, widget, data=None):
+        self.__totals.remove_listener(self.__totals_changed)
+        if self.__update_source is not None:
+            gobject.source_remove(self.__update_source)
+            self.__update_source = None
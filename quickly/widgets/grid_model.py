@@ -0,0 +1,1515 @@
+# -*- coding: utf-8 -*-
+### BEGIN LICENSE
+# Copyright (C) 2010 Rick Spencer rick.spencer@canonical.com
+#This program is free software: you can redistribute it and/or modify it
+#under the terms of the GNU General Public License version 3, as published
+#by the Free Software Foundation.
+#
+#This program is distributed in the hope that it will be useful, but
+#WITHOUT ANY WARRANTY; without even the implied warranties of
+#MERCHANTABILITY, SATISFACTORY QUALITY, or FITNESS FOR A PARTICULAR
+#PURPOSE.  See the GNU General Public License for more details.
+#
+#You should have received a copy of the GNU General Public License along
+#with this program.  If not, see <http://www.gnu.org/licenses/>.
+### END LICENSE
+
+"""A GTK-free model for DictionaryGrid and GridFilter
+Handles converting dictionaries into rows, inferring keys, sorting and
+filtering without importing gtk, so the same logic that drives a
+DictionaryGrid can run in batch jobs, benchmarks and tests that have no
+display.
+
+The widgets in grid_column and grid_filter are built on top of this
+module. Each GridColumn inherits its value handling from one of the
+column models here, and each filter box hands out Predicates built from
+the filter functions here.
+
+Using
+#create a GridModel from a list of dictionaries
+dicts = [{"test?":True,"price":100,"foo count":100,"Key4":"1004"},
+    {"test?":False,"price":50,"foo count":10,"Key4":"1005"}]
+model = GridModel(dicts)
+
+#sort the rows by a key
+model.sort("price")
+
+#filter the rows, the result is a list of dictionaries
+row_filter = RowFilter(match_all=True)
+row_filter.append(model.columns_map["price"].index,
+                  Predicate(numeric_greater_than, "75"))
+expensive = model.filter(row_filter)
+
+#or get a NumPy boolean array with an item for each row, if NumPy is
+#installed. Numeric, integer, date and check filters are evaluated on
+#whole columns at once, and the filters that ignore case lower each
+#column once
+visible = model.mask(row_filter)
+
+#test first the filters that are cheap and decide the most rows, from
+#how they did on some of the rows
+stats = FilterStats()
+row_filter.measure(model.rows[:50], stats)
+row_filter = row_filter.ordered(stats)
+
+Configuring
+#Define columns to use
+model = GridModel(dicts, keys=["price","test?"])
+
+#Define column models to use
+hints = {"price": StringColumnModel}
+model = GridModel(dicts, type_hints=hints)
+
+#Store low cardinality columns as small integer codes, repeated values
+#in the dictionaries for those columns are shared
+model = GridModel(dicts, compact_keys=["status","category"])
+print model.bytes_per_row()
+
+Extending
+A column model must provide display_val, real_val, default_display_val
+and sort_key. Derive from StringColumnModel to get sensible defaults.
+A filter function takes a display value and a value to filter against
+and returns True if the row should be displayed.
+
+"""
+
+import datetime
+import operator
+import re
+import sys
+import time
+import gettext
+from gettext import gettext as _
+gettext.textdomain('quickly-widgets')
+
+import conventions
+
+class StringColumnModel(object):
+    """StringColumnModel - converts values for a column that displays
+    strings and tracks data as strings. Base class for the other
+    column models.
+
+    """
+
+    #columns with string display values can store them as codes from a
+    #ValueEncoder, set encoder to do so
+    compactable = True
+    encoder = None
+
+    #the typecode of an array.array to keep the real values of the column
+    #in a column_store.ColumnStore, None to keep them in a list
+    array_typecode = None
+
+    #columns of numbers can be totalled by an aggregates.StoreAggregates
+    aggregatable = False
+
+    #columns with string display values are found by a
+    #search_index.StoreSearch
+    searchable = True
+
+    #the column_store.ColumnStore holding the dictionaries for the rows,
+    #if the rows store row ids in place of dictionaries
+    row_store = None
+
+    def __init__(self, key, index, dictionary_index):
+        """Creates a StringColumnModel
+
+        Arguments:
+        key - the key from the dict for the row.
+
+        index - the position of the column in the row.
+
+        dictionary_index - the position in the row where the dictionary
+        for the row is stored. Typically len(keys).
+
+        """
+
+        self.key = key
+        self.index = index
+        self.dictionary_index = dictionary_index
+
+    def cell_val(self, display_val):
+        """cell_val - returns the value stored in the row for a display
+        value, the display value itself or its code if the column has
+        an encoder.
+
+        arguments:
+
+        display_val - the display value to store
+
+        """
+
+        if self.encoder is None:
+            return display_val
+        return self.encoder.encode(display_val)
+
+    def cell_display_val(self, cell_val):
+        """cell_display_val - returns the display value for a value
+        stored in the row, the reverse of cell_val.
+
+        arguments:
+
+        cell_val - the value stored in the row
+
+        """
+
+        if self.encoder is None:
+            return cell_val
+        return self.encoder.decode(cell_val)
+
+    def row_dictionary(self, stored):
+        """row_dictionary - returns the dictionary for a row from the
+        value stored at dictionary_index, which is the dictionary itself
+        or a row id in row_store.
+
+        arguments:
+
+        stored - the value at dictionary_index in the row
+
+        """
+
+        if self.row_store is None:
+            return stored
+        return self.row_store.dictionary(stored)
+
+    def display_val(self, val):
+        """display_val - takes a real value and returns the cooresponding
+        display value
+
+        arguments:
+
+        val - the real value to convert
+
+        """
+
+        if val == None:
+            return self.default_display_val()
+        else:
+            return str(val)
+
+    def real_val(self, val):
+        """real_val - takes a display value and returns the cooresponding
+        real value.
+
+        arguments:
+
+        val - the display value to convert
+
+        """
+
+        #in a StringColumn, the backing data and the display data are the same
+        return self.display_val(val)
+
+    def default_display_val(self):
+        """default_dislay_val - return the value to display in the case
+        where there is no real value for the column for the row.
+
+        """
+
+        #display an empty string if there is no string for the cell
+        return ""
+
+    def sort_key(self, val):
+        """sort_key - takes a display value and returns a value that
+        sorts the column from least value to greatest value.
+
+        arguments:
+
+        val - the display value to sort by
+
+        """
+
+        return val
+
+    def _sort_ascending(self, x, y):
+        """_sort_ascending - sort function that sorts two rows from
+        least value to greatest value by the display value in the column.
+
+        returns 1 if x > y, 0 if x = y, -1 if x < y
+
+        """
+
+        return cmp(self.sort_key(x[self.index]), self.sort_key(y[self.index]))
+
+    def _sort_descending(self, x, y):
+        """_sort_descending - sort function that sorts two rows from
+        greatest value to least value by the display value in the column.
+
+        returns 1 if x < y, 0 if x = y, -1 if x > y
+
+        """
+
+        return cmp(self.sort_key(y[self.index]), self.sort_key(x[self.index]))
+
+class CurrencyColumnModel(StringColumnModel):
+    """CurrencyColumnModel - converts values for a column that displays
+    currency. Stores real values as float.
+
+    """
+
+    array_typecode = "d"
+    aggregatable = True
+
+    def display_val(self, val):
+        try:
+            return str(float(val))
+        except:
+            return ""
+
+    def real_val(self, val):
+        try:
+            return float(val)
+        except:
+            return 0.0
+
+    def default_display_val(self):
+        return ""
+
+    def sort_key(self, val):
+        #empty cells sort before any number
+        if val == "":
+            return (0, 0.0)
+        return (1, float(val))
+
+class TagsColumnModel(StringColumnModel):
+    """TagsColumnModel - converts values for a column of space separated
+    tags. Tags are stored and displayed as strings.
+
+    """
+
+    pass
+
+class IntegerColumnModel(StringColumnModel):
+    """IntegerColumnModel - converts values for a column that displays
+    integers. Stores real values as int.
+
+    """
+
+    array_typecode = "l"
+    aggregatable = True
+
+    def display_val(self, val):
+        try:
+            return str(int(val))
+        except:
+            return ""
+
+    def real_val(self, val):
+        try:
+            return int(val)
+        except:
+            return 0
+
+    def default_display_val(self):
+        return ""
+
+    def sort_key(self, val):
+        #empty cells sort before any number
+        if val == "":
+            return (0, 0)
+        return (1, int(val))
+
+class CheckColumnModel(StringColumnModel):
+    """CheckColumnModel - converts values for a column that displays
+    checkboxes. Stores real values as bool and display values as 1 for
+    checked, 0 for not checked and -1 for unset.
+
+    """
+
+    #the display values are small integers already
+    compactable = False
+    searchable = False
+    array_typecode = "b"
+
+    def display_val(self, val):
+        if type(val) is bool:
+            if val:
+                return 1
+            else:
+                return 0
+        elif type(val) is str:
+            if val.lower() == _("yes"):
+                return 1
+            else:
+                return 0
+        elif type(val) is None:
+            return self.default_display_val()
+        else:
+            return bool(val)
+
+    def default_display_val(self):
+        return -1
+
+    def real_val(self, val):
+        if type(val) is type(True):
+            return val
+        elif type(val) is type("a"):
+            if val.lower() == "yes":
+                return True
+            else:
+                return False
+        else:
+            return bool(val)
+
+    def sort_key(self, val):
+        #checked rows sort first
+        return -val
+
+class DateColumnModel(StringColumnModel):
+    """DateColumnModel - converts values for a column that displays
+    dates. Dates are stored and displayed as strings in the form
+    YYYY-MM-DD.
+
+    """
+
+    pass
+
+class ValueEncoder(object):
+    """ValueEncoder - dictionary encodes the display values of a column
+    as small integer codes, and shares repeated real values between the
+    dictionaries of the rows. Suited to columns with few distinct values,
+    such as a status or a category, since every distinct value is kept
+    for as long as the encoder is.
+
+    """
+
+    def __init__(self):
+        """Creates a ValueEncoder"""
+
+        self.values = []
+        self.__codes = {}
+        self.__interned = {}
+
+    def __len__(self):
+        return len(self.values)
+
+    def encode(self, display_val):
+        """encode - returns the code for a display value, adding the value
+        if it is new.
+
+        arguments:
+        display_val - the display value
+
+        """
+
+        code = self.__codes.get(display_val)
+        if code is None:
+            code = len(self.values)
+            self.values.append(display_val)
+            self.__codes[display_val] = code
+        return code
+
+    def decode(self, code):
+        """decode - returns the display value for a code.
+
+        arguments:
+        code - a code returned from encode
+
+        """
+
+        return self.values[code]
+
+    def intern(self, real_val):
+        """intern - returns the first real value seen that is equal to
+        real_val, so equal values in many dictionaries are one object.
+        Values that can not be dictionary keys are returned as they are.
+
+        arguments:
+        real_val - the real value for the column in a dictionary
+
+        """
+
+        try:
+            return self.__interned.setdefault(real_val, real_val)
+        except TypeError:
+            return real_val
+
+    def table_bytes(self):
+        """table_bytes - returns an estimate of the bytes used by the
+        distinct values and the tables that map them.
+
+        """
+
+        total = sys.getsizeof(self.values) + sys.getsizeof(self.__codes)
+        total += sys.getsizeof(self.__interned)
+        for val in self.values:
+            total += sys.getsizeof(val)
+        for val in self.__interned:
+            total += sys.getsizeof(val)
+        return total
+
+class EncodedPredicate(object):
+    """EncodedPredicate - applies a Predicate to the codes of a column
+    with a ValueEncoder. The Predicate is called once for each distinct
+    value rather than once for each row. Not typically created directly,
+    but by RowFilter.for_columns.
+
+    """
+
+    def __init__(self, predicate, encoder):
+        self.predicate = predicate
+        self.encoder = encoder
+        self.__results = []
+
+    def __call__(self, code):
+        results = self.__results
+        if code >= len(results):
+            values = self.encoder.values
+            for val in values[len(results):code + 1]:
+                results.append(self.predicate(val))
+        return results[code]
+
+#an estimate of the bytes a gtk.ListStore uses for each cell
+CELL_BYTES = 16
+
+def row_bytes(columns, row, counted):
+    """row_bytes - returns an estimate of the bytes a row uses in a
+    store, including the dictionary for the row and the values in it.
+    Strings are counted as copied into the store, objects in the
+    dictionary only the first time they are seen.
+
+    arguments:
+    columns - the column models for the row, in order
+
+    row - the values stored for the row, followed by its dictionary, or
+    its row id in a column_store.ColumnStore
+
+    counted - a set of the ids of objects already counted, shared by
+    the calls for the rows of a grid
+
+    """
+
+    total = CELL_BYTES * len(row)
+    for val in row[:len(columns)]:
+        if isinstance(val, basestring):
+            total += len(val) + 1
+    dictionary = row[len(columns)]
+    if not isinstance(dictionary, dict):
+        #a row id for a column_store.ColumnStore
+        return total
+    for obj in [dictionary] + dictionary.keys() + dictionary.values():
+        if id(obj) not in counted:
+            counted.add(id(obj))
+            total += sys.getsizeof(obj)
+    return total
+
+def encoded_bytes_per_row(columns, rows):
+    """encoded_bytes_per_row - returns an estimate of the bytes used for
+    each of rows, with the tables of the ValueEncoders of columns shared
+    between them. Returns 0 if there are no rows.
+
+    arguments:
+    columns - the column models for the rows, in order
+
+    rows - the rows, each a sequence of stored values and a dictionary
+
+    """
+
+    counted = set()
+    total = 0
+    count = 0
+    for row in rows:
+        total += row_bytes(columns, row, counted)
+        count += 1
+    if count == 0:
+        return 0
+    for column in columns:
+        if column.encoder is not None:
+            total += column.encoder.table_bytes()
+    return total / float(count)
+
+def infer_keys(dictionaries):
+    """infer_keys - returns a list of keys suitable for column titles
+    from a list of dictionaries, in the order they are first found.
+    Keys starting with "__" are not included.
+
+    arguments:
+    dictionaries - the dictionaries to collect keys from
+
+    """
+
+    key_collector = []
+    for r in dictionaries:
+        for k in r.keys():
+            if k not in key_collector and not k.startswith("__"):
+                key_collector.append(k)
+    return key_collector
+
+def find_children_key(dictionaries):
+    """find_children_key - returns the first key found whose value is a
+    list of dictionaries, such as the lines of an order, or None if the
+    dictionaries are not nested.
+
+    arguments:
+    dictionaries - the dictionaries to look in
+
+    """
+
+    for r in dictionaries:
+        for k, v in r.items():
+            if isinstance(v, list) and len(v) > 0 and isinstance(v[0], dict):
+                return k
+    return None
+
+def infer_tree_keys(dictionaries, children_key):
+    """infer_tree_keys - returns a list of keys suitable for column titles
+    from nested dictionaries, in the order they are first found going
+    down each dictionary's children before the next dictionary. The
+    children key and keys starting with "__" are not included.
+
+    arguments:
+    dictionaries - the top level dictionaries
+
+    children_key - the key of the lists of child dictionaries
+
+    """
+
+    key_collector = []
+    pending = list(reversed(dictionaries))
+    while len(pending) > 0:
+        r = pending.pop()
+        for k in r.keys():
+            if k != children_key and k not in key_collector \
+               and not k.startswith("__"):
+                key_collector.append(k)
+        pending.extend(reversed(r.get(children_key) or []))
+    return key_collector
+
+def build_columns(keys, type_hints=None):
+    """build_columns - returns a list of column models for keys, using
+    type_hints where supplied and conventions otherwise.
+
+    arguments:
+    keys - the keys to create column models for
+
+    keyword arguments:
+    type_hints - a dictionary of keys mapped to column model classes
+
+    """
+
+    if type_hints is None:
+        type_hints = {}
+    columns = []
+    for i, k in enumerate(keys):
+        if k in type_hints:
+            columns.append(type_hints[k](k, i, len(keys)))
+        else:
+            columns.append(conventions.get_column_model(k, i, len(keys)))
+    return columns
+
+def make_row(columns, dictionary):
+    """make_row - returns a row for a dictionary. A row is a list of
+    display values, one for each column, followed by the dictionary
+    itself. Values in the dictionary for the columns are replaced
+    by their real values.
+
+    arguments:
+    columns - the column models for the row, in order
+
+    dictionary - the dictionary to convert
+
+    """
+
+    new_row = []
+    for column in columns:
+        k = column.key
+        if k in dictionary:
+            display_val = column.display_val(dictionary[k])
+            dictionary[k] = column.real_val(dictionary[k])
+        else:
+            display_val = column.default_display_val()
+        if column.encoder is not None:
+            display_val = column.encoder.encode(display_val)
+            if k in dictionary:
+                dictionary[k] = column.encoder.intern(dictionary[k])
+        new_row.append(display_val)
+    new_row.append(dictionary)
+    return new_row
+
+def sort_order(values, column, descending=False):
+    """sort_order - returns the new order of rows, as a list of row
+    positions, for sorting a column.
+
+    arguments:
+    values - the values stored in the column, in the current row order
+
+    column - the column model for the values
+
+    keyword arguments:
+    descending - True to sort from greatest value to least value
+
+    """
+
+    sort_key = column.sort_key
+    if column.encoder is not None:
+        #one sort key for each distinct value
+        code_keys = [sort_key(v) for v in column.encoder.values]
+        keys = [code_keys[c] for c in values]
+    else:
+        keys = [sort_key(v) for v in values]
+    order = range(len(keys))
+    order.sort(key=keys.__getitem__, reverse=descending)
+    return order
+
+class Predicate(object):
+    """Predicate - a filter function bound to the value to filter against.
+    Calling a Predicate with a display value returns True if the row
+    should be displayed.
+
+    """
+
+    def __init__(self, function, target_val=None):
+        """Creates a Predicate
+
+        arguments:
+        function - a filter function taking a display value and
+        target_val
+
+        keyword arguments:
+        target_val - the value to filter against, such as the text
+        entered by the user
+
+        """
+
+        self.function = function
+        self.target_val = target_val
+
+    def __call__(self, orig_val):
+        return self.function(orig_val, self.target_val)
+
+def match_nothing(orig_val):
+    """match_nothing - a predicate that hides every row. Used when a
+    filter is chosen but no value to filter against has been entered.
+
+    """
+
+    return False
+
+def _term_key(index, predicate):
+    #filters are told apart by their column and filter function
+    predicate = getattr(predicate, "predicate", predicate)
+    return (index, getattr(predicate, "function", predicate))
+
+class FilterStats(object):
+    """FilterStats - keeps how long each filter of a RowFilter takes for
+    a row and how many of the rows it passes, so that RowFilter.ordered
+    can test first the filters most likely to decide a row. Filters are
+    told apart by the column they test and their filter function. The
+    value to filter against changes as the user types, so the latest
+    figures for a filter count for more than the older ones.
+
+    """
+
+    def __init__(self, weight=0.5):
+        """Creates a FilterStats
+
+        keyword arguments:
+        weight - how much the latest figures for a filter count for,
+        from 0 to 1
+
+        """
+
+        self.weight = weight
+        self.__stats = {}
+
+    def record(self, key, seconds, calls, passes):
+        """record - adds what was seen of a filter.
+
+        arguments:
+        key - the column position and filter function of the filter
+
+        seconds - how long the calls took in all
+
+        calls - how many values were tested
+
+        passes - how many of the values matched
+
+        """
+
+        if calls == 0:
+            return
+        cost = seconds / calls
+        pass_rate = passes / float(calls)
+        old = self.__stats.get(key)
+        if old is not None:
+            cost = self.weight * cost + (1 - self.weight) * old[0]
+            pass_rate = self.weight * pass_rate + (1 - self.weight) * old[1]
+        self.__stats[key] = (cost, pass_rate)
+
+    def get(self, key):
+        """get - returns a tuple of the seconds a filter takes for a row
+        and the share of the rows it passes, or None if nothing has been
+        recorded for it.
+
+        arguments:
+        key - the column position and filter function of the filter
+
+        """
+
+        return self.__stats.get(key)
+
+class RowFilter(object):
+    """RowFilter - decides whether rows should be displayed by
+    combining a set of predicates with "and" or "or".
+
+    """
+
+    def __init__(self, match_all=True):
+        """Creates a RowFilter
+
+        keyword arguments:
+        match_all - True if a row must match every predicate to be
+        displayed, False if matching any predicate is enough.
+
+        """
+
+        self.match_all = match_all
+        self.terms = []
+
+    def append(self, index, predicate):
+        """append - adds a predicate to apply to a column.
+
+        arguments:
+        index - the position in the row of the value to test
+
+        predicate - a callable taking the value and returning True
+        if the row should be displayed, or None to match every row
+
+        """
+
+        self.terms.append((index, predicate))
+
+    def for_columns(self, columns):
+        """for_columns - returns a RowFilter with the same terms that can
+        be applied to rows storing codes for columns with a ValueEncoder.
+
+        arguments:
+        columns - the column models of the rows to filter
+
+        """
+
+        encoders = dict([(c.index, c.encoder) for c in columns
+                         if c.encoder is not None])
+        if len(encoders) == 0:
+            return self
+        row_filter = RowFilter(self.match_all)
+        for index, predicate in self.terms:
+            if predicate is not None and index in encoders:
+                predicate = EncodedPredicate(predicate, encoders[index])
+            row_filter.append(index, predicate)
+        return row_filter
+
+    def measure(self, rows, stats):
+        """measure - tests each term on some rows, and records how long it
+        took and how many rows matched in a FilterStats.
+
+        arguments:
+        rows - a sample of the rows to filter
+
+        stats - the FilterStats
+
+        """
+
+        for index, predicate in self.terms:
+            if predicate is None:
+                continue
+            passes = 0
+            start = time.time()
+            for row in rows:
+                try:
+                    if predicate(row[index]):
+                        passes += 1
+                except Exception:
+                    pass
+            stats.record(_term_key(index, predicate), time.time() - start,
+                         len(rows), passes)
+
+    def ordered(self, stats):
+        """ordered - returns a RowFilter with the same terms, in the order
+        that decides rows soonest according to a FilterStats. For "and",
+        terms that are cheap and reject many rows come first. For "or",
+        terms that are cheap and match many rows come first. Terms with
+        no figures keep their order after the others.
+
+        arguments:
+        stats - the FilterStats
+
+        """
+
+        match_all = self.match_all
+        def rank(term):
+            index, predicate = term
+            if predicate is None:
+                #matches every row, which decides an "or" at once
+                figures = (0.0, 1.0)
+            else:
+                figures = stats.get(_term_key(index, predicate))
+                if figures is None:
+                    return (1, 0.0)
+            cost = max(figures[0], 1e-9)
+            if match_all:
+                rate = 1.0 - figures[1]
+            else:
+                rate = figures[1]
+            if rate <= 0:
+                return (0, float("inf"))
+            return (0, cost / rate)
+
+        row_filter = RowFilter(match_all)
+        row_filter.terms = sorted(self.terms, key=rank)
+        return row_filter
+
+    def mask(self, values_of, row_count, cache=None):
+        """mask - returns a NumPy boolean array with an item for each row
+        that is True if the row should be displayed, or None if NumPy is
+        not installed. Terms with a filter function from vector_ops are
+        evaluated on the whole column at once, terms on columns with a
+        ValueEncoder once for each distinct value, and other terms once
+        for each row.
+
+        arguments:
+        values_of - a function taking a position in the row and returning
+        a list of the values stored there for every row, in row order
+
+        row_count - the number of rows
+
+        keyword arguments:
+        cache - a dictionary to keep the columns converted for filtering
+        in, to share between calls until the values change
+
+        """
+
+        numpy = _numpy()
+        if numpy is None:
+            return None
+        if cache is None:
+            cache = {}
+        result = None
+        for index, predicate in self.terms:
+            if predicate is None:
+                term = numpy.ones(row_count, numpy.bool_)
+            else:
+                term = predicate_mask(predicate, index, values_of,
+                                      row_count, cache)
+            if result is None:
+                result = term.copy()
+            elif self.match_all:
+                result &= term
+            else:
+                result |= term
+            #the rest of the terms can not change the result
+            if self.match_all and not result.any():
+                break
+            if not self.match_all and result.all():
+                break
+        if result is None:
+            #all filters match an "and" or none matched an "or"
+            if self.match_all:
+                return numpy.ones(row_count, numpy.bool_)
+            return numpy.zeros(row_count, numpy.bool_)
+        return result
+
+    def matches(self, row):
+        """matches - returns True if the row should be displayed.
+
+        arguments:
+        row - a sequence of display values, indexable by column position
+
+        """
+
+        match_all = self.match_all
+        for index, predicate in self.terms:
+            rez = predicate is None or predicate(row[index])
+            if match_all:
+                if not rez:
+                    return False
+            else:
+                if rez:
+                    return True
+        return match_all #all filters match an "and" or none matched an "or"
+
+class GridModel(object):
+    """GridModel - stores dictionaries as rows of display values using
+    the same conversions, sorting and filtering as a DictionaryGrid,
+    without needing gtk.
+
+    """
+
+    def __init__(self, dictionaries=None, keys=None, type_hints=None,
+                 compact_keys=None):
+        """Creates a GridModel
+
+        keyword arguments:
+        dictionaries - a list of dictionaries to add as rows.
+
+        keys - a list of strings specifying the keys to use as columns.
+        If not set, keys will be inferred from the dictionaries.
+
+        type_hints - a dictionary of keys mapped to column model
+        classes, used to override the column models chosen by
+        convention.
+
+        compact_keys - a list of keys for columns with few distinct
+        values to store as codes from a ValueEncoder.
+
+        """
+
+        if dictionaries is None:
+            dictionaries = []
+        if compact_keys is None:
+            compact_keys = []
+        self.rows = []
+        self.columns = []
+        self._keys = keys
+        self._type_hints = type_hints
+        self._compact_keys = compact_keys
+
+        if self._keys is None and len(dictionaries) > 0:
+            self._keys = infer_keys(dictionaries)
+        if self._keys is not None:
+            self.columns = build_columns(self._keys, self._type_hints)
+            for column in self.columns:
+                if column.key in compact_keys and column.compactable:
+                    column.encoder = ValueEncoder()
+
+        for dictionary in dictionaries:
+            self.append_row(dictionary)
+
+    @property
+    def keys(self):
+        """keys - the keys used for the columns. This property is read only.
+
+        """
+
+        return self._keys
+
+    @property
+    def columns_map(self):
+        """columns_map - a dictionary of the column models indexed by key.
+        This property is read only.
+
+        """
+
+        return dict([(c.key, c) for c in self.columns])
+
+    @property
+    def dictionaries(self):
+        """dictionaries - the dictionaries for each row, in row order.
+        This property is read only.
+
+        """
+
+        return [row[-1] for row in self.rows]
+
+    def display_row(self, row):
+        """display_row - returns the display values of a row, with the
+        codes of encoded columns decoded.
+
+        arguments:
+        row - a row in rows
+
+        """
+
+        return [c.cell_display_val(row[c.index]) for c in self.columns]
+
+    def bytes_per_row(self):
+        """bytes_per_row - returns an estimate of the bytes used for each
+        row, as they would be in a DictionaryGrid.
+
+        """
+
+        return encoded_bytes_per_row(self.columns, self.rows)
+
+    def append_row(self, dictionary):
+        """append_row - add a dictionary as a row.
+
+        arguments:
+        dictionary - the dictionary to add
+
+        """
+
+        self.rows.append(make_row(self.columns, dictionary))
+
+    def sort(self, key, descending=False):
+        """sort - sorts the rows by the column for key.
+
+        arguments:
+        key - the key of the column to sort by
+
+        keyword arguments:
+        descending - True to sort from greatest value to least value
+
+        """
+
+        column = self.columns_map[key]
+        values = [row[column.index] for row in self.rows]
+        order = sort_order(values, column, descending)
+        self.rows = [self.rows[i] for i in order]
+
+    def filter(self, row_filter):
+        """filter - returns the dictionaries for the rows that match a
+        RowFilter.
+
+        arguments:
+        row_filter - the RowFilter to apply
+
+        """
+
+        row_filter = row_filter.for_columns(self.columns)
+        return [row[-1] for row in self.rows if row_filter.matches(row)]
+
+    def mask(self, row_filter):
+        """mask - returns a NumPy boolean array that is True for the rows
+        that match a RowFilter, or None if NumPy is not installed.
+
+        arguments:
+        row_filter - the RowFilter to apply
+
+        """
+
+        row_filter = row_filter.for_columns(self.columns)
+        values_of = lambda index: [row[index] for row in self.rows]
+        return row_filter.mask(values_of, len(self.rows))
+
+#filter functions for use in Predicates and filter boxes. Each takes the
+#display value stored in the row and a value to filter against, and
+#returns True if the row should be displayed.
+
+def string_contains(orig_val, target_val):
+    if len(target_val) == 0:
+        return True
+    return orig_val.find(target_val) > -1
+
+def string_not_contains(orig_val, target_val):
+    if len(target_val) == 0:
+        return True
+    return orig_val.find(target_val) == -1
+
+def string_starts_with(orig_val, target_val):
+    if len(target_val) == 0:
+        return True
+    return orig_val.startswith(target_val)
+
+def string_ends_with(orig_val, target_val):
+    if len(target_val) == 0:
+        return True
+    return orig_val.endswith(target_val)
+
+#compiled regular expressions by pattern and flags, so a pattern is
+#compiled once when the filter changes rather than for every row
+_patterns = {}
+_MAX_PATTERNS = 100
+
+def compiled_pattern(pattern, flags=0):
+    """compiled_pattern - returns a compiled regular expression, from a
+    cache of the patterns compiled before. Raises re.error for an
+    invalid pattern.
+
+    arguments:
+    pattern - the regular expression
+
+    keyword arguments:
+    flags - re flags to compile with
+
+    """
+
+    key = (pattern, flags)
+    compiled = _patterns.get(key)
+    if compiled is None:
+        if len(_patterns) >= _MAX_PATTERNS:
+            _patterns.clear()
+        compiled = re.compile(pattern, flags)
+        _patterns[key] = compiled
+    return compiled
+
+def casefold(val):
+    """casefold - returns a string in lower case as unicode, for matching
+    strings without regard to case. UTF-8 strings are decoded first so
+    that letters outside of ASCII are lowered too.
+
+    """
+
+    if isinstance(val, str):
+        val = val.decode("utf-8", "replace")
+    return val.lower()
+
+def _word_pattern(target_val):
+    return compiled_pattern(r"\b%s\b" % re.escape(casefold(target_val)),
+                            re.UNICODE)
+
+def string_contains_ignore_case(orig_val, target_val):
+    if len(target_val) == 0:
+        return True
+    return casefold(target_val) in casefold(orig_val)
+
+def string_not_contains_ignore_case(orig_val, target_val):
+    if len(target_val) == 0:
+        return True
+    return casefold(target_val) not in casefold(orig_val)
+
+def string_contains_word(orig_val, target_val):
+    """string_contains_word - matches if target_val is found as a whole
+    word, ignoring case.
+
+    """
+
+    if len(target_val) == 0:
+        return True
+    return _word_pattern(target_val).search(casefold(orig_val)) is not None
+
+def string_matches_pattern(orig_val, target_val):
+    """string_matches_pattern - matches if the regular expression in
+    target_val is found. An invalid pattern matches every row, as it is
+    usually one that is still being typed.
+
+    """
+
+    if len(target_val) == 0:
+        return True
+    try:
+        pattern = compiled_pattern(target_val, re.UNICODE)
+    except re.error:
+        return True
+    return pattern.search(orig_val) is not None
+
+def value_in(orig_val, target_val):
+    """value_in - matches if the display value is one of the values in
+    target_val, a set or frozenset.
+
+    """
+
+    return orig_val in target_val
+
+def tags_any(orig_val, target_val):
+    """tags_any - matches if any of the tags in target_val are found"""
+
+    if len(target_val) == 0:
+        return True
+
+    tags_on_bug = orig_val.split()
+    tags_in_filter = target_val.split()
+
+    for tag in tags_in_filter:
+        if tag in tags_on_bug:
+            return True
+    return False
+
+def tags_all(orig_val, target_val):
+    """tags_all - matches if all of the tags in target_val are found"""
+
+    if len(target_val) == 0:
+        return True
+
+    tags_on_bug = orig_val.split()
+    tags_in_filter = target_val.split()
+
+    for tag in tags_in_filter:
+        if tag not in tags_on_bug:
+            return False
+    return True
+
+def tags_not(orig_val, target_val):
+    """tags_not - matches if one of the tags in target_val is not found"""
+
+    if len(target_val) == 0:
+        return True
+
+    tags_on_bug = orig_val.split()
+    tags_in_filter = target_val.split()
+
+    for tag in tags_in_filter:
+        if tag not in tags_on_bug:
+            return True
+    return False
+
+def tags_not_all(orig_val, target_val):
+    """tags_not_all - matches if the tags in target_val are not found"""
+
+    if len(target_val) == 0:
+        return True
+
+    tags_on_bug = orig_val.split()
+    tags_in_filter = target_val.split()
+
+    for tag in tags_in_filter:
+        if tag in tags_on_bug:
+            return False
+        return True
+
+def integer_equals(orig_val, target_val):
+    return int(orig_val) == target_val
+
+def integer_less_than(orig_val, target_val):
+    return int(orig_val) < target_val
+
+def integer_greater_than(orig_val, target_val):
+    return int(orig_val) > target_val
+
+def integer_less_than_equals(orig_val, target_val):
+    return int(orig_val) <= target_val
+
+def integer_greater_than_equals(orig_val, target_val):
+    return int(orig_val) >= target_val
+
+def numeric_equals(orig_val, target_val):
+    try:
+        return float(orig_val) == float(target_val)
+    except:
+        return True
+
+def numeric_less_than(orig_val, target_val):
+    try:
+        return float(orig_val) < float(target_val)
+    except:
+        return True
+
+def numeric_greater_than(orig_val, target_val):
+    try:
+        return float(orig_val) > float(target_val)
+    except:
+        return True
+
+def numeric_less_than_equals(orig_val, target_val):
+    try:
+        return float(orig_val) <= float(target_val)
+    except:
+        return True
+
+def numeric_greater_than_equals(orig_val, target_val):
+    try:
+        return float(orig_val) >= float(target_val)
+    except:
+        return True
+
+def parse_date(orig_val):
+    """parse_date - returns a datetime.date for a display value in
+    the form YYYY-MM-DD.
+
+    """
+
+    p = orig_val.split("-")
+    return datetime.date(int(p[0]),int(p[1]),int(p[2]))
+
+def date_before(orig_val, target_val):
+    return parse_date(orig_val) < target_val
+
+def date_on_before(orig_val, target_val):
+    return parse_date(orig_val) <= target_val
+
+def date_on(orig_val, target_val):
+    return parse_date(orig_val) == target_val
+
+def date_on_after(orig_val, target_val):
+    return parse_date(orig_val) >= target_val
+
+def date_after(orig_val, target_val):
+    return parse_date(orig_val) > target_val
+
+def check_checked(orig_val, target_val=None):
+    return orig_val == 1
+
+def check_not_checked(orig_val, target_val=None):
+    return orig_val == 0
+
+def check_unset(orig_val, target_val=None):
+    return orig_val == -1
+
+def _numpy():
+    """_numpy - internal function that returns the numpy module, or None
+    if it is not installed. NumPy is only imported when it is needed.
+
+    """
+
+    try:
+        import numpy
+    except ImportError:
+        return None
+    return numpy
+
+def _to_float(orig_val):
+    return float(orig_val)
+
+def _to_int(orig_val):
+    return int(orig_val)
+
+def _to_ordinal(orig_val):
+    return parse_date(orig_val).toordinal()
+
+def _number_target(target_val):
+    #integer filters compare with the target as given, only numbers
+    #can be compared the same way on a whole column
+    if not isinstance(target_val, (int, long, float)):
+        raise TypeError(target_val)
+    return float(target_val)
+
+#filter functions that can be evaluated on whole columns, mapped to a
+#function converting a display value to a number, the comparison, a
+#function converting the target value to a number, and whether a
+#display value that can not be converted matches. These match the
+#results of calling the filter functions row by row.
+vector_ops = {
+    numeric_equals: (_to_float, operator.eq, float, True),
+    numeric_less_than: (_to_float, operator.lt, float, True),
+    numeric_greater_than: (_to_float, operator.gt, float, True),
+    numeric_less_than_equals: (_to_float, operator.le, float, True),
+    numeric_greater_than_equals: (_to_float, operator.ge, float, True),
+    integer_equals: (_to_int, operator.eq, _number_target, False),
+    integer_less_than: (_to_int, operator.lt, _number_target, False),
+    integer_greater_than: (_to_int, operator.gt, _number_target, False),
+    integer_less_than_equals: (_to_int, operator.le, _number_target, False),
+    integer_greater_than_equals: (_to_int, operator.ge, _number_target, False),
+    date_before: (_to_ordinal, operator.lt, datetime.date.toordinal, False),
+    date_on_before: (_to_ordinal, operator.le, datetime.date.toordinal, False),
+    date_on: (_to_ordinal, operator.eq, datetime.date.toordinal, False),
+    date_on_after: (_to_ordinal, operator.ge, datetime.date.toordinal, False),
+    date_after: (_to_ordinal, operator.gt, datetime.date.toordinal, False),
+    check_checked: (int, operator.eq, lambda t: 1, False),
+    check_not_checked: (int, operator.eq, lambda t: 0, False),
+    check_unset: (int, operator.eq, lambda t: -1, False),
+    }
+
+#filter functions that ignore case, mapped to a function converting the
+#target value and a test taking a value already passed through casefold
+#and the converted target. A column is only lowered once, not each time
+#one of these filters changes.
+folded_ops = {
+    string_contains_ignore_case: (casefold, operator.contains),
+    string_not_contains_ignore_case: (casefold,
+                                      lambda val, target: target not in val),
+    string_contains_word: (_word_pattern,
+                           lambda val, pattern: pattern.search(val) is not None),
+    }
+
+def column_vector(values, convert):
+    """column_vector - returns a tuple of a NumPy float array of values
+    converted with convert, and a boolean array that is False where a
+    value could not be converted.
+
+    arguments:
+    values - the display values of a column
+
+    convert - a function converting a display value to a number
+
+    """
+
+    numpy = _numpy()
+    numbers = numpy.zeros(len(values), numpy.float64)
+    valid = numpy.ones(len(values), numpy.bool_)
+    for i, val in enumerate(values):
+        try:
+            numbers[i] = convert(val)
+        except Exception:
+            valid[i] = False
+    return (numbers, valid)
+
+def predicate_mask(predicate, index, values_of, row_count, cache):
+    """predicate_mask - returns a NumPy boolean array that is True for
+    the rows a predicate matches. Used by RowFilter.mask.
+
+    arguments:
+    predicate - a Predicate, EncodedPredicate or other callable
+
+    index - the position in the row of the values to test
+
+    values_of - a function taking a position in the row and returning
+    the list of the values there for every row
+
+    row_count - the number of rows
+
+    cache - a dictionary of values and converted columns by position
+
+    """
+
+    numpy = _numpy()
+    if predicate is match_nothing:
+        return numpy.zeros(row_count, numpy.bool_)
+    if ("values", index) not in cache:
+        cache[("values", index)] = values_of(index)
+    values = cache[("values", index)]
+
+    if isinstance(predicate, EncodedPredicate):
+        #evaluate the distinct values, then look up each row's code
+        encoder = predicate.encoder
+        if len(encoder) == 0:
+            return numpy.zeros(row_count, numpy.bool_)
+        by_code = numpy.array([predicate(c) for c in range(len(encoder))],
+                              numpy.bool_)
+        return by_code[numpy.array(values, numpy.intp)]
+
+    function = getattr(predicate, "function", None)
+    if function in vector_ops:
+        convert, compare, convert_target, invalid_matches = vector_ops[function]
+        try:
+            target = convert_target(predicate.target_val)
+        except Exception:
+            target = None
+        if target is not None:
+            if ("vector", index, convert) not in cache:
+                cache[("vector", index, convert)] = column_vector(values,
+                                                                  convert)
+            numbers, valid = cache[("vector", index, convert)]
+            result = compare(numbers, target)
+            if invalid_matches:
+                return result | ~valid
+            return result & valid
+
+    if function in folded_ops and len(predicate.target_val or "") > 0:
+        convert_target, test = folded_ops[function]
+        if ("folded", index) not in cache:
+            cache[("folded", index)] = [casefold(v)
+                                        if isinstance(v, basestring) else None
+                                        for v in values]
+        target = convert_target(predicate.target_val)
+        return numpy.fromiter((v is not None and test(v, target)
+                               for v in cache[("folded", index)]),
+                              numpy.bool_, row_count)
+
+    return numpy.fromiter((_safe_match(predicate, v) for v in values),
+                          numpy.bool_, row_count)
+
+def _safe_match(predicate, val):
+    """_safe_match - internal function that returns what a predicate
+    returns for val, or False if the predicate raises, as for a display
+    value that is not a valid date.
+
+    """
+
+    try:
+        return bool(predicate(val))
+    except Exception:
+        return False
+
+def and_masks(mask, other):
+    """and_masks - returns the mask of the rows that are True in both of
+    two masks, a NumPy array if mask is one and a list otherwise.
+
+    arguments:
+    mask - a list or NumPy array of booleans, as from RowFilter.mask
+
+    other - a list or NumPy array of booleans the same length
+
+    """
+
+    numpy = _numpy()
+    if numpy is not None and isinstance(mask, numpy.ndarray):
+        return mask & numpy.asarray(other, numpy.bool_)
+    return [bool(a and b) for a, b in zip(mask, other)]
+
+def changed_rows(old, new):
+    """changed_rows - returns a list of the positions where two sequences
+    of booleans differ, such as the mask a row filter had and the mask
+    it has now.
+
+    arguments:
+    old - the booleans before
+
+    new - the booleans after, the same length as old
+
+    """
+
+    numpy = _numpy()
+    if numpy is not None:
+        old = numpy.asarray(old, numpy.bool_)
+        new = numpy.asarray(new, numpy.bool_)
+        return numpy.flatnonzero(old != new).tolist()
+    return [i for i in xrange(len(new)) if bool(old[i]) != bool(new[i])]
@@ -0,0 +1,321 @@
+### BEGIN LICENSE
+# Copyright (C) 2010 Rick Spencer rick.spencer@canonical.com
+#This program is free software: you can redistribute it and/or modify it
+#under the terms of the GNU General Public License version 3, as published
+#by the Free Software Foundation.
+#
+#This program is distributed in the hope that it will be useful, but
+#WITHOUT ANY WARRANTY; without even the implied warranties of
+#MERCHANTABILITY, SATISFACTORY QUALITY, or FITNESS FOR A PARTICULAR
+#PURPOSE.  See the GNU General Public License for more details.
+#
+#You should have received a copy of the GNU General Public License along
+#with this program.  If not, see <http://www.gnu.org/licenses/>.
+### END LICENSE
+
+"""A grouped view of the rows of a DictionaryGrid
+GroupedGrid is a gtk.TreeView that shows the rows of a DictionaryGrid
+grouped by the values of one or more columns, with the number of rows
+and the sum of each currency and integer column for every group. The
+groups and their totals are kept by a StoreAggregates from the grid's
+group_aggregates, so they follow appends, edits, removes and a
+GridFilter without being worked out again. A group's rows are only put
+in the gtk.TreeStore when the group is expanded, and are released when
+it is collapsed.
+
+Using
+grid = DictionaryGrid(dictionaries=dicts)
+grouped = GroupedGrid(grid, ["status", "customer"])
+grouped.show()
+
+#read the totals of a group, by the values stored for the group keys
+group = grouped.totals.group(("open", "acme"))
+print group.count, group.get("price")["sum"]
+
+Configuring
+#GroupedGrid is a gtk.TreeView, so you can use gtk.TreeView members
+grouped.expand_all()
+
+Extending
+Override GroupedGrid.group_cells to change what the row for a group
+shows.
+
+"""
+
+import gettext
+from gettext import gettext as _
+gettext.textdomain('quickly-widgets')
+
+import gtk
+import gobject
+
+def group_label(column, stored):
+    """group_label: returns the text for the value of a group key, as
+    stored in the rows of the grid.
+
+    """
+
+    display = column.cell_display_val(stored)
+    if not isinstance(display, basestring):
+        #check columns store numbers
+        return str(column.real_val(display))
+    if display == "":
+        return _("(empty)")
+    return display
+
+class GroupedGrid(gtk.TreeView):
+    """GroupedGrid: shows the rows of a DictionaryGrid in groups.
+
+    """
+
+    def __init__(self, grid, group_keys):
+        """Create a GroupedGrid
+
+        arguments:
+        grid - the DictionaryGrid with the rows to group
+
+        group_keys - a list of the keys to group the rows by, the rows are
+        grouped by the first key, each group by the second, and so on
+
+        """
+
+        gtk.TreeView.__init__(self)
+        self.grid = grid
+        self.group_keys = group_keys
+        self.keys = list(grid.keys or [])
+        self.totals = grid.group_aggregates(group_keys)
+        self.__group_rows = {}
+        self.__update_source = None
+
+        #the label, a column for each key, the count, and the prefix of
+        #the group for group rows, None for rows of the grid
+        types = [gobject.TYPE_STRING] * (len(self.keys) + 2)
+        self.tree_store = gtk.TreeStore(*(types + [gobject.TYPE_PYOBJECT]))
+        self.__prefix_index = len(types)
+        titles = [grid.columns[k].get_title() for k in group_keys
+                  if k in grid.columns]
+        self.__add_column(" / ".join(titles), 0)
+        for i, key in enumerate(self.keys):
+            self.__add_column(grid.columns[key].get_title(), i + 1)
+        self.__add_column(_("Count"), len(self.keys) + 1)
+        self.set_model(self.tree_store)
+
+        self.connect("test-expand-row", self.__expanding)
+        self.connect("row-collapsed", self.__collapsed)
+        self.connect("destroy", self.__destroyed)
+        self.totals.add_listener(self.__totals_changed)
+        self.update()
+
+    def group_cells(self, prefix, group):
+        """group_cells: returns the values for the row of a group, a label
+        followed by a string for each key of the grid and the count.
+
+        arguments:
+        prefix - the prefix of the group, see StoreAggregates.group
+
+        group - the aggregates.RowGroup
+
+        """
+
+        column = self.grid.columns[self.group_keys[len(prefix) - 1]]
+        cells = [group_label(column, prefix[-1])]
+        for key in self.keys:
+            if key in group.aggregates and group.aggregates[key].count > 0:
+                cells.append(self.grid.columns[key].display_val(
+                             group.aggregates[key].sum))
+            else:
+                cells.append("")
+        cells.append(str(group.count))
+        return cells
+
+    def update(self):
+        """update: brings the groups up to date with the grid. Called when
+        the main loop is idle after rows of the grid change.
+
+        """
+
+        self.__update_source = None
+        changed = self.totals.take_changed_groups()
+        if () in changed:
+            self.__rebuild()
+            return False
+        for prefix in sorted(changed, key=len):
+            group = self.totals.group(prefix)
+            if group is None:
+                self.__remove_group(prefix)
+            elif prefix in self.__group_rows:
+                self.__update_group(prefix, group)
+            else:
+                self.__add_group(prefix, group)
+        return False
+
+    def __add_column(self, title, index):
+        renderer = gtk.CellRendererText()
+        column = gtk.TreeViewColumn(title, renderer, text=index)
+        column.set_resizable(True)
+        self.append_column(column)
+
+    def __rebuild(self):
+        """__rebuild: internal function that puts the top level groups in
+        a new tree, expanding the groups that were expanded before.
+
+        """
+
+        expanded = [p for p in self.__group_rows if self.__is_expanded(p)]
+        self.tree_store.clear()
+        self.__group_rows = {}
+        for prefix in self.__sorted(self.totals.children(())):
+            self.__add_group(prefix, self.totals.group(prefix))
+        for prefix in sorted(expanded, key=len):
+            if prefix in self.__group_rows:
+                self.expand_row(self.__path(prefix), False)
+
+    def __sorted(self, prefixes):
+        if len(prefixes) == 0:
+            return prefixes
+        column = self.grid.columns[self.group_keys[len(prefixes[0]) - 1]]
+        return sorted(prefixes,
+                      key=lambda p: column.sort_key(column.cell_display_val(p[-1])))
+
+    def __path(self, prefix):
+        return self.__group_rows[prefix].get_path()
+
+    def __iter(self, prefix):
+        return self.tree_store.get_iter(self.__path(prefix))
+
+    def __is_expanded(self, prefix):
+        return self.row_expanded(self.__path(prefix))
+
+    def __loaded(self, iter):
+        """__loaded: internal function that returns True if the children
+        of a group row are in the tree, rather than a placeholder.
+
+        """
+
+        child = self.tree_store.iter_children(iter)
+        return child is not None and \
+               self.tree_store.get_value(child, 0) is not None
+
+    def __add_group(self, prefix, group, parent=None):
+        """__add_group: internal function that adds the row for a group
+        under parent, or under the row of the group above it if that
+        group's children are in the tree.
+
+        """
+
+        if parent is None and len(prefix) > 1:
+            if prefix[:-1] not in self.__group_rows:
+                return
+            parent = self.__iter(prefix[:-1])
+            if not self.__loaded(parent):
+                return
+        iter = self.tree_store.append(parent,
+                                      self.group_cells(prefix, group) + [prefix])
+        self.__group_rows[prefix] = gtk.TreeRowReference(self.tree_store,
+                                        self.tree_store.get_path(iter))
+        self.__add_placeholder(iter)
+
+    def __update_group(self, prefix, group):
+        iter = self.__iter(prefix)
+        for i, val in enumerate(self.group_cells(prefix, group)):
+            self.tree_store.set_value(iter, i, val)
+        #the rows of an open group at the last level may have changed
+        if len(prefix) == len(self.group_keys) and self.__loaded(iter):
+            self.__reload(prefix, iter)
+
+    def __remove_group(self, prefix):
+        if prefix not in self.__group_rows:
+            return
+        self.tree_store.remove(self.__iter(prefix))
+        self.__forget(prefix, True)
+
+    def __forget(self, prefix, itself):
+        """__forget: internal function that drops the row references for
+        the groups below a group, and the group itself if itself is True.
+
+        """
+
+        depth = len(prefix)
+        for p in self.__group_rows.keys():
+            if p[:depth] == prefix and (itself or len(p) > depth):
+                del self.__group_rows[p]
+
+    def __add_placeholder(self, iter):
+        #an empty child so the group can be expanded
+        self.tree_store.append(iter, [None] * (len(self.keys) + 2) + [None])
+
+    def __release(self, iter):
+        child = self.tree_store.iter_children(iter)
+        while child is not None:
+            if not self.tree_store.remove(child):
+                child = None
+
+    def __reload(self, prefix, iter):
+        """__reload: internal function that replaces the children of a
+        group with the groups at the next level or the rows of the grid.
+        The new children are added before the old ones are removed, so
+        an expanded group stays expanded.
+
+        """
+
+        old_count = self.tree_store.iter_n_children(iter)
+        if len(prefix) < len(self.group_keys):
+            for child in self.__sorted(self.totals.children(prefix)):
+                self.__add_group(child, self.totals.group(child), iter)
+        else:
+            self.__load_rows(prefix, iter)
+        for i in range(old_count):
+            self.tree_store.remove(self.tree_store.iter_children(iter))
+
+    def __load_rows(self, prefix, iter):
+        """__load_rows: internal function that adds the rows of the grid
+        in a group at the last level under its row.
+
+        """
+
+        store = self.grid.unfiltered_store
+        columns = [self.grid.columns[k] for k in self.keys]
+        for position in self.totals.rows_in(prefix):
+            row = store[position]
+            cells = [""]
+            for column in columns:
+                display = column.cell_display_val(row[column.index])
+                if isinstance(display, basestring):
+                    cells.append(display)
+                else:
+                    cells.append(group_label(column, row[column.index]))
+            self.tree_store.append(iter, cells + [""] + [None])
+
+    def __expanding(self, treeview, iter, path, data=None):
+        """__expanding: internal signal handler that puts the children of
+        a group in the tree just before it is expanded.
+
+        Do not call directly
+        """
+
+        if not self.__loaded(iter):
+            prefix = self.tree_store.get_value(iter, self.__prefix_index)
+            self.__reload(prefix, iter)
+        return False
+
+    def __collapsed(self, treeview, iter, path, data=None):
+        """__collapsed: internal signal handler that releases the children
+        of a group when it is collapsed.
+
+        Do not call directly
+        """
+
+        prefix = self.tree_store.get_value(iter, self.__prefix_index)
+        self.__release(iter)
+        self.__forget(prefix, False)
+        self.__add_placeholder(iter)
+
+    def __totals_changed(self):
+        if self.__update_source is None:
+            self.__update_source = gobject.idle_add(self.update)
+
+    def __destroyed(self, widget, data=None):
+        self.grid.release_aggregates(self.totals)
+        if self.__update_source is not None:
+            gobject.source_remove(self.__update_source)
+            self.__update_source = None
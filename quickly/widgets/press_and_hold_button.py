@@ -25,11 +25,26 @@ pah.connect('tick',__handle_on_tick)
 def __handle_on_tick(widget, data=None):
     #do something once
 
+#ticks are kept to a schedule, when the main loop is too busy to keep up
+#one tick is emitted for all the intervals that passed. tick still passes
+#the button, as it always has, so only the ticks event passes how many
+#intervals there were
+pah.connect('ticks',__handle_on_ticks)
+
+def __handle_on_ticks(widget, count):
+    #do something count times
+
 Configuring
 #Change the timeout period in milliseconds by adjusting the
 #timeout property
 pah.timeout = 10000
 
+#make the ticks come faster the longer the button is held, each interval
+#is multiplied by acceleration until it reaches min_timeout milliseconds,
+#a tenth of timeout unless it is set
+pah.acceleration = 0.8
+pah.min_timeout = 20
+
 #set the label as a normal button
 pah.set_labe("Press and Hold")
 
@@ -38,39 +53,156 @@ A PressAndHoldButton is gtk.Button
 
 """
 
+import math
+import os
+import time
 import gobject
 import gtk
 
+#the shortest interval as a share of the first, for accelerating ticks
+#without a min_timeout
+MIN_INTERVAL_FRACTION = 0.1
+
+def _monotonic():
+    """_monotonic: returns seconds from a clock that does not jump when
+    the system time is changed.
+
+    """
+
+    if hasattr(time, "monotonic"):
+        return time.monotonic()
+    #the elapsed real time since a fixed point in the past
+    return os.times()[4]
+
+class TickSchedule(object):
+    """TickSchedule: keeps the deadlines for the ticks of a
+    PressAndHoldButton. Not typically created directly.
+
+    """
+
+    def __init__(self, interval, acceleration=1.0, min_interval=None):
+        """Create a TickSchedule
+
+        Keyword arguments:
+        interval -- seconds between the first ticks
+        acceleration -- each interval is the last one times acceleration
+        min_interval -- the shortest interval, defaults to interval times
+        MIN_INTERVAL_FRACTION when acceleration is below 1, and to
+        interval otherwise
+
+        """
+
+        if min_interval is None:
+            if acceleration < 1.0:
+                min_interval = interval * MIN_INTERVAL_FRACTION
+            else:
+                min_interval = interval
+        if min_interval > interval:
+            min_interval = interval
+        self.interval = interval
+        self.acceleration = acceleration
+        self.min_interval = min_interval
+        self.deadline = None
+
+    def start(self, now):
+        """start: sets the first deadline an interval after now."""
+
+        self.deadline = now + self.interval
+
+    def delay(self, now):
+        """delay: returns the seconds from now until the next deadline."""
+
+        return max(0, self.deadline - now)
+
+    def due(self, now):
+        """due: returns the number of deadlines that passed by now, and
+        moves the deadline past now.
+
+        """
+
+        count = 0
+        while now >= self.deadline and self.interval > self.min_interval:
+            count += 1
+            self.interval = max(self.min_interval,
+                                self.interval * self.acceleration)
+            self.deadline += self.interval
+        if now >= self.deadline:
+            #the interval is fixed now, so count the rest in one go
+            passed = int((now - self.deadline) / self.interval) + 1
+            count += passed
+            self.deadline += passed * self.interval
+        return count
+
 class PressAndHoldButton(gtk.Button):
     def __init__(self):
         """Create a PressAndHoldButton
 
         After creating it, you can change the frequency of the tick
         event by setting timeout property in milliseconds. The default
-        timeout period is 250 milliseconds.
+        timeout period is 250 milliseconds. Set acceleration below 1.0
+        to make the ticks come faster while the button is held, down to
+        one every min_timeout milliseconds, or every tenth of timeout if
+        min_timeout is None.
+
+        "tick" and "ticks" are emitted together, once for all the
+        intervals that passed since the last time. "tick" keeps passing
+        the button for compatibility with existing handlers, so only
+        "ticks" passes the count of intervals.
 
         """
 
         gtk.Button.__init__(self)
         self.timeout = 250
+        self.acceleration = 1.0
+        self.min_timeout = None
         self.connect("pressed",self.__pressed)
         self.connect("released",self.__released)
         self.__continue_ticking = True
+        self.__schedule = None
+        self.__source = None
 
     def __pressed(self, widget, data=None):
         self.__continue_ticking = True
         widget.emit("tick",self)
-        gobject.timeout_add(self.timeout, self.__tick)
+        widget.emit("ticks",1)
+        min_interval = None
+        if self.min_timeout is not None:
+            min_interval = self.min_timeout / 1000.0
+        self.__schedule = TickSchedule(self.timeout / 1000.0,
+                                       self.acceleration, min_interval)
+        self.__schedule.start(_monotonic())
+        self.__wait()
 
     def __released(self, widget, data=None):
         self.__continue_ticking = False
+        if self.__source is not None:
+            gobject.source_remove(self.__source)
+            self.__source = None
+
+    def __wait(self):
+        """__wait: internal function that sets a timeout for the next
+        deadline, so a late tick does not delay the ones after it.
+
+        """
+
+        delay = self.__schedule.delay(_monotonic())
+        self.__source = gobject.timeout_add(int(math.ceil(delay * 1000)),
+                                            self.__tick)
 
     def __tick(self, data=None):
-        if self.__continue_ticking:
+        self.__source = None
+        if not self.__continue_ticking:
+            return False
+        count = self.__schedule.due(_monotonic())
+        if count > 0:
             self.emit("tick",self)
-        return self.__continue_ticking
+            self.emit("ticks",count)
+        self.__wait()
+        return False
 
     __gsignals__ = {'tick' : (gobject.SIGNAL_RUN_LAST, gobject.TYPE_NONE,
 		(gobject.TYPE_PYOBJECT,)),
+		'ticks' : (gobject.SIGNAL_RUN_LAST, gobject.TYPE_NONE,
+		(gobject.TYPE_INT,)),
 		}
 
@@ -0,0 +1,199 @@
+### BEGIN LICENSE
+# Copyright (C) 2010 Rick Spencer rick.spencer@canonical.com
+#This program is free software: you can redistribute it and/or modify it
+#under the terms of the GNU General Public License version 3, as published
+#by the Free Software Foundation.
+#
+#This program is distributed in the hope that it will be useful, but
+#WITHOUT ANY WARRANTY; without even the implied warranties of
+#MERCHANTABILITY, SATISFACTORY QUALITY, or FITNESS FOR A PARTICULAR
+#PURPOSE.  See the GNU General Public License for more details.
+#
+#You should have received a copy of the GNU General Public License along
+#with this program.  If not, see <http://www.gnu.org/licenses/>.
+### END LICENSE
+
+"""Reads byte ranges of http URLs into files
+probe asks an http server for the size of a URL and whether it accepts
+Range requests, and fetch_range writes a range of the URL into a file.
+A server that ignores the Range header and sends the whole URL is
+noticed, rather than its reply being taken for the range. The functions
+block, so UrlFetchProgressBox runs them on a TaskExecutor for resume and
+segments over http. range_fetch does not use gtk or gio, so it can be
+tested and reused on its own.
+
+Using
+info = probe(url)
+if info.accepts_ranges:
+    print info.size, info.etag, info.modified
+
+#continue a partial file, returns where the server started, which is 0
+#if it ignored the range, in which case the file was written again
+#from the beginning
+start = fetch_range(url, destination, os.path.getsize(destination))
+
+#write one range of a preallocated file, raises RangeError if the
+#server ignored the range
+fetch_range(url, destination, 1000, end=2000)
+
+Configuring
+#read 8KB at a time, stop when killed returns True and hand each chunk
+#to progress with the position it was written at
+fetch_range(url, destination, 0, chunk_size=8192, progress=progress,
+            killed=lambda: params["kill"])
+
+"""
+
+import email.utils
+import re
+import urllib2
+import urlparse
+
+#bytes to read at a time
+CHUNK_SIZE = 64 * 1024
+
+#seconds to wait for the server before giving up
+TIMEOUT = 30
+
+_CONTENT_RANGE = re.compile(r"bytes\s+(\d+)-(\d+)/(\d+|\*)")
+
+class RangeError(IOError):
+    """RangeError: raised when the server did not send the range asked
+    for, or the URL ended before the end of the range.
+
+    """
+
+    pass
+
+class RangeInfo(object):
+    """RangeInfo: what an http server says about a URL, as returned by
+    probe.
+
+    """
+
+    def __init__(self, size, accepts_ranges, etag, modified):
+        self.size = size
+        self.accepts_ranges = accepts_ranges
+        self.etag = etag
+        self.modified = modified
+
+class _HeadRequest(urllib2.Request):
+    def get_method(self):
+        return "HEAD"
+
+def is_http(url):
+    """is_http: returns True for the http and https URLs that probe and
+    fetch_range can read.
+
+    """
+
+    return urlparse.urlparse(url)[0] in ("http", "https")
+
+def probe(url, timeout=TIMEOUT):
+    """probe: sends a HEAD request for url and returns a RangeInfo with
+    its size, or None if unknown, whether the server advertises
+    "Accept-Ranges: bytes", and its etag and modification time in
+    seconds since the epoch, or None if not sent.
+
+    Keyword arguments:
+    url -- the http URL
+    timeout -- seconds to wait for the server
+
+    """
+
+    response = urllib2.urlopen(_HeadRequest(url), timeout=timeout)
+    try:
+        headers = response.info()
+        size = headers.getheader("Content-Length")
+        size = size and size.isdigit() and int(size) or None
+        accepts = headers.getheader("Accept-Ranges", "").strip().lower()
+        modified = headers.getheader("Last-Modified")
+        if modified is not None:
+            parsed = email.utils.parsedate_tz(modified)
+            modified = parsed and email.utils.mktime_tz(parsed) or None
+        return RangeInfo(size, accepts == "bytes",
+                         headers.getheader("ETag"), modified)
+    finally:
+        response.close()
+
+def open_range(url, start, end=None, timeout=TIMEOUT):
+    """open_range: requests the bytes of url from start up to end, and
+    returns the response and the position its body starts at. That is
+    start if the server sent the range, or 0 if it ignored the Range
+    header and is sending the whole URL.
+
+    Keyword arguments:
+    url -- the http URL
+    start -- the first byte to read
+    end -- the byte after the last one to read, None to read to the end
+    timeout -- seconds to wait for the server
+
+    """
+
+    request = urllib2.Request(url)
+    if start > 0 or end is not None:
+        last = ""
+        if end is not None:
+            last = str(end - 1)
+        request.add_header("Range", "bytes=%d-%s" % (start, last))
+    response = urllib2.urlopen(request, timeout=timeout)
+    if response.getcode() != 206:
+        return response, 0
+    match = _CONTENT_RANGE.match(response.info().getheader("Content-Range", ""))
+    if match is None or int(match.group(1)) != start:
+        response.close()
+        raise RangeError("the server sent a different range")
+    return response, start
+
+def fetch_range(url, destination, start, end=None, chunk_size=CHUNK_SIZE,
+                progress=None, killed=None, timeout=TIMEOUT):
+    """fetch_range: writes the bytes of url from start up to end into the
+    file destination at the same position, and returns the position it
+    started writing at. With no end, a server that ignores the range is
+    read from the beginning and destination is truncated first, so 0 is
+    returned. With an end, RangeError is raised instead, as the rest of
+    the file is being written by other ranges.
+
+    Keyword arguments:
+    url -- the http URL
+    destination -- the name of an existing file to write into
+    start -- the first byte to read
+    end -- the byte after the last one to read, None to read to the end
+    chunk_size -- the most bytes to read at a time
+    progress -- optional function called with the position and the
+      content of each chunk after it is written
+    killed -- optional function that returns True to stop early
+    timeout -- seconds to wait for the server
+
+    """
+
+    response, first = open_range(url, start, end, timeout)
+    position = first
+    try:
+        if first != start and end is not None:
+            raise RangeError("the server ignored the range")
+        output = open(destination, "r+b")
+        try:
+            if first != start:
+                output.truncate(0)
+            output.seek(position)
+            while killed is None or not killed():
+                count = chunk_size
+                if end is not None:
+                    count = min(count, end - position)
+                    if count == 0:
+                        break
+                chunk = response.read(count)
+                if len(chunk) == 0:
+                    if end is not None:
+                        raise RangeError("the URL ended before the range")
+                    break
+                output.write(chunk)
+                if progress is not None:
+                    progress(position, chunk)
+                position += len(chunk)
+        finally:
+            output.close()
+    finally:
+        response.close()
+    return first
@@ -0,0 +1,374 @@
+### BEGIN LICENSE
+# Copyright (C) 2010 Rick Spencer rick.spencer@canonical.com
+#This program is free software: you can redistribute it and/or modify it
+#under the terms of the GNU General Public License version 3, as published
+#by the Free Software Foundation.
+#
+#This program is distributed in the hope that it will be useful, but
+#WITHOUT ANY WARRANTY; without even the implied warranties of
+#MERCHANTABILITY, SATISFACTORY QUALITY, or FITNESS FOR A PARTICULAR
+#PURPOSE.  See the GNU General Public License for more details.
+#
+#You should have received a copy of the GNU General Public License along
+#with this program.  If not, see <http://www.gnu.org/licenses/>.
+### END LICENSE
+
+"""A trigram index for searching every column of a grid
+TrigramIndex keeps, for every run of three characters, the set of rows
+with a value containing it. A search for some text only looks at the
+rows that have all of its trigrams, so it does not test every value of
+every row. Searches ignore case. StoreSearch keeps a TrigramIndex for
+the searchable columns of a store as rows are added, edited, removed
+and sorted, and is used by DictionaryGrid.search and the search box
+of a GridFilter. This module does not use gtk.
+
+Using
+index = TrigramIndex()
+index.add(1, ["Blue pen", "acme"])
+index.add(2, ["red pen", "initech"])
+print index.search("PEN")
+
+columns = grid_model.build_columns(["name", "customer"])
+search = StoreSearch(columns)
+search.reset(rows)
+print search.mask("acme")
+
+Extending
+A column model is searched unless its searchable class variable is
+False. Its display values are searched.
+
+"""
+
+def trigrams(text):
+    """trigrams - returns a set of the runs of three characters in text.
+
+    arguments:
+    text - the text, already lower case
+
+    """
+
+    return set([text[i:i + 3] for i in xrange(len(text) - 2)])
+
+class TrigramIndex(object):
+    """TrigramIndex - finds the rows with a value containing some text.
+
+    """
+
+    def __init__(self):
+        self.__postings = {}
+        self.__texts = {}
+
+    def __len__(self):
+        return len(self.__texts)
+
+    def texts(self, row_key):
+        """texts - returns a tuple of the values indexed for a row, in
+        lower case, or None if the row is not indexed.
+
+        arguments:
+        row_key - the key the row was added with
+
+        """
+
+        return self.__texts.get(row_key)
+
+    def add(self, row_key, texts):
+        """add - indexes the values of a row.
+
+        arguments:
+        row_key - a hashable key for the row
+
+        texts - the values of the row to search, as strings
+
+        """
+
+        texts = tuple([t.lower() for t in texts])
+        self.__texts[row_key] = texts
+        postings = self.__postings
+        for trigram in self.__row_trigrams(texts):
+            posting = postings.get(trigram)
+            if posting is None:
+                postings[trigram] = set([row_key])
+            else:
+                posting.add(row_key)
+
+    def remove(self, row_key):
+        """remove - stops finding a row.
+
+        arguments:
+        row_key - the key the row was added with
+
+        """
+
+        texts = self.__texts.pop(row_key, None)
+        if texts is None:
+            return
+        self.__discard(row_key, self.__row_trigrams(texts))
+
+    def update(self, row_key, texts):
+        """update - indexes the new values of a row, only changing the
+        postings of the trigrams that were added or removed.
+
+        arguments:
+        row_key - the key the row was added with
+
+        texts - the new values of the row
+
+        """
+
+        texts = tuple([t.lower() for t in texts])
+        old = self.__texts.get(row_key)
+        if old == texts:
+            return
+        if old is None:
+            self.add(row_key, texts)
+            return
+        old_trigrams = self.__row_trigrams(old)
+        new_trigrams = self.__row_trigrams(texts)
+        self.__texts[row_key] = texts
+        self.__discard(row_key, old_trigrams - new_trigrams)
+        postings = self.__postings
+        for trigram in new_trigrams - old_trigrams:
+            postings.setdefault(trigram, set()).add(row_key)
+
+    def search(self, text):
+        """search - returns a set of the keys of the rows with a value
+        that contains text, ignoring case.
+
+        arguments:
+        text - the text to find
+
+        """
+
+        text = text.lower()
+        query = trigrams(text)
+        if len(query) == 0:
+            #too short to have trigrams, so test every row
+            candidates = self.__texts.keys()
+        else:
+            postings = []
+            for trigram in query:
+                posting = self.__postings.get(trigram)
+                if posting is None:
+                    return set()
+                postings.append(posting)
+            postings.sort(key=len)
+            candidates = postings[0]
+            for posting in postings[1:]:
+                candidates = candidates & posting
+                if len(candidates) == 0:
+                    return set()
+        #having every trigram does not mean having them in order
+        texts = self.__texts
+        return set([k for k in candidates
+                    if any(text in t for t in texts[k])])
+
+    def __row_trigrams(self, texts):
+        found = set()
+        for text in texts:
+            found.update(trigrams(text))
+        return found
+
+    def __discard(self, row_key, row_trigrams):
+        postings = self.__postings
+        for trigram in row_trigrams:
+            posting = postings.get(trigram)
+            if posting is not None:
+                posting.discard(row_key)
+                if len(posting) == 0:
+                    del postings[trigram]
+
+class StoreSearch(object):
+    """StoreSearch - keeps a TrigramIndex for the rows of a store by
+    being told about each change to it. Each row is indexed under a key
+    of its own, given out by the StoreSearch, so rows sharing a
+    dictionary are still told apart. When the rows are sorted, the keys
+    are matched up again by the dictionary or row id stored with each
+    row, so sorting does not index them again. Not typically created
+    directly, but by DictionaryGrid.search_index.
+
+    """
+
+    def __init__(self, columns):
+        """Creates a StoreSearch
+
+        arguments:
+        columns - the column models of the store. Columns that are not
+        searchable are left out.
+
+        """
+
+        self.set_columns(columns)
+
+    def set_columns(self, columns, visible_index=None):
+        """set_columns - starts again with new column models, for a store
+        that was replaced.
+
+        arguments:
+        columns - the column models of the new store
+
+        keyword arguments:
+        visible_index - not used, rows are found whether they are
+        visible or not
+
+        """
+
+        self.columns = [c for c in columns if c.searchable]
+        self.dictionary_index = None
+        if len(columns) > 0:
+            self.dictionary_index = columns[0].dictionary_index
+        self.index = TrigramIndex()
+        self.__keys = []
+        self.__identities = []
+        self.__next_key = 0
+
+    def search(self, text):
+        """search - returns a list of the positions of the rows with a
+        value in a searchable column that contains text, ignoring case.
+
+        arguments:
+        text - the text to find
+
+        """
+
+        found = self.index.search(text)
+        return [i for i, k in enumerate(self.__keys) if k in found]
+
+    def mask(self, text):
+        """mask - returns a list with a boolean for each row that is True
+        if the row contains text, ignoring case.
+
+        arguments:
+        text - the text to find
+
+        """
+
+        found = self.index.search(text)
+        return [k in found for k in self.__keys]
+
+    def row_matches(self, row, text):
+        """row_matches - returns True if a row contains text, testing the
+        row itself rather than the index.
+
+        arguments:
+        row - the row
+
+        text - the text to find
+
+        """
+
+        text = text.lower()
+        return any(text in t.lower() for t in self.__texts(row))
+
+    def reset(self, rows):
+        """reset - forgets every row and indexes rows instead.
+
+        arguments:
+        rows - the rows of the store, in order
+
+        """
+
+        self.index = TrigramIndex()
+        self.__keys = []
+        self.__identities = []
+        for row in rows:
+            self.__add(len(self.__keys), row)
+
+    def rows_reordered(self, rows):
+        """rows_reordered - follows the new order of the rows of the store,
+        without indexing them again.
+
+        arguments:
+        rows - the rows of the store, in their new order
+
+        """
+
+        by_identity = {}
+        for key, identity in zip(self.__keys, self.__identities):
+            by_identity.setdefault(identity, []).append(key)
+        self.__keys = []
+        self.__identities = []
+        for row in rows:
+            identity = self.__identity(row)
+            keys = by_identity.get(identity)
+            if not keys:
+                #not a row the store had, which a reorder should not do
+                self.__add(len(self.__keys), row)
+                continue
+            self.__keys.append(self.__take_key(keys, row))
+            self.__identities.append(identity)
+        for keys in by_identity.values():
+            for key in keys:
+                self.index.remove(key)
+
+    def row_inserted(self, index, row):
+        """row_inserted - indexes a row added to the store.
+
+        arguments:
+        index - the position of the new row
+
+        row - the new row
+
+        """
+
+        self.__add(index, row)
+
+    def row_changed(self, index, row):
+        """row_changed - indexes the new values of a row.
+
+        arguments:
+        index - the position of the row
+
+        row - the row with its new values
+
+        """
+
+        self.__identities[index] = self.__identity(row)
+        self.index.update(self.__keys[index], self.__texts(row))
+
+    def row_deleted(self, index):
+        """row_deleted - stops finding a row removed from the store.
+
+        arguments:
+        index - the position the row had
+
+        """
+
+        self.__identities.pop(index)
+        self.index.remove(self.__keys.pop(index))
+
+    def __add(self, index, row):
+        key = self.__next_key
+        self.__next_key += 1
+        self.__keys.insert(index, key)
+        self.__identities.insert(index, self.__identity(row))
+        self.index.add(key, self.__texts(row))
+
+    def __take_key(self, keys, row):
+        """__take_key - internal function that removes and returns the key
+        of a row from the keys of the rows with the same dictionary, using
+        the indexed values to tell them apart.
+
+        """
+
+        if len(keys) > 1:
+            texts = tuple([t.lower() for t in self.__texts(row)])
+            for i, key in enumerate(keys):
+                if self.index.texts(key) == texts:
+                    return keys.pop(i)
+        return keys.pop(0)
+
+    def __identity(self, row):
+        stored = row[self.dictionary_index]
+        if isinstance(stored, (int, long)):
+            #a row id in a column_store.ColumnStore
+            return stored
+        return id(stored)
+
+    def __texts(self, row):
+        texts = []
+        for column in self.columns:
+            display = column.cell_display_val(row[column.index])
+            if isinstance(display, basestring):
+                texts.append(display)
+        return texts
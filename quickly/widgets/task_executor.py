@@ -0,0 +1,545 @@
+### BEGIN LICENSE
+# Copyright (C) 2010 Rick Spencer rick.spencer@canonical.com
+#This program is free software: you can redistribute it and/or modify it
+#under the terms of the GNU General Public License version 3, as published
+#by the Free Software Foundation.
+#
+#This program is distributed in the hope that it will be useful, but
+#WITHOUT ANY WARRANTY; without even the implied warranties of
+#MERCHANTABILITY, SATISFACTORY QUALITY, or FITNESS FOR A PARTICULAR
+#PURPOSE.  See the GNU General Public License for more details.
+#
+#You should have received a copy of the GNU General Public License along
+#with this program.  If not, see <http://www.gnu.org/licenses/>.
+### END LICENSE
+
+"""A shared, bounded pool of worker threads for long running tasks
+A TaskExecutor runs tasks from a priority queue on at most max_workers
+threads, so many AsynchTaskProgressBoxes can share a few threads rather
+than starting one each. TaskExecutor does not use gtk, on_complete is
+called on the worker thread.
+
+Using
+#create an executor and submit a task to it
+executor = TaskExecutor(max_workers=4)
+task = executor.submit(run_function, params, on_complete)
+
+#the function gets the same params as with an AsynchTaskProgressBox
+def run_function(params):
+    while not params["kill"]:
+        ...
+    return result
+
+#stop a task. Tasks that have not started yet will not run at all
+task.kill()
+
+#hand results to the main loop in batches while the task runs, put
+#blocks while the consumer is max_batches behind
+channel = ResultChannel(max_batches=8, on_put=schedule_drain)
+def run_function(params):
+    for rows in fetch_pages():
+        if not channel.put(rows):
+            return
+
+Configuring
+#use the executor shared by all of quickly.widgets
+executor = default_executor()
+
+#run a task before tasks with a lower priority
+executor.submit(run_function, params, on_complete, priority=10)
+
+#have AsynchTaskProgressBoxes share the executor
+box = AsynchTaskProgressBox(run_function, params, executor=executor)
+
+#run cpu bound tasks in worker processes so they do not hold the GIL,
+#run_function, params and the result must be picklable, so run_function
+#has to be a module level function
+executor = ProcessTaskExecutor()
+box = AsynchTaskProgressBox(checksum_files, params, executor=executor)
+
+Extending
+Derive from TaskExecutor and override _run_task to change how a task's
+function is run by a worker.
+
+"""
+
+import heapq
+import Queue
+import sys
+import threading
+import traceback
+
+#the number of workers for default_executor
+DEFAULT_MAX_WORKERS = 4
+
+#seconds to wait before checking again whether a task was killed or
+#a ResultChannel was closed
+POLL_INTERVAL = 0.05
+
+#params that belong to the calling process and are replaced in the
+#worker process of a ProcessTaskExecutor
+_PROCESS_LOCAL_PARAMS = ("kill", "update_progress_function",
+                         "partial_results_function")
+
+#the number of batches a ResultChannel holds before put blocks
+DEFAULT_MAX_BATCHES = 16
+
+class Task(object):
+    """Task: a function and its params submitted to a TaskExecutor.
+    Not typically created directly, but returned from TaskExecutor.submit.
+
+    """
+
+    PENDING = "pending"
+    RUNNING = "running"
+    DONE = "done"
+    KILLED = "killed"
+
+    def __init__(self, run_function, params, on_complete, priority):
+        self.run_function = run_function
+        if params is None:
+            params = {}
+        params["kill"] = False
+        self.params = params
+        self.on_complete = on_complete
+        self.priority = priority
+        self.state = Task.PENDING
+
+    def kill(self):
+        """kill: tells the task's function that it should stop by setting
+        params["kill"] to True. A task that has not started will not run.
+
+        """
+
+        self.params["kill"] = True
+        if self.state == Task.PENDING:
+            self.state = Task.KILLED
+
+class ResultChannel(object):
+    """ResultChannel: a bounded queue for passing batches of partial
+    results from a task to a consumer. put blocks while the channel is
+    full, so a task can not get further ahead of its consumer than
+    max_batches.
+
+    """
+
+    def __init__(self, max_batches=DEFAULT_MAX_BATCHES, on_put=None):
+        """Create a ResultChannel
+
+        Keyword arguments:
+        max_batches -- the number of batches to hold before put blocks,
+        0 to never block
+        on_put -- optional function called on the producing thread after
+        each batch is put, for example to schedule the consumer
+
+        """
+
+        self.on_put = on_put
+        self.__queue = Queue.Queue(max_batches)
+        self.__closed = False
+
+    def put(self, batch):
+        """put: adds a batch of results, waiting while the channel is full.
+        Returns False, dropping the batch, if the channel is closed.
+
+        Keyword arguments:
+        batch -- a list of results
+
+        """
+
+        while not self.__closed:
+            try:
+                self.__queue.put(batch, True, POLL_INTERVAL)
+            except Queue.Full:
+                continue
+            if self.on_put is not None:
+                self.on_put()
+            return True
+        return False
+
+    def get_batches(self):
+        """get_batches: returns a list of the batches in the channel
+        without waiting. Returns an empty list if there are none.
+
+        """
+
+        batches = []
+        while True:
+            try:
+                batches.append(self.__queue.get_nowait())
+            except Queue.Empty:
+                return batches
+
+    def close(self):
+        """close: stops the channel from taking more batches and wakes
+        up a producer waiting in put.
+
+        """
+
+        self.__closed = True
+
+    @property
+    def closed(self):
+        """closed - True once close has been called.
+        This property is read only.
+
+        """
+
+        return self.__closed
+
+class TaskExecutor(object):
+    """TaskExecutor: runs submitted tasks on a bounded pool of worker
+    threads in priority order.
+
+    """
+
+    def __init__(self, max_workers=DEFAULT_MAX_WORKERS):
+        """Create a TaskExecutor
+
+        Keyword arguments:
+        max_workers -- the most tasks to run at the same time. Worker
+        threads are only started as they are needed.
+
+        """
+
+        self.max_workers = max_workers
+        self.__queue = []
+        self.__sequence = 0
+        self.__workers = []
+        self.__idle_workers = 0
+        self.__running = 0
+        self.__shutdown = False
+        self.__condition = threading.Condition()
+
+    def submit(self, run_function, params=None, on_complete=None, priority=0):
+        """submit: queues run_function to be run by a worker and returns
+        a Task.
+
+        Keyword arguments:
+        run_function -- the function to run, it is passed params
+        params -- optional dictionary of parameters to pass to run_function
+        on_complete -- optional function called with the return value of
+        run_function. Called on the worker thread.
+        priority -- tasks with a higher priority run first, tasks with
+        the same priority run in the order they were submitted
+
+        """
+
+        task = Task(run_function, params, on_complete, priority)
+        self.__condition.acquire()
+        try:
+            if self.__shutdown:
+                raise RuntimeError("TaskExecutor has been shut down.")
+            #heapq pops the smallest item, so negate the priority
+            heapq.heappush(self.__queue, (-priority, self.__sequence, task))
+            self.__sequence += 1
+            if self.__idle_workers == 0 and len(self.__workers) < self.max_workers:
+                worker = threading.Thread(target=self.__work)
+                worker.setDaemon(True)
+                self.__workers.append(worker)
+                worker.start()
+            else:
+                self.__condition.notify()
+        finally:
+            self.__condition.release()
+        return task
+
+    @property
+    def pending(self):
+        """pending - the number of tasks waiting for a worker.
+        This property is read only.
+
+        """
+
+        self.__condition.acquire()
+        try:
+            return len([t for p, s, t in self.__queue if t.state == Task.PENDING])
+        finally:
+            self.__condition.release()
+
+    @property
+    def running(self):
+        """running - the number of tasks being run by workers.
+        This property is read only.
+
+        """
+
+        return self.__running
+
+    def shutdown(self, wait=True):
+        """shutdown: stops the workers once the queued tasks have run.
+        No more tasks can be submitted.
+
+        Keyword arguments:
+        wait -- True to block until the workers have stopped
+
+        """
+
+        self.__condition.acquire()
+        try:
+            self.__shutdown = True
+            self.__condition.notifyAll()
+        finally:
+            self.__condition.release()
+        if wait:
+            for worker in self.__workers:
+                if worker is not threading.currentThread():
+                    worker.join()
+
+    def __next_task(self):
+        """__next_task: internal function that blocks until there is a
+        task to run and returns it, or returns None on shutdown.
+
+        """
+
+        self.__condition.acquire()
+        try:
+            while True:
+                while len(self.__queue) > 0:
+                    task = heapq.heappop(self.__queue)[2]
+                    if task.state == Task.PENDING:
+                        task.state = Task.RUNNING
+                        self.__running += 1
+                        return task
+                if self.__shutdown:
+                    return None
+                self.__idle_workers += 1
+                self.__condition.wait()
+                self.__idle_workers -= 1
+        finally:
+            self.__condition.release()
+
+    def __work(self):
+        """__work: internal function run by each worker thread."""
+
+        while True:
+            task = self.__next_task()
+            if task is None:
+                return
+            try:
+                self._run_task(task)
+            finally:
+                task.state = Task.DONE
+                self.__condition.acquire()
+                self.__running -= 1
+                self.__condition.release()
+
+    def _run_task(self, task):
+        """_run_task: runs a task's function and passes the result to
+        the task's on_complete function. Called on a worker thread.
+
+        """
+
+        try:
+            data = task.run_function(task.params)
+        except Exception:
+            traceback.print_exc()
+            return
+        if task.on_complete is not None:
+            task.on_complete(data)
+
+class ProcessTaskExecutor(TaskExecutor):
+    """ProcessTaskExecutor: a TaskExecutor that runs each task's function
+    in a worker process, so that cpu bound tasks use more than one core
+    and do not hold the GIL while the UI is running.
+
+    Each worker thread owns a long lived process and passes it tasks over
+    a pipe. run_function and params are pickled, so run_function must be a
+    module level function. In the worker process, params["kill"] follows
+    Task.kill, params["update_progress_function"] sends the progress
+    back to the update_progress_function of the calling process and
+    params["partial_results_function"] does the same for partial results,
+    blocking while the calling process' function blocks. The
+    result is pickled back and passed to on_complete on the worker thread.
+
+    """
+
+    def __init__(self, max_workers=None):
+        """Create a ProcessTaskExecutor
+
+        Keyword arguments:
+        max_workers -- the most processes to run at the same time. Defaults
+        to the number of cpus.
+
+        """
+
+        import multiprocessing
+        if max_workers is None:
+            max_workers = multiprocessing.cpu_count()
+        TaskExecutor.__init__(self, max_workers)
+        self.__local = threading.local()
+        self.__processes = []
+        self.__processes_lock = threading.Lock()
+
+    def shutdown(self, wait=True):
+        """shutdown: stops the workers and their processes once the
+        queued tasks have run. No more tasks can be submitted.
+
+        Keyword arguments:
+        wait -- True to block until the workers have stopped
+
+        """
+
+        TaskExecutor.shutdown(self, wait)
+        self.__processes_lock.acquire()
+        try:
+            for process in self.__processes:
+                process.stop(wait)
+            self.__processes = []
+        finally:
+            self.__processes_lock.release()
+
+    def __process(self):
+        """__process: internal function that returns the worker process
+        of the calling worker thread, starting it if needed.
+
+        """
+
+        process = getattr(self.__local, "process", None)
+        if process is None or not process.is_alive():
+            process = _WorkerProcess()
+            self.__local.process = process
+            self.__processes_lock.acquire()
+            self.__processes.append(process)
+            self.__processes_lock.release()
+        return process
+
+    def _run_task(self, task):
+        """_run_task: sends a task to the worker process of the calling
+        worker thread and relays progress and kill requests until the
+        process sends back the result.
+
+        """
+
+        process = self.__process()
+        params = dict([(k, v) for k, v in task.params.items()
+                       if k not in _PROCESS_LOCAL_PARAMS])
+        process.kill_event.clear()
+        try:
+            process.connection.send((task.run_function, params))
+        except Exception:
+            traceback.print_exc()
+            return
+
+        while True:
+            if task.params["kill"]:
+                process.kill_event.set()
+            try:
+                if not process.connection.poll(POLL_INTERVAL):
+                    if not process.is_alive():
+                        raise EOFError()
+                    continue
+                message = process.connection.recv()
+            except (EOFError, IOError):
+                sys.stderr.write("worker process stopped while running %s\n"
+                                 % task.run_function)
+                return
+            if message[0] == "progress":
+                update = task.params.get("update_progress_function")
+                if update is not None:
+                    update(*message[1:])
+            elif message[0] == "partial":
+                put = task.params.get("partial_results_function")
+                if put is not None:
+                    put(message[1])
+            elif message[0] == "error":
+                sys.stderr.write(message[1])
+                return
+            else:
+                if task.on_complete is not None:
+                    task.on_complete(message[1])
+                return
+
+class _WorkerProcess(object):
+    """Class for use by ProcessTaskExecutor. Not for general use.
+
+    """
+
+    def __init__(self):
+        import multiprocessing
+        self.connection, child_connection = multiprocessing.Pipe()
+        self.kill_event = multiprocessing.Event()
+        self.process = multiprocessing.Process(target=_process_main,
+                                   args=(child_connection, self.kill_event))
+        self.process.daemon = True
+        self.process.start()
+
+    def is_alive(self):
+        return self.process.is_alive()
+
+    def stop(self, wait=True):
+        try:
+            self.connection.send(None)
+        except (IOError, ValueError):
+            pass
+        if wait:
+            self.process.join()
+
+class _ProcessParams(dict):
+    """Class for use by ProcessTaskExecutor. Not for general use.
+    The params passed to run_function in a worker process.
+
+    """
+
+    def __init__(self, params, kill_event, connection):
+        dict.__init__(self, params)
+        self.__kill_event = kill_event
+        self.__connection = connection
+        dict.__setitem__(self, "kill", False)
+        dict.__setitem__(self, "update_progress_function", self.__update)
+        dict.__setitem__(self, "partial_results_function", self.__put)
+
+    def __getitem__(self, key):
+        if key == "kill":
+            return self.__kill_event.is_set()
+        return dict.__getitem__(self, key)
+
+    def get(self, key, default=None):
+        if key in self:
+            return self[key]
+        return default
+
+    def __update(self, fraction=None, displaytext="Working"):
+        self.__connection.send(("progress", fraction, displaytext))
+
+    def __put(self, batch):
+        self.__connection.send(("partial", batch))
+        return not self.__kill_event.is_set()
+
+def _process_main(connection, kill_event):
+    """_process_main: runs tasks sent over connection in a worker process
+    until it receives None.
+
+    """
+
+    while True:
+        try:
+            job = connection.recv()
+        except (EOFError, IOError):
+            return
+        if job is None:
+            return
+        run_function, params = job
+        try:
+            data = run_function(_ProcessParams(params, kill_event, connection))
+            connection.send(("result", data))
+        except Exception:
+            connection.send(("error", traceback.format_exc()))
+
+_default_executor = None
+_default_executor_lock = threading.Lock()
+
+def default_executor():
+    """default_executor: returns a TaskExecutor shared by everything in
+    quickly.widgets that uses the default, created on first use.
+
+    """
+
+    global _default_executor
+    _default_executor_lock.acquire()
+    try:
+        if _default_executor is None:
+            _default_executor = TaskExecutor()
+        return _default_executor
+    finally:
+        _default_executor_lock.release()
@@ -0,0 +1,112 @@
+# -*- coding: utf-8 -*-
+### BEGIN LICENSE
+# Copyright (C) 2010 Rick Spencer rick.spencer@canonical.com
+#This program is free software: you can redistribute it and/or modify it
+#under the terms of the GNU General Public License version 3, as published
+#by the Free Software Foundation.
+#
+#This program is distributed in the hope that it will be useful, but
+#WITHOUT ANY WARRANTY; without even the implied warranties of
+#MERCHANTABILITY, SATISFACTORY QUALITY, or FITNESS FOR A PARTICULAR
+#PURPOSE.  See the GNU General Public License for more details.
+#
+#You should have received a copy of the GNU General Public License along
+#with this program.  If not, see <http://www.gnu.org/licenses/>.
+### END LICENSE
+
+"""Tests for the aggregates module"""
+
+from testtools import TestCase
+from quickly.widgets.aggregates import ColumnAggregate, StoreAggregates
+from quickly.widgets.aggregates import StoreValueCounts
+from quickly.widgets import grid_model
+
+class TestAggregates(TestCase):
+    """Test the ColumnAggregate and StoreAggregates functionality"""
+
+    def setUp(self):
+        TestCase.setUp(self)
+
+    def tearDown(self):
+        TestCase.tearDown(self)
+
+    def test_column_aggregate(self):
+        aggregate = ColumnAggregate()
+        self.assertEqual(aggregate.values(), {"count": 0, "sum": 0,
+                         "avg": None, "min": None, "max": None})
+        for val in [5, 1, 9, 1]:
+            aggregate.add(val)
+        aggregate.remove(9)
+        aggregate.remove(1)
+        self.assertEqual(aggregate.values(), {"count": 2, "sum": 6,
+                         "avg": 3.0, "min": 1, "max": 5})
+        aggregate.remove(1)
+        self.assertEqual(aggregate.min, 5)
+
+    def test_store_aggregates(self):
+        columns = grid_model.build_columns(["name", "price", "id"])
+        totals = StoreAggregates(columns, visible_index=4)
+        self.assertEqual([c.key for c in totals.columns], ["price", "id"])
+        calls = []
+        totals.add_listener(lambda: calls.append(1))
+        totals.row_inserted(0, ["a", "1.5", "", {}, True])
+        totals.row_inserted(0, ["b", "2.5", "3", {}, True])
+        totals.row_inserted(2, ["c", "", "4", {}, False])
+        self.assertEqual(totals.get("price")["sum"], 4.0)
+        self.assertEqual(totals.get("id")["count"], 1)
+
+        #edits and visibility changes replace the row's old values
+        totals.row_changed(2, ["c", "6.0", "4", {}, True])
+        totals.row_changed(0, ["b", "2.5", "3", {}, False])
+        self.assertEqual(totals.get("price")["sum"], 7.5)
+        self.assertEqual(totals.get("id")["max"], 4)
+        totals.row_deleted(1)
+        self.assertEqual(totals.get("price")["min"], 6.0)
+        self.assertEqual(len(calls), 6)
+
+    def test_compact_columns(self):
+        dicts = [{"size count": 3}, {"size count": 5}, {"size count": 3}]
+        model = grid_model.GridModel(dicts, compact_keys=["size count"])
+        totals = StoreAggregates(model.columns)
+        totals.reset(model.rows)
+        self.assertEqual(totals.get("size count")["sum"], 11)
+
+    def test_group_keys(self):
+        columns = grid_model.build_columns(["status", "who", "price"])
+        totals = StoreAggregates(columns, group_keys=["status", "who"])
+        totals.reset([["open", "a", "1.0", {}], ["open", "b", "2.0", {}],
+                      ["closed", "a", "4.0", {}]])
+        self.assertEqual(sorted(totals.children()), [("closed",), ("open",)])
+        self.assertEqual(sorted(totals.children(("open",))),
+                         [("open", "a"), ("open", "b")])
+        self.assertEqual(totals.group(("open",)).get("price")["sum"], 3.0)
+        self.assertEqual(totals.get("price")["sum"], 7.0)
+        self.assertEqual(totals.rows_in(("open", "b")), [1])
+        self.assertTrue(() in totals.take_changed_groups())
+
+        #moving a row to another group changes both and drops empty ones
+        totals.row_changed(1, ["closed", "a", "2.0", {}])
+        self.assertEqual(totals.take_changed_groups(),
+                         set([("open",), ("open", "b"), ("closed",),
+                              ("closed", "a")]))
+        self.assertEqual(totals.group(("open", "b")), None)
+        self.assertEqual(totals.children(("open",)), [("open", "a")])
+        self.assertEqual(totals.group(("closed", "a")).count, 2)
+        totals.row_deleted(0)
+        self.assertEqual(totals.group(("open",)), None)
+        self.assertEqual(totals.children(), [("closed",)])
+
+    def test_store_value_counts(self):
+        columns = grid_model.build_columns(["status", "price"])
+        statuses = StoreValueCounts("status")
+        statuses.set_columns(columns)
+        rows = [["open", "1.0", {}], ["closed", "2.0", {}],
+                ["open", "3.0", {}]]
+        statuses.reset(rows)
+        self.assertEqual(statuses.counts, {"open": 2, "closed": 1})
+        statuses.rows_reordered(list(reversed(rows)))
+        statuses.row_changed(0, ["closed", "3.0", {}])
+        statuses.row_inserted(1, ["", "4.0", {}])
+        self.assertEqual(statuses.counts, {"open": 1, "closed": 2, "": 1})
+        statuses.row_deleted(3)
+        self.assertEqual(statuses.counts, {"closed": 2, "": 1})
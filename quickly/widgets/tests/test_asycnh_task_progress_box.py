@@ -15,8 +15,23 @@
 
 """Tests for the AsyncTaskProgressBox"""
 
+import threading
+import time
 from testtools import TestCase
+import gobject
+import gtk
 from quickly.widgets.asynch_task_progressbox import AsynchTaskProgressBox
+from quickly.widgets.task_executor import TaskExecutor
+from quickly.widgets.coroutine_task import Return, TaskCancelled
+
+gobject.threads_init()
+
+def run_main_loop(until, timeout=5):
+    """runs the main loop until the function until returns True"""
+    deadline = time.time() + timeout
+    while not until() and time.time() < deadline:
+        gtk.main_iteration(False)
+        time.sleep(.001)
 
 class TestAsynchTaskProgessBox(TestCase):
     """Test the CouchGrid functionality"""
@@ -32,6 +47,98 @@ class TestAsynchTaskProgessBox(TestCase):
         box = AsynchTaskProgressBox(self.asynch_function)
         self.assertEqual((box != None), True)
 
+    def test_complete_on_main_loop(self):
+        """Ensure complete is emitted on the main thread"""
+        results = []
+        def on_complete(widget, data):
+            results.append((data, threading.currentThread()))
+        box = AsynchTaskProgressBox(lambda params: "done")
+        box.connect("complete", on_complete)
+        box.start()
+        run_main_loop(lambda: len(results) > 0)
+        self.assertEqual(results[0][0], "done")
+        self.assertTrue(results[0][1] is threading.currentThread())
+
+    def test_updates_are_coalesced(self):
+        """Ensure many updates lead to the latest value being shown"""
+        done = []
+        def run(params):
+            for x in range(1000):
+                params["update_progress_function"](x / 1000.0, str(x))
+            time.sleep(.2)
+            return x
+        box = AsynchTaskProgressBox(run)
+        box.connect("complete", lambda widget, data: done.append(data))
+        box.start()
+        run_main_loop(lambda: box.progressbar.get_text() == "999")
+        self.assertEqual(box.progressbar.get_text(), "999")
+        run_main_loop(lambda: len(done) > 0)
+        self.assertEqual(done, [999])
+
+    def test_start_twice(self):
+        box = AsynchTaskProgressBox(lambda params: time.sleep(.1))
+        box.start()
+        self.assertRaises(RuntimeError, box.start)
+        box.kill()
+
+    def test_executor(self):
+        """Ensure a box can run its task on a shared executor"""
+        done = []
+        executor = TaskExecutor(max_workers=1)
+        box = AsynchTaskProgressBox(lambda params: "done", executor=executor)
+        box.connect("complete", lambda widget, data: done.append(data))
+        box.start()
+        run_main_loop(lambda: len(done) > 0)
+        self.assertEqual(done, ["done"])
+        executor.shutdown()
+
+    def test_partial_results(self):
+        """Ensure partial results all arrive before complete"""
+        events = []
+        def run(params):
+            for x in range(100):
+                params["partial_results_function"]([x])
+            return "done"
+        box = AsynchTaskProgressBox(run)
+        box.connect("partial-results",
+                    lambda widget, results: events.extend(results))
+        box.connect("complete", lambda widget, data: events.append(data))
+        box.start()
+        run_main_loop(lambda: "done" in events)
+        self.assertEqual(events, range(100) + ["done"])
+
+    def test_coroutine(self):
+        """Ensure generator functions run on the main thread"""
+        done = []
+        threads = []
+        def run(params):
+            threads.append(threading.currentThread())
+            yield .01
+            params["partial_results_function"](["row"])
+            raise Return("done")
+        box = AsynchTaskProgressBox(run)
+        box.connect("complete", lambda widget, data: done.append(data))
+        box.start()
+        run_main_loop(lambda: len(done) > 0)
+        self.assertEqual(done, ["done"])
+        self.assertTrue(threads[0] is threading.currentThread())
+
+    def test_coroutine_cancel(self):
+        """Ensure cancel raises TaskCancelled in the coroutine"""
+        done = []
+        def run(params):
+            try:
+                yield 60
+            except TaskCancelled:
+                raise Return("cancelled")
+        box = AsynchTaskProgressBox(run)
+        box.connect("complete", lambda widget, data: done.append(data))
+        box.start()
+        run_main_loop(lambda: False, .1)
+        box.cancel()
+        run_main_loop(lambda: len(done) > 0)
+        self.assertEqual(done, ["cancelled"])
+
     #A function to run asynchronously
     def asynch_function( self, params ):
         #pull values from the params that were set above
@@ -0,0 +1,123 @@
+# -*- coding: utf-8 -*-
+### BEGIN LICENSE
+# Copyright (C) 2010 Rick Spencer rick.spencer@canonical.com
+#This program is free software: you can redistribute it and/or modify it
+#under the terms of the GNU General Public License version 3, as published
+#by the Free Software Foundation.
+#
+#This program is distributed in the hope that it will be useful, but
+#WITHOUT ANY WARRANTY; without even the implied warranties of
+#MERCHANTABILITY, SATISFACTORY QUALITY, or FITNESS FOR A PARTICULAR
+#PURPOSE.  See the GNU General Public License for more details.
+#
+#You should have received a copy of the GNU General Public License along
+#with this program.  If not, see <http://www.gnu.org/licenses/>.
+### END LICENSE
+
+"""Tests for the ColumnStore"""
+
+import array
+import gc
+from testtools import TestCase
+from quickly.widgets.column_store import ColumnStore
+from quickly.widgets import grid_model
+
+class TestColumnStore(TestCase):
+    """Test the ColumnStore functionality"""
+
+    def setUp(self):
+        TestCase.setUp(self)
+        columns = grid_model.build_columns(["name", "price", "id", "done?"])
+        self.store = ColumnStore(columns)
+
+    def tearDown(self):
+        TestCase.tearDown(self)
+
+    def test_typed_columns(self):
+        self.store.append({"name": "a", "price": 1.5, "id": 3, "done?": True})
+        self.assertTrue(isinstance(self.store.column("price"), array.array))
+        self.assertEqual(self.store.column("price").typecode, "d")
+        self.assertEqual(self.store.column("id").typecode, "l")
+        self.assertEqual(self.store.column("done?").typecode, "b")
+        self.assertEqual(self.store.column("name"), ["a"])
+
+    def test_dictionary(self):
+        row_id = self.store.append({"name": "a", "done?": False,
+                                    "__couch_id": "x"})
+        dictionary = self.store.dictionary(row_id)
+        self.assertEqual(dictionary, {"name": "a", "done?": False,
+                                      "__couch_id": "x"})
+        self.assertTrue(dictionary["done?"] is False)
+        self.assertTrue(self.store.dictionary(row_id) is dictionary)
+        self.assertEqual(self.store.get_value(row_id, "price"), None)
+
+    def test_dictionary_released(self):
+        row_id = self.store.append({"name": "a"})
+        dictionary = self.store.dictionary(row_id)
+        dictionary["extra"] = 1
+        del dictionary
+        gc.collect()
+        self.assertEqual(self.store.dictionary(row_id),
+                         {"name": "a", "extra": 1})
+
+    def test_set_through_dictionary(self):
+        row_id = self.store.append({"name": "a", "price": 1.0})
+        dictionary = self.store.dictionary(row_id)
+        dictionary["price"] = "2.5"
+        self.assertEqual(self.store.column("price")[row_id], 2.5)
+        self.assertEqual(dictionary["price"], 2.5)
+        del dictionary["name"]
+        self.assertEqual(self.store.get_value(row_id, "name"), None)
+        self.store.set_value(row_id, "id", 7)
+        self.assertEqual(dictionary["id"], 7)
+
+    def test_dict_methods_write_through(self):
+        row_id = self.store.append({"name": "a", "price": 1.0, "id": 1})
+        dictionary = self.store.dictionary(row_id)
+        dictionary.update({"price": "3.5"}, extra=1)
+        self.assertEqual(self.store.column("price")[row_id], 3.5)
+        self.assertEqual(dictionary.setdefault("done?", True), True)
+        self.assertEqual(dictionary.setdefault("done?", False), True)
+        self.assertEqual(self.store.get_value(row_id, "done?"), True)
+        self.assertEqual(dictionary.pop("name"), "a")
+        self.assertEqual(dictionary.pop("name", None), None)
+        self.assertEqual(self.store.get_value(row_id, "name"), None)
+        key, val = dictionary.popitem()
+        self.assertEqual(self.store.get_value(row_id, key), None)
+        dictionary.clear()
+        del dictionary
+        gc.collect()
+        self.assertEqual(self.store.dictionary(row_id), {})
+
+    def test_remove(self):
+        ids = [self.store.append({"id": i}) for i in range(3)]
+        self.store.remove(ids[1])
+        self.store.remove(ids[1])
+        self.assertEqual(len(self.store), 2)
+        self.assertEqual(self.store.row_count, 3)
+        self.assertTrue(self.store.is_removed(ids[1]))
+        self.assertEqual(self.store.live_ids(), [0, 2])
+        self.assertEqual([d["id"] for d in self.store.dictionaries()], [0, 2])
+
+    def test_table_bytes(self):
+        for i in range(10):
+            self.store.append({"name": "a", "id": i})
+        self.assertTrue(self.store.table_bytes() > 0)
+
+    def test_numpy_column(self):
+        try:
+            import numpy
+        except ImportError:
+            self.skipTest("numpy is not installed")
+        for i in range(4):
+            self.store.append({"price": i * 1.5})
+        self.store.append({"name": "no price"})
+        self.store.remove(0)
+        values, present = self.store.numpy_column("price")
+        live = self.store.numpy_live()
+        self.assertEqual(values[present & live].sum(), 9.0)
+
+        #the arrays are copies, so adding rows does not change them
+        self.store.append({"price": 100.0})
+        self.assertEqual(len(values), 5)
+        self.assertEqual(values[present & live].sum(), 9.0)
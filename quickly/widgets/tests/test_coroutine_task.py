@@ -0,0 +1,163 @@
+# -*- coding: utf-8 -*-
+### BEGIN LICENSE
+# Copyright (C) 2010 Rick Spencer rick.spencer@canonical.com
+#This program is free software: you can redistribute it and/or modify it
+#under the terms of the GNU General Public License version 3, as published
+#by the Free Software Foundation.
+#
+#This program is distributed in the hope that it will be useful, but
+#WITHOUT ANY WARRANTY; without even the implied warranties of
+#MERCHANTABILITY, SATISFACTORY QUALITY, or FITNESS FOR A PARTICULAR
+#PURPOSE.  See the GNU General Public License for more details.
+#
+#You should have received a copy of the GNU General Public License along
+#with this program.  If not, see <http://www.gnu.org/licenses/>.
+### END LICENSE
+
+"""Tests for the CoroutineTask"""
+
+from testtools import TestCase
+from quickly.widgets.coroutine_task import CoroutineTask, Future, Return
+from quickly.widgets.coroutine_task import TaskCancelled
+
+class FakeScheduler(object):
+    """A scheduler that runs steps in order of a pretend clock"""
+
+    def __init__(self):
+        self.now = 0
+        self.calls = {}
+        self.next_handle = 0
+
+    def call_soon(self, function, *args):
+        return self.call_later(0, function, *args)
+
+    def call_later(self, seconds, function, *args):
+        self.next_handle += 1
+        self.calls[self.next_handle] = (self.now + seconds, function, args)
+        return self.next_handle
+
+    def cancel(self, handle):
+        del self.calls[handle]
+
+    def run_one(self):
+        handle = min(self.calls, key=lambda h: (self.calls[h][0], h))
+        when, function, args = self.calls.pop(handle)
+        self.now = when
+        function(*args)
+
+    def run(self):
+        while len(self.calls) > 0:
+            self.run_one()
+
+class TestCoroutineTask(TestCase):
+    """Test the CoroutineTask functionality"""
+
+    def setUp(self):
+        TestCase.setUp(self)
+        self.scheduler = FakeScheduler()
+        self.results = []
+
+    def tearDown(self):
+        TestCase.tearDown(self)
+
+    def start(self, run_function, params=None):
+        task = CoroutineTask(run_function, params, self.results.append,
+                             self.scheduler)
+        task.start()
+        return task
+
+    def test_return(self):
+        def run(params):
+            yield None
+            raise Return(params["x"] * 2)
+        task = self.start(run, {"x": 21})
+        self.scheduler.run()
+        self.assertEqual(self.results, [42])
+        self.assertEqual(task.state, CoroutineTask.DONE)
+        self.assertEqual(task.future.result(), 42)
+
+    def test_sleep(self):
+        def run(params):
+            yield 1.5
+            raise Return(self.scheduler.now)
+        self.start(run)
+        self.scheduler.run()
+        self.assertEqual(self.results, [1.5])
+
+    def test_interleaved(self):
+        order = []
+        def run(params):
+            for x in range(2):
+                order.append((params["name"], x))
+                yield None
+        self.start(run, {"name": "a"})
+        self.start(run, {"name": "b"})
+        self.scheduler.run()
+        self.assertEqual(order, [("a", 0), ("b", 0), ("a", 1), ("b", 1)])
+        self.assertEqual(self.results, [None, None])
+
+    def test_future(self):
+        future = Future()
+        def run(params):
+            value = yield future
+            raise Return(value)
+        self.start(run)
+        self.scheduler.run()
+        self.assertEqual(self.results, [])
+        future.set_result("done")
+        self.scheduler.run()
+        self.assertEqual(self.results, ["done"])
+
+    def test_future_exception(self):
+        future = Future()
+        def run(params):
+            try:
+                yield future
+            except ValueError:
+                raise Return("caught")
+        self.start(run)
+        future.set_exception(ValueError())
+        self.scheduler.run()
+        self.assertEqual(self.results, ["caught"])
+
+    def test_nested_generator(self):
+        def child():
+            yield 1
+            raise Return("child")
+        def run(params):
+            value = yield child()
+            raise Return(value + " and parent")
+        self.start(run)
+        self.scheduler.run()
+        self.assertEqual(self.results, ["child and parent"])
+
+    def test_kill_raises_in_coroutine(self):
+        cleaned_up = []
+        def run(params):
+            try:
+                yield 100
+            except TaskCancelled:
+                cleaned_up.append(params["kill"])
+                raise Return("stopped")
+        task = self.start(run)
+        self.scheduler.run_one()
+        task.kill()
+        self.scheduler.run()
+        self.assertEqual(cleaned_up, [True])
+        self.assertEqual(self.results, ["stopped"])
+        self.assertEqual(task.state, CoroutineTask.KILLED)
+        self.assertEqual(self.scheduler.now, 0)
+
+    def test_kill_uncaught(self):
+        future = Future()
+        def run(params):
+            yield future
+        task = self.start(run)
+        self.scheduler.run()
+        task.kill()
+        self.scheduler.run()
+        self.assertEqual(self.results, [])
+        self.assertTrue(isinstance(task.future.exception(), TaskCancelled))
+        #the future no longer resumes the killed coroutine
+        future.set_result(None)
+        self.assertEqual(len(self.scheduler.calls), 0)
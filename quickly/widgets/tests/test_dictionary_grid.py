@@ -274,3 +274,98 @@ class TestDictionaryGrid(TestCase):
         for c in grid.columns:
             self.assertTrue(grid.columns[c].get_title() in ("KEY1","KEY2","KEY3"))
 
+
+    def test_compact_keys(self):
+        """test storing a column with few distinct values as codes"""
+        dicts = [{"status": "open", "done?": True},
+                 {"status": "closed", "done?": False},
+                 {"status": "open", "done?": True}]
+        grid = DictionaryGrid(dicts, keys=["status", "done?"],
+                              compact_keys=["status", "done?"])
+        model = grid.get_model()
+        self.assertEqual(model.get_column_type(0), gobject.TYPE_INT)
+        self.assertEqual([r[0] for r in model], [0, 1, 0])
+        self.assertEqual(grid.columns["done?"].encoder, None)
+        self.assertTrue(dicts[0]["status"] is dicts[2]["status"])
+        self.assertTrue(grid.bytes_per_row() > 0)
+
+        #sorting uses the values, not the codes, the first sort is
+        #descending
+        grid.columns["status"].sort_rows(grid.columns["status"])
+        self.assertEqual([r[-1]["status"] for r in model],
+                         ["open", "open", "closed"])
+
+    def test_columnar(self):
+        """test keeping the dictionaries in a ColumnStore"""
+        dicts = [{"name": "a", "price": 1.0}, {"name": "b", "price": 2.0},
+                 {"name": "c", "price": 3.0}]
+        grid = DictionaryGrid(dicts, columnar=True)
+        self.assertEqual(grid.get_model().get_column_type(2), gobject.TYPE_INT)
+        self.assertEqual(list(grid.row_store.column("price")), [1.0, 2.0, 3.0])
+        self.assertEqual(grid.rows, dicts)
+        self.assertEqual(grid.get_dictionaries_copy(), dicts)
+
+        #a change to a dictionary handed out changes the store
+        grid.rows[1]["price"] = 5.0
+        self.assertEqual(grid.row_store.get_value(1, "price"), 5.0)
+
+        grid.get_selection().select_path((0,))
+        self.assertEqual(grid.selected_rows, [dicts[0]])
+        grid.remove_selected_rows()
+        self.assertEqual(len(grid.row_store), 2)
+        self.assertEqual([d["name"] for d in grid.rows], ["b", "c"])
+
+        #rebuilding keeps the rows
+        grid.keys = ["name"]
+        self.assertEqual([d["name"] for d in grid.rows], ["b", "c"])
+
+    def test_columnar_filtered(self):
+        """test a columnar grid without keys once a GridFilter is attached"""
+        from quickly.widgets.grid_filter import GridFilter
+        dicts = [{"name": "a", "price": 1.0}, {"name": "b", "price": 2.0}]
+        grid = DictionaryGrid(dicts, columnar=True)
+        self.assertEqual(sorted(grid.keys), ["name", "price"])
+        grid_filter = GridFilter(grid)
+        self.assertEqual(grid.rows, dicts)
+        grid.append_row({"name": "c", "price": 3.0})
+        self.assertEqual(list(grid.row_store.column("price")), [1.0, 2.0, 3.0])
+        self.assertEqual(grid.get_dictionaries_copy()[2]["name"], "c")
+
+    def test_aggregates(self):
+        """test totals following appends, edits, removes and the filter"""
+        dicts = [{"name": "a", "price": 1.0, "id": 4},
+                 {"name": "b", "price": 2.0, "id": 2},
+                 {"name": "c", "price": 3.0}]
+        grid = DictionaryGrid(dicts, keys=["name", "price", "id"])
+        self.assertEqual(grid.aggregates("price")["sum"], 6.0)
+        self.assertEqual(grid.aggregates("id")["count"], 2)
+
+        grid.append_row({"name": "d", "price": 10.0, "id": 9})
+        self.assertEqual(grid.aggregates("price")["max"], 10.0)
+        grid.get_model().set_value(grid.get_model().get_iter((0,)), 1, "4.0")
+        self.assertEqual(grid.aggregates("price")["min"], 2.0)
+
+        grid.get_selection().select_path((3,))
+        grid.remove_selected_rows()
+        self.assertEqual(grid.aggregates("price")["sum"], 9.0)
+        self.assertEqual(grid.aggregates("id")["avg"], 3.0)
+
+        #hidden rows are not counted
+        grid.add_visible_column()
+        store = grid.get_model()
+        store.set_value(store.get_iter((1,)), grid.visible_column, False)
+        self.assertEqual(grid.aggregates("price")["sum"], 7.0)
+
+    def test_footer_after_visible_column(self):
+        """test a GridFooter made before the visible column is added"""
+        from quickly.widgets.grid_footer import GridFooter
+        dicts = [{"name": "a", "price": 1.0}, {"name": "b", "price": 2.0}]
+        grid = DictionaryGrid(dicts, keys=["name", "price"])
+        footer = GridFooter(grid)
+        grid.add_visible_column()
+        store = grid.get_model()
+        store.set_value(store.get_iter((0,)), grid.visible_column, False)
+        footer.update()
+        self.assertEqual(grid.aggregates("price")["sum"], 2.0)
+        self.assertEqual(footer.get_children()[0].get_text(),
+                         "price Sum: " + grid.columns["price"].display_val(2.0))
@@ -0,0 +1,84 @@
+# -*- coding: utf-8 -*-
+### BEGIN LICENSE
+# Copyright (C) 2010 Rick Spencer rick.spencer@canonical.com
+#This program is free software: you can redistribute it and/or modify it
+#under the terms of the GNU General Public License version 3, as published
+#by the Free Software Foundation.
+#
+#This program is distributed in the hope that it will be useful, but
+#WITHOUT ANY WARRANTY; without even the implied warranties of
+#MERCHANTABILITY, SATISFACTORY QUALITY, or FITNESS FOR A PARTICULAR
+#PURPOSE.  See the GNU General Public License for more details.
+#
+#You should have received a copy of the GNU General Public License along
+#with this program.  If not, see <http://www.gnu.org/licenses/>.
+### END LICENSE
+
+"""Tests for the FetchScheduler"""
+
+from testtools import TestCase
+from quickly.widgets.fetch_scheduler import FetchScheduler, host_of
+from quickly.widgets.fetch_scheduler import split_ranges
+
+class TestFetchScheduler(TestCase):
+    """Test the FetchScheduler functionality"""
+
+    def setUp(self):
+        TestCase.setUp(self)
+
+    def tearDown(self):
+        TestCase.tearDown(self)
+
+    def test_host_of(self):
+        self.assertEqual(host_of("http://example.com:8080/a/b"),
+                         "example.com:8080")
+        self.assertEqual(host_of("file:///tmp/a"), "")
+
+    def test_split_ranges(self):
+        self.assertEqual(split_ranges(10, 3), [(0, 3), (3, 6), (6, 10)])
+        self.assertEqual(split_ranges(10, 1), [(0, 10)])
+        self.assertEqual(split_ranges(2, 4), [(0, 1), (1, 2)])
+        ranges = split_ranges(1000003, 7)
+        self.assertEqual(ranges[0][0], 0)
+        self.assertEqual(ranges[-1][1], 1000003)
+        for previous, following in zip(ranges, ranges[1:]):
+            self.assertEqual(previous[1], following[0])
+
+    def test_max_active(self):
+        scheduler = FetchScheduler(max_active=2, max_per_host=None)
+        for x in range(5):
+            scheduler.add(x, "host")
+        self.assertEqual(scheduler.next_ready(), [0, 1])
+        self.assertEqual(scheduler.next_ready(), [])
+        scheduler.finished(0)
+        self.assertEqual(scheduler.next_ready(), [2])
+        self.assertEqual(scheduler.active, 2)
+        self.assertEqual(scheduler.pending, 2)
+
+    def test_max_per_host(self):
+        scheduler = FetchScheduler(max_active=4, max_per_host=1)
+        scheduler.add("a1", "a")
+        scheduler.add("a2", "a")
+        scheduler.add("b1", "b")
+        self.assertEqual(scheduler.next_ready(), ["a1", "b1"])
+        scheduler.finished("b1")
+        self.assertEqual(scheduler.next_ready(), [])
+        scheduler.finished("a1")
+        self.assertEqual(scheduler.next_ready(), ["a2"])
+
+    def test_priority(self):
+        scheduler = FetchScheduler(max_active=1)
+        scheduler.add("low", "a")
+        scheduler.add("high", "b", priority=5)
+        scheduler.add("low2", "c")
+        self.assertEqual(scheduler.next_ready(), ["high"])
+        scheduler.finished("high")
+        self.assertEqual(scheduler.next_ready(), ["low"])
+
+    def test_finish_pending(self):
+        scheduler = FetchScheduler(max_active=1)
+        scheduler.add("a", "a")
+        scheduler.add("b", "b")
+        scheduler.finished("b")
+        self.assertEqual(scheduler.pending, 1)
+        self.assertEqual(scheduler.next_ready(), ["a"])
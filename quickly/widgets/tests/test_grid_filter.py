@@ -17,8 +17,13 @@
 """Tests for the DictionaryGrid"""
 
 from testtools import TestCase
+import gobject
+import gtk
 from quickly.widgets.dictionary_grid import DictionaryGrid
-from quickly.widgets.grid_filter import GridFilter
+from quickly.widgets.task_executor import TaskExecutor
+from quickly.widgets.grid_filter import GridFilter, DistinctValuesFilterBox
+
+gobject.threads_init()
 
 class TestGridFilter(TestCase):
     """Test the CouchGrid functionality"""
@@ -108,3 +113,120 @@ class TestGridFilter(TestCase):
         self.assertEqual(len(grid.get_model()),4)
 
 
+
+    def test_search_all_columns(self):
+        dicts = [{"name": "Blue pen", "customer": "acme"},
+                 {"name": "ink", "customer": "initech"},
+                 {"name": "pencil", "customer": "Penguin"}]
+        grid = DictionaryGrid(dicts)
+        grid_filter = GridFilter(grid, search=True)
+        grid_filter.search_entry.set_text("PEN")
+        self.assertEqual(len(grid.get_model()),2)
+        self.assertEqual(grid.search("peng"), [dicts[2]])
+
+        #edited and added rows are searched too
+        grid.append_row({"name": "open", "customer": "x"})
+        self.assertEqual(len(grid.get_model()),3)
+        grid_filter.search_entry.set_text("")
+        self.assertEqual(len(grid.get_model()),4)
+
+    def test_search_index_made_before_filter(self):
+        dicts = [{"name": "Blue pen"}, {"name": "ink"}, {"name": "pencil"}]
+        grid = DictionaryGrid(dicts)
+        self.assertEqual(grid.search("pen"), [dicts[0], dicts[2]])
+        #the index follows the store the GridFilter adds the column to
+        grid_filter = GridFilter(grid, search=True)
+        grid_filter.search_entry.set_text("ink")
+        self.assertEqual(len(grid.get_model()),1)
+        grid.append_row({"name": "pink"})
+        self.assertEqual(len(grid.get_model()),2)
+        self.assertEqual(grid.search("pink"), [{"name": "pink"}])
+
+    def test_distinct_values(self):
+        dicts = [{"name": "pen", "status": "open"},
+                 {"name": "ink", "status": "closed"},
+                 {"name": "pad", "status": "open"}]
+        grid = DictionaryGrid(dicts)
+        box = DistinctValuesFilterBox(grid, "status")
+        grid_filter = GridFilter(grid, {"status": box})
+        self.assertEqual(box.distinct_values(), [("closed", 1), ("open", 2)])
+        grid_filter.rows[0].column_combo.set_active(grid.keys.index("status"))
+        box.chosen = ["closed"]
+        self.assertEqual(len(grid.get_model()),1)
+
+        #the counts follow the rows
+        grid.append_row({"name": "nib", "status": "closed"})
+        self.assertEqual(grid.value_counts("status"), {"closed": 2, "open": 2})
+        self.assertEqual(len(grid.get_model()),2)
+        box.chosen = None
+        self.assertEqual(len(grid.get_model()),4)
+
+    def test_value_counts_made_before_filter(self):
+        dicts = [{"name": "pen", "status": "open"},
+                 {"name": "ink", "status": "closed"}]
+        grid = DictionaryGrid(dicts)
+        self.assertEqual(grid.value_counts("status"), {"closed": 1, "open": 1})
+        box = DistinctValuesFilterBox(grid, "status")
+        grid_filter = GridFilter(grid, {"status": box})
+        #the counts follow the store the GridFilter adds the column to
+        grid.append_row({"name": "pad", "status": "open"})
+        self.assertEqual(box.distinct_values(), [("closed", 1), ("open", 2)])
+
+    def test_filter_on_executor(self):
+        dicts = [{"key1_1": "val1_1", "key1_2": "val1_2"},
+                 {"key1_1": "val2_1", "key1_2": "val2_2"},
+                 {"key1_1": "val3_1", "key1_2": "val3_2"}]
+        grid = DictionaryGrid(dicts, keys=["key1_1", "key1_2"])
+        executor = TaskExecutor(max_workers=1)
+        grid_filter = GridFilter(grid, executor=executor)
+        filter_row = grid_filter.rows[0]
+        filter_combo = filter_row.get_children()[1].get_children()[0].get_children()[0]
+        filter_combo.set_active(1)
+        entry = filter_row.get_children()[1].get_children()[0].get_children()[1]
+        #only the mask for the last text is written to the grid
+        entry.set_text("val3")
+        entry.set_text("val2_1")
+        executor.shutdown(wait=True)
+        while gtk.events_pending():
+            gtk.main_iteration()
+        self.assertEqual(len(grid.get_model()),2)
+
+    def test_filter_keeps_columns(self):
+        dicts = [{"name": "pen", "price": 1.5}, {"name": "ink", "price": 2}]
+        grid = DictionaryGrid(dicts, keys=["name", "price"])
+        name_column = grid.columns["name"]
+        grid.set_column_titles({"name": "Product"})
+        grid_filter = GridFilter(grid)
+        self.assertTrue(grid.columns["name"] is name_column)
+        self.assertEqual(grid.columns["name"].get_title(), "Product")
+        self.assertTrue(name_column.list_store is grid.unfiltered_store)
+        self.assertEqual(len(grid.unfiltered_store), 2)
+
+    def test_refilter_after_rows_change(self):
+        dicts = [{"key1_1": "val1_1"}, {"key1_1": "val2_1"},
+                 {"key1_1": "val3_1"}]
+        grid = DictionaryGrid(dicts, keys=["key1_1"])
+        grid_filter = GridFilter(grid)
+        filter_row = grid_filter.rows[0]
+        filter_combo = filter_row.get_children()[1].get_children()[0].get_children()[0]
+        filter_combo.set_active(1)
+        entry = filter_row.get_children()[1].get_children()[0].get_children()[1]
+        entry.set_text("val2")
+        self.assertEqual(len(grid.get_model()),2)
+        #the visible column as last written follows the rows
+        grid.append_row({"key1_1": "val2_2"})
+        grid.get_selection().select_path((0,))
+        grid.remove_selected_rows()
+        self.assertEqual(len(grid.get_model()),1)
+        entry.set_text("val3")
+        self.assertEqual(len(grid.get_model()),2)
+        self.assertEqual([r[grid.visible_column] for r in grid.unfiltered_store],
+                         [True, False, True])
+
+    def test_filter_grid_without_keys(self):
+        dicts = [{"name": "pen", "price": 1.5}, {"name": "ink", "price": 2}]
+        grid = DictionaryGrid(dicts)
+        grid_filter = GridFilter(grid)
+        self.assertEqual(sorted(grid.keys), ["name", "price"])
+        self.assertEqual(len(grid.get_model()), 2)
+        self.assertEqual(grid.get_dictionaries_copy(), dicts)
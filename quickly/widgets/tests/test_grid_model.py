@@ -0,0 +1,300 @@
+# -*- coding: utf-8 -*-
+### BEGIN LICENSE
+# Copyright (C) 2010 Rick Spencer rick.spencer@canonical.com
+#This program is free software: you can redistribute it and/or modify it
+#under the terms of the GNU General Public License version 3, as published
+#by the Free Software Foundation.
+#
+#This program is distributed in the hope that it will be useful, but
+#WITHOUT ANY WARRANTY; without even the implied warranties of
+#MERCHANTABILITY, SATISFACTORY QUALITY, or FITNESS FOR A PARTICULAR
+#PURPOSE.  See the GNU General Public License for more details.
+#
+#You should have received a copy of the GNU General Public License along
+#with this program.  If not, see <http://www.gnu.org/licenses/>.
+### END LICENSE
+
+"""Tests for the GridModel"""
+
+import datetime
+import subprocess
+import sys
+from testtools import TestCase
+from quickly.widgets.grid_model import GridModel, RowFilter, Predicate
+from quickly.widgets.grid_model import StringColumnModel, IntegerColumnModel
+from quickly.widgets.grid_model import CurrencyColumnModel, CheckColumnModel
+from quickly.widgets.grid_model import DateColumnModel, TagsColumnModel
+from quickly.widgets import grid_model
+
+class TestGridModel(TestCase):
+    """Test the GridModel functionality"""
+
+    def setUp(self):
+        TestCase.setUp(self)
+
+    def tearDown(self):
+        TestCase.tearDown(self)
+
+    def test_does_not_import_gtk(self):
+        script = ("import sys; import quickly.widgets.grid_model; "
+                  "print 'gtk' in sys.modules")
+        output = subprocess.Popen([sys.executable, "-c", script],
+                                  stdout=subprocess.PIPE).communicate()[0]
+        self.assertEqual(output.strip(), "False")
+
+    def test_constructor_with_dicts(self):
+        dicts = [{"key1_1": "val1_1", "key1_2": "val1_2", "__extra": 1},
+                 {"key1_1": "val2_1", "key2_2": "val2_2"}]
+        model = GridModel(dicts)
+        self.assertEqual(model.keys, ["key1_1", "key1_2", "key2_2"])
+        self.assertEqual(len(model.rows), 2)
+        self.assertEqual(model.rows[1], ["val2_1", "", "val2_2", dicts[1]])
+
+    def test_constructor_with_keys(self):
+        dicts = [{"key1_1": "val1_1", "key1_2": "val1_2", "key1_3": "val1_3"}]
+        model = GridModel(dicts, keys=["key1_3", "key1_1"])
+        self.assertEqual(model.rows[0], ["val1_3", "val1_1", dicts[0]])
+
+    def test_auto_set_col_types(self):
+        data = [{"id":0,"price":1.00,"bool?":True,"tags":"a b",
+                "sale price":.50, "count":50, "full count":100,
+                "date":"2010-05-05","sale date":"2010-05-06","name":"a"}]
+        columns = GridModel(data).columns_map
+        self.assertEqual(type(columns["id"]), IntegerColumnModel)
+        self.assertEqual(type(columns["price"]), CurrencyColumnModel)
+        self.assertEqual(type(columns["bool?"]), CheckColumnModel)
+        self.assertEqual(type(columns["tags"]), TagsColumnModel)
+        self.assertEqual(type(columns["sale price"]), CurrencyColumnModel)
+        self.assertEqual(type(columns["count"]), IntegerColumnModel)
+        self.assertEqual(type(columns["full count"]), IntegerColumnModel)
+        self.assertEqual(type(columns["date"]), DateColumnModel)
+        self.assertEqual(type(columns["sale date"]), DateColumnModel)
+        self.assertEqual(type(columns["name"]), StringColumnModel)
+
+    def test_type_hints(self):
+        dicts = [{"price":100,"id":"asdfas"}]
+        hints = {"id":StringColumnModel, "price":IntegerColumnModel}
+        model = GridModel(dicts, type_hints=hints)
+        self.assertEqual(type(model.columns_map["id"]), StringColumnModel)
+        self.assertEqual(dicts[0]["price"], 100)
+
+    def test_real_values(self):
+        keys = ["id","price","bool?","a?","b?"]
+        dicts = [{"price":"100.00","id":"50","bool?":"Yes","a?":0,"b?":False}]
+        model = GridModel(dicts, keys)
+        self.assertEqual(dicts[0]["id"], 50)
+        self.assertEqual(dicts[0]["price"], 100.00)
+        self.assertEqual(dicts[0]["bool?"], True)
+        self.assertEqual(dicts[0]["a?"], False)
+        self.assertEqual(model.rows[0][:5], ["50", "100.0", 1, False, 0])
+
+    def test_NONE_values(self):
+        dicts = [{"price":None,"id":None,"bool?":None,"foo":None}]
+        model = GridModel(dicts)
+        self.assertEqual(len(model.rows), 1)
+
+    def test_sort_integers(self):
+        dicts = [{"id":3}, {"id":1}, {"name":"no id"}, {"id":2}]
+        model = GridModel(dicts)
+        model.sort("id")
+        self.assertEqual([r[0] for r in model.rows], ["", "1", "2", "3"])
+        model.sort("id", descending=True)
+        self.assertEqual([r[0] for r in model.rows], ["3", "2", "1", ""])
+
+    def test_sort_checks(self):
+        dicts = [{"a?":False}, {"a?":True}, {"b":"unset"}]
+        model = GridModel(dicts, keys=["a?"])
+        model.sort("a?")
+        self.assertEqual([r[0] for r in model.rows], [1, 0, -1])
+
+    def test_sort_order_is_stable(self):
+        dicts = [{"k":"b", "n":1}, {"k":"a", "n":2}, {"k":"b", "n":3}]
+        model = GridModel(dicts, keys=["k"])
+        model.sort("k", descending=True)
+        self.assertEqual([d["n"] for d in model.dictionaries], [1, 3, 2])
+
+    def test_filter_match_all(self):
+        dicts = [{"name":"val1", "count":1},
+                 {"name":"val2", "count":2},
+                 {"name":"other", "count":3}]
+        model = GridModel(dicts, keys=["name","count"])
+        row_filter = RowFilter(match_all=True)
+        row_filter.append(0, Predicate(grid_model.string_starts_with, "val"))
+        row_filter.append(1, Predicate(grid_model.integer_greater_than, 1))
+        self.assertEqual(model.filter(row_filter), [dicts[1]])
+
+    def test_filter_match_any(self):
+        dicts = [{"name":"val1", "count":1},
+                 {"name":"val2", "count":2},
+                 {"name":"other", "count":3}]
+        model = GridModel(dicts, keys=["name","count"])
+        row_filter = RowFilter(match_all=False)
+        row_filter.append(0, Predicate(grid_model.string_contains, "1"))
+        row_filter.append(1, Predicate(grid_model.integer_equals, 3))
+        self.assertEqual(model.filter(row_filter), [dicts[0], dicts[2]])
+
+    def test_filter_without_predicate(self):
+        dicts = [{"name":"val1"}, {"name":"val2"}]
+        model = GridModel(dicts)
+        row_filter = RowFilter()
+        row_filter.append(0, None)
+        self.assertEqual(len(model.filter(row_filter)), 2)
+        row_filter.append(0, grid_model.match_nothing)
+        self.assertEqual(len(model.filter(row_filter)), 0)
+
+    def test_filter_functions(self):
+        self.assertTrue(grid_model.string_not_contains("abc", "d"))
+        self.assertTrue(grid_model.string_ends_with("abc", "bc"))
+        self.assertTrue(grid_model.tags_all("aaa bbb ccc", "ccc aaa"))
+        self.assertFalse(grid_model.tags_any("aaa bbb ccc", "ddd"))
+        self.assertTrue(grid_model.numeric_less_than_equals("2.0", "2"))
+        self.assertTrue(grid_model.check_unset(-1))
+        target = datetime.date(2010, 8, 1)
+        self.assertTrue(grid_model.date_on("2010-08-01", target))
+        self.assertTrue(grid_model.date_after("2010-09-01", target))
+        self.assertFalse(grid_model.date_before("2010-09-01", target))
+
+    def test_compact_keys(self):
+        dicts = [{"status":"open", "name":"a"},
+                 {"status":"closed", "name":"b"},
+                 {"status":"open", "name":"c"}]
+        model = GridModel(dicts, keys=["status","name"],
+                          compact_keys=["status"])
+        self.assertEqual([r[0] for r in model.rows], [0, 1, 0])
+        self.assertEqual(model.display_row(model.rows[1]), ["closed", "b"])
+        self.assertTrue(dicts[0]["status"] is dicts[2]["status"])
+        self.assertEqual(model.columns_map["name"].encoder, None)
+
+    def test_compact_keys_skip_check_columns(self):
+        dicts = [{"done?":True}, {"done?":False}]
+        model = GridModel(dicts, compact_keys=["done?"])
+        self.assertEqual(model.columns_map["done?"].encoder, None)
+        self.assertEqual([r[0] for r in model.rows], [1, 0])
+
+    def test_compact_sort_and_filter(self):
+        dicts = [{"size count":10}, {"size count":2}, {"size count":10},
+                 {"size count":5}]
+        model = GridModel(dicts, compact_keys=["size count"])
+        model.sort("size count")
+        self.assertEqual([d["size count"] for d in model.dictionaries],
+                         [2, 5, 10, 10])
+        calls = []
+        def greater(orig_val, target_val):
+            calls.append(orig_val)
+            return grid_model.integer_greater_than(orig_val, target_val)
+        row_filter = RowFilter()
+        row_filter.append(0, Predicate(greater, 4))
+        self.assertEqual(len(model.filter(row_filter)), 3)
+        #once for each distinct value, not each row
+        self.assertEqual(sorted(calls), ["10", "2", "5"])
+
+    def test_encoded_predicate_new_values(self):
+        encoder = grid_model.ValueEncoder()
+        predicate = grid_model.EncodedPredicate(
+                        Predicate(grid_model.string_contains, "a"), encoder)
+        self.assertTrue(predicate(encoder.encode("abc")))
+        self.assertFalse(predicate(encoder.encode("xyz")))
+        self.assertTrue(predicate(encoder.encode("cba")))
+        self.assertEqual(encoder.decode(1), "xyz")
+        self.assertEqual(len(encoder), 3)
+
+    def test_bytes_per_row(self):
+        dicts = [{"status":"status %d" % (i % 2), "id":i} for i in range(100)]
+        self.assertEqual(GridModel().bytes_per_row(), 0)
+        plain = GridModel([d.copy() for d in dicts]).bytes_per_row()
+        compact = GridModel(dicts, compact_keys=["status"]).bytes_per_row()
+        self.assertTrue(compact < plain)
+
+    def test_mask_matches_filter(self):
+        try:
+            import numpy
+        except ImportError:
+            self.skipTest("numpy is not installed")
+        dicts = [{"price":1.5, "id":1, "done?":True, "due":"2010-08-01",
+                  "status":"open"},
+                 {"price":20, "id":2, "done?":False, "due":"2010-09-01",
+                  "status":"closed"},
+                 {"price":"n/a", "id":3, "due":"2010-07-01", "status":"open"}]
+        model = GridModel(dicts, keys=["price","id","done?","due","status"],
+                          type_hints={"due":DateColumnModel},
+                          compact_keys=["status"])
+        target = datetime.date(2010, 8, 15)
+        terms = [(0, Predicate(grid_model.numeric_greater_than, "10")),
+                 (1, Predicate(grid_model.integer_less_than, 3)),
+                 (2, Predicate(grid_model.check_unset)),
+                 (3, Predicate(grid_model.date_before, target)),
+                 (4, Predicate(grid_model.string_contains, "pen")),
+                 (3, Predicate(grid_model.string_contains_ignore_case, "-09")),
+                 (3, Predicate(grid_model.string_contains_word, "08"))]
+        for match_all in (True, False):
+            for index, predicate in terms:
+                row_filter = RowFilter(match_all)
+                row_filter.append(index, predicate)
+                row_filter.append(1, Predicate(grid_model.integer_equals, 2))
+                expected = [d in model.filter(row_filter) for d in dicts]
+                self.assertEqual(model.mask(row_filter).tolist(), expected)
+
+    def test_string_match_modes(self):
+        self.assertTrue(grid_model.string_contains_ignore_case("Blue Pen",
+                                                               "PEN"))
+        self.assertFalse(grid_model.string_not_contains_ignore_case("ÉCLAIR",
+                                                                    "éc"))
+        self.assertTrue(grid_model.string_contains_word("a red pen", "Pen"))
+        self.assertFalse(grid_model.string_contains_word("a red pencil",
+                                                         "pen"))
+        self.assertTrue(grid_model.string_matches_pattern("order 1234",
+                                                          r"\d{4}$"))
+        self.assertFalse(grid_model.string_matches_pattern("order 12",
+                                                           r"\d{4}$"))
+        #a pattern that is still being typed does not hide rows
+        self.assertTrue(grid_model.string_matches_pattern("order", "(ord"))
+        self.assertTrue(grid_model.compiled_pattern("a+") is
+                        grid_model.compiled_pattern("a+"))
+
+    def test_ordered_terms(self):
+        rows = [["a", 1], ["b", 2], ["c", 3], ["d", 4]]
+        cheap = Predicate(grid_model.string_contains, "a")
+        slow_calls = []
+        def slow(orig_val, target_val):
+            slow_calls.append(orig_val)
+            return orig_val > 1
+        costly = Predicate(slow, None)
+        row_filter = RowFilter(True)
+        row_filter.append(1, costly)
+        row_filter.append(0, cheap)
+        stats = grid_model.FilterStats()
+        stats.record((1, slow), 1.0, 4, 3)
+        stats.record((0, grid_model.string_contains), 0.001, 4, 1)
+        #"and" tests the cheap term that rejects most rows first
+        ordered = row_filter.ordered(stats)
+        self.assertEqual(ordered.terms, [(0, cheap), (1, costly)])
+        self.assertEqual([ordered.matches(r) for r in rows],
+                         [row_filter.matches(r) for r in rows])
+        del slow_calls[:]
+        [ordered.matches(r) for r in rows]
+        self.assertEqual(slow_calls, [1])
+
+        #"or" tests first the term that matches the most rows for its cost
+        or_stats = grid_model.FilterStats()
+        or_stats.record((1, slow), 0.004, 4, 3)
+        or_stats.record((0, grid_model.string_contains), 0.002, 4, 1)
+        row_filter.match_all = False
+        self.assertEqual(row_filter.ordered(or_stats).terms[0], (1, costly))
+        row_filter.append(0, None)
+        self.assertEqual(row_filter.ordered(or_stats).terms[0], (0, None))
+
+        row_filter.measure(rows, stats)
+        self.assertTrue(stats.get((0, grid_model.string_contains))[1] < 0.5)
+
+    def test_changed_rows(self):
+        self.assertEqual(grid_model.changed_rows([True, True, False],
+                                                 [True, False, True]), [1, 2])
+
+    def test_tree_keys(self):
+        orders = [{"customer": "a", "__id": 1, "lines": [
+                       {"product": "pen", "parts": [{"part": "cap"}]}]},
+                  {"customer": "b", "lines": [], "total": 2}]
+        self.assertEqual(grid_model.find_children_key(orders), "lines")
+        self.assertEqual(grid_model.find_children_key([{"a": [1]}]), None)
+        self.assertEqual(grid_model.infer_tree_keys(orders, "lines"),
+                         ["customer", "product", "parts", "total"])
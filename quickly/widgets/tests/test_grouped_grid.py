@@ -0,0 +1,66 @@
+# -*- coding: utf-8 -*-
+### BEGIN LICENSE
+# Copyright (C) 2010 Rick Spencer rick.spencer@canonical.com
+#This program is free software: you can redistribute it and/or modify it
+#under the terms of the GNU General Public License version 3, as published
+#by the Free Software Foundation.
+#
+#This program is distributed in the hope that it will be useful, but
+#WITHOUT ANY WARRANTY; without even the implied warranties of
+#MERCHANTABILITY, SATISFACTORY QUALITY, or FITNESS FOR A PARTICULAR
+#PURPOSE.  See the GNU General Public License for more details.
+#
+#You should have received a copy of the GNU General Public License along
+#with this program.  If not, see <http://www.gnu.org/licenses/>.
+### END LICENSE
+
+"""Tests for the GroupedGrid"""
+
+from testtools import TestCase
+from quickly.widgets.dictionary_grid import DictionaryGrid
+from quickly.widgets.grouped_grid import GroupedGrid
+
+class TestGroupedGrid(TestCase):
+    """Test the GroupedGrid functionality"""
+
+    def setUp(self):
+        TestCase.setUp(self)
+        dicts = [{"status": "open", "price": 1.0},
+                 {"status": "closed", "price": 2.0},
+                 {"status": "open", "price": 3.0}]
+        self.grid = DictionaryGrid(dicts, keys=["status", "price"])
+        self.grouped = GroupedGrid(self.grid, ["status"])
+
+    def tearDown(self):
+        TestCase.tearDown(self)
+
+    def test_groups(self):
+        store = self.grouped.get_model()
+        self.assertEqual([r[0] for r in store], ["closed", "open"])
+        self.assertEqual(store[1][2], "4.0")
+        self.assertEqual(store[1][3], "2")
+        #rows are only loaded when a group is expanded
+        self.assertEqual(store.iter_n_children(store.get_iter((1,))), 1)
+        self.grouped.expand_row((1,), False)
+        self.assertEqual([r[1] for r in store[1].iterchildren()],
+                         ["open", "open"])
+        self.grouped.collapse_row((1,))
+        self.assertEqual(store.iter_n_children(store.get_iter((1,))), 1)
+
+    def test_follows_grid(self):
+        self.grid.append_row({"status": "new", "price": 5.0})
+        self.grid.get_selection().select_path((1,))
+        self.grid.remove_selected_rows()
+        self.grouped.update()
+        store = self.grouped.get_model()
+        self.assertEqual(sorted([r[0] for r in store]), ["new", "open"])
+
+    def test_hidden_rows_and_destroy(self):
+        self.grid.add_visible_column()
+        store = self.grid.get_model()
+        store.set_value(store.get_iter((2,)), self.grid.visible_column, False)
+        self.grouped.update()
+        self.assertEqual(self.grouped.get_model()[1][2], "1.0")
+        #the grid stops updating the groups' totals
+        self.grouped.destroy()
+        self.grid.append_row({"status": "new", "price": 5.0})
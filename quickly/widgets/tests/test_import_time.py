@@ -0,0 +1,86 @@
+# -*- coding: utf-8 -*-
+### BEGIN LICENSE
+# Copyright (C) 2010 Rick Spencer rick.spencer@canonical.com
+#This program is free software: you can redistribute it and/or modify it
+#under the terms of the GNU General Public License version 3, as published
+#by the Free Software Foundation.
+#
+#This program is distributed in the hope that it will be useful, but
+#WITHOUT ANY WARRANTY; without even the implied warranties of
+#MERCHANTABILITY, SATISFACTORY QUALITY, or FITNESS FOR A PARTICULAR
+#PURPOSE.  See the GNU General Public License for more details.
+#
+#You should have received a copy of the GNU General Public License along
+#with this program.  If not, see <http://www.gnu.org/licenses/>.
+### END LICENSE
+
+"""Tests for the import time of quickly.widgets modules"""
+
+import subprocess
+import sys
+from testtools import TestCase
+
+#seconds an import may take on top of importing gtk itself
+IMPORT_BUDGET = 0.25
+
+#imports each module in a fresh interpreter, prints how long the
+#import took and which of the deferred modules got imported anyway
+TIMING_SCRIPT = """
+import sys
+import time
+import pygtk
+pygtk.require("2.0")
+import gtk
+start = time.time()
+import %s
+print time.time() - start
+print " ".join([m for m in %r if m in sys.modules])
+"""
+
+class TestImportTime(TestCase):
+    """Test that quickly.widgets modules defer heavy imports"""
+
+    def setUp(self):
+        TestCase.setUp(self)
+
+    def tearDown(self):
+        TestCase.tearDown(self)
+
+    def time_import(self, module, deferred):
+        """time_import - imports module in a new interpreter and returns
+        a tuple of the seconds the import took and a list of the modules
+        in deferred that were imported with it.
+
+        """
+
+        script = TIMING_SCRIPT % (module, deferred)
+        output = subprocess.Popen([sys.executable, "-c", script],
+                                  stdout=subprocess.PIPE).communicate()[0]
+        lines = output.splitlines()
+        return (float(lines[0]), lines[1].split())
+
+    def test_grid_column_defers_grid_filter(self):
+        elapsed, loaded = self.time_import("quickly.widgets.grid_column",
+                                           ["quickly.widgets.grid_filter"])
+        self.assertEqual(loaded, [])
+        self.assertTrue(elapsed < IMPORT_BUDGET)
+
+    def test_dictionary_grid_defers_grid_filter(self):
+        elapsed, loaded = self.time_import("quickly.widgets.dictionary_grid",
+                                           ["quickly.widgets.grid_filter"])
+        self.assertEqual(loaded, [])
+        self.assertTrue(elapsed < IMPORT_BUDGET)
+
+    def test_couch_grid_defers_desktopcouch(self):
+        elapsed, loaded = self.time_import("quickly.widgets.couch_grid",
+                                           ["desktopcouch.records.server",
+                                            "quickly.widgets.grid_filter"])
+        self.assertEqual(loaded, [])
+        self.assertTrue(elapsed < IMPORT_BUDGET)
+
+    def test_url_fetch_progressbox_defers_gio(self):
+        elapsed, loaded = self.time_import(
+                              "quickly.widgets.url_fetch_progressbox",
+                              ["gio"])
+        self.assertEqual(loaded, [])
+        self.assertTrue(elapsed < IMPORT_BUDGET)
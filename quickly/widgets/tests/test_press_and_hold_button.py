@@ -0,0 +1,73 @@
+# -*- coding: utf-8 -*-
+### BEGIN LICENSE
+# Copyright (C) 2010 Rick Spencer rick.spencer@canonical.com
+#This program is free software: you can redistribute it and/or modify it
+#under the terms of the GNU General Public License version 3, as published
+#by the Free Software Foundation.
+#
+#This program is distributed in the hope that it will be useful, but
+#WITHOUT ANY WARRANTY; without even the implied warranties of
+#MERCHANTABILITY, SATISFACTORY QUALITY, or FITNESS FOR A PARTICULAR
+#PURPOSE.  See the GNU General Public License for more details.
+#
+#You should have received a copy of the GNU General Public License along
+#with this program.  If not, see <http://www.gnu.org/licenses/>.
+### END LICENSE
+
+"""Tests for the PressAndHoldButton"""
+
+from testtools import TestCase
+from quickly.widgets.press_and_hold_button import PressAndHoldButton
+from quickly.widgets.press_and_hold_button import TickSchedule
+
+class TestPressAndHoldButton(TestCase):
+    """Test the PressAndHoldButton functionality"""
+
+    def setUp(self):
+        TestCase.setUp(self)
+
+    def tearDown(self):
+        TestCase.tearDown(self)
+
+    def test_press_ticks_once(self):
+        ticks = []
+        button = PressAndHoldButton()
+        button.connect("ticks", lambda widget, count: ticks.append(count))
+        button.emit("pressed")
+        button.emit("released")
+        self.assertEqual(ticks, [1])
+
+    def test_schedule_on_time(self):
+        schedule = TickSchedule(.25)
+        schedule.start(10)
+        self.assertEqual(schedule.due(10.1), 0)
+        self.assertAlmostEqual(schedule.delay(10.1), .15)
+        self.assertEqual(schedule.due(10.25), 1)
+        self.assertEqual(schedule.deadline, 10.5)
+
+    def test_schedule_falls_behind(self):
+        schedule = TickSchedule(.25)
+        schedule.start(10)
+        #the main loop was busy for a second
+        self.assertEqual(schedule.due(11.1), 4)
+        self.assertEqual(schedule.deadline, 11.25)
+
+    def test_schedule_acceleration(self):
+        schedule = TickSchedule(1, acceleration=.5, min_interval=.25)
+        schedule.start(0)
+        self.assertEqual(schedule.due(1), 1)
+        self.assertEqual(schedule.deadline, 1.5)
+        self.assertEqual(schedule.due(1.5), 1)
+        self.assertEqual(schedule.deadline, 1.75)
+        self.assertEqual(schedule.due(2.75), 5)
+        self.assertEqual(schedule.interval, .25)
+
+    def test_schedule_acceleration_without_minimum(self):
+        schedule = TickSchedule(1, acceleration=.5)
+        schedule.start(0)
+        self.assertEqual(schedule.due(1), 1)
+        self.assertEqual(schedule.deadline, 1.5)
+        self.assertEqual(schedule.due(1.5), 1)
+        self.assertEqual(schedule.deadline, 1.75)
+        schedule.due(10)
+        self.assertAlmostEqual(schedule.interval, .1)
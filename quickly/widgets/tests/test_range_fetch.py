@@ -0,0 +1,174 @@
+# -*- coding: utf-8 -*-
+### BEGIN LICENSE
+# Copyright (C) 2010 Rick Spencer rick.spencer@canonical.com
+#This program is free software: you can redistribute it and/or modify it
+#under the terms of the GNU General Public License version 3, as published
+#by the Free Software Foundation.
+#
+#This program is distributed in the hope that it will be useful, but
+#WITHOUT ANY WARRANTY; without even the implied warranties of
+#MERCHANTABILITY, SATISFACTORY QUALITY, or FITNESS FOR A PARTICULAR
+#PURPOSE.  See the GNU General Public License for more details.
+#
+#You should have received a copy of the GNU General Public License along
+#with this program.  If not, see <http://www.gnu.org/licenses/>.
+### END LICENSE
+
+"""Tests for range_fetch against a local http server"""
+
+import BaseHTTPServer
+import os
+import re
+import shutil
+import tempfile
+import threading
+from testtools import TestCase
+from quickly.widgets.range_fetch import (probe, open_range, fetch_range,
+                                         RangeError)
+
+CONTENT = "".join([chr(x % 251) for x in range(10000)])
+
+class RangeHandler(BaseHTTPServer.BaseHTTPRequestHandler):
+    """serves CONTENT, with the Range header honoured if the server's
+    honour_ranges is True, and ignored with a plain 200 reply otherwise.
+    "Accept-Ranges: bytes" is sent if the server's advertise_ranges is True.
+
+    """
+
+    def do_HEAD(self):
+        self.__reply(False)
+
+    def do_GET(self):
+        self.__reply(True)
+
+    def __reply(self, body):
+        self.server.requests.append(self.headers.getheader("Range"))
+        start, end = 0, len(CONTENT)
+        wanted = re.match(r"bytes=(\d+)-(\d*)$",
+                          self.headers.getheader("Range", ""))
+        if self.server.honour_ranges and wanted is not None:
+            start = int(wanted.group(1))
+            if wanted.group(2):
+                end = int(wanted.group(2)) + 1
+            self.send_response(206)
+            self.send_header("Content-Range", "bytes %d-%d/%d" %
+                             (start, end - 1, len(CONTENT)))
+        else:
+            self.send_response(200)
+        if self.server.advertise_ranges:
+            self.send_header("Accept-Ranges", "bytes")
+        self.send_header("Content-Length", str(end - start))
+        self.send_header("ETag", '"v1"')
+        self.send_header("Last-Modified", "Sat, 01 Jan 2000 00:00:00 GMT")
+        self.end_headers()
+        if body:
+            self.wfile.write(CONTENT[start:end])
+
+    def log_message(self, *args):
+        pass
+
+def serve(honour_ranges, advertise_ranges=None):
+    """starts a throwaway http server on localhost in a thread and
+    returns it, its url is server.url and server.requests lists the
+    Range header of each request. Call server.shutdown to stop it.
+    advertise_ranges defaults to honour_ranges.
+
+    """
+
+    server = BaseHTTPServer.HTTPServer(("127.0.0.1", 0), RangeHandler)
+    server.honour_ranges = honour_ranges
+    if advertise_ranges is None:
+        advertise_ranges = honour_ranges
+    server.advertise_ranges = advertise_ranges
+    server.requests = []
+    server.url = "http://127.0.0.1:%d/content" % server.server_port
+    thread = threading.Thread(target=server.serve_forever)
+    thread.setDaemon(True)
+    thread.start()
+    return server
+
+class TestRangeFetch(TestCase):
+    """Test reading ranges from servers that honour and ignore them"""
+
+    def setUp(self):
+        TestCase.setUp(self)
+        self.directory = tempfile.mkdtemp()
+        self.destination = os.path.join(self.directory, "destination")
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+        TestCase.tearDown(self)
+
+    def start_server(self, honour_ranges):
+        server = serve(honour_ranges)
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        return server
+
+    def write_partial(self, size):
+        partial = open(self.destination, "wb")
+        partial.write(CONTENT[:size])
+        partial.close()
+
+    def test_probe(self):
+        info = probe(self.start_server(True).url)
+        self.assertEqual(info.size, len(CONTENT))
+        self.assertTrue(info.accepts_ranges)
+        self.assertEqual(info.etag, '"v1"')
+        self.assertEqual(info.modified, 946684800)
+        self.assertFalse(probe(self.start_server(False).url).accepts_ranges)
+
+    def test_open_range(self):
+        response, start = open_range(self.start_server(True).url, 3000, 3010)
+        self.assertEqual((start, response.read()), (3000, CONTENT[3000:3010]))
+        response.close()
+        response, start = open_range(self.start_server(False).url, 3000, 3010)
+        self.assertEqual(start, 0)
+        self.assertEqual(response.read(), CONTENT)
+        response.close()
+
+    def test_resume(self):
+        server = self.start_server(True)
+        self.write_partial(3000)
+        written = []
+        start = fetch_range(server.url, self.destination, 3000, chunk_size=1000,
+                            progress=lambda p, c: written.append(p))
+        self.assertEqual(start, 3000)
+        self.assertEqual(server.requests, ["bytes=3000-"])
+        self.assertEqual(written[0], 3000)
+        self.assertEqual(open(self.destination, "rb").read(), CONTENT)
+
+    def test_resume_range_ignored(self):
+        self.write_partial(3000)
+        start = fetch_range(self.start_server(False).url, self.destination,
+                            3000)
+        #the whole URL is written again rather than after the partial file
+        self.assertEqual(start, 0)
+        self.assertEqual(open(self.destination, "rb").read(), CONTENT)
+
+    def test_segment(self):
+        server = self.start_server(True)
+        output = open(self.destination, "wb")
+        output.truncate(len(CONTENT))
+        output.close()
+        fetch_range(server.url, self.destination, 4000, end=6000)
+        written = open(self.destination, "rb").read()
+        self.assertEqual(written[4000:6000], CONTENT[4000:6000])
+        self.assertEqual(written[:4000], "\0" * 4000)
+        self.assertEqual(server.requests, ["bytes=4000-5999"])
+
+    def test_segment_range_ignored(self):
+        output = open(self.destination, "wb")
+        output.truncate(len(CONTENT))
+        output.close()
+        self.assertRaises(RangeError, fetch_range,
+                          self.start_server(False).url, self.destination,
+                          4000, end=6000)
+        self.assertEqual(open(self.destination, "rb").read(),
+                         "\0" * len(CONTENT))
+
+    def test_killed(self):
+        self.write_partial(0)
+        fetch_range(self.start_server(True).url, self.destination, 0,
+                    chunk_size=1000, killed=lambda: True)
+        self.assertEqual(os.path.getsize(self.destination), 0)
@@ -0,0 +1,85 @@
+# -*- coding: utf-8 -*-
+### BEGIN LICENSE
+# Copyright (C) 2010 Rick Spencer rick.spencer@canonical.com
+#This program is free software: you can redistribute it and/or modify it
+#under the terms of the GNU General Public License version 3, as published
+#by the Free Software Foundation.
+#
+#This program is distributed in the hope that it will be useful, but
+#WITHOUT ANY WARRANTY; without even the implied warranties of
+#MERCHANTABILITY, SATISFACTORY QUALITY, or FITNESS FOR A PARTICULAR
+#PURPOSE.  See the GNU General Public License for more details.
+#
+#You should have received a copy of the GNU General Public License along
+#with this program.  If not, see <http://www.gnu.org/licenses/>.
+### END LICENSE
+
+"""Tests for the search_index module"""
+
+from testtools import TestCase
+from quickly.widgets.search_index import TrigramIndex, StoreSearch
+from quickly.widgets import grid_model
+
+class TestSearchIndex(TestCase):
+    """Test the TrigramIndex and StoreSearch functionality"""
+
+    def setUp(self):
+        TestCase.setUp(self)
+
+    def tearDown(self):
+        TestCase.tearDown(self)
+
+    def test_trigram_index(self):
+        index = TrigramIndex()
+        index.add(1, ["Blue pen", "acme"])
+        index.add(2, ["red pen", "initech"])
+        index.add(3, ["pencil", "acme"])
+        self.assertEqual(index.search("PEN"), set([1, 2, 3]))
+        self.assertEqual(index.search("pen "), set())
+        self.assertEqual(index.search("e p"), set([1]))
+        #every trigram of "cmea" is in row 1, but not in that order
+        self.assertEqual(index.search("cmeac"), set())
+        self.assertEqual(index.search("ac"), set([1, 3]))
+        index.update(1, ["Blue ink", "acme"])
+        self.assertEqual(index.search("pen"), set([2, 3]))
+        self.assertEqual(index.search("ink"), set([1]))
+        index.remove(3)
+        self.assertEqual(index.search("acm"), set([1]))
+        self.assertEqual(len(index), 2)
+
+    def test_store_search(self):
+        dicts = [{"name": "pen", "done?": True},
+                 {"name": "Pencil", "done?": False},
+                 {"name": "ink", "done?": True}]
+        model = grid_model.GridModel(dicts, compact_keys=["name"])
+        search = StoreSearch(model.columns)
+        self.assertEqual([c.key for c in search.columns], ["name"])
+        search.reset(model.rows)
+        self.assertEqual(search.search("pen"), [0, 1])
+        self.assertEqual(search.mask("ink"), [False, False, True])
+
+        #rows keep their keys when sorted
+        model.rows.reverse()
+        search.rows_reordered(model.rows)
+        self.assertEqual(search.search("pen"), [1, 2])
+
+        row = grid_model.make_row(model.columns, {"name": "pens"})
+        search.row_inserted(0, row)
+        self.assertEqual(search.search("pens"), [0])
+        search.row_deleted(3)
+        self.assertEqual(search.search("pen"), [0, 2])
+        self.assertTrue(search.row_matches(row, "PENS"))
+
+    def test_rows_sharing_a_dictionary(self):
+        columns = grid_model.build_columns(["name"])
+        shared = {"name": "blue pen"}
+        search = StoreSearch(columns)
+        search.reset([["blue pen", shared], ["blue pen", shared]])
+        search.row_deleted(0)
+        self.assertEqual(search.search("pen"), [0])
+
+        search.row_inserted(0, ["blue pen", shared])
+        search.row_changed(1, ["red ink", shared])
+        search.rows_reordered([["red ink", shared], ["blue pen", shared]])
+        self.assertEqual(search.search("pen"), [1])
+        self.assertEqual(search.search("ink"), [0])
@@ -0,0 +1,253 @@
+# -*- coding: utf-8 -*-
+### BEGIN LICENSE
+# Copyright (C) 2010 Rick Spencer rick.spencer@canonical.com
+#This program is free software: you can redistribute it and/or modify it
+#under the terms of the GNU General Public License version 3, as published
+#by the Free Software Foundation.
+#
+#This program is distributed in the hope that it will be useful, but
+#WITHOUT ANY WARRANTY; without even the implied warranties of
+#MERCHANTABILITY, SATISFACTORY QUALITY, or FITNESS FOR A PARTICULAR
+#PURPOSE.  See the GNU General Public License for more details.
+#
+#You should have received a copy of the GNU General Public License along
+#with this program.  If not, see <http://www.gnu.org/licenses/>.
+### END LICENSE
+
+"""Tests for the TaskExecutor"""
+
+import os
+import threading
+import time
+from testtools import TestCase
+from quickly.widgets.task_executor import TaskExecutor, Task, default_executor
+from quickly.widgets.task_executor import ProcessTaskExecutor, ResultChannel
+
+#functions for the ProcessTaskExecutor tests have to be picklable
+def process_id(params):
+    return os.getpid()
+
+def count_with_progress(params):
+    for x in range(params["count"]):
+        params["update_progress_function"](fraction=x / 10.0,
+                                           displaytext=str(x))
+    return params["count"]
+
+def wait_for_kill(params):
+    while not params["kill"]:
+        time.sleep(.01)
+    return "killed"
+
+def put_partial_results(params):
+    for x in range(3):
+        params["partial_results_function"]([x])
+    return "done"
+
+def raise_error(params):
+    raise ValueError("expected")
+
+class TestTaskExecutor(TestCase):
+    """Test the TaskExecutor functionality"""
+
+    def setUp(self):
+        TestCase.setUp(self)
+        self.executor = TaskExecutor(max_workers=2)
+
+    def tearDown(self):
+        self.executor.shutdown()
+        TestCase.tearDown(self)
+
+    def test_runs_task(self):
+        results = []
+        done = threading.Event()
+        def on_complete(data):
+            results.append(data)
+            done.set()
+        task = self.executor.submit(lambda params: params["x"] * 2,
+                                    {"x": 21}, on_complete)
+        done.wait(5)
+        self.assertEqual(results, [42])
+        self.assertEqual(task.params["kill"], False)
+
+    def test_max_workers(self):
+        lock = threading.Lock()
+        counts = {"now": 0, "most": 0}
+        def run(params):
+            lock.acquire()
+            counts["now"] += 1
+            counts["most"] = max(counts["most"], counts["now"])
+            lock.release()
+            time.sleep(.05)
+            lock.acquire()
+            counts["now"] -= 1
+            lock.release()
+        for i in range(8):
+            self.executor.submit(run)
+        self.executor.shutdown()
+        self.assertEqual(counts["most"], 2)
+
+    def test_priority(self):
+        gate = threading.Event()
+        order = []
+        self.executor = TaskExecutor(max_workers=1)
+        self.executor.submit(lambda params: gate.wait(5))
+        for priority in [0, 5, 0, 10]:
+            self.executor.submit(lambda params: order.append(params["p"]),
+                                 {"p": priority}, priority=priority)
+        gate.set()
+        self.executor.shutdown()
+        self.assertEqual(order, [10, 5, 0, 0])
+
+    def test_kill_pending(self):
+        gate = threading.Event()
+        started = threading.Event()
+        ran = []
+        def block(params):
+            started.set()
+            gate.wait(5)
+        self.executor = TaskExecutor(max_workers=1)
+        self.executor.submit(block)
+        started.wait(5)
+        task = self.executor.submit(lambda params: ran.append(True))
+        self.assertEqual(self.executor.pending, 1)
+        task.kill()
+        self.assertEqual(task.state, Task.KILLED)
+        self.assertEqual(self.executor.pending, 0)
+        gate.set()
+        self.executor.shutdown()
+        self.assertEqual(ran, [])
+
+    def test_kill_running(self):
+        started = threading.Event()
+        results = []
+        def run(params):
+            started.set()
+            while not params["kill"]:
+                time.sleep(.01)
+            return "killed"
+        task = self.executor.submit(run, None, results.append)
+        started.wait(5)
+        task.kill()
+        self.executor.shutdown()
+        self.assertEqual(results, ["killed"])
+        self.assertEqual(task.state, Task.DONE)
+
+    def test_error_does_not_stop_worker(self):
+        results = []
+        self.executor = TaskExecutor(max_workers=1)
+        self.executor.submit(lambda params: 1 / 0)
+        self.executor.submit(lambda params: "ok", None, results.append)
+        self.executor.shutdown()
+        self.assertEqual(results, ["ok"])
+
+    def test_submit_after_shutdown(self):
+        self.executor.shutdown()
+        self.assertRaises(RuntimeError, self.executor.submit, lambda p: None)
+
+    def test_default_executor(self):
+        self.assertTrue(default_executor() is default_executor())
+
+class TestResultChannel(TestCase):
+    """Test the ResultChannel functionality"""
+
+    def setUp(self):
+        TestCase.setUp(self)
+
+    def tearDown(self):
+        TestCase.tearDown(self)
+
+    def test_get_batches(self):
+        puts = []
+        channel = ResultChannel(on_put=lambda: puts.append(True))
+        channel.put([1, 2])
+        channel.put([3])
+        self.assertEqual(channel.get_batches(), [[1, 2], [3]])
+        self.assertEqual(channel.get_batches(), [])
+        self.assertEqual(len(puts), 2)
+
+    def test_put_blocks_when_full(self):
+        channel = ResultChannel(max_batches=2)
+        put = []
+        def produce():
+            for x in range(5):
+                put.append(channel.put([x]))
+        producer = threading.Thread(target=produce)
+        producer.start()
+        time.sleep(.2)
+        self.assertEqual(len(put), 2)
+        received = []
+        while len(received) < 5:
+            for batch in channel.get_batches():
+                received.extend(batch)
+            time.sleep(.01)
+        producer.join()
+        self.assertEqual(received, range(5))
+
+    def test_close_wakes_producer(self):
+        channel = ResultChannel(max_batches=1)
+        channel.put([0])
+        results = []
+        producer = threading.Thread(
+                       target=lambda: results.append(channel.put([1])))
+        producer.start()
+        time.sleep(.1)
+        channel.close()
+        producer.join(5)
+        self.assertEqual(results, [False])
+        self.assertFalse(channel.put([2]))
+
+class TestProcessTaskExecutor(TestCase):
+    """Test the ProcessTaskExecutor functionality"""
+
+    def setUp(self):
+        TestCase.setUp(self)
+        self.executor = ProcessTaskExecutor(max_workers=1)
+
+    def tearDown(self):
+        self.executor.shutdown()
+        TestCase.tearDown(self)
+
+    def test_runs_in_worker_process(self):
+        results = []
+        for i in range(3):
+            self.executor.submit(process_id, None, results.append)
+        self.executor.shutdown()
+        self.assertEqual(len(results), 3)
+        self.assertNotEqual(results[0], os.getpid())
+        #the process is kept for the following tasks
+        self.assertEqual(len(set(results)), 1)
+
+    def test_progress(self):
+        progress = []
+        results = []
+        params = {"count": 3,
+                  "update_progress_function":
+                  lambda fraction, displaytext: progress.append(displaytext)}
+        self.executor.submit(count_with_progress, params, results.append)
+        self.executor.shutdown()
+        self.assertEqual(progress, ["0", "1", "2"])
+        self.assertEqual(results, [3])
+
+    def test_partial_results(self):
+        channel = ResultChannel()
+        results = []
+        params = {"partial_results_function": channel.put}
+        self.executor.submit(put_partial_results, params, results.append)
+        self.executor.shutdown()
+        self.assertEqual(channel.get_batches(), [[0], [1], [2]])
+        self.assertEqual(results, ["done"])
+
+    def test_kill(self):
+        results = []
+        task = self.executor.submit(wait_for_kill, None, results.append)
+        time.sleep(.2)
+        task.kill()
+        self.executor.shutdown()
+        self.assertEqual(results, ["killed"])
+
+    def test_error_does_not_stop_worker(self):
+        results = []
+        self.executor.submit(raise_error)
+        self.executor.submit(process_id, None, results.append)
+        self.executor.shutdown()
+        self.assertEqual(len(results), 1)
@@ -0,0 +1,183 @@
+# -*- coding: utf-8 -*-
+### BEGIN LICENSE
+# Copyright (C) 2010 Rick Spencer rick.spencer@canonical.com
+#This program is free software: you can redistribute it and/or modify it
+#under the terms of the GNU General Public License version 3, as published
+#by the Free Software Foundation.
+#
+#This program is distributed in the hope that it will be useful, but
+#WITHOUT ANY WARRANTY; without even the implied warranties of
+#MERCHANTABILITY, SATISFACTORY QUALITY, or FITNESS FOR A PARTICULAR
+#PURPOSE.  See the GNU General Public License for more details.
+#
+#You should have received a copy of the GNU General Public License along
+#with this program.  If not, see <http://www.gnu.org/licenses/>.
+### END LICENSE
+
+"""Tests for the ThumbnailCache"""
+
+import hashlib
+import os
+import shutil
+import stat
+import struct
+import tempfile
+import threading
+import time
+import zlib
+from testtools import TestCase
+from quickly.widgets.thumbnail_cache import ThumbnailCache, file_uri
+from quickly.widgets.thumbnail_cache import freedesktop_directory, png_text
+from quickly.widgets.task_executor import TaskExecutor, default_executor
+
+def png_chunk(kind, data):
+    crc = zlib.crc32(kind + data) & 0xffffffff
+    return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", crc)
+
+def text_thumbnail(filename, thumbnail, size):
+    """stands in for making a png, the thumbnail has the text chunks of
+    a thumbnail but no image"""
+    f = open(thumbnail, "wb")
+    f.write("\x89PNG\r\n\x1a\n")
+    f.write(png_chunk("tEXt", "Thumb::URI\0" + file_uri(filename)))
+    f.write(png_chunk("IDAT", zlib.compress("")))
+    f.write(png_chunk("tEXt", "Thumb::MTime\0%d" %
+                      int(os.path.getmtime(filename))))
+    f.write(png_chunk("IEND", ""))
+    f.close()
+
+class TestThumbnailCache(TestCase):
+    """Test the ThumbnailCache functionality"""
+
+    def setUp(self):
+        TestCase.setUp(self)
+        self.directory = tempfile.mkdtemp()
+        self.thumbnails = os.path.join(self.directory, "thumbnails")
+        self.executor = TaskExecutor(max_workers=1)
+        self.images = []
+        for x in range(5):
+            name = os.path.join(self.directory, "image %d.jpg" % x)
+            f = open(name, "w")
+            f.write(str(x))
+            f.close()
+            self.images.append(name)
+
+    def tearDown(self):
+        self.executor.shutdown()
+        shutil.rmtree(self.directory)
+        TestCase.tearDown(self)
+
+    def cache(self, **kwargs):
+        return ThumbnailCache(self.thumbnails, executor=self.executor,
+                              make_thumbnail=text_thumbnail, **kwargs)
+
+    def test_freedesktop_layout(self):
+        os.environ["XDG_CACHE_HOME"] = "/tmp/cache"
+        try:
+            self.assertEqual(freedesktop_directory(),
+                             "/tmp/cache/thumbnails/normal")
+        finally:
+            del os.environ["XDG_CACHE_HOME"]
+        cache = self.cache()
+        uri = "file://" + self.images[0].replace(" ", "%20")
+        self.assertEqual(file_uri(self.images[0]), uri)
+        self.assertEqual(cache.thumbnail_path(self.images[0]),
+                         os.path.join(self.thumbnails,
+                                      hashlib.md5(uri).hexdigest() + ".png"))
+
+    def test_request_makes_thumbnail(self):
+        cache = self.cache()
+        ready = []
+        cache.request(self.images[0], lambda f, t: ready.append((f, t)))
+        self.executor.shutdown()
+        thumbnail = cache.thumbnail_path(self.images[0])
+        self.assertEqual(ready, [(self.images[0], thumbnail)])
+        self.assertEqual(cache.lookup(self.images[0]), thumbnail)
+        self.assertEqual((cache.hits, cache.misses), (1, 1))
+
+    def test_out_of_date(self):
+        cache = self.cache()
+        cache.request(self.images[0], lambda f, t: None)
+        self.executor.shutdown()
+        later = time.time() + 10
+        os.utime(self.images[0], (later, later))
+        self.assertEqual(cache.lookup(self.images[0]), None)
+
+    def test_cancel(self):
+        gate = threading.Event()
+        started = threading.Event()
+        def block(params):
+            started.set()
+            gate.wait(5)
+        self.executor.submit(block)
+        started.wait(5)
+        cache = self.cache()
+        ready = []
+        request = cache.request(self.images[0], lambda f, t: ready.append(t))
+        request.cancel()
+        gate.set()
+        self.executor.shutdown()
+        self.assertEqual(ready, [])
+        self.assertFalse(os.path.exists(cache.thumbnail_path(self.images[0])))
+
+    def test_failed_thumbnail(self):
+        def fail(filename, thumbnail, size):
+            open(thumbnail, "w").close()
+            raise IOError("not an image")
+        cache = ThumbnailCache(self.thumbnails, executor=self.executor,
+                               make_thumbnail=fail)
+        ready = []
+        cache.request(self.images[0], lambda f, t: ready.append(t))
+        self.executor.shutdown()
+        self.assertEqual(ready, [None])
+        self.assertEqual(os.listdir(self.thumbnails), [])
+
+    def test_lru_eviction(self):
+        cache = self.cache(max_entries=3)
+        for x, image in enumerate(self.images):
+            cache.request(image, lambda f, t: None)
+            self.executor.shutdown()
+            self.executor = TaskExecutor(max_workers=1)
+            cache.executor = self.executor
+            #make the use times distinct
+            thumbnail = cache.thumbnail_path(image)
+            os.utime(thumbnail, (1000 + x, 1000 + x))
+        remaining = sorted(os.listdir(self.thumbnails))
+        self.assertTrue(len(remaining) <= 3)
+        self.assertTrue(os.path.exists(cache.thumbnail_path(self.images[4])))
+        self.assertFalse(os.path.exists(cache.thumbnail_path(self.images[0])))
+
+    def test_thumb_mtime(self):
+        cache = self.cache()
+        cache.request(self.images[0], lambda f, t: None)
+        self.executor.shutdown()
+        thumbnail = cache.thumbnail_path(self.images[0])
+        self.assertEqual(png_text(thumbnail)["Thumb::URI"],
+                         file_uri(self.images[0]))
+        self.assertEqual(stat.S_IMODE(os.stat(thumbnail).st_mode), 0600)
+
+        #a newer thumbnail of an older image is still out of date
+        os.utime(thumbnail, (time.time() + 20, time.time() + 20))
+        earlier = time.time() - 10
+        os.utime(self.images[0], (earlier, earlier))
+        self.assertEqual(cache.lookup(self.images[0]), None)
+
+    def test_shared_thumbnails_are_not_touched(self):
+        os.environ["XDG_CACHE_HOME"] = self.directory
+        try:
+            cache = ThumbnailCache(executor=self.executor,
+                                   make_thumbnail=text_thumbnail)
+            self.assertTrue(cache.shared)
+            self.assertFalse(self.cache().shared)
+            cache.request(self.images[0], lambda f, t: None)
+            self.executor.shutdown()
+            thumbnail = cache.thumbnail_path(self.images[0])
+            os.utime(thumbnail, (1000, 1000))
+            self.assertEqual(cache.lookup(self.images[0]), thumbnail)
+            self.assertEqual(os.path.getmtime(thumbnail), 1000)
+        finally:
+            del os.environ["XDG_CACHE_HOME"]
+
+    def test_default_executor(self):
+        cache = ThumbnailCache(self.thumbnails)
+        self.assertTrue(cache.executor is default_executor())
@@ -0,0 +1,61 @@
+# -*- coding: utf-8 -*-
+### BEGIN LICENSE
+# Copyright (C) 2010 Rick Spencer rick.spencer@canonical.com
+#This program is free software: you can redistribute it and/or modify it
+#under the terms of the GNU General Public License version 3, as published
+#by the Free Software Foundation.
+#
+#This program is distributed in the hope that it will be useful, but
+#WITHOUT ANY WARRANTY; without even the implied warranties of
+#MERCHANTABILITY, SATISFACTORY QUALITY, or FITNESS FOR A PARTICULAR
+#PURPOSE.  See the GNU General Public License for more details.
+#
+#You should have received a copy of the GNU General Public License along
+#with this program.  If not, see <http://www.gnu.org/licenses/>.
+### END LICENSE
+
+"""Tests for the TreeGrid"""
+
+from testtools import TestCase
+from quickly.widgets.tree_grid import TreeGrid
+
+class TestTreeGrid(TestCase):
+    """Test the TreeGrid functionality"""
+
+    def setUp(self):
+        TestCase.setUp(self)
+        self.orders = [{"customer": "acme", "price": 10.0,
+                        "lines": [{"product": "pen", "price": 4.0},
+                                  {"product": "ink", "price": 6.0}]},
+                       {"customer": "initech", "price": 1.0}]
+
+    def tearDown(self):
+        TestCase.tearDown(self)
+
+    def test_create_a_grid(self):
+        grid = TreeGrid(self.orders)
+        self.assertEqual(grid.children_key, "lines")
+        self.assertEqual(grid.keys, ["customer", "price", "product"])
+        self.assertEqual(grid.rows, self.orders)
+
+    def test_lazy_children(self):
+        grid = TreeGrid(self.orders)
+        store = grid.get_model()
+        #only a placeholder until the row is expanded
+        self.assertEqual(store.iter_n_children(store.get_iter((0,))), 1)
+        self.assertEqual(store.iter_n_children(store.get_iter((1,))), 0)
+        grid.expand_row((0,), False)
+        self.assertEqual([r[2] for r in store[0].iterchildren()],
+                         ["pen", "ink"])
+        grid.get_selection().select_path((0, 1))
+        self.assertEqual(grid.selected_rows, [self.orders[0]["lines"][1]])
+        grid.collapse_row((0,))
+        self.assertEqual(store.iter_n_children(store.get_iter((0,))), 1)
+
+    def test_append_child(self):
+        grid = TreeGrid(self.orders)
+        store = grid.get_model()
+        grid.append_row({"product": "desk"}, store.get_iter((1,)))
+        self.assertEqual(self.orders[1]["lines"], [{"product": "desk"}])
+        grid.expand_row((1,), False)
+        self.assertEqual(store[1, 0][2], "desk")
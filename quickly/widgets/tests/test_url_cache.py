@@ -0,0 +1,86 @@
+# -*- coding: utf-8 -*-
+### BEGIN LICENSE
+# Copyright (C) 2010 Rick Spencer rick.spencer@canonical.com
+#This program is free software: you can redistribute it and/or modify it
+#under the terms of the GNU General Public License version 3, as published
+#by the Free Software Foundation.
+#
+#This program is distributed in the hope that it will be useful, but
+#WITHOUT ANY WARRANTY; without even the implied warranties of
+#MERCHANTABILITY, SATISFACTORY QUALITY, or FITNESS FOR A PARTICULAR
+#PURPOSE.  See the GNU General Public License for more details.
+#
+#You should have received a copy of the GNU General Public License along
+#with this program.  If not, see <http://www.gnu.org/licenses/>.
+### END LICENSE
+
+"""Tests for the UrlCache"""
+
+import os
+import shutil
+import tempfile
+from testtools import TestCase
+from quickly.widgets.url_cache import UrlCache
+
+class TestUrlCache(TestCase):
+    """Test the UrlCache functionality"""
+
+    def setUp(self):
+        TestCase.setUp(self)
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+        TestCase.tearDown(self)
+
+    def test_store_and_use(self):
+        cache = UrlCache(self.directory)
+        self.assertEqual(cache.lookup("http://a/1"), None)
+        cache.store("http://a/1", "content", etag="e1")
+        entry = cache.lookup("http://a/1")
+        self.assertTrue(cache.is_fresh(entry))
+        self.assertEqual(open(cache.use(entry)).read(), "content")
+        self.assertEqual(cache.read(entry), "content")
+        self.assertEqual((cache.hits, cache.misses), (1, 1))
+
+    def test_persistent(self):
+        cache = UrlCache(self.directory)
+        cache.store("http://a/1", "content", modified=100)
+        cache = UrlCache(self.directory)
+        entry = cache.lookup("http://a/1")
+        self.assertEqual(entry.modified, 100)
+        self.assertEqual(cache.read(entry), "content")
+
+    def test_lru_eviction(self):
+        cache = UrlCache(self.directory, max_bytes=10)
+        cache.store("1", "aaaa")
+        cache.store("2", "bbbb")
+        cache.use(cache.lookup("1"))
+        cache.lookup("1").last_used += 1
+        cache.store("3", "cccc")
+        self.assertEqual(cache.size, 8)
+        self.assertEqual(cache.lookup("2"), None)
+        self.assertNotEqual(cache.lookup("1"), None)
+        self.assertEqual(len(os.listdir(self.directory)), 3)
+
+    def test_too_big(self):
+        cache = UrlCache(self.directory, max_bytes=3)
+        self.assertEqual(cache.store("1", "aaaa"), None)
+        self.assertEqual(len(cache), 0)
+
+    def test_revalidate(self):
+        cache = UrlCache(self.directory, max_age=0)
+        cache.store("1", "a", etag="e1", modified=100)
+        entry = cache.lookup("1")
+        self.assertFalse(cache.is_fresh(entry))
+        self.assertTrue(cache.revalidate(entry, "e1", 200))
+        self.assertFalse(cache.revalidate(entry, "e2", 100))
+        self.assertTrue(cache.revalidate(entry, None, 100))
+        self.assertFalse(cache.revalidate(entry, None, None))
+        self.assertEqual((cache.revalidations, cache.misses), (2, 2))
+
+    def test_damaged_index(self):
+        f = open(os.path.join(self.directory, "index.json"), "w")
+        f.write("{not json")
+        f.close()
+        self.assertEqual(len(UrlCache(self.directory)), 0)
@@ -0,0 +1,224 @@
+# -*- coding: utf-8 -*-
+### BEGIN LICENSE
+# Copyright (C) 2010 Rick Spencer rick.spencer@canonical.com
+#This program is free software: you can redistribute it and/or modify it
+#under the terms of the GNU General Public License version 3, as published
+#by the Free Software Foundation.
+#
+#This program is distributed in the hope that it will be useful, but
+#WITHOUT ANY WARRANTY; without even the implied warranties of
+#MERCHANTABILITY, SATISFACTORY QUALITY, or FITNESS FOR A PARTICULAR
+#PURPOSE.  See the GNU General Public License for more details.
+#
+#You should have received a copy of the GNU General Public License along
+#with this program.  If not, see <http://www.gnu.org/licenses/>.
+### END LICENSE
+
+"""Tests for the UrlFetchProgressBox"""
+
+import os
+import shutil
+import tempfile
+import time
+from testtools import TestCase
+import gobject
+import gtk
+from quickly.widgets.url_fetch_progressbox import (UrlFetchProgressBox,
+                                                   VALIDATOR_SUFFIX)
+from quickly.widgets.url_cache import UrlCache
+from quickly.widgets.tests.test_range_fetch import serve, CONTENT
+
+#ranges of http URLs are read on worker threads
+gobject.threads_init()
+
+def run_main_loop(until, timeout=5):
+    """runs the main loop until the function until returns True"""
+    deadline = time.time() + timeout
+    while not until() and time.time() < deadline:
+        gtk.main_iteration(False)
+        time.sleep(.001)
+
+class TestUrlFetchProgressBox(TestCase):
+    """Test the UrlFetchProgressBox functionality"""
+
+    def setUp(self):
+        TestCase.setUp(self)
+        self.directory = tempfile.mkdtemp()
+        self.source = os.path.join(self.directory, "source")
+        self.content = "".join([chr(x % 256) for x in range(10000)])
+        source = open(self.source, "wb")
+        source.write(self.content)
+        source.close()
+        self.url = "file://" + self.source
+        self.downloaded = []
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+        TestCase.tearDown(self)
+
+    def fetch(self, **kwargs):
+        box = UrlFetchProgressBox(self.url, destroy_after_fetching=False,
+                                  **kwargs)
+        box.connect("downloaded",
+                    lambda widget, data: self.downloaded.append(data))
+        run_main_loop(lambda: len(self.downloaded) > 0)
+        return box
+
+    def test_load_contents(self):
+        self.fetch()
+        self.assertEqual(self.downloaded, [self.content])
+
+    def test_streaming_chunks(self):
+        chunks = []
+        box = UrlFetchProgressBox(self.url, destroy_after_fetching=False,
+                                  streaming=True, chunk_size=4096)
+        box.connect("chunk", lambda widget, chunk: chunks.append(chunk))
+        box.connect("downloaded",
+                    lambda widget, data: self.downloaded.append(data))
+        run_main_loop(lambda: len(self.downloaded) > 0)
+        self.assertEqual(self.downloaded, [len(self.content)])
+        self.assertEqual("".join(chunks), self.content)
+        self.assertEqual([len(c) for c in chunks], [4096, 4096, 1808])
+
+    def test_streaming_to_destination(self):
+        destination = os.path.join(self.directory, "destination")
+        self.fetch(destination=destination)
+        self.assertEqual(self.downloaded, [destination])
+        self.assertEqual(open(destination, "rb").read(), self.content)
+
+    def test_cache_hit(self):
+        cache = UrlCache(os.path.join(self.directory, "cache"))
+        self.fetch(cache=cache)
+        self.assertEqual(cache.misses, 1)
+        os.remove(self.source)
+        self.downloaded = []
+        self.fetch(cache=cache)
+        self.assertEqual(self.downloaded, [self.content])
+        self.assertEqual(cache.hits, 1)
+
+    def test_cache_revalidation(self):
+        cache = UrlCache(os.path.join(self.directory, "cache"), max_age=0)
+        self.fetch(cache=cache)
+        self.downloaded = []
+        self.fetch(cache=cache)
+        self.assertEqual(self.downloaded, [self.content])
+        self.assertEqual(cache.revalidations, 1)
+
+    def cancel_after_first_chunk(self, destination):
+        """leaves the first 3000 bytes of the URL in destination"""
+        box = UrlFetchProgressBox(self.url, destroy_after_fetching=False,
+                                  destination=destination, resume=True,
+                                  chunk_size=3000)
+        box.connect("chunk", lambda widget, chunk: widget.cancel())
+        box.connect("downloaded",
+                    lambda widget, data: self.downloaded.append(data))
+        run_main_loop(lambda: len(self.downloaded) > 0)
+        self.assertEqual(self.downloaded, [None])
+        self.downloaded = []
+        self.assertEqual(os.path.getsize(destination), 3000)
+
+    def resume(self, destination):
+        """resumes the fetch and returns the chunks it read"""
+        chunks = []
+        box = UrlFetchProgressBox(self.url, destroy_after_fetching=False,
+                                  destination=destination, resume=True)
+        box.connect("chunk", lambda widget, chunk: chunks.append(chunk))
+        box.connect("downloaded",
+                    lambda widget, data: self.downloaded.append(data))
+        run_main_loop(lambda: len(self.downloaded) > 0)
+        self.assertEqual(open(destination, "rb").read(), self.content)
+        return chunks
+
+    def test_resume(self):
+        destination = os.path.join(self.directory, "destination")
+        self.cancel_after_first_chunk(destination)
+        chunks = self.resume(destination)
+        self.assertEqual(len("".join(chunks)), 7000)
+        self.assertFalse(os.path.exists(destination + ".validator"))
+
+    def test_resume_changed_url(self):
+        destination = os.path.join(self.directory, "destination")
+        self.cancel_after_first_chunk(destination)
+        os.utime(self.source, (1, 1))
+        chunks = self.resume(destination)
+        self.assertEqual(len("".join(chunks)), 10000)
+
+    def test_resume_without_validator(self):
+        destination = os.path.join(self.directory, "destination")
+        partial = open(destination, "wb")
+        partial.write(self.content[:3000])
+        partial.close()
+        chunks = self.resume(destination)
+        self.assertEqual(len("".join(chunks)), 10000)
+
+    def test_resume_with_segments(self):
+        self.assertRaises(ValueError, UrlFetchProgressBox, self.url,
+                          destination=os.path.join(self.directory, "d"),
+                          resume=True, segments=4)
+
+    def test_segments(self):
+        destination = os.path.join(self.directory, "destination")
+        box = self.fetch(destination=destination, segments=4, chunk_size=1000)
+        self.assertEqual(self.downloaded, [destination])
+        self.assertEqual(box.bytes_read, len(self.content))
+        self.assertEqual(open(destination, "rb").read(), self.content)
+
+    def fetch_http(self, server, **kwargs):
+        """fetches the url of a server from test_range_fetch into a
+        destination and returns the chunks it read
+
+        """
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        destination = os.path.join(self.directory, "destination")
+        chunks = []
+        box = UrlFetchProgressBox(server.url, destroy_after_fetching=False,
+                                  destination=destination, **kwargs)
+        box.connect("chunk", lambda widget, chunk: chunks.append(chunk))
+        box.connect("downloaded",
+                    lambda widget, data: self.downloaded.append(data))
+        run_main_loop(lambda: len(self.downloaded) > 0)
+        self.assertEqual(self.downloaded, [destination])
+        self.assertEqual(open(destination, "rb").read(), CONTENT)
+        return chunks
+
+    def write_http_partial(self, size):
+        destination = os.path.join(self.directory, "destination")
+        partial = open(destination, "wb")
+        partial.write(CONTENT[:size])
+        partial.close()
+        #the etag and modification time the test server sends
+        validator = open(destination + VALIDATOR_SUFFIX, "w")
+        validator.write('"v1"\n946684800\n')
+        validator.close()
+
+    def test_http_resume(self):
+        self.write_http_partial(3000)
+        server = serve(True)
+        chunks = self.fetch_http(server, resume=True)
+        self.assertEqual(len("".join(chunks)), 7000)
+        self.assertEqual(server.requests, [None, "bytes=3000-"])
+
+    def test_http_resume_range_ignored(self):
+        #the server says it accepts ranges, but sends the whole URL
+        self.write_http_partial(3000)
+        chunks = self.fetch_http(serve(False, True), resume=True)
+        self.assertEqual(len("".join(chunks)), 10000)
+
+    def test_http_segments(self):
+        server = serve(True)
+        self.fetch_http(server, segments=4)
+        self.assertEqual(sorted(server.requests[1:]),
+                         ["bytes=0-2499", "bytes=2500-4999",
+                          "bytes=5000-7499", "bytes=7500-9999"])
+
+    def test_http_segments_without_accept_ranges(self):
+        server = serve(True, False)
+        self.fetch_http(server, segments=4)
+        self.assertEqual(server.requests, [None, None])
+
+    def test_http_segments_range_ignored(self):
+        #every segment after the first fails, so the URL is read whole
+        server = serve(False, True)
+        self.fetch_http(server, segments=4, chunk_size=1000)
+        self.assertTrue(None in server.requests[1:])
@@ -0,0 +1,93 @@
+# -*- coding: utf-8 -*-
+### BEGIN LICENSE
+# Copyright (C) 2010 Rick Spencer rick.spencer@canonical.com
+#This program is free software: you can redistribute it and/or modify it
+#under the terms of the GNU General Public License version 3, as published
+#by the Free Software Foundation.
+#
+#This program is distributed in the hope that it will be useful, but
+#WITHOUT ANY WARRANTY; without even the implied warranties of
+#MERCHANTABILITY, SATISFACTORY QUALITY, or FITNESS FOR A PARTICULAR
+#PURPOSE.  See the GNU General Public License for more details.
+#
+#You should have received a copy of the GNU General Public License along
+#with this program.  If not, see <http://www.gnu.org/licenses/>.
+### END LICENSE
+
+"""Tests for the UrlFetchQueue"""
+
+import os
+import shutil
+import tempfile
+import time
+from testtools import TestCase
+import gtk
+from quickly.widgets.url_fetch_queue import UrlFetchQueue
+
+def run_main_loop(until, timeout=5):
+    """runs the main loop until the function until returns True"""
+    deadline = time.time() + timeout
+    while not until() and time.time() < deadline:
+        gtk.main_iteration(False)
+        time.sleep(.001)
+
+class TestUrlFetchQueue(TestCase):
+    """Test the UrlFetchQueue functionality"""
+
+    def setUp(self):
+        TestCase.setUp(self)
+        self.directory = tempfile.mkdtemp()
+        self.urls = []
+        for x in range(6):
+            name = os.path.join(self.directory, str(x))
+            f = open(name, "w")
+            f.write(str(x))
+            f.close()
+            self.urls.append("file://" + name)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+        TestCase.tearDown(self)
+
+    def test_fetches_all(self):
+        downloaded = {}
+        finished = []
+        queue = UrlFetchQueue(max_active=2)
+        queue.connect("downloaded",
+                      lambda q, url, data: downloaded.__setitem__(url, data))
+        queue.connect("all-downloaded", lambda q: finished.append(True))
+        for url in self.urls:
+            queue.add(url)
+        self.assertEqual(queue.scheduler.active, 2)
+        run_main_loop(lambda: len(finished) > 0)
+        self.assertEqual(len(downloaded), 6)
+        self.assertEqual(downloaded[self.urls[3]], "3")
+
+    def test_cancel_all(self):
+        downloaded = []
+        queue = UrlFetchQueue(max_active=1)
+        queue.connect("downloaded",
+                      lambda q, url, data: downloaded.append(data))
+        for url in self.urls:
+            queue.add(url)
+        queue.cancel_all()
+        run_main_loop(lambda: len(downloaded) == 6)
+        #the running fetch may finish before it sees the cancel
+        self.assertTrue(downloaded.count(None) >= 5)
+
+    def test_failed_fetch_frees_its_slot(self):
+        downloaded = {}
+        failed = []
+        finished = []
+        queue = UrlFetchQueue(max_active=1)
+        queue.connect("downloaded",
+                      lambda q, url, data: downloaded.__setitem__(url, data))
+        queue.connect("failed", lambda q, url, error: failed.append(url))
+        queue.connect("all-downloaded", lambda q: finished.append(True))
+        missing = "file://" + os.path.join(self.directory, "missing")
+        queue.add(missing)
+        queue.add(self.urls[0])
+        run_main_loop(lambda: len(finished) > 0)
+        self.assertEqual(failed, [missing])
+        self.assertEqual(downloaded, {self.urls[0]: "0"})
+        self.assertEqual(queue.scheduler.active, 0)
@@ -0,0 +1,321 @@
+### BEGIN LICENSE
+# Copyright (C) 2010 Rick Spencer rick.spencer@canonical.com
+#This program is free software: you can redistribute it and/or modify it
+#under the terms of the GNU General Public License version 3, as published
+#by the Free Software Foundation.
+#
+#This program is distributed in the hope that it will be useful, but
+#WITHOUT ANY WARRANTY; without even the implied warranties of
+#MERCHANTABILITY, SATISFACTORY QUALITY, or FITNESS FOR A PARTICULAR
+#PURPOSE.  See the GNU General Public License for more details.
+#
+#You should have received a copy of the GNU General Public License along
+#with this program.  If not, see <http://www.gnu.org/licenses/>.
+### END LICENSE
+
+"""A persistent cache of image thumbnails made on worker threads
+ThumbnailCache keeps png thumbnails named by the md5 of the image's uri,
+the layout of the freedesktop.org thumbnail specification, so by default
+it shares ~/.cache/thumbnails with the rest of the desktop. As the
+specification asks, a thumbnail is up to date if the Thumb::MTime stored
+in it is the modification time of the image, and new thumbnails can only
+be read by the user. Missing or out of date thumbnails are made on a
+TaskExecutor, and requests that are no longer needed can be cancelled
+before they run. OpenImageDialog uses a ThumbnailCache for its preview.
+
+Using
+cache = ThumbnailCache()
+request = cache.request("/home/me/Pictures/cat.jpg", on_ready)
+
+#on_ready is called on a worker thread with the file name and the name
+#of the thumbnail, or None if no thumbnail could be made
+def on_ready(filename, thumbnail):
+    gobject.idle_add(image.set_from_file, thumbnail)
+
+#the user moved on, don't make the thumbnail if it has not started
+request.cancel()
+
+Configuring
+#keep the thumbnails in a directory of your own and keep at most
+#5000 of them, the least recently used are removed first. Thumbnails in
+#the shared directory are not marked as used, so there the oldest are
+#removed first
+cache = ThumbnailCache(directory, max_entries=5000)
+
+#use large thumbnails
+cache = ThumbnailCache(size=LARGE_SIZE)
+
+"""
+
+import hashlib
+import os
+import struct
+import threading
+import urllib
+
+#thumbnail sizes in pixels, and the directories the freedesktop.org
+#thumbnail specification keeps them in
+NORMAL_SIZE = 128
+LARGE_SIZE = 256
+_SIZE_DIRECTORIES = {NORMAL_SIZE: "normal", LARGE_SIZE: "large"}
+
+#the first bytes of every png file
+_PNG_SIGNATURE = "\x89PNG\r\n\x1a\n"
+
+def file_uri(filename):
+    """file_uri: returns the file uri for a file name, as used to name
+    thumbnails.
+
+    """
+
+    return "file://" + urllib.quote(os.path.abspath(filename))
+
+def freedesktop_directory(size=NORMAL_SIZE):
+    """freedesktop_directory: returns the shared thumbnail directory for
+    size, under $XDG_CACHE_HOME or ~/.cache.
+
+    """
+
+    cache_home = os.environ.get("XDG_CACHE_HOME",
+                                os.path.join(os.path.expanduser("~"), ".cache"))
+    return os.path.join(cache_home, "thumbnails",
+                        _SIZE_DIRECTORIES.get(size, "normal"))
+
+def make_png_thumbnail(filename, thumbnail, size):
+    """make_png_thumbnail: writes a png thumbnail of the image filename,
+    no bigger than size, with the Thumb::URI and Thumb::MTime the
+    freedesktop.org specification asks for. Safe to call on a worker
+    thread since it does not draw.
+
+    """
+
+    import gtk
+    pixbuf = gtk.gdk.pixbuf_new_from_file_at_size(filename, size, size)
+    options = {"tEXt::Thumb::URI": file_uri(filename),
+               "tEXt::Thumb::MTime": str(int(os.path.getmtime(filename)))}
+    pixbuf.save(thumbnail, "png", options)
+
+def png_text(filename):
+    """png_text: returns a dictionary of the keys and values of the tEXt
+    chunks of a png file, such as Thumb::MTime. Reads only the chunk
+    headers and the text, so it does not decode the image.
+
+    """
+
+    text = {}
+    f = open(filename, "rb")
+    try:
+        if f.read(8) != _PNG_SIGNATURE:
+            return text
+        while True:
+            header = f.read(8)
+            if len(header) < 8:
+                break
+            length, kind = struct.unpack(">I4s", header)
+            if kind == "IEND":
+                break
+            if kind == "tEXt":
+                data = f.read(length)
+                if "\0" in data:
+                    key, val = data.split("\0", 1)
+                    text[key] = val
+                f.seek(4, os.SEEK_CUR)
+            else:
+                #skip the data and the crc
+                f.seek(length + 4, os.SEEK_CUR)
+    finally:
+        f.close()
+    return text
+
+class ThumbnailRequest(object):
+    """ThumbnailRequest: a thumbnail asked for from a ThumbnailCache. Not
+    typically created directly, but returned from ThumbnailCache.request.
+
+    """
+
+    def __init__(self, filename, task=None):
+        self.filename = filename
+        self.task = task
+        self.cancelled = False
+
+    def cancel(self):
+        """cancel: stops the thumbnail from being made if it has not
+        started, and stops on_ready from being called.
+
+        """
+
+        self.cancelled = True
+        if self.task is not None:
+            self.task.kill()
+
+class ThumbnailCache(object):
+    """ThumbnailCache: finds and makes thumbnails of image files.
+
+    """
+
+    def __init__(self, directory=None, size=NORMAL_SIZE, max_entries=None,
+                 executor=None, make_thumbnail=make_png_thumbnail):
+        """Create a ThumbnailCache
+
+        Keyword arguments:
+        directory -- the directory to keep thumbnails in, defaults to the
+        freedesktop.org directory for size
+        size -- the most pixels wide or high for a thumbnail
+        max_entries -- the most thumbnails to keep, None for no limit
+        executor -- a TaskExecutor to make thumbnails on, defaults to the
+        one shared by quickly.widgets, task_executor.default_executor
+        make_thumbnail -- a function taking the file name, thumbnail name
+        and size that writes the thumbnail
+
+        """
+
+        if directory is None:
+            directory = freedesktop_directory(size)
+        if executor is None:
+            from task_executor import default_executor
+            executor = default_executor()
+        #thumbnails in the directory shared with the desktop are left as
+        #they are when used
+        shared = os.path.dirname(freedesktop_directory(size))
+        self.shared = os.path.abspath(directory).startswith(shared + os.sep)
+        self.directory = directory
+        self.size = size
+        self.max_entries = max_entries
+        self.executor = executor
+        self.make_thumbnail = make_thumbnail
+        self.hits = 0
+        self.misses = 0
+        self.__count = None
+        self.__lock = threading.Lock()
+
+    def thumbnail_path(self, filename):
+        """thumbnail_path: returns the name the thumbnail of filename has,
+        whether it exists or not.
+
+        """
+
+        name = hashlib.md5(file_uri(filename)).hexdigest() + ".png"
+        return os.path.join(self.directory, name)
+
+    def lookup(self, filename):
+        """lookup: returns the name of an up to date thumbnail of filename,
+        or None. Counts as a use of the thumbnail.
+
+        """
+
+        thumbnail = self.thumbnail_path(filename)
+        try:
+            text = png_text(thumbnail)
+            mtime = str(int(os.path.getmtime(filename)))
+            valid = text.get("Thumb::MTime") == mtime and \
+                    text.get("Thumb::URI", file_uri(filename)) == file_uri(filename)
+        except (IOError, OSError, struct.error):
+            valid = False
+        if not valid:
+            self.misses += 1
+            return None
+        self.hits += 1
+        if not self.shared:
+            try:
+                #the modification time of a thumbnail is its last use
+                os.utime(thumbnail, None)
+            except OSError:
+                pass
+        return thumbnail
+
+    def request(self, filename, on_ready, priority=0):
+        """request: calls on_ready with filename and the name of its
+        thumbnail, making the thumbnail on a worker first if needed.
+        Returns a ThumbnailRequest.
+
+        Keyword arguments:
+        filename -- the image file
+        on_ready -- function called with filename and the thumbnail name,
+        or None if no thumbnail could be made. It is called right away if
+        the thumbnail is up to date, otherwise on a worker thread.
+        priority -- the priority of the work in the executor
+
+        """
+
+        thumbnail = self.lookup(filename)
+        if thumbnail is not None:
+            on_ready(filename, thumbnail)
+            return ThumbnailRequest(filename)
+
+        request = ThumbnailRequest(filename)
+        def finished(thumbnail):
+            if not request.cancelled:
+                on_ready(filename, thumbnail)
+        request.task = self.executor.submit(self.__make, {"filename": filename},
+                                            finished, priority)
+        return request
+
+    def __make(self, params):
+        """__make: internal function run on a worker to make a thumbnail.
+
+        """
+
+        filename = params["filename"]
+        thumbnail = self.thumbnail_path(filename)
+        if not os.path.isdir(self.directory):
+            try:
+                os.makedirs(self.directory, 0700)
+            except OSError:
+                pass
+        #write to a temporary name so a half written thumbnail is never used
+        temporary = "%s.%d.tmp" % (thumbnail, threading.currentThread().ident)
+        try:
+            #thumbnails show what is in the user's files, so only the
+            #user may read them
+            os.close(os.open(temporary, os.O_WRONLY | os.O_CREAT | os.O_TRUNC,
+                             0600))
+            self.make_thumbnail(filename, temporary, self.size)
+            os.chmod(temporary, 0600)
+            os.rename(temporary, thumbnail)
+        except Exception:
+            if os.path.exists(temporary):
+                os.remove(temporary)
+            return None
+        self.__added()
+        return thumbnail
+
+    def __added(self):
+        """__added: internal function that removes the least recently used
+        thumbnails once there are more than max_entries.
+
+        """
+
+        if self.max_entries is None:
+            return
+        self.__lock.acquire()
+        try:
+            if self.__count is None:
+                self.__count = len(self.__thumbnails())
+            else:
+                self.__count += 1
+            if self.__count <= self.max_entries:
+                return
+            #remove a tenth more than needed, so the directory is not
+            #listed again for every new thumbnail
+            thumbnails = self.__thumbnails()
+            keep = self.max_entries - self.max_entries // 10
+            thumbnails.sort(key=lambda t: t[0])
+            for mtime, name in thumbnails[:max(0, len(thumbnails) - keep)]:
+                try:
+                    os.remove(name)
+                except OSError:
+                    pass
+            self.__count = min(len(thumbnails), keep)
+        finally:
+            self.__lock.release()
+
+    def __thumbnails(self):
+        thumbnails = []
+        for name in os.listdir(self.directory):
+            if name.endswith(".png"):
+                name = os.path.join(self.directory, name)
+                try:
+                    thumbnails.append((os.path.getmtime(name), name))
+                except OSError:
+                    pass
+        return thumbnails
@@ -0,0 +1,292 @@
+# -*- coding: utf-8 -*-
+### BEGIN LICENSE
+# Copyright (C) 2010 Rick Spencer rick.spencer@canonical.com
+#This program is free software: you can redistribute it and/or modify it
+#under the terms of the GNU General Public License version 3, as published
+#by the Free Software Foundation.
+#
+#This program is distributed in the hope that it will be useful, but
+#WITHOUT ANY WARRANTY; without even the implied warranties of
+#MERCHANTABILITY, SATISFACTORY QUALITY, or FITNESS FOR A PARTICULAR
+#PURPOSE.  See the GNU General Public License for more details.
+#
+#You should have received a copy of the GNU General Public License along
+#with this program.  If not, see <http://www.gnu.org/licenses/>.
+### END LICENSE
+"""A gtk.TreeView for nested Dictionaries
+Displays dictionaries that hold lists of child dictionaries, such as
+orders and their lines, as expandable rows. Uses the same GridColumns
+and conventions as a DictionaryGrid, with a gtk.TreeStore in place of
+a gtk.ListStore. The display values for a row's children are only made
+when the row is expanded, and are released when it is collapsed, so a
+large document costs little until it is explored.
+
+Using
+orders = [{"customer": "acme", "price": 10.0,
+           "lines": [{"product": "pen", "price": 4.0, "id": 1},
+                     {"product": "ink", "price": 6.0, "id": 2}]}]
+
+#the key holding the children is found from the dictionaries
+tg = TreeGrid(dictionaries=orders)
+
+Configuring
+#name the key holding the children, and the keys to show
+tg = TreeGrid(dictionaries=orders, children_key="lines",
+              keys=["customer", "product", "price"])
+
+#set UI to be editable, edits change the dictionaries
+tg.editable = True
+
+#read the dictionaries for the selected rows, at any level
+for dictionary in tg.selected_rows:
+    print dictionary.get("product")
+
+Extending
+A TreeGrid is a gtk.TreeView. As with a DictionaryGrid, override
+_refresh_treeview to change how it builds itself and append_row to
+change how a row is added.
+
+"""
+
+import gtk
+import gobject
+import conventions
+import grid_model
+
+class TreeGrid(gtk.TreeView):
+    __gtype_name__ = "TreeGrid"
+
+    def __init__(self, dictionaries=None, editable=False, keys=None,
+                 type_hints=None, children_key=None):
+        """
+        Creates a new TreeGrid
+        arguments:
+
+        dictionaries - a list of the top level dictionaries.
+
+        keys - a list of strings specifying keys to use in the columns
+        of the TreeGrid. Defaults to the keys of the dictionaries and
+        all of their children.
+
+        type-hints - a dictionary of keys to GridColumn types, as for a
+        DictionaryGrid.
+
+        children_key - the key of the lists of child dictionaries. The
+        children of a child are under the same key. Defaults to the first
+        key found with a list of dictionaries as its value.
+
+        """
+
+        gtk.TreeView.__init__(self)
+        self.tree_store = None
+        if dictionaries is None:
+            dictionaries = []
+        self._dictionaries = dictionaries
+        self._keys = keys
+        self._editable = editable
+        if type_hints is None:
+            type_hints = {}
+        self._type_hints = type_hints
+        if children_key is None:
+            children_key = grid_model.find_children_key(dictionaries)
+        self.children_key = children_key
+        self.get_selection().set_mode(gtk.SELECTION_MULTIPLE)
+        self.connect("test-expand-row", self.__expanding)
+        self.connect("row-collapsed", self.__collapsed)
+        self._refresh_treeview()
+
+    @property
+    def keys(self):
+        """ keys - the dictionary keys used for the columns. Setting
+        this property will cause the widget to reload.
+
+        """
+
+        return self._keys
+
+    @keys.setter
+    def keys(self, keys):
+        self._keys = keys
+        self._refresh_treeview()
+
+    @property
+    def editable(self):
+        """editable - bool value, True to make editable
+
+        Setting this property will cause the widget to reload.
+
+        """
+
+        return self._editable
+
+    @editable.setter
+    def editable(self, editable):
+        self._editable = editable
+        self._refresh_treeview()
+
+    @property
+    def columns(self):
+        """ columns - A dictionary of the GridColumns indexed by the
+        keys for that column.
+
+        """
+
+        return dict([(c.key, c) for c in self.get_columns()])
+
+    @property
+    def rows(self):
+        """ rows - returns a list of the top level dictionaries, in the
+        order they are displayed.
+
+        This property is read only.
+
+        """
+
+        if self.tree_store is None:
+            return []
+        return [r[len(self.keys)] for r in self.tree_store]
+
+    @property
+    def selected_rows(self):
+        """ selected_rows - returns a list of dictionaries for each row
+        selected, at any level.
+
+        This property is read only.
+
+        """
+
+        model, paths = self.get_selection().get_selected_rows()
+        return [model[p][len(self.keys)] for p in paths]
+
+    def get_dictionaries_copy(self):
+        """get_dictionaries_copy - returns a copy of the list of the top
+        level dictionaries.
+
+        """
+
+        return self._dictionaries[:]
+
+    def _refresh_treeview(self):
+        """
+        _refresh_treeview: internal function to handle rebuilding the
+        gtk.TreeView along with columns and cell renderers.
+
+        _refresh_treeview is not typically called directly,
+        but may be useful to override in subclasses.
+
+        """
+
+        for c in self.get_columns():
+            self.remove_column(c)
+        if self._keys is None:
+            if len(self._dictionaries) == 0:
+                return
+            self._keys = grid_model.infer_tree_keys(self._dictionaries,
+                                                    self.children_key)
+
+        col_types = []
+        self.__columns = []
+        for i, k in enumerate(self._keys):
+            if k in self._type_hints:
+                column = self._type_hints[k](k, i, len(self._keys))
+            else:
+                column = conventions.get_column(k, i, len(self._keys),
+                                                self._editable)
+            self.append_column(column)
+            self.__columns.append(column)
+            col_types.append(column.column_type)
+
+        #the last column is always for storing the backing dict,
+        #None for the placeholder under a row whose children are not loaded
+        col_types.append(gobject.TYPE_PYOBJECT)
+        self.tree_store = gtk.TreeStore(*col_types)
+        for column in self.__columns:
+            #the columns edit and sort the tree store
+            column.list_store = self.tree_store
+
+        for dictionary in self._dictionaries:
+            self.__add_row(dictionary, None)
+        self.set_model(self.tree_store)
+
+    def append_row(self, dictionary, parent=None):
+        """append_row: adds a row for a dictionary. Its children are added
+        when the row is expanded. Returns the gtk.TreeIter of the row.
+
+        arguments:
+        dictionary - the dictionary for the row
+
+        keyword arguments:
+        parent - the gtk.TreeIter of the row to add the row under, None
+        to add a top level row. The dictionary is also appended to the
+        list of dictionaries it belongs in. If the parent's children are
+        not loaded, no row is made and None is returned.
+
+        """
+
+        if parent is None:
+            self._dictionaries.append(dictionary)
+        else:
+            parent_dict = self.tree_store.get_value(parent, len(self.keys))
+            parent_dict.setdefault(self.children_key, []).append(dictionary)
+            if not self.__loaded(parent):
+                #the row is made when the parent is expanded
+                return None
+        return self.__add_row(dictionary, parent)
+
+    def __add_row(self, dictionary, parent):
+        """__add_row: internal function that adds the row for a dictionary
+        under parent, with a placeholder for its children.
+
+        """
+
+        row = grid_model.make_row(self.__columns, dictionary)
+        iter = self.tree_store.append(parent, row)
+        if len(dictionary.get(self.children_key) or []) > 0:
+            self.__add_placeholder(iter)
+        return iter
+
+    def __loaded(self, iter):
+        """__loaded: internal function that returns True unless the row
+        has a placeholder in place of its children.
+
+        """
+
+        child = self.tree_store.iter_children(iter)
+        return child is None or \
+               self.tree_store.get_value(child, len(self.keys)) is not None
+
+    def __add_placeholder(self, iter):
+        #an empty child so the row can be expanded
+        if self.tree_store.iter_children(iter) is None:
+            self.tree_store.append(iter)
+
+    def __expanding(self, treeview, iter, path, data=None):
+        """__expanding: internal signal handler that makes the rows for the
+        children of a row just before it is expanded.
+
+        Do not call directly
+        """
+
+        if self.__loaded(iter):
+            return False
+        placeholder = self.tree_store.iter_children(iter)
+        dictionary = self.tree_store.get_value(iter, len(self.keys))
+        for child in dictionary.get(self.children_key) or []:
+            self.__add_row(child, iter)
+        self.tree_store.remove(placeholder)
+        return False
+
+    def __collapsed(self, treeview, iter, path, data=None):
+        """__collapsed: internal signal handler that releases the rows
+        for the children of a row when it is collapsed.
+
+        Do not call directly
+        """
+
+        child = self.tree_store.iter_children(iter)
+        while child is not None:
+            if not self.tree_store.remove(child):
+                child = None
+        dictionary = self.tree_store.get_value(iter, len(self.keys))
+        if len(dictionary.get(self.children_key) or []) > 0:
+            self.__add_placeholder(iter)
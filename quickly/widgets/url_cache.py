@@ -0,0 +1,344 @@
+### BEGIN LICENSE
+# Copyright (C) 2010 Rick Spencer rick.spencer@canonical.com
+#This program is free software: you can redistribute it and/or modify it
+#under the terms of the GNU General Public License version 3, as published
+#by the Free Software Foundation.
+#
+#This program is distributed in the hope that it will be useful, but
+#WITHOUT ANY WARRANTY; without even the implied warranties of
+#MERCHANTABILITY, SATISFACTORY QUALITY, or FITNESS FOR A PARTICULAR
+#PURPOSE.  See the GNU General Public License for more details.
+#
+#You should have received a copy of the GNU General Public License along
+#with this program.  If not, see <http://www.gnu.org/licenses/>.
+### END LICENSE
+
+"""An on disk cache of fetched URLs
+UrlCache keeps the content of fetched URLs in a directory, with an index
+of when each was fetched and its etag and modification time. When the
+cache grows past max_bytes the least recently used entries are removed.
+UrlFetchProgressBox uses a UrlCache passed to it to skip fetches.
+UrlCache does not use gtk or gio.
+
+Using
+cache = UrlCache(os.path.expanduser("~/.cache/myapp/urls"))
+box = UrlFetchProgressBox(url, cache=cache)
+
+#an entry fetched less than max_age seconds ago is used as it is, an
+#older entry is used if its etag or modification time has not changed
+cache = UrlCache(directory, max_bytes=50 * 1024 * 1024, max_age=60)
+
+#see how well the cache works
+print cache.hits, cache.revalidations, cache.misses
+
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import time
+
+#the default size limit of the cache in bytes
+DEFAULT_MAX_BYTES = 100 * 1024 * 1024
+
+#the default number of seconds an entry is used without checking it
+DEFAULT_MAX_AGE = 300
+
+INDEX_FILE = "index.json"
+
+class CacheEntry(object):
+    """CacheEntry: a URL stored in a UrlCache. Not typically created
+    directly, but returned from UrlCache.lookup.
+
+    """
+
+    def __init__(self, url, file_name, size, etag=None, modified=None,
+                 stored=None, last_used=None):
+        self.url = url
+        self.file_name = file_name
+        self.size = size
+        self.etag = etag
+        self.modified = modified
+        if stored is None:
+            stored = time.time()
+        self.stored = stored
+        if last_used is None:
+            last_used = stored
+        self.last_used = last_used
+
+    def to_dict(self):
+        return {"url": self.url, "file_name": self.file_name,
+                "size": self.size, "etag": self.etag,
+                "modified": self.modified, "stored": self.stored,
+                "last_used": self.last_used}
+
+class UrlCache(object):
+    """UrlCache: a size bounded, least recently used cache of URL content
+    in a directory.
+
+    """
+
+    def __init__(self, directory, max_bytes=DEFAULT_MAX_BYTES,
+                 max_age=DEFAULT_MAX_AGE):
+        """Create a UrlCache
+
+        Keyword arguments:
+        directory -- the directory to keep the cache in, created if needed
+        max_bytes -- the most bytes of content to keep
+        max_age -- seconds after it is stored that an entry is used
+        without checking whether it changed
+
+        """
+
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.hits = 0
+        self.revalidations = 0
+        self.misses = 0
+        self.__entries = {}
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+        self.__load()
+
+    @property
+    def size(self):
+        """size - the bytes of content in the cache.
+        This property is read only.
+
+        """
+
+        return sum([e.size for e in self.__entries.values()])
+
+    def __len__(self):
+        return len(self.__entries)
+
+    def lookup(self, url):
+        """lookup: returns the CacheEntry for url, or None. Counts a miss
+        if there is no entry.
+
+        Keyword arguments:
+        url -- the URL
+
+        """
+
+        entry = self.__entries.get(url)
+        if entry is None:
+            self.misses += 1
+        return entry
+
+    def is_fresh(self, entry):
+        """is_fresh: returns True if entry can be used without checking
+        whether the URL changed.
+
+        Keyword arguments:
+        entry -- a CacheEntry
+
+        """
+
+        return time.time() - entry.stored < self.max_age
+
+    def use(self, entry):
+        """use: counts a hit on a fresh entry and returns the name of the
+        file holding its content.
+
+        Keyword arguments:
+        entry -- a CacheEntry
+
+        """
+
+        self.hits += 1
+        entry.last_used = time.time()
+        return self.path(entry)
+
+    def read(self, entry):
+        """read: returns the content of entry.
+
+        Keyword arguments:
+        entry -- a CacheEntry
+
+        """
+
+        f = open(self.path(entry), "rb")
+        try:
+            return f.read()
+        finally:
+            f.close()
+
+    def revalidate(self, entry, etag, modified):
+        """revalidate: compares the etag and modification time of the URL
+        now with those of entry. Returns True if it has not changed,
+        counting a revalidation and treating entry as newly stored.
+        Returns False and counts a miss if it has changed or it can not
+        tell.
+
+        Keyword arguments:
+        entry -- a CacheEntry
+        etag -- the etag of the URL now, or None
+        modified -- the modification time of the URL now, or None
+
+        """
+
+        if etag and entry.etag:
+            valid = etag == entry.etag
+        elif modified and entry.modified:
+            valid = modified == entry.modified
+        else:
+            valid = False
+        if not valid:
+            self.misses += 1
+            return False
+        self.revalidations += 1
+        entry.stored = time.time()
+        entry.last_used = entry.stored
+        self.save()
+        return True
+
+    def path(self, entry):
+        """path: returns the name of the file holding the content of entry.
+
+        Keyword arguments:
+        entry -- a CacheEntry
+
+        """
+
+        return os.path.join(self.directory, entry.file_name)
+
+    def store(self, url, content, etag=None, modified=None):
+        """store: adds or replaces the content of url and removes least
+        recently used entries to stay within max_bytes. Returns the
+        CacheEntry, or None if content alone is larger than max_bytes.
+
+        Keyword arguments:
+        url -- the URL
+        content -- a string of the content of the URL
+        etag -- optional etag of the URL
+        modified -- optional modification time of the URL
+
+        """
+
+        if len(content) > self.max_bytes:
+            return None
+        entry = self.__new_entry(url, len(content), etag, modified)
+        f = open(self.path(entry), "wb")
+        try:
+            f.write(content)
+        finally:
+            f.close()
+        return self.__add(entry)
+
+    def store_file(self, url, file_name, etag=None, modified=None):
+        """store_file: like store, but copies the content from a file.
+
+        Keyword arguments:
+        url -- the URL
+        file_name -- the name of a file holding the content of the URL
+        etag -- optional etag of the URL
+        modified -- optional modification time of the URL
+
+        """
+
+        size = os.path.getsize(file_name)
+        if size > self.max_bytes:
+            return None
+        entry = self.__new_entry(url, size, etag, modified)
+        shutil.copyfile(file_name, self.path(entry))
+        return self.__add(entry)
+
+    def remove(self, url):
+        """remove: removes url from the cache if it is there.
+
+        Keyword arguments:
+        url -- the URL
+
+        """
+
+        entry = self.__entries.pop(url, None)
+        if entry is not None:
+            self.__delete_file(entry)
+            self.save()
+
+    def clear(self):
+        """clear: removes everything from the cache."""
+
+        for entry in self.__entries.values():
+            self.__delete_file(entry)
+        self.__entries = {}
+        self.save()
+
+    def save(self):
+        """save: writes the index of the cache to disk. Called when entries
+        are added or removed, call it to keep the latest use times too.
+
+        """
+
+        index = [e.to_dict() for e in self.__entries.values()]
+        index_name = os.path.join(self.directory, INDEX_FILE)
+        f = open(index_name + ".tmp", "w")
+        try:
+            json.dump(index, f)
+        finally:
+            f.close()
+        os.rename(index_name + ".tmp", index_name)
+
+    def __load(self):
+        """__load: internal function that reads the index, dropping entries
+        whose file is gone.
+
+        """
+
+        index_name = os.path.join(self.directory, INDEX_FILE)
+        if not os.path.exists(index_name):
+            return
+        try:
+            f = open(index_name)
+            try:
+                index = json.load(f)
+            finally:
+                f.close()
+        except (IOError, ValueError):
+            #a damaged index just means an empty cache
+            return
+        for values in index:
+            values = dict([(str(k), v) for k, v in values.items()])
+            entry = CacheEntry(**values)
+            if os.path.exists(self.path(entry)):
+                self.__entries[entry.url] = entry
+
+    def __new_entry(self, url, size, etag, modified):
+        self.remove(url)
+        if isinstance(url, unicode):
+            url = url.encode("utf-8")
+        file_name = hashlib.md5(url).hexdigest()
+        return CacheEntry(url, file_name, size, etag, modified)
+
+    def __add(self, entry):
+        self.__entries[entry.url] = entry
+        self.__evict()
+        self.save()
+        return entry
+
+    def __evict(self):
+        """__evict: internal function that removes least recently used
+        entries until the cache is within max_bytes.
+
+        """
+
+        total = self.size
+        if total <= self.max_bytes:
+            return
+        entries = self.__entries.values()
+        entries.sort(key=lambda e: e.last_used)
+        for entry in entries:
+            if total <= self.max_bytes:
+                break
+            del self.__entries[entry.url]
+            self.__delete_file(entry)
+            total -= entry.size
+
+    def __delete_file(self, entry):
+        try:
+            os.remove(self.path(entry))
+        except OSError:
+            pass
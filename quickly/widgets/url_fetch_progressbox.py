@@ -13,17 +13,27 @@
 #with this program.  If not, see <http://www.gnu.org/licenses/>.
 ### END LICENSE
 
+import httplib
+
 try:
     import pygtk
     pygtk.require("2.0")
-    import gtk, gobject, gio
+    import gtk, gobject
     import gettext
     from gettext import gettext as _
     gettext.textdomain('quickly-widgets')
+    import range_fetch
 
 except:
     print "couldn't load dependencies"
 
+#bytes to read at a time when streaming
+CHUNK_SIZE = 64 * 1024
+
+#added to destination for the file that remembers which version of the
+#URL a partial destination holds
+VALIDATOR_SUFFIX = ".validator"
+
 
 class UrlFetchProgressBox(gtk.HBox):
     """UrlFetchProgressBox: encapsulates a pulsating progressbar, a cancel
@@ -35,14 +45,53 @@ class UrlFetchProgressBox(gtk.HBox):
     Fires a "downloaded" signal once download is complete, passing the contents
     of the URL.
     Cancelling fires the "downloaded" signal with a value of None.
+    Any other failure, such as a missing file or an unknown host, fires
+    the "failed" signal with the error instead.
+
+    Pass streaming=True or a destination file name to read the URL in chunks
+    rather than into memory. Each chunk is passed to the "chunk" signal as it
+    arrives and written to destination, and the progressbar shows the real
+    fraction when the size of the URL is known. "downloaded" then passes
+    destination, or the number of bytes read when there is no destination.
+    A cancelled download leaves the part already written in destination.
+
+    Pass a url_cache.UrlCache as cache to keep what is fetched on disk. A
+    URL stored less than the cache's max_age ago is not fetched again and
+    "downloaded" fires from the main loop right away. For an older entry,
+    the box compares the etag and modification time gio reports for the URL
+    with the stored ones, and only fetches again if they changed. Streaming
+    without a destination does not use the cache.
+
+    With a destination, pass resume=True to continue from the end of a
+    partial destination file left by a cancelled or failed fetch, or
+    segments=N to fetch N ranges of the URL at once into a preallocated
+    destination file. "chunk" is not emitted for segments, and resume can
+    not be combined with segments. For http and https URLs the ranges are
+    read with range_fetch on the executor, as gio can not tell whether the
+    server sent the range asked for. Ranges are only asked for when the
+    server advertises "Accept-Ranges: bytes", and a server that answers a
+    range with the whole URL is read from the beginning instead. Call
+    gobject.threads_init() before gtk.main() for these. Other URLs need a
+    gio backend that can seek in them, and fall back to fetching the whole
+    URL otherwise.
+    A resumed fetch keeps the etag and modification time of the URL in
+    destination + VALIDATOR_SUFFIX until it completes, and starts again
+    from the beginning when they changed or gio does not report them.
     """
 
     __gsignals__ = {
         'downloaded' : (gobject.SIGNAL_RUN_LAST, gobject.TYPE_NONE, 
+            (gobject.TYPE_PYOBJECT,)),
+        'chunk' : (gobject.SIGNAL_RUN_LAST, gobject.TYPE_NONE,
+            (gobject.TYPE_PYOBJECT,)),
+        'failed' : (gobject.SIGNAL_RUN_LAST, gobject.TYPE_NONE,
             (gobject.TYPE_PYOBJECT,))
     }
 
-    def __init__(self, url, destroy_after_fetching=True, cancelable=True):
+    def __init__(self, url, destroy_after_fetching=True, cancelable=True,
+                 streaming=False, destination=None, chunk_size=CHUNK_SIZE,
+                 start_immediately=True, cache=None, resume=False,
+                 segments=1, executor=None):
         """Create an UrlFetchProgressBox
 
         Keyword arguments:
@@ -50,10 +99,24 @@ class UrlFetchProgressBox(gtk.HBox):
         destroy_after_fetching -- should this widget destroy itself once the URL
           is fetched? Defaults to True.
         cancelable -- whether to show cancel button. Defaults to True.
+        streaming -- read the URL in chunks and emit "chunk" for each of
+          them. Defaults to False, unless there is a destination.
+        destination -- optional name of a file to write the URL to.
+        chunk_size -- the most bytes to read at a time when streaming.
+        start_immediately -- start fetching right away. Defaults to True,
+          pass False and call start later to queue the fetch.
+        cache -- optional UrlCache to use. Defaults to None.
+        resume -- continue a partial destination file. Defaults to False.
+        segments -- the number of ranges to fetch at once into destination.
+          Defaults to 1, and must be 1 with resume.
+        executor -- a TaskExecutor to read ranges of http URLs on,
+          defaults to the one shared by quickly.widgets,
+          task_executor.default_executor
         """
+        if resume and segments > 1:
+            raise ValueError("resume can not be combined with segments.")
         gtk.HBox.__init__( self, False, 2)
         self.progressbar = gtk.ProgressBar()
-        gobject.timeout_add(100, self.__tick)
         parts = [x for x in url.split("/") if x]
         self.progressbar.set_text(_("Downloading %s") % parts[-1])
         self.running = True
@@ -67,33 +130,630 @@ class UrlFetchProgressBox(gtk.HBox):
         self.cancel_button.connect("clicked",self.__cancel)
         self.pack_end(self.cancel_button, False)
         self.cancel_button.set_sensitive(True)
+        self.url = url
+        self.streaming = streaming
+        self.destination = destination
+        self.chunk_size = chunk_size
+        self.bytes_read = 0
+        self.total_bytes = None
+        self.started = False
+        self.cache = cache
+        self.resume = resume
+        self.segments = segments
+        if executor is None:
+            from task_executor import default_executor
+            executor = default_executor()
+        self.executor = executor
+        self.__range_tasks = []
+        self.__output = None
+        self.__segment_generation = 0
+        self.__segments_running = 0
+        self.__canceller = None
+        self.__etag = None
+        self.__modified = None
+        if start_immediately:
+            self.start()
+
+    def start(self):
+        """start: starts fetching the URL. Only needed when the box was
+        created with start_immediately=False.
+
+        """
+
+        if self.started:
+            raise RuntimeError("UrlFetchProgressBox already started.")
+        self.started = True
+
+        #gio is only needed once a fetch starts, so import it here
+        #rather than when the module is imported
+        import gio
         self.__canceller = gio.Cancellable()
-        self.stream = gio.File(url)
-        self.stream.load_contents_async(self.__download_finished, cancellable=self.__canceller)
+        gobject.timeout_add(100, self.__tick)
+        self.stream = gio.File(self.url)
+        if self.streaming and self.destination is None:
+            self.cache = None
+        if self.cache is not None:
+            entry = self.cache.lookup(self.url)
+            if entry is not None:
+                if self.cache.is_fresh(entry):
+                    self.cache.use(entry)
+                    gobject.idle_add(self.__serve_cached, entry)
+                else:
+                    self.stream.query_info_async(
+                        "etag::value,time::modified", self.__revalidate,
+                        cancellable=self.__canceller, user_data=entry)
+                return
+        self.__fetch()
+
+    def __fetch(self):
+        if ((self.resume or self.segments > 1) and
+            self.destination is not None and range_fetch.is_http(self.url)):
+            self.__submit(range_fetch.probe, [self.url], self.__probed)
+        elif self.segments > 1 and self.destination is not None:
+            self.stream.query_info_async(
+                "standard::size,etag::value,time::modified",
+                self.__segment_info_ready, cancellable=self.__canceller)
+        elif self.resume and self.destination is not None:
+            #the validators decide whether to resume, so they are needed
+            #before the stream is opened
+            self.stream.query_info_async(
+                "standard::size,etag::value,time::modified",
+                self.__resume_info_ready, cancellable=self.__canceller)
+        elif self.streaming or self.destination is not None:
+            self.stream.query_info_async(
+                "standard::size,etag::value,time::modified",
+                self.__info_ready, cancellable=self.__canceller)
+            self.stream.read_async(self.__stream_opened,
+                                   cancellable=self.__canceller)
+        else:
+            if self.cache is not None:
+                self.stream.query_info_async("etag::value,time::modified",
+                    self.__info_ready, cancellable=self.__canceller)
+            self.stream.load_contents_async(self.__download_finished, cancellable=self.__canceller)
+
+    def __revalidate(self, gdaemonfile, result, entry):
+        import gio
+        try:
+            info = self.stream.query_info_finish(result)
+        except gio.Error, e:
+            if e.code == gio.ERROR_CANCELLED:
+                self.__stream_failed(e)
+            else:
+                #can not tell whether it changed, so this counts a miss
+                self.cache.revalidate(entry, None, None)
+                self.__fetch()
+            return
+        self.__read_validators(info)
+        if self.cache.revalidate(entry, self.__etag, self.__modified):
+            self.__serve_cached(entry)
+        else:
+            self.__fetch()
+
+    def __read_validators(self, info):
+        etag = info.get_etag()
+        if etag:
+            self.__etag = etag
+        modified = info.get_attribute_uint64("time::modified")
+        if modified:
+            self.__modified = modified
+
+    def __serve_cached(self, entry):
+        if self.__canceller.is_cancelled():
+            self.emit("downloaded", None)
+            return False
+        if self.destination is not None:
+            import shutil
+            shutil.copyfile(self.cache.path(entry), self.destination)
+            self.bytes_read = entry.size
+            self.emit("downloaded", self.destination)
+        else:
+            self.emit("downloaded", self.cache.read(entry))
+        self.__maybe_destroy()
+        return False
+
+    def __store_in_cache(self, content=None):
+        if self.cache is None:
+            return
+        if content is not None:
+            self.cache.store(self.url, content, self.__etag, self.__modified)
+        else:
+            self.cache.store_file(self.url, self.destination,
+                                  self.__etag, self.__modified)
     
     def __tick(self):
-        self.progressbar.pulse()
+        if self.total_bytes is None:
+            self.progressbar.pulse()
         return self.running
+
+    def __info_ready(self, gdaemonfile, result):
+        import gio
+        try:
+            info = self.stream.query_info_finish(result)
+        except gio.Error:
+            #not every backend knows the size, keep pulsing
+            return
+        self.__read_info(info)
+
+    def __resume_info_ready(self, gdaemonfile, result):
+        import gio
+        try:
+            info = self.stream.query_info_finish(result)
+        except gio.Error, e:
+            if e.code == gio.ERROR_CANCELLED:
+                self.__stream_failed(e)
+                return
+            #without validators the fetch starts from the beginning
+            info = None
+        if info is not None:
+            self.__read_info(info)
+        self.stream.read_async(self.__stream_opened,
+                               cancellable=self.__canceller)
+
+    def __read_info(self, info):
+        self.__read_validators(info)
+        size = info.get_size()
+        if size > 0:
+            self.total_bytes = size
+            self.__show_fraction()
+
+    def __show_fraction(self):
+        if self.total_bytes is not None:
+            fraction = min(1.0, self.bytes_read / float(self.total_bytes))
+            self.progressbar.set_fraction(fraction)
+
+    def __stream_opened(self, gdaemonfile, result):
+        import gio
+        try:
+            input_stream = self.stream.read_finish(result)
+            if self.destination is not None:
+                offset = self.__resume_offset(input_stream)
+                if offset > 0:
+                    self.__output = open(self.destination, "ab")
+                else:
+                    self.__output = open(self.destination, "wb")
+                    if self.resume:
+                        self.__save_validator()
+                self.bytes_read = offset
+                self.__show_fraction()
+        except (gio.Error, IOError), e:
+            self.__stream_failed(e)
+            return
+        input_stream.read_async(self.chunk_size, self.__chunk_read,
+                                cancellable=self.__canceller)
+
+    def __chunk_read(self, input_stream, result):
+        import gio
+        try:
+            chunk = input_stream.read_finish(result)
+            if len(chunk) > 0 and self.__output is not None:
+                self.__output.write(chunk)
+        except (gio.Error, IOError), e:
+            input_stream.close()
+            self.__stream_failed(e)
+            return
+
+        if len(chunk) == 0:
+            input_stream.close()
+            self.__close_output()
+            if self.destination is not None:
+                if self.resume:
+                    self.__remove_validator()
+                self.__store_in_cache()
+                self.emit("downloaded", self.destination)
+            else:
+                self.emit("downloaded", self.bytes_read)
+            self.__maybe_destroy()
+            return
+
+        self.bytes_read += len(chunk)
+        self.__show_fraction()
+        self.emit("chunk", chunk)
+        input_stream.read_async(self.chunk_size, self.__chunk_read,
+                                cancellable=self.__canceller)
+
+    def __resume_offset(self, input_stream):
+        """__resume_offset: internal function that seeks input_stream to
+        the end of a partial destination file and returns the offset, or
+        returns 0 if the fetch has to start from the beginning. The
+        partial file is only used when it was written from the same
+        version of the URL.
+
+        """
+        import gio
+        offset = self.__partial_size()
+        if offset == 0 or not input_stream.can_seek():
+            return 0
+        try:
+            input_stream.seek(offset)
+        except gio.Error:
+            return 0
+        return offset
+
+    def __partial_size(self):
+        """__partial_size: internal function that returns the size of a
+        partial destination file to resume, or 0 if there is none or it
+        was written from another version of the URL.
+
+        """
+        import os
+        if not self.resume or not os.path.exists(self.destination):
+            return 0
+        validator = self.__validator()
+        if validator is None or self.__stored_validator() != validator:
+            return 0
+        return os.path.getsize(self.destination)
+
+    def __submit(self, function, args, callback, kwargs=None,
+                 killable=False):
+        """__submit: internal function that runs function with args and
+        kwargs on the executor, and passes its result and the error it
+        raised, if any, to callback on the main loop. Results of tasks
+        submitted before the fetch was cancelled or fell back to a single
+        range are dropped.
+
+        """
+        generation = self.__segment_generation
+        params = {"function": function, "args": args,
+                  "kwargs": kwargs or {}, "killable": killable}
+        def done(result):
+            gobject.idle_add(self.__task_done, callback, generation, result)
+        self.__range_tasks.append(self.executor.submit(_run_caught, params,
+                                                       done))
+
+    def __task_done(self, callback, generation, result):
+        if generation == self.__segment_generation:
+            callback(*result)
+        return False
+
+    def __stop_range_tasks(self):
+        self.__segment_generation += 1
+        for task in self.__range_tasks:
+            task.kill()
+        self.__range_tasks = []
+
+    def __probed(self, info, error):
+        if error is not None:
+            self.__range_failed(error)
+            return
+        if info.etag:
+            self.__etag = info.etag
+        if info.modified:
+            self.__modified = info.modified
+        if info.size:
+            self.total_bytes = info.size
+        if self.segments > 1:
+            if info.size and info.accepts_ranges:
+                self.__fetch_segments(info.size)
+            else:
+                #ranges need the size and a server that accepts them
+                self.__fetch_from(0)
+            return
+        offset = 0
+        if info.accepts_ranges:
+            offset = self.__partial_size()
+        if info.size and offset >= info.size:
+            offset = 0
+        self.__fetch_from(offset)
+
+    def __fetch_from(self, offset):
+        """__fetch_from: internal function that reads an http URL into
+        destination from offset to the end on the executor.
+
+        """
+        try:
+            if offset == 0:
+                open(self.destination, "wb").close()
+                if self.resume:
+                    self.__save_validator()
+        except IOError, e:
+            self.__range_failed(e)
+            return
+        self.bytes_read = offset
+        self.__show_fraction()
+        generation = self.__segment_generation
+        def progress(position, chunk):
+            gobject.idle_add(self.__range_chunk, generation, position, chunk)
+        self.__submit(range_fetch.fetch_range,
+                      [self.url, self.destination, offset],
+                      self.__range_fetched,
+                      {"chunk_size": self.chunk_size, "progress": progress},
+                      killable=True)
+
+    def __range_chunk(self, generation, position, chunk):
+        if generation == self.__segment_generation:
+            #a server that ignored the range starts again from 0
+            self.bytes_read = position + len(chunk)
+            self.__show_fraction()
+            if self.segments == 1:
+                self.emit("chunk", chunk)
+        return False
+
+    def __range_fetched(self, start, error):
+        if error is not None:
+            self.__range_failed(error)
+        else:
+            self.__range_finished()
+
+    def __fetch_segments(self, size):
+        """__fetch_segments: internal function that preallocates
+        destination and reads segments ranges of an http URL into it on
+        the executor.
+
+        """
+        from fetch_scheduler import split_ranges
+        try:
+            output = open(self.destination, "wb")
+            try:
+                output.truncate(size)
+            finally:
+                output.close()
+        except IOError, e:
+            self.__range_failed(e)
+            return
+        ranges = split_ranges(size, self.segments)
+        self.__segments_running = len(ranges)
+        generation = self.__segment_generation
+        def progress(position, chunk):
+            gobject.idle_add(self.__segment_chunk, generation, chunk)
+        for start, end in ranges:
+            self.__submit(range_fetch.fetch_range,
+                          [self.url, self.destination, start],
+                          self.__segment_fetched,
+                          {"end": end, "chunk_size": self.chunk_size,
+                           "progress": progress},
+                          killable=True)
+
+    def __segment_chunk(self, generation, chunk):
+        if generation == self.__segment_generation:
+            self.bytes_read += len(chunk)
+            self.__show_fraction()
+        return False
+
+    def __segment_fetched(self, start, error):
+        if isinstance(error, range_fetch.RangeError):
+            #the server did not send the range, so read the whole URL
+            self.__stop_range_tasks()
+            self.__fetch_from(0)
+        elif error is not None:
+            self.__range_failed(error)
+        else:
+            self.__segments_running -= 1
+            if self.__segments_running == 0:
+                self.__range_finished()
+
+    def __range_finished(self):
+        self.__range_tasks = []
+        if self.resume:
+            self.__remove_validator()
+        self.__store_in_cache()
+        self.emit("downloaded", self.destination)
+        self.__maybe_destroy()
+
+    def __range_failed(self, error):
+        self.__stop_range_tasks()
+        self.__stream_failed(error)
+
+    def __validator(self):
+        """__validator: internal function that returns the etag and
+        modification time of the URL as a list of strings, or None if gio
+        reported neither.
+
+        """
+        if self.__etag is None and self.__modified is None:
+            return None
+        return [self.__etag or "", str(self.__modified or "")]
+
+    def __stored_validator(self):
+        try:
+            validator_file = open(self.destination + VALIDATOR_SUFFIX, "r")
+            try:
+                return validator_file.read().split("\n")[:2]
+            finally:
+                validator_file.close()
+        except IOError:
+            return None
+
+    def __save_validator(self):
+        validator = self.__validator()
+        if validator is None:
+            #a later resume could not tell whether the URL changed
+            self.__remove_validator()
+            return
+        try:
+            validator_file = open(self.destination + VALIDATOR_SUFFIX, "w")
+            try:
+                validator_file.write("\n".join(validator) + "\n")
+            finally:
+                validator_file.close()
+        except IOError:
+            self.__remove_validator()
+
+    def __remove_validator(self):
+        import os
+        try:
+            os.remove(self.destination + VALIDATOR_SUFFIX)
+        except OSError:
+            pass
+
+    def __segment_info_ready(self, gdaemonfile, result):
+        import gio
+        from fetch_scheduler import split_ranges
+        try:
+            info = self.stream.query_info_finish(result)
+        except gio.Error, e:
+            if e.code == gio.ERROR_CANCELLED:
+                self.__stream_failed(e)
+            else:
+                self.__fetch_whole()
+            return
+        self.__read_validators(info)
+        size = info.get_size()
+        if size <= 0:
+            #ranges need the size
+            self.__fetch_whole()
+            return
+        self.total_bytes = size
+        try:
+            self.__output = open(self.destination, "wb")
+            self.__output.truncate(size)
+        except IOError, e:
+            self.__stream_failed(e)
+            return
+        ranges = split_ranges(size, self.segments)
+        self.__segments_running = len(ranges)
+        generation = self.__segment_generation
+        for start, end in ranges:
+            #each range needs a stream of its own
+            gio.File(self.url).read_async(self.__segment_opened,
+                cancellable=self.__canceller,
+                user_data=[start, end, generation])
+
+    def __fetch_whole(self):
+        """__fetch_whole: internal function that stops any segments and
+        fetches the URL in one stream instead.
+
+        """
+        self.__segment_generation += 1
+        self.__close_output()
+        self.bytes_read = 0
+        self.resume = False
+        self.stream.read_async(self.__stream_opened,
+                               cancellable=self.__canceller)
+
+    def __segment_opened(self, gdaemonfile, result, segment):
+        import gio
+        try:
+            input_stream = gdaemonfile.read_finish(result)
+        except gio.Error, e:
+            if segment[2] == self.__segment_generation:
+                self.__segment_failed(e)
+            return
+        if segment[2] != self.__segment_generation:
+            input_stream.close()
+            return
+        if segment[0] > 0:
+            try:
+                if not input_stream.can_seek():
+                    raise gio.Error("can not seek")
+                input_stream.seek(segment[0])
+            except gio.Error:
+                input_stream.close()
+                self.__fetch_whole()
+                return
+        self.__read_segment(input_stream, segment)
+
+    def __read_segment(self, input_stream, segment):
+        count = min(self.chunk_size, segment[1] - segment[0])
+        input_stream.read_async(count, self.__segment_read,
+                                cancellable=self.__canceller,
+                                user_data=segment)
+
+    def __segment_read(self, input_stream, result, segment):
+        import gio
+        if segment[2] != self.__segment_generation:
+            input_stream.close()
+            return
+        try:
+            chunk = input_stream.read_finish(result)
+            if len(chunk) == 0:
+                raise IOError("the URL ended before its size")
+            self.__output.seek(segment[0])
+            self.__output.write(chunk)
+        except (gio.Error, IOError), e:
+            input_stream.close()
+            self.__segment_failed(e)
+            return
+
+        segment[0] += len(chunk)
+        self.bytes_read += len(chunk)
+        self.__show_fraction()
+        if segment[0] < segment[1]:
+            self.__read_segment(input_stream, segment)
+            return
+
+        input_stream.close()
+        self.__segments_running -= 1
+        if self.__segments_running == 0:
+            self.__close_output()
+            self.__store_in_cache()
+            self.emit("downloaded", self.destination)
+            self.__maybe_destroy()
+
+    def __segment_failed(self, error):
+        #the other segments stop when they see the new generation
+        self.__segment_generation += 1
+        self.__stream_failed(error)
+
+    def __stream_failed(self, error):
+        import gio
+        self.__close_output()
+        if isinstance(error, gio.Error) and error.code == gio.ERROR_CANCELLED:
+            # user cancelled
+            self.emit("downloaded", None)
+        else:
+            self.emit("failed", error)
+        self.__maybe_destroy()
+
+    def __close_output(self):
+        if self.__output is not None:
+            self.__output.close()
+            self.__output = None
     
     def __download_finished(self, gdaemonfile, result):
+        import gio
         try:
-            content = self.stream.load_contents_finish(result)[0]
+            content, length, etag = self.stream.load_contents_finish(result)
         except gio.Error, e:
-            if e.code == 19:
+            if e.code == gio.ERROR_CANCELLED:
                 # user cancelled
                 self.emit("downloaded", None)
+            else:
+                self.emit("failed", e)
         else:
+            if etag and not self.__etag:
+                self.__etag = etag
+            self.__store_in_cache(content)
             self.emit("downloaded", content)
         self.__maybe_destroy()
     
     def __cancel(self, btn):
-        self.__canceller.cancel()
+        self.cancel()
+
+    def cancel(self):
+        """cancel: stops the fetch and emits "downloaded" with None.
+        A box that has not started never starts.
+
+        """
+        if self.__range_tasks:
+            #tasks on the executor do not see the gio cancellable
+            self.__stop_range_tasks()
+            self.emit("downloaded", None)
+        elif self.__canceller is not None:
+            self.__canceller.cancel()
+        else:
+            self.started = True
+            self.emit("downloaded", None)
         self.__maybe_destroy()
     
     def __maybe_destroy(self):
         self.running = False
         if self.destroy_after_fetching: self.destroy()
 
+def _run_caught(params):
+    """_run_caught: run_function for the executor that calls
+    params["function"] and returns its result and None, or None and the
+    error it raised. With params["killable"] the function is also passed
+    killed, which returns True once the task is killed.
+
+    """
+    kwargs = dict(params["kwargs"])
+    if params["killable"]:
+        kwargs["killed"] = lambda: params["kill"]
+    try:
+        return params["function"](*params["args"], **kwargs), None
+    except (EnvironmentError, httplib.HTTPException), e:
+        return None, e
+
 class TestWindow(gtk.Window):
     def __init__(self):
         gtk.Window.__init__(self, gtk.WINDOW_TOPLEVEL)
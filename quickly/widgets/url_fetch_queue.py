@@ -0,0 +1,174 @@
+### BEGIN LICENSE
+# Copyright (C) 2010 Rick Spencer rick.spencer@canonical.com
+#This program is free software: you can redistribute it and/or modify it
+#under the terms of the GNU General Public License version 3, as published
+#by the Free Software Foundation.
+#
+#This program is distributed in the hope that it will be useful, but
+#WITHOUT ANY WARRANTY; without even the implied warranties of
+#MERCHANTABILITY, SATISFACTORY QUALITY, or FITNESS FOR A PARTICULAR
+#PURPOSE.  See the GNU General Public License for more details.
+#
+#You should have received a copy of the GNU General Public License along
+#with this program.  If not, see <http://www.gnu.org/licenses/>.
+### END LICENSE
+
+"""A queue of UrlFetchProgressBoxes that limits how many fetch at once
+Using
+#create the queue and add it to a window, it shows a progressbar for
+#the whole queue and a UrlFetchProgressBox for each running fetch
+queue = UrlFetchQueue(max_active=4, max_per_host=2)
+queue.show()
+window.add(queue)
+
+#add urls, they are fetched in priority order as slots free up
+queue.add("http://example.com/a.png")
+queue.add("http://example.com/index.html", priority=10)
+
+#the keyword arguments of UrlFetchProgressBox can be passed to add
+queue.add("http://example.com/big.iso", destination="/tmp/big.iso")
+
+#respond to each fetch, and to the whole queue finishing
+queue.connect("downloaded", on_downloaded)
+queue.connect("all-downloaded", on_all_downloaded)
+def on_downloaded(queue, url, content):
+    pass
+
+#a fetch that fails frees its slot and fires "failed" with the error
+queue.connect("failed", on_failed)
+def on_failed(queue, url, error):
+    pass
+
+"""
+
+try:
+    import pygtk
+    pygtk.require("2.0")
+    import gtk, gobject
+    import gettext
+    from gettext import gettext as _
+    gettext.textdomain('quickly-widgets')
+    from fetch_scheduler import FetchScheduler, host_of
+    from fetch_scheduler import DEFAULT_MAX_ACTIVE, DEFAULT_MAX_PER_HOST
+    from url_fetch_progressbox import UrlFetchProgressBox
+
+except:
+    print "couldn't load dependencies"
+
+class UrlFetchQueue(gtk.VBox):
+    """UrlFetchQueue: fetches URLs with UrlFetchProgressBoxes, running no
+    more than max_active at once and no more than max_per_host at once
+    against the same host. Shows a progressbar with the progress of the
+    whole queue.
+    Fires a "downloaded" signal for each fetch, passing the URL and what
+    the UrlFetchProgressBox passed, "failed" for each fetch that fails,
+    passing the URL and the error, and "all-downloaded" once nothing is
+    left in the queue.
+    """
+
+    __gsignals__ = {
+        'downloaded' : (gobject.SIGNAL_RUN_LAST, gobject.TYPE_NONE,
+            (gobject.TYPE_PYOBJECT, gobject.TYPE_PYOBJECT)),
+        'failed' : (gobject.SIGNAL_RUN_LAST, gobject.TYPE_NONE,
+            (gobject.TYPE_PYOBJECT, gobject.TYPE_PYOBJECT)),
+        'all-downloaded' : (gobject.SIGNAL_RUN_LAST, gobject.TYPE_NONE,
+            ())
+    }
+
+    def __init__(self, max_active=DEFAULT_MAX_ACTIVE,
+                 max_per_host=DEFAULT_MAX_PER_HOST, show_fetches=True):
+        """Create an UrlFetchQueue
+
+        Keyword arguments:
+        max_active -- the most URLs to fetch at once
+        max_per_host -- the most URLs to fetch at once from one host,
+          None for no limit
+        show_fetches -- show a UrlFetchProgressBox for each running
+          fetch. Defaults to True.
+        """
+        gtk.VBox.__init__(self, False, 2)
+        self.progressbar = gtk.ProgressBar()
+        self.progressbar.show()
+        self.pack_start(self.progressbar, False)
+        self.show_fetches = show_fetches
+        self.scheduler = FetchScheduler(max_active, max_per_host)
+        self.__boxes = []
+        self.__finished = set()
+        self.__ticking = False
+        self.__update_progress()
+
+    @property
+    def fraction(self):
+        """fraction - the overall completion of the queue. Finished fetches
+        count as done, running fetches count by the bytes read when their
+        size is known. This property is read only.
+        """
+        if len(self.__boxes) == 0:
+            return 0.0
+        done = float(len(self.__finished))
+        for box in self.__boxes:
+            if box in self.__finished:
+                continue
+            if box.started and box.total_bytes:
+                done += min(1.0, box.bytes_read / float(box.total_bytes))
+        return done / len(self.__boxes)
+
+    def add(self, url, priority=0, **kwargs):
+        """add: queues a URL and returns the UrlFetchProgressBox for it.
+
+        Keyword arguments:
+        url -- the URL to fetch
+        priority -- URLs with a higher priority are fetched first, URLs
+          with the same priority in the order they were added
+        Other keyword arguments are passed to UrlFetchProgressBox.
+        """
+        kwargs["start_immediately"] = False
+        box = UrlFetchProgressBox(url, **kwargs)
+        box.connect("downloaded", self.__box_finished, "downloaded")
+        box.connect("failed", self.__box_finished, "failed")
+        self.__boxes.append(box)
+        self.scheduler.add(box, host_of(url), priority)
+        self.__start_ready()
+        self.__update_progress()
+        return box
+
+    def cancel_all(self):
+        """cancel_all: cancels every fetch in the queue, running or not."""
+        for box in list(self.__boxes):
+            if box not in self.__finished:
+                box.cancel()
+
+    def __start_ready(self):
+        for box in self.scheduler.next_ready():
+            self.pack_start(box, False)
+            if self.show_fetches:
+                box.show()
+            box.start()
+        if self.scheduler.active > 0 and not self.__ticking:
+            self.__ticking = True
+            gobject.timeout_add(100, self.__tick)
+
+    def __tick(self):
+        self.__update_progress()
+        self.__ticking = self.scheduler.active > 0
+        return self.__ticking
+
+    def __box_finished(self, box, data, signal):
+        #called for "downloaded" and "failed", either frees the slot
+        if box in self.__finished:
+            return
+        self.scheduler.finished(box)
+        self.__finished.add(box)
+        self.emit(signal, box.url, data)
+        self.__start_ready()
+        self.__update_progress()
+        if self.scheduler.active == 0 and self.scheduler.pending == 0:
+            self.__boxes = []
+            self.__finished = set()
+            self.emit("all-downloaded")
+
+    def __update_progress(self):
+        self.progressbar.set_fraction(self.fraction)
+        self.progressbar.set_text(_("%(done)d of %(total)d downloaded") %
+                                  {"done": len(self.__finished),
+                                   "total": len(self.__boxes)})